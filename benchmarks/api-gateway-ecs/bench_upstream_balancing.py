@@ -0,0 +1,129 @@
+"""
+Tail latency of the gateway's upstream requests over replicas of which one pauses now and then, as
+during a GC pause or a noisy neighbour, for round-robin (what Docker DNS gives), least outstanding
+requests, peak EWMA, and peak EWMA with hedged GETs.
+
+Each replica answers after a --latency-ms service time with an exponential jitter; the first one
+also stalls for --pause-ms every --pause-every seconds, holding every request it got meanwhile. The
+requests arrive open loop at --rps and go through the gateway's UpstreamBalancer and an httpx
+client whose transport stands in for the replicas, so no server is needed.
+
+Usage:
+    python3 bench_upstream_balancing.py
+    python3 bench_upstream_balancing.py --replicas 3 --rps 500 --duration 20 --pause-ms 300 --pause-every 2
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import itertools
+
+SERVICE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "services", "api-gateway-ecs")
+sys.path.insert(0, os.path.abspath(SERVICE_DIR))
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+import httpx
+
+from balancer.balancer import UpstreamBalancer, LEAST_OUTSTANDING, EWMA
+
+class RoundRobinBalancer(UpstreamBalancer):
+    """Sends the requests to the replicas in turn, whatever their state."""
+
+    def __init__(self, urls: list[str]):
+        super().__init__(urls, hedge_budget=0)
+        self._turns = itertools.cycle(self.endpoints)
+
+    def pick(self, exclude=None):
+        endpoint = next(self._turns)
+        endpoint.outstanding += 1
+        endpoint.requests += 1
+        return endpoint
+
+class Replicas:
+    """Answers the requests to http://replica-<n> like replicas with the given latencies, the first one pausing."""
+
+    def __init__(self, latency: float, pause: float, pause_every: float):
+        self._latency = latency
+        self._pause = pause
+        self._pause_every = pause_every
+        self._started_at = time.monotonic()
+
+    def _paused_for(self) -> float:
+        elapsed = time.monotonic() - self._started_at
+        # Each period ends with the pause, so the first one comes after a warm-up.
+        remaining = self._pause_every - elapsed % self._pause_every
+        return remaining if remaining <= self._pause else 0.0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if request.url.host == "replica-0":
+            await asyncio.sleep(self._paused_for())
+        await asyncio.sleep(self._latency * (0.5 + random.expovariate(2.0)))
+        return httpx.Response(200, json={"ok": True})
+
+def quantile(sorted_values: list[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+async def run(balancer: UpstreamBalancer, args) -> dict:
+    replicas = Replicas(args.latency_ms / 1000, args.pause_ms / 1000, args.pause_every)
+    client = httpx.AsyncClient(transport=httpx.MockTransport(replicas.handle))
+    latencies, errors = [], 0
+
+    async def one_request():
+        nonlocal errors
+        started_at = time.perf_counter()
+        try:
+            response, close = await balancer.send(client, lambda endpoint: client.build_request("GET", f"{endpoint.url}/v1/users/u/offers"), idempotent=True)
+            await response.aread()
+            await close()
+            latencies.append(time.perf_counter() - started_at)
+        except httpx.HTTPError:
+            errors += 1
+
+    tasks, interval = [], 1 / args.rps
+    started_at = time.perf_counter()
+    for i in range(int(args.rps * args.duration)):
+        delay = started_at + i * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one_request()))
+    await asyncio.gather(*tasks)
+    await client.aclose()
+
+    latencies.sort()
+    upstream_requests = sum(endpoint.requests for endpoint in balancer.endpoints)
+    return {
+        "p50": quantile(latencies, 0.5), "p95": quantile(latencies, 0.95), "p99": quantile(latencies, 0.99),
+        "p999": quantile(latencies, 0.999), "errors": errors, "load": upstream_requests / len(tasks),
+        "to_paused": balancer.endpoints[0].requests / upstream_requests, "hedges": balancer.hedges,
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--rps", type=float, default=400)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Mean service time of a replica.")
+    parser.add_argument("--pause-ms", type=float, default=200.0, help="Length of the pauses of the first replica.")
+    parser.add_argument("--pause-every", type=float, default=2.0, help="Seconds between the starts of two pauses.")
+    parser.add_argument("--hedge-budget", type=float, default=0.1)
+    args = parser.parse_args()
+
+    urls = [f"http://replica-{i}" for i in range(args.replicas)]
+    modes = {
+        "round robin": lambda: RoundRobinBalancer(urls),
+        "least outstanding": lambda: UpstreamBalancer(urls, LEAST_OUTSTANDING, hedge_budget=0),
+        "ewma": lambda: UpstreamBalancer(urls, EWMA, hedge_budget=0),
+        "ewma + hedging": lambda: UpstreamBalancer(urls, EWMA, hedge_budget=args.hedge_budget),
+    }
+    print(f"{'mode':<18} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'p99.9 ms':>9} {'upstream/req':>13} {'to paused':>10} {'hedges':>7} {'errors':>7}")
+    for mode, create in modes.items():
+        result = await run(create(), args)
+        print(
+            f"{mode:<18} {result['p50'] * 1000:>7.1f} {result['p95'] * 1000:>7.1f} {result['p99'] * 1000:>7.1f} {result['p999'] * 1000:>9.1f} "
+            f"{result['load']:>13.3f} {result['to_paused']:>10.1%} {result['hedges']:>7} {result['errors']:>7}"
+        )
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+"""
+Per-request cost of the shared Prometheus instrumentation.
+
+Drives the credit-analysis-service ASGI app in-process, first with the metrics middleware that
+`instrument_app` installs and then with it removed, and reports the mean latency of each route
+and the difference. Both variants run in alternating rounds and the best round of each is kept.
+It also reports the raw cost of one histogram observation.
+
+Usage:
+    python3 bench_metrics_overhead.py --requests 50000
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+SERVICE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "services", "credit-analysis-service")
+sys.path.insert(0, os.path.abspath(SERVICE_DIR))
+
+from main import app
+from configuration.config import MODEL_PATH
+from scoring.scoring import ScoringEngine
+from metrics.metrics import REQUEST_LATENCY
+
+PREDICT_BODY = json.dumps({
+    "transaction_count_30d": 12, "avg_transaction_value_30d": 85.5, "avg_positivity_7d": 0.7, "stress_events_30d": 3,
+}).encode()
+
+def build_scope(method: str, path: str) -> dict:
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"host", b"bench")],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+
+async def time_requests(method: str, path: str, body: bytes, requests: int) -> float:
+    """Sends `requests` requests straight to the ASGI app and returns the mean latency in microseconds."""
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(build_scope(method, path), receive, send)
+    return (time.perf_counter() - start) / requests * 1e6
+
+def build_middleware_stacks() -> dict:
+    """Builds the app's middleware stack with and without the metrics middleware."""
+    instrumented = app.build_middleware_stack()
+    user_middleware = app.user_middleware
+    app.user_middleware = [m for m in user_middleware if m.cls.__name__ != "MetricsMiddleware"]
+    baseline = app.build_middleware_stack()
+    app.user_middleware = user_middleware
+    return {"instrumented": instrumented, "baseline": baseline}
+
+async def main(args):
+    app.state.scoring_engine = ScoringEngine.from_file(MODEL_PATH)
+    routes = (("GET", "/healthz", b""), ("POST", "/v1/predict", PREDICT_BODY))
+    stacks = build_middleware_stacks()
+
+    results = {}
+    for _ in range(args.rounds):
+        for label, stack in stacks.items():
+            app.middleware_stack = stack
+            for method, path, body in routes:
+                latency = await time_requests(method, path, body, args.requests // args.rounds)
+                results[(label, path)] = min(latency, results.get((label, path), latency))
+
+    for _, path, _ in routes:
+        instrumented, baseline = results[("instrumented", path)], results[("baseline", path)]
+        print(f"{path:>12}: baseline {baseline:.1f} us, instrumented {instrumented:.1f} us -> overhead {instrumented - baseline:.1f} us/request")
+
+    child = REQUEST_LATENCY.labels("GET", "/bench", "200")
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        child.observe(0.001)
+    print(f"{'observe':>12}: {(time.perf_counter() - start) / args.requests * 1e9:.0f} ns per histogram observation")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument("--rounds", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
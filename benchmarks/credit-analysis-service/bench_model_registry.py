@@ -0,0 +1,130 @@
+"""
+Startup time and memory of credit-analysis-service replicas loading a large model as a JSON file,
+as `.npy` arrays read into memory, and as the memory-mapped `.npy` arrays of the model registry.
+
+The model is --model-mb of float64 coefficients split over --arrays arrays, standing in for the
+tables of a tree ensemble; it is published to a temporary registry with the service's
+`publish_model` and also written in the JSON format of `models/coefficients.json`. For each format,
+--replicas processes start at once on this node, load the model and read all of it once, as
+scoring with every tree would. Each replica reports the time to load the model and the time of
+that first pass; once all of them are ready, the RSS and PSS of every replica are read from
+`/proc/<pid>/smaps_rollup`. PSS splits every shared page between the processes that map it, so
+their sum is what the replicas cost the node. A replica that loaded no model gives the baseline.
+
+The files are read warm from the page cache, as on a node where a replica already runs; on a cold
+cache every format also pays for reading them from disk, once for the whole node with mmap.
+
+Usage:
+    python3 bench_model_registry.py
+    python3 bench_model_registry.py --model-mb 256 --replicas 4 --formats npy mmap
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+SERVICE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "services", "credit-analysis-service")
+sys.path.insert(0, os.path.abspath(SERVICE_DIR))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import numpy as np
+
+from registry.registry import publish_model, load_model, VERSIONS_DIR
+
+VERSION = "bench-v1"
+FORMATS = ("none", "json", "npy", "mmap")
+
+def build_model(root: str, model_mb: float, n_arrays: int, with_json: bool) -> str:
+    """Publishes a random model of `model_mb` to the registry under `root` and returns the path of its JSON twin."""
+    rng = np.random.default_rng(42)
+    rows = max(1, int(model_mb * 2**20 / 8 / n_arrays))
+    arrays = {f"tree_{i}": rng.standard_normal(rows) for i in range(n_arrays)}
+    publish_model(root, VERSION, "synthetic", ("x",), arrays)
+    json_path = os.path.join(root, "model.json")
+    if with_json:
+        with open(json_path, "w") as f:
+            json.dump({"version": VERSION, **{name: array.tolist() for name, array in arrays.items()}}, f)
+    return json_path
+
+def load(model_format: str, root: str, json_path: str) -> dict:
+    """Loads the model the way a replica would in `model_format`."""
+    if model_format == "none":
+        return {}
+    if model_format == "json":
+        with open(json_path) as f:
+            model = json.load(f)
+        return {name: np.asarray(values, dtype=np.float64) for name, values in model.items() if name != "version"}
+    if model_format == "npy":
+        version_dir = os.path.join(root, VERSIONS_DIR, VERSION)
+        return {name[:-4]: np.load(os.path.join(version_dir, name)) for name in os.listdir(version_dir) if name.endswith(".npy")}
+    return load_model(root, VERSION).arrays
+
+def replica(model_format: str, root: str, json_path: str):
+    """Runs one replica: loads the model, reads it once, reports, and stays alive until stdin closes."""
+    started_at = time.perf_counter()
+    arrays = load(model_format, root, json_path)
+    loaded_at = time.perf_counter()
+    checksum = sum(float(array.sum()) for array in arrays.values())
+    ready_at = time.perf_counter()
+    print(json.dumps({"load": loaded_at - started_at, "first_pass": ready_at - loaded_at, "checksum": checksum}), flush=True)
+    sys.stdin.read()
+
+def memory_kb(pid: int) -> dict:
+    """Returns the Rss and Pss of a process, in kB."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            if name in ("Rss", "Pss"):
+                values[name] = int(rest.split()[0])
+    return values
+
+def run(model_format: str, args, root: str, json_path: str) -> dict:
+    command = [sys.executable, os.path.abspath(__file__), "--replica", model_format, "--registry", root, "--json-path", json_path]
+    processes = [subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True) for _ in range(args.replicas)]
+    try:
+        reports = [json.loads(process.stdout.readline()) for process in processes]
+        memory = [memory_kb(process.pid) for process in processes]
+    finally:
+        for process in processes:
+            process.stdin.close()
+            process.wait()
+    n = len(processes)
+    return {
+        "load_ms": sum(report["load"] for report in reports) / n * 1000,
+        "first_pass_ms": sum(report["first_pass"] for report in reports) / n * 1000,
+        "rss_mb": sum(m["Rss"] for m in memory) / n / 1024,
+        "pss_mb": sum(m["Pss"] for m in memory) / n / 1024,
+        "node_pss_mb": sum(m["Pss"] for m in memory) / 1024,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-mb", type=float, default=64.0, help="Size of the model coefficients.")
+    parser.add_argument("--arrays", type=int, default=16, help="Number of arrays the coefficients are split over.")
+    parser.add_argument("--replicas", type=int, default=4, help="Replicas started at once on the node.")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS[1:], default=list(FORMATS[1:]))
+    parser.add_argument("--replica", choices=FORMATS, help=argparse.SUPPRESS)
+    parser.add_argument("--registry", help=argparse.SUPPRESS)
+    parser.add_argument("--json-path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.replica:
+        replica(args.replica, args.registry, args.json_path)
+        return
+
+    with tempfile.TemporaryDirectory() as root:
+        json_path = build_model(root, args.model_mb, args.arrays, "json" in args.formats)
+        print(f"model: {args.model_mb:.0f} MB in {args.arrays} arrays, {args.replicas} replicas")
+        print(f"{'format':<8} {'load ms':>9} {'first pass ms':>14} {'RSS MB/replica':>15} {'PSS MB/replica':>15} {'node PSS MB':>12}")
+        for model_format in ("none", *args.formats):
+            result = run(model_format, args, root, json_path)
+            print(
+                f"{model_format:<8} {result['load_ms']:>9.1f} {result['first_pass_ms']:>14.1f} {result['rss_mb']:>15.1f} "
+                f"{result['pss_mb']:>15.1f} {result['node_pss_mb']:>12.1f}"
+            )
+
+if __name__ == "__main__":
+    main()
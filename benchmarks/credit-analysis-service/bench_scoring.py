@@ -0,0 +1,68 @@
+"""
+Per-row cost of the credit-analysis-service scoring engine at different batch sizes.
+
+For each batch size it reports the cost of the vectorized model evaluation alone and the
+cost of the full batch request path (Pydantic validation, matrix building and scoring).
+
+Usage:
+    python3 bench_scoring.py --sizes 1 64 1024 16384
+    python3 bench_scoring.py --model ../../services/credit-analysis-service/models/trees.json
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+SERVICE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "services", "credit-analysis-service")
+sys.path.insert(0, os.path.abspath(SERVICE_DIR))
+
+from configuration.config import MODEL_PATH
+from models.machine_learning import BatchPredictionRequest
+from scoring.scoring import ScoringEngine, features_matrix
+
+def build_payload(size: int) -> dict:
+    return {
+        "features": [
+            {
+                "transaction_count_30d": random.randint(0, 80),
+                "avg_transaction_value_30d": random.uniform(5, 800),
+                "avg_positivity_7d": random.random(),
+                "stress_events_30d": random.randint(0, 40),
+            }
+            for _ in range(size)
+        ]
+    }
+
+def time_per_row(fn, size: int, min_seconds: float) -> float:
+    """Repeats fn until at least min_seconds elapsed and returns the mean cost per row in microseconds."""
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        fn()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / (runs * size) * 1e6
+
+def main(args):
+    engine = ScoringEngine.from_file(args.model)
+    print(f"model: {engine.version} ({engine.kind})")
+    print(f"{'batch size':>10} | {'score (us/row)':>14} | {'request (us/row)':>16} | {'rows/s (request)':>16}")
+    for size in args.sizes:
+        payload = build_payload(size)
+        matrix = features_matrix(BatchPredictionRequest.model_validate(payload).features)
+        score_cost = time_per_row(lambda: engine.score(matrix), size, args.min_seconds)
+        request_cost = time_per_row(
+            lambda: engine.score(features_matrix(BatchPredictionRequest.model_validate(payload).features)).tolist(),
+            size,
+            args.min_seconds,
+        )
+        print(f"{size:>10} | {score_cost:>14.3f} | {request_cost:>16.3f} | {1e6 / request_cost:>16.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 64, 1024, 16384])
+    parser.add_argument("--min-seconds", type=float, default=1.0)
+    parser.add_argument("--model", default=MODEL_PATH, help="JSON model file to score with, coefficients or trees.")
+    main(parser.parse_args())
@@ -0,0 +1,105 @@
+"""
+Per-event cost of encoding events in the producers and decoding them in the workers, for the
+path before the shared events module (Pydantic `model_dump` -> `json.dumps` -> `.encode()` and
+`.decode()` -> `json.loads` -> `model_validate`, with the models the services used to copy)
+versus the msgspec codec of events/events.py, in JSON and in MessagePack.
+
+Usage:
+    python3 bench_event_codec.py --iterations 200000
+"""
+import os
+import sys
+import json
+import uuid
+import timeit
+import argparse
+
+from typing import Optional
+from datetime import datetime, timezone
+from pydantic import BaseModel, Field
+
+SERVICE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "services", "transaction-service")
+sys.path.insert(0, os.path.abspath(SERVICE_DIR))
+
+from events.events import (
+    JSON, MSGPACK, TransactionEvent, EmotionEvent, EmotionEventPayload, EmotionMetrics,
+    CreditOfferAcceptedEvent, EventDecoder, encode_event, event_headers
+)
+
+class PydanticTransactionEvent(BaseModel):
+    user_id: str = Field(..., alias="userId")
+    amount: float
+    created_at: Optional[datetime] = Field(None, alias="createdAt")
+
+class PydanticEmotionMetrics(BaseModel):
+    positivity: float
+    intensity: float
+    stress_level: float
+
+class PydanticEmotionEventPayload(BaseModel):
+    type: str
+    metrics: PydanticEmotionMetrics
+
+class PydanticEmotionEvent(BaseModel):
+    user_id: str = Field(..., alias="userId")
+    timestamp: str
+    emotion_event: PydanticEmotionEventPayload = Field(..., alias="emotionEvent")
+    trace_id: Optional[str] = Field(None, alias="traceId")
+
+class PydanticCreditOfferAcceptedEvent(BaseModel):
+    offer_id: uuid.UUID = Field(..., alias="offerId")
+    user_id: uuid.UUID = Field(..., alias="userId")
+    credit_limit: float = Field(..., alias="creditLimit")
+    interest_rate: float = Field(..., alias="interestRate")
+    credit_type: str = Field(..., alias="creditType")
+    accepted_at: str = Field(..., alias="acceptedAt")
+
+def sample_events() -> dict:
+    """Returns, per event type, its Pydantic model, a Pydantic instance and the equivalent struct."""
+    user_id, now = uuid.uuid4(), datetime.now(timezone.utc)
+    transaction = {"userId": str(user_id), "amount": 123.45, "createdAt": now.isoformat()}
+    emotion = {
+        "userId": str(user_id), "timestamp": now.isoformat(), "traceId": str(uuid.uuid4()),
+        "emotionEvent": {"type": "SENTIMENT_ANALYSIS", "metrics": {"positivity": 0.71, "intensity": 0.42, "stress_level": 0.18}},
+    }
+    acceptance = {
+        "offerId": str(uuid.uuid4()), "userId": str(user_id), "creditLimit": 8500.0, "interestRate": 7.25,
+        "creditType": "SHORT_TERM_PERSONAL_LOAN", "acceptedAt": now.isoformat(),
+    }
+    return {
+        "transaction": (PydanticTransactionEvent, PydanticTransactionEvent.model_validate(transaction), TransactionEvent(user_id=str(user_id), amount=123.45, created_at=now)),
+        "emotion": (PydanticEmotionEvent, PydanticEmotionEvent.model_validate(emotion), EmotionEvent(
+            user_id=str(user_id), timestamp=emotion["timestamp"], trace_id=emotion["traceId"],
+            emotion_event=EmotionEventPayload(type="SENTIMENT_ANALYSIS", metrics=EmotionMetrics(positivity=0.71, intensity=0.42, stress_level=0.18)),
+        )),
+        "credit_offer_accepted": (PydanticCreditOfferAcceptedEvent, PydanticCreditOfferAcceptedEvent.model_validate(acceptance), CreditOfferAcceptedEvent(
+            offer_id=uuid.UUID(acceptance["offerId"]), user_id=user_id, credit_limit=8500.0, interest_rate=7.25,
+            credit_type="SHORT_TERM_PERSONAL_LOAN", accepted_at=acceptance["acceptedAt"],
+        )),
+    }
+
+def per_call_us(func, iterations: int) -> float:
+    return min(timeit.repeat(func, number=iterations, repeat=3)) / iterations * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+
+    print(f"{'event':<22} {'path':<22} {'encode us':>10} {'decode us':>10} {'bytes':>6}")
+    for name, (model, instance, struct) in sample_events().items():
+        payload = json.dumps(instance.model_dump(by_alias=True, mode="json")).encode()
+        encode = lambda: json.dumps(instance.model_dump(by_alias=True, mode="json")).encode()
+        decode = lambda: model.model_validate(json.loads(payload.decode()))
+        print(f"{name:<22} {'pydantic + json':<22} {per_call_us(encode, args.iterations):>10.2f} {per_call_us(decode, args.iterations):>10.2f} {len(payload):>6}")
+
+        decoder = EventDecoder(type(struct))
+        for content_type in (JSON, MSGPACK):
+            payload = encode_event(struct, content_type)
+            headers = event_headers(content_type)
+            encode = lambda: encode_event(struct, content_type)
+            decode = lambda: decoder.decode(payload, headers)
+            print(f"{'':<22} {'msgspec ' + content_type.split('/')[1]:<22} {per_call_us(encode, args.iterations):>10.2f} {per_call_us(decode, args.iterations):>10.2f} {len(payload):>6}")
+
+if __name__ == "__main__":
+    main()
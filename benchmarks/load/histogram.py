@@ -0,0 +1,84 @@
+"""
+Log-linear latency histogram in the style of HdrHistogram: every power of two is split into
+2^SUB_BUCKET_BITS linear sub-buckets, so recorded values keep a relative precision better than
+1% over any range with a fixed, small number of buckets, and histograms can be merged exactly.
+"""
+SUB_BUCKET_BITS = 8
+PERCENTILES = (50, 90, 99, 99.9)
+
+class LatencyHistogram:
+    """
+    Counts of latencies in microseconds, keyed by the lowest value of their bucket.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = 0
+
+    @staticmethod
+    def bucket_of(value: int) -> int:
+        shift = max(0, value.bit_length() - SUB_BUCKET_BITS)
+        return (value >> shift) << shift
+
+    @staticmethod
+    def highest_equivalent(bucket: int) -> int:
+        """The highest value that falls in the bucket starting at `bucket`."""
+        shift = max(0, bucket.bit_length() - SUB_BUCKET_BITS)
+        return bucket + (1 << shift) - 1
+
+    def record(self, value_us: float):
+        value = max(0, int(value_us))
+        bucket = self.bucket_of(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.total += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "LatencyHistogram"):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percentile: float) -> int:
+        """The highest value equivalent to the recorded value at `percentile`, capped at the maximum."""
+        if not self.total:
+            return 0
+        rank = max(1, round(percentile / 100 * self.total))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self.highest_equivalent(bucket), self.max)
+        return self.max
+
+    def mean(self) -> float:
+        return self.sum / self.total if self.total else 0.0
+
+    def summary(self) -> dict:
+        """Count, mean, min, max and PERCENTILES in milliseconds."""
+        return {
+            "count": self.total,
+            "mean_ms": round(self.mean() / 1000, 3),
+            "min_ms": round((self.min or 0) / 1000, 3),
+            "max_ms": round(self.max / 1000, 3),
+            **{f"p{p:g}_ms": round(self.percentile(p) / 1000, 3) for p in PERCENTILES},
+        }
+
+    def to_dict(self) -> dict:
+        return {"counts": {str(bucket): count for bucket, count in sorted(self.counts.items())}, "sum": self.sum, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        histogram = cls()
+        histogram.counts = {int(bucket): count for bucket, count in data["counts"].items()}
+        histogram.total = sum(histogram.counts.values())
+        histogram.sum, histogram.min, histogram.max = data["sum"], data["min"], data["max"]
+        return histogram
@@ -0,0 +1,318 @@
+"""
+Open-loop load generator for the API gateway. Requests are sent at their intended arrival times,
+following a rate profile, whether or not earlier requests have completed, and their latency is
+measured from the intended time. A closed-loop tool such as k6 with VUs waits for each response
+before sending the next request, so a slow system also slows the load down and the queueing
+delay never shows up in the numbers (coordinated omission).
+
+The traffic is either a JSON lines file replayed at the profile's rate (or at its recorded
+`at_ms` offsets with --replay-timing), or synthetic transactions, emotion events and credit
+analyses for the users of the k6 `sessions.json` and `users.json` files (see generate_sessions.sh).
+
+Latencies go into log-linear histograms per endpoint and status code, and into one histogram per
+--interval of the run, so the knee where latency takes off as the rate ramps up is visible in the
+timeline. `report` prints a saved run again and `compare` diffs two runs, exiting with status 1
+when a percentile or the throughput regressed by more than --tolerance.
+
+Usage:
+    python3 loadgen.py run --mix transaction=3,emotion=5,credit_analysis=1 --stage 30s:100 --stage 2m:100:2000 --output ramp.json
+    python3 loadgen.py synth --count 10000 --stage 1m:200 --output requests.jsonl
+    python3 loadgen.py run --replay requests.jsonl --replay-timing --speed 2 --output replay.json
+    python3 loadgen.py report ramp.json
+    python3 loadgen.py compare baseline.json ramp.json --tolerance 0.1
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+
+from collections import defaultdict
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+K6_DIR = os.path.abspath(os.path.join(BENCH_DIR, "..", "..", "k6"))
+sys.path.insert(0, BENCH_DIR)
+
+import httpx
+
+from histogram import LatencyHistogram
+from traffic import RateProfile, ReplaySource, SyntheticSource, DEFAULT_INTERNAL_KEY
+
+COMPARED_PERCENTILES = ("p50_ms", "p99_ms", "p99.9_ms")
+
+class Recorder:
+    """
+    Latency histograms per endpoint and status code, and per interval of the run.
+
+    `latency` runs from the intended send time to the end of the response, `service_time` from
+    the actual send, and `send_lag` is the difference: time spent waiting for a free connection
+    or for the generator itself. When it grows the generator, not the system, is the bottleneck.
+
+    Arrivals and their latency are counted in the window of their intended send time, and
+    completions in the window they completed in, so the windows show the offered load against
+    the throughput actually achieved.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.latency = defaultdict(LatencyHistogram)
+        self.service_time = defaultdict(LatencyHistogram)
+        self.send_lag = LatencyHistogram()
+        self.windows = defaultdict(lambda: {"arrivals": 0, "ok": 0, "errors": 0, "latency": LatencyHistogram()})
+
+    def record(self, endpoint: str, status: str, intended_at: float, sent_at: float, done_at: float):
+        self.latency[(endpoint, status)].record((done_at - intended_at) * 1e6)
+        self.service_time[(endpoint, status)].record((done_at - sent_at) * 1e6)
+        self.send_lag.record((sent_at - intended_at) * 1e6)
+        arrival_window = self.windows[int(intended_at // self.interval)]
+        arrival_window["arrivals"] += 1
+        arrival_window["latency"].record((done_at - intended_at) * 1e6)
+        self.windows[int(done_at // self.interval)]["ok" if status.isdigit() and int(status) < 400 else "errors"] += 1
+
+    def to_dict(self, profile: RateProfile | None, duration: float) -> dict:
+        endpoints = defaultdict(dict)
+        for (endpoint, status), histogram in sorted(self.latency.items()):
+            endpoints[endpoint][status] = {"latency": histogram.to_dict(), "service_time": self.service_time[(endpoint, status)].to_dict()}
+        timeline = []
+        for index in range(max(self.windows, default=-1) + 1):
+            window = self.windows[index]
+            start = index * self.interval
+            timeline.append({
+                "start_s": round(start, 3),
+                "offered_rps": round(profile.rate_at(start + self.interval / 2), 1) if profile else None,
+                "arrivals": window["arrivals"], "ok": window["ok"], "errors": window["errors"],
+                "latency": window["latency"].to_dict(),
+            })
+        return {"duration_s": round(duration, 3), "endpoints": dict(endpoints), "send_lag": self.send_lag.to_dict(), "timeline": timeline}
+
+async def send(client: httpx.AsyncClient, slots: asyncio.Semaphore, recorder: Recorder, request: dict, started_at: float, intended: float):
+    async with slots:
+        sent_at = time.perf_counter()
+        try:
+            body = request.get("body")
+            response = await client.request(
+                request["method"], request["path"], headers=request.get("headers"),
+                **({"content": body} if isinstance(body, str) else {"json": body}),
+            )
+            status = str(response.status_code)
+        except httpx.TimeoutException:
+            status = "timeout"
+        except httpx.RequestError:
+            status = "error"
+        done_at = time.perf_counter()
+    recorder.record(request["endpoint"], status, intended, sent_at - started_at, done_at - started_at)
+
+async def run_load(source, arrivals, args, profile: RateProfile | None) -> dict:
+    """
+    Sends a request from `source` at every intended time yielded by `arrivals`.
+
+    At most --max-connections requests are outstanding; the ones over the limit wait in line for
+    a connection, with that wait counted in their latency.
+    """
+    recorder = Recorder(args.interval)
+    slots = asyncio.Semaphore(args.max_connections)
+    client = httpx.AsyncClient(
+        base_url=args.target,
+        limits=httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections),
+        timeout=args.timeout,
+    )
+    tasks = set()
+    started_at = time.perf_counter()
+    try:
+        for intended in arrivals:
+            delay = started_at + intended - time.perf_counter()
+            await asyncio.sleep(max(0.0, delay))
+            task = asyncio.create_task(send(client, slots, recorder, source.next(), started_at, intended))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+    finally:
+        await client.aclose()
+    return recorder.to_dict(profile, time.perf_counter() - started_at)
+
+def load_json_file(path: str, required: bool) -> list:
+    if not os.path.exists(path):
+        if required:
+            raise SystemExit(f"{path} not found, run generate_sessions.sh first.")
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+def build_synthetic_source(args) -> SyntheticSource:
+    return SyntheticSource(
+        SyntheticSource.parse_mix(args.mix),
+        load_json_file(args.sessions, required=True),
+        load_json_file(args.users, required=False),
+        args.internal_key,
+        random.Random(args.seed),
+    )
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=BENCH_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def merged(statuses: dict, key: str, ok_only: bool = False) -> LatencyHistogram:
+    histogram = LatencyHistogram()
+    for status, histograms in statuses.items():
+        if not ok_only or (status.isdigit() and int(status) < 400):
+            histogram.merge(LatencyHistogram.from_dict(histograms[key]))
+    return histogram
+
+def print_report(results: dict):
+    duration = results["duration_s"]
+    meta = results["meta"]
+    print(f"{meta['source']} against {meta['target']}, {duration:.1f} s, commit {meta.get('commit') or '-'}")
+    print(f"\n{'endpoint':<40} {'status':>7} {'count':>8} {'rps':>8} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'p99.9 ms':>9} {'max ms':>9} {'svc p99':>9}")
+    for endpoint, statuses in results["endpoints"].items():
+        for status, histograms in statuses.items():
+            latency = LatencyHistogram.from_dict(histograms["latency"]).summary()
+            service_time = LatencyHistogram.from_dict(histograms["service_time"]).summary()
+            print(
+                f"{endpoint:<40} {status:>7} {latency['count']:>8} {latency['count'] / duration:>8.1f} {latency['p50_ms']:>9.2f} "
+                f"{latency['p90_ms']:>9.2f} {latency['p99_ms']:>9.2f} {latency['p99.9_ms']:>9.2f} {latency['max_ms']:>9.2f} {service_time['p99_ms']:>9.2f}"
+            )
+    send_lag = LatencyHistogram.from_dict(results["send_lag"]).summary()
+    print(f"\nsend lag: p99 {send_lag['p99_ms']:.2f} ms, max {send_lag['max_ms']:.2f} ms (waiting for a free connection or for the generator)")
+
+    print(f"\n{'t (s)':>8} {'offered':>9} {'arrivals/s':>11} {'ok/s':>9} {'errors':>8} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    interval = meta["interval_s"]
+    for window in results["timeline"]:
+        latency = LatencyHistogram.from_dict(window["latency"]).summary()
+        offered = f"{window['offered_rps']:.0f}" if window["offered_rps"] is not None else "-"
+        print(
+            f"{window['start_s']:>8.1f} {offered:>9} {window['arrivals'] / interval:>11.1f} {window['ok'] / interval:>9.1f} {window['errors']:>8} "
+            f"{latency['p50_ms']:>9.2f} {latency['p99_ms']:>9.2f} {latency['max_ms']:>9.2f}"
+        )
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Prints the change of the percentiles of successful requests and of their throughput per
+    endpoint, and returns the regressions beyond `tolerance`.
+    """
+    regressions = []
+    print(f"\nAgainst {baseline['meta'].get('commit') or 'baseline'} (tolerance {tolerance:.0%}):")
+    for endpoint, statuses in results["endpoints"].items():
+        if endpoint not in baseline["endpoints"]:
+            print(f"{endpoint:<40} not in baseline")
+            continue
+        after = merged(statuses, "latency", ok_only=True).summary()
+        before = merged(baseline["endpoints"][endpoint], "latency", ok_only=True).summary()
+        changes = []
+        for metric, higher_is_better, value_before, value_after in [
+            ("ok_rps", True, before["count"] / baseline["duration_s"], after["count"] / results["duration_s"]),
+            *((metric, False, before[metric], after[metric]) for metric in COMPARED_PERCENTILES),
+        ]:
+            if not value_before:
+                continue
+            change = value_after / value_before - 1
+            changes.append(f"{metric} {change:+.1%}")
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{endpoint}: {metric} {value_before:.2f} -> {value_after:.2f} ({change:+.1%})")
+        print(f"{endpoint:<40} {', '.join(changes)}")
+    return regressions
+
+def load_results(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+def command_run(args):
+    profile = RateProfile.parse(args.stage or ["60s:100"])
+    if args.replay:
+        source = ReplaySource(args.replay)
+        description = f"replay of {args.replay}"
+        if args.replay_timing:
+            arrivals, profile = source.recorded_arrivals(args.speed), None
+            description += f" at {args.speed:g}x its recorded timing"
+    else:
+        source = build_synthetic_source(args)
+        description = f"synthetic {args.mix}"
+    if profile is not None:
+        arrivals = profile.arrivals(args.arrivals == "poisson", random.Random(args.seed))
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "target": args.target,
+            "source": description,
+            "profile": profile.describe() if profile else None,
+            "arrivals": args.arrivals if profile else "recorded",
+            "interval_s": args.interval,
+            "max_connections": args.max_connections,
+        },
+        **asyncio.run(run_load(source, arrivals, args, profile)),
+    }
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f)
+
+def command_synth(args):
+    profile = RateProfile.parse(args.stage or ["60s:100"])
+    source = build_synthetic_source(args)
+    with open(args.output, "w") as f:
+        for count, intended in enumerate(profile.arrivals(args.arrivals == "poisson", random.Random(args.seed))):
+            if count >= args.count:
+                break
+            f.write(json.dumps({**source.next(), "at_ms": round(intended * 1000, 3)}) + "\n")
+
+def command_compare(args):
+    results, baseline = load_results(args.results), load_results(args.baseline)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+
+def add_traffic_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--stage", action="append", help="Rate stage DURATION:RATE or DURATION:RATE:END_RATE (linear ramp), repeatable. Defaults to 60s:100.")
+    parser.add_argument("--arrivals", choices=["uniform", "poisson"], default="uniform", help="Spacing of the arrivals within the profile.")
+    parser.add_argument("--mix", default="transaction=1,emotion=1,credit_analysis=1", help="Weights of the synthetic traffic kinds.")
+    parser.add_argument("--sessions", default=os.path.join(K6_DIR, "sessions.json"))
+    parser.add_argument("--users", default=os.path.join(K6_DIR, "users.json"))
+    parser.add_argument("--internal-key", default=os.getenv("INTERNAL_API_KEY", DEFAULT_INTERNAL_KEY))
+    parser.add_argument("--seed", type=int, default=None)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Send the load and report its latencies.")
+    add_traffic_arguments(run)
+    run.add_argument("--target", default="http://localhost:9999")
+    run.add_argument("--replay", help="JSON lines file of requests to replay instead of the synthetic traffic.")
+    run.add_argument("--replay-timing", action="store_true", help="Send the replayed requests at their recorded at_ms offsets instead of the profile's rate.")
+    run.add_argument("--speed", type=float, default=1.0, help="Speed-up of the recorded timing.")
+    run.add_argument("--max-connections", type=int, default=500, help="Connections to the target, which bounds the requests in flight.")
+    run.add_argument("--timeout", type=float, default=10.0)
+    run.add_argument("--interval", type=float, default=1.0, help="Seconds per row of the timeline.")
+    run.add_argument("--output", help="Write the results as JSON to this file.")
+    run.set_defaults(func=command_run)
+
+    synth = commands.add_parser("synth", help="Write synthetic traffic as a JSON lines file for --replay.")
+    add_traffic_arguments(synth)
+    synth.add_argument("--count", type=int, default=10000)
+    synth.add_argument("--output", required=True)
+    synth.set_defaults(func=command_synth)
+
+    report = commands.add_parser("report", help="Print the report of a saved run.")
+    report.add_argument("results")
+    report.set_defaults(func=lambda args: print_report(load_results(args.results)))
+
+    compare_parser = commands.add_parser("compare", help="Compare a run against a baseline run.")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("results")
+    compare_parser.add_argument("--tolerance", type=float, default=0.10)
+    compare_parser.set_defaults(func=command_compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Arrival schedules and request sources of the load generator.
+
+A request is a dict with `method`, `path`, optional `headers` and `body`, an optional `endpoint`
+label and, in recorded files, an optional `at_ms` offset from the start of the recording. The
+replay files are JSON lines of such dicts, and `loadgen.py synth` writes them from the
+synthetic traffic.
+"""
+import re
+import json
+import random
+
+from datetime import datetime, timezone
+
+UUID_SEGMENT = re.compile(r"/[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}(?=/|$)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+DEFAULT_INTERNAL_KEY = "your-different-secret-for-internal-services"
+
+def endpoint_of(method: str, path: str) -> str:
+    """Labels a request by its method and path, with ids replaced by `{id}`."""
+    return f"{method.upper()} {UUID_SEGMENT.sub('/{id}', path.split('?', 1)[0])}"
+
+def parse_duration(value: str) -> float:
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)(ms|s|m|h)?", value.strip())
+    if not match:
+        raise ValueError(f"Invalid duration: {value!r}")
+    return float(match.group(1)) * DURATION_UNITS[match.group(2) or "s"]
+
+class RateProfile:
+    """
+    A sequence of stages, each holding the arrival rate constant or ramping it linearly.
+    """
+
+    def __init__(self, stages: list[tuple[float, float, float]]):
+        self.stages = stages
+        self.duration = sum(duration for duration, _, _ in stages)
+
+    @classmethod
+    def parse(cls, specs: list[str]) -> "RateProfile":
+        """
+        Parses stages written as DURATION:RATE (constant) or DURATION:RATE:END_RATE (linear ramp),
+        e.g. `30s:100` or `2m:100:2000`, with rates in requests per second.
+        """
+        stages = []
+        for spec in specs:
+            parts = spec.split(":")
+            if len(parts) not in (2, 3):
+                raise ValueError(f"Invalid stage: {spec!r}, expected DURATION:RATE[:END_RATE]")
+            rate = float(parts[1])
+            stages.append((parse_duration(parts[0]), rate, float(parts[2]) if len(parts) == 3 else rate))
+        return cls(stages)
+
+    def rate_at(self, t: float) -> float:
+        for duration, start_rate, end_rate in self.stages:
+            if t < duration:
+                return start_rate + (end_rate - start_rate) * t / duration
+            t -= duration
+        return 0.0
+
+    def arrivals(self, poisson: bool = False, rng: random.Random | None = None):
+        """
+        Yields the intended send time of every request, in seconds from the start, at uniform
+        intervals of 1 / rate or with exponential inter-arrival times when `poisson` is set.
+        """
+        rng = rng or random.Random()
+        t = 0.0
+        while t < self.duration:
+            rate = self.rate_at(t)
+            if rate <= 0:
+                t += 0.01
+                continue
+            t += rng.expovariate(rate) if poisson else 1 / rate
+            if t < self.duration:
+                yield t
+
+    def describe(self) -> list[dict]:
+        return [{"duration_s": duration, "start_rps": start_rate, "end_rps": end_rate} for duration, start_rate, end_rate in self.stages]
+
+class ReplaySource:
+    """
+    Requests read from a JSON lines file, handed out in order and cycled when the run outlasts them.
+    """
+
+    def __init__(self, path: str):
+        with open(path) as f:
+            self.requests = [json.loads(line) for line in f if line.strip()]
+        if not self.requests:
+            raise ValueError(f"No requests in {path}")
+        for request in self.requests:
+            request.setdefault("endpoint", endpoint_of(request["method"], request["path"]))
+        self._next = 0
+
+    def next(self) -> dict:
+        request = self.requests[self._next]
+        self._next = (self._next + 1) % len(self.requests)
+        return request
+
+    def recorded_arrivals(self, speed: float):
+        """Yields the recorded `at_ms` offsets of the requests, in seconds and divided by `speed`."""
+        for request in self.requests:
+            yield request["at_ms"] / 1000 / speed
+
+class SyntheticSource:
+    """
+    Transactions, emotion events and credit analyses in the shape the k6 scripts send them, for
+    the users of the k6 `sessions.json` and `users.json` files, mixed by `weights`.
+    """
+
+    def __init__(self, weights: dict[str, float], sessions: list[dict], users: list[dict], internal_key: str, rng: random.Random | None = None):
+        unknown = set(weights) - set(self.BUILDERS)
+        if unknown:
+            raise ValueError(f"Unknown traffic kinds: {', '.join(sorted(unknown))}")
+        if not sessions:
+            raise ValueError("Synthetic traffic needs at least one session in sessions.json.")
+        self.kinds, self.weights = list(weights), list(weights.values())
+        self.sessions = sessions
+        self.user_ids = [user["id"] for user in users if user.get("id")] or [session["userId"] for session in sessions]
+        self.internal_key = internal_key
+        self.rng = rng or random.Random()
+
+    @classmethod
+    def parse_mix(cls, spec: str) -> dict[str, float]:
+        """Parses `transaction=3,emotion=5,credit_analysis=1` into weights."""
+        weights = {}
+        for part in spec.split(","):
+            kind, _, weight = part.partition("=")
+            weights[kind.strip()] = float(weight or 1)
+        return weights
+
+    def next(self) -> dict:
+        return self.BUILDERS[self.rng.choices(self.kinds, self.weights)[0]](self)
+
+    def _transaction(self) -> dict:
+        session = self.rng.choice(self.sessions)
+        return {
+            "endpoint": "POST /v1/transactions", "method": "POST", "path": "/v1/transactions",
+            "headers": {"Authorization": f"Bearer {session['token']}"},
+            "body": {"userId": session["userId"], "amount": round(self.rng.uniform(1, 50000), 2)},
+        }
+
+    def _emotion(self) -> dict:
+        return {
+            "endpoint": "POST /v1/emotions/stream", "method": "POST", "path": "/v1/emotions/stream",
+            "headers": {"X-Internal-Key": self.internal_key},
+            "body": {
+                "userId": self.rng.choice(self.user_ids),
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "emotionEvent": {
+                    "type": "SENTIMENT_ANALYSIS",
+                    "metrics": {"positivity": self.rng.random(), "intensity": self.rng.random(), "stress_level": self.rng.random()},
+                },
+            },
+        }
+
+    def _credit_analysis(self) -> dict:
+        session = self.rng.choice(self.sessions)
+        return {
+            "endpoint": "POST /v1/users/{id}/credit-analysis", "method": "POST",
+            "path": f"/v1/users/{session['userId']}/credit-analysis",
+            "headers": {"Authorization": f"Bearer {session['token']}"},
+        }
+
+    BUILDERS = {"transaction": _transaction, "emotion": _emotion, "credit_analysis": _credit_analysis}
@@ -0,0 +1,79 @@
+"""
+Publish throughput benchmark comparing one awaited JetStream publish per request
+(the previous BackgroundTasks path) with the pipelined BackgroundPublisher of the
+transaction-service, against a local nats-server started with JetStream enabled.
+
+Usage:
+    nats-server -js &
+    NATS_URL=nats://localhost:4222 python3 bench_publisher.py --messages 50000 --window 256
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import nats
+
+SERVICE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "services", "transaction-service")
+sys.path.insert(0, os.path.abspath(SERVICE_DIR))
+
+from configuration.config import NATS_URL
+from messaging.messaging import BackgroundPublisher
+
+BENCH_STREAM = "bench_transactions"
+BENCH_SUBJECT = "bench.transactions.topic"
+
+def build_payload(i: int) -> bytes:
+    return json.dumps({"userId": "00000000-0000-0000-0000-000000000000", "amount": 10.0 + i % 100}).encode()
+
+async def run_awaited(nc, messages: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def publish_one(i):
+        async with semaphore:
+            js = nc.jetstream()
+            await js.publish(BENCH_SUBJECT, build_payload(i))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(publish_one(i) for i in range(messages)))
+    return time.perf_counter() - start
+
+async def run_pipelined(nc, messages: int, window: int) -> float:
+    publisher = BackgroundPublisher(nc, BENCH_SUBJECT, queue_size=messages, window=window, max_retries=5, retry_backoff=0.05)
+    publisher.start()
+    start = time.perf_counter()
+    for i in range(messages):
+        publisher.publish(build_payload(i))
+    await publisher.stop(timeout=120)
+    elapsed = time.perf_counter() - start
+    if publisher.requeued:
+        print(f"  {publisher.requeued} publishes requeued after exhausting their retries")
+    return elapsed
+
+async def main(args):
+    nc = await nats.connect(os.getenv("NATS_URL", NATS_URL), name="bench_publisher")
+    js = nc.jetstream()
+    await js.add_stream(name=BENCH_STREAM, subjects=[BENCH_SUBJECT], storage="memory")
+    try:
+        results = {}
+        for name, runner, param in (
+            ("awaited", run_awaited, args.concurrency),
+            ("pipelined", run_pipelined, args.window),
+        ):
+            await js.purge_stream(BENCH_STREAM)
+            elapsed = await runner(nc, args.messages, param)
+            stored = (await js.stream_info(BENCH_STREAM)).state.messages
+            results[name] = args.messages / elapsed
+            print(f"{name:>10}: {args.messages} messages in {elapsed:.2f}s -> {results[name]:.0f} publishes/s ({stored} stored)")
+        print(f"{'speedup':>10}: {results['pipelined'] / results['awaited']:.1f}x")
+    finally:
+        await js.delete_stream(BENCH_STREAM)
+        await nc.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--window", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent requests for the awaited baseline.")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,181 @@
+"""
+Convergence of the adaptive concurrency limit of the workers against a simulated database.
+
+The WorkerRuntime and AdaptiveLimit of the transaction-processing-worker process a saturating
+stream of messages whose handler runs one query on a simulated database: `capacity` queries run at
+once for --service-ms each and the others queue, so past the capacity more concurrency only adds
+latency. The capacity changes between --phases, as when the database gets a noisy neighbour, and the
+limit should follow it, settling around where the latency is --tolerance times the uncontended one.
+A stand-in JetStream consumer counts how often the limit had its max_ack_pending updated.
+
+Every --report-every seconds it prints the capacity, the limit, the throughput and the mean latency,
+then a summary of the second half of every phase. --fixed runs the same load with fixed limits.
+
+Usage:
+    python3 bench_adaptive_concurrency.py
+    python3 bench_adaptive_concurrency.py --phases 10s:8,10s:2,10s:16 --fixed 10,32
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+from types import SimpleNamespace
+from collections import deque
+
+SERVICE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "services", "transaction-processing-worker")
+sys.path.insert(0, os.path.abspath(SERVICE_DIR))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from runtime.runtime import WorkerRuntime
+from concurrency.concurrency import AdaptiveLimit, AckPendingLimit
+from configuration.config import WORKER_CONCURRENCY, WORKER_CONCURRENCY_MIN, WORKER_CONCURRENCY_MAX, WORKER_QUEUE_SIZE, CONCURRENCY_LATENCY_TOLERANCE, ACK_PENDING_PER_SLOT
+
+class SimulatedDatabase:
+    """
+    Runs up to `capacity` queries at once, each taking `service_time` seconds; the others wait in order.
+    """
+
+    def __init__(self, capacity: int, service_time: float):
+        self.capacity = capacity
+        self._service_time = service_time
+        self._running = 0
+        self._waiters = deque()
+
+    def set_capacity(self, capacity: int):
+        self.capacity = capacity
+        self._wake()
+
+    def _wake(self):
+        for _ in range(min(len(self._waiters), max(0, self.capacity - self._running))):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def query(self):
+        while self._running >= self.capacity:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            await waiter
+        self._running += 1
+        try:
+            await asyncio.sleep(self._service_time)
+        finally:
+            self._running -= 1
+            self._wake()
+
+class FakeConsumer:
+    """
+    Stands in for both the JetStream context and the subscription that AckPendingLimit talks to.
+    """
+
+    def __init__(self, max_ack_pending: int):
+        self.config = SimpleNamespace(max_ack_pending=max_ack_pending)
+        self.updates = 0
+
+    async def consumer_info(self):
+        return SimpleNamespace(stream_name="TRANSACTIONS", name="processor", config=self.config)
+
+    async def add_consumer(self, stream: str, config):
+        self.updates += 1
+
+def parse_phases(spec: str) -> list[tuple[float, int]]:
+    """Parses comma-separated `DURATION:CAPACITY` phases, e.g. `10s:8,10s:4`."""
+    phases = []
+    for phase in spec.split(","):
+        duration, capacity = phase.split(":")
+        phases.append((float(duration.rstrip("s")), int(capacity)))
+    return phases
+
+async def run_load(limit: AdaptiveLimit, phases: list[tuple[float, int]], args) -> tuple[list[dict], FakeConsumer]:
+    """Drives the runtime through the phases and returns one row per report period."""
+    database = SimulatedDatabase(phases[0][1], args.service_ms / 1000)
+    consumer = FakeConsumer(limit.limit * ACK_PENDING_PER_SLOT)
+    ack_pending = AckPendingLimit(consumer, consumer, ACK_PENDING_PER_SLOT)
+    await ack_pending.update(limit.limit)
+    completed, latency_sum = 0, 0.0
+
+    async def handler(msg):
+        nonlocal completed, latency_sum
+        started_at = time.perf_counter()
+        await database.query()
+        completed += 1
+        latency_sum += time.perf_counter() - started_at
+
+    async def produce():
+        while True:
+            await runtime.submit(None)
+
+    runtime = WorkerRuntime(handler, limit, WORKER_QUEUE_SIZE)
+    runtime.start()
+    tasks = [asyncio.create_task(limit.run(args.interval, ack_pending.update)), asyncio.create_task(produce())]
+    rows, started_at = [], time.perf_counter()
+    try:
+        for phase, (duration, capacity) in enumerate(phases):
+            database.set_capacity(capacity)
+            phase_ends_at = time.perf_counter() + duration
+            while time.perf_counter() < phase_ends_at:
+                period_started_at = time.perf_counter()
+                await asyncio.sleep(min(args.report_every, phase_ends_at - period_started_at))
+                elapsed = time.perf_counter() - period_started_at
+                rows.append({
+                    "t": time.perf_counter() - started_at, "phase": phase, "capacity": capacity, "limit": limit.limit,
+                    "throughput": completed / elapsed, "latency_ms": latency_sum / completed * 1000 if completed else 0.0,
+                    "max_ack_pending": ack_pending.current,
+                })
+                completed, latency_sum = 0, 0.0
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await runtime.stop(timeout=5)
+    return rows, consumer
+
+def summarize(rows: list[dict], phases: list[tuple[float, int]], service_ms: float) -> list[dict]:
+    """Averages the second half of every phase."""
+    summary = []
+    for phase, (_, capacity) in enumerate(phases):
+        phase_rows = [row for row in rows if row["phase"] == phase]
+        settled = phase_rows[len(phase_rows) // 2:] or phase_rows
+        summary.append({
+            "capacity": capacity,
+            "limit": sum(row["limit"] for row in settled) / len(settled),
+            "throughput": sum(row["throughput"] for row in settled) / len(settled),
+            "best_throughput": capacity / service_ms * 1000,
+            "latency_ms": sum(row["latency_ms"] for row in settled) / len(settled),
+        })
+    return summary
+
+def print_summary(label: str, summary: list[dict], consumer: FakeConsumer):
+    print(f"\n{label} (max_ack_pending updated {consumer.updates} times):")
+    print(f"  {'capacity':>8} {'limit':>7} {'msg/s':>9} {'best msg/s':>11} {'latency ms':>11}")
+    for phase in summary:
+        print(f"  {phase['capacity']:>8} {phase['limit']:>7.1f} {phase['throughput']:>9,.0f} {phase['best_throughput']:>11,.0f} {phase['latency_ms']:>11.2f}")
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--phases", default="10s:8,10s:3,10s:10", help="Comma-separated DURATION:CAPACITY phases of the simulated database.")
+    parser.add_argument("--service-ms", type=float, default=4.0, help="Execution time of one query.")
+    parser.add_argument("--interval", type=float, default=0.25, help="Seconds between adjustments of the limit (CONCURRENCY_ADJUST_INTERVAL).")
+    parser.add_argument("--tolerance", type=float, default=CONCURRENCY_LATENCY_TOLERANCE)
+    parser.add_argument("--initial", type=int, default=WORKER_CONCURRENCY)
+    parser.add_argument("--min", type=int, default=WORKER_CONCURRENCY_MIN)
+    parser.add_argument("--max", type=int, default=WORKER_CONCURRENCY_MAX)
+    parser.add_argument("--report-every", type=float, default=1.0)
+    parser.add_argument("--fixed", default="", help="Comma-separated fixed limits to run the same load with.")
+    args = parser.parse_args()
+    phases = parse_phases(args.phases)
+
+    rows, consumer = await run_load(AdaptiveLimit(args.initial, args.min, args.max, args.tolerance), phases, args)
+    print(f"{'t (s)':>6} {'capacity':>8} {'limit':>6} {'msg/s':>8} {'latency ms':>11} {'max_ack_pending':>16}")
+    for row in rows:
+        print(f"{row['t']:>6.1f} {row['capacity']:>8} {row['limit']:>6} {row['throughput']:>8,.0f} {row['latency_ms']:>11.2f} {row['max_ack_pending']:>16}")
+    print_summary(f"Adaptive limit, tolerance {args.tolerance}", summarize(rows, phases, args.service_ms), consumer)
+
+    for fixed in filter(None, args.fixed.split(",")):
+        rows, consumer = await run_load(AdaptiveLimit.fixed(int(fixed)), phases, args)
+        print_summary(f"Fixed limit of {fixed}", summarize(rows, phases, args.service_ms), consumer)
+
+if __name__ == "__main__":
+    asyncio.run(main())
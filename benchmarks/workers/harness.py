@@ -0,0 +1,219 @@
+"""
+In-memory stand-ins and measurement helpers shared by the worker benchmark scenarios.
+"""
+import gc
+import time
+import random
+import asyncio
+import logging
+import itertools
+import tracemalloc
+
+from types import SimpleNamespace
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+class StageClock:
+    """
+    Accumulates the time spent in each named stage of message processing.
+    """
+
+    def __init__(self):
+        self.totals = defaultdict(float)
+
+    def reset(self):
+        self.totals.clear()
+
+    def add(self, stage: str, seconds: float):
+        self.totals[stage] += seconds
+
+    def wrap(self, stage: str, func):
+        """Returns `func` (sync or async) with its duration added to `stage`."""
+        if asyncio.iscoroutinefunction(func):
+            async def timed(*args, **kwargs):
+                started_at = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.totals[stage] += time.perf_counter() - started_at
+        else:
+            def timed(*args, **kwargs):
+                started_at = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.totals[stage] += time.perf_counter() - started_at
+        return timed
+
+    def timed_decoder(self, decoder):
+        """A stand-in for the event decoder of a processing module, timing decoding and validation as the decode stage."""
+        return SimpleNamespace(decode=self.wrap("decode", decoder.decode))
+
+STREAM_SEQUENCE = itertools.count(1)
+
+class FakeMsg:
+    """
+    In-memory stand-in for a JetStream message, timing its ack as the ack stage. Acks complete
+    immediately, so the stage measures the acknowledgement code of the worker, not a round trip.
+    """
+
+    def __init__(self, data: bytes, clock: StageClock, headers: dict | None = None):
+        self.data = data
+        self.headers = headers
+        self.metadata = SimpleNamespace(stream="bench", sequence=SimpleNamespace(stream=next(STREAM_SEQUENCE)), timestamp=datetime.now(timezone.utc))
+        self.acked = False
+        self._clock = clock
+
+    async def ack(self):
+        started_at = time.perf_counter()
+        self.acked = True
+        self._clock.add("ack", time.perf_counter() - started_at)
+
+    async def nak(self, delay=None):
+        self.acked = False
+
+    async def in_progress(self):
+        pass
+
+class FakeConnection:
+    """
+    Stand-in for an asyncpg connection whose statements take `latency` seconds and return
+    whatever `fetch_handler` builds from their arguments. With no latency statements complete
+    without yielding to the event loop, so the db stage only measures the code around them.
+    """
+
+    def __init__(self, latency: float, fetch_handler=None):
+        self._latency = latency
+        self._fetch_handler = fetch_handler
+
+    async def _round_trip(self):
+        if self._latency:
+            await asyncio.sleep(self._latency)
+
+    async def execute(self, query, *args):
+        await self._round_trip()
+        return "OK"
+
+    async def fetch(self, query, *args):
+        await self._round_trip()
+        return self._fetch_handler(*args) if self._fetch_handler else []
+
+    async def copy_records_to_table(self, table_name, records, columns):
+        for _ in records:
+            pass
+        await self._round_trip()
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+class FakePool:
+    """
+    Stand-in for an asyncpg pool of `size` fake connections.
+    """
+
+    def __init__(self, size: int, latency: float, fetch_handler=None):
+        self._slots = asyncio.Semaphore(size)
+        self._latency = latency
+        self._fetch_handler = fetch_handler
+
+    @asynccontextmanager
+    async def acquire(self):
+        async with self._slots:
+            yield FakeConnection(self._latency, self._fetch_handler)
+
+    async def close(self):
+        pass
+
+class StagedPool:
+    """
+    Wraps a pool to add the time each connection is held, including the wait for it, to the db stage.
+    """
+
+    def __init__(self, pool, clock: StageClock):
+        self._pool = pool
+        self._clock = clock
+
+    @asynccontextmanager
+    async def acquire(self):
+        started_at = time.perf_counter()
+        try:
+            async with self._pool.acquire() as conn:
+                yield conn
+        finally:
+            self._clock.add("db", time.perf_counter() - started_at)
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+class FakeNats:
+    """
+    Stand-in for a core NATS connection or a JetStream context that only counts publishes.
+    """
+
+    def __init__(self):
+        self.published = 0
+
+    async def publish(self, subject, payload, headers=None):
+        self.published += 1
+
+LOGGING_MODES = ("queue", "sync", "off")
+
+def silence_logging(mode: str = "queue"):
+    """
+    Sends the log output of the services to /dev/null, keeping the cost of formatting each record.
+
+    With "queue" the records still go through the queue and the listener thread of logs/logs.py;
+    with "sync" they are formatted and written by the logging call itself, as with the former
+    `logging.basicConfig` setup of the services.
+    """
+    devnull = open("/dev/null", "w")
+    root = logging.getLogger()
+    if mode == "sync":
+        handler = logging.StreamHandler(devnull)
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+        root.handlers = [handler]
+        return
+    for handler in root.handlers:
+        for target in [handler, *getattr(getattr(handler, "listener", None), "handlers", [])]:
+            if isinstance(target, logging.StreamHandler):
+                target.setStream(devnull)
+
+def dropped_log_records() -> int:
+    """Records the queue handlers of logs/logs.py dropped because their queue was full."""
+    return sum(getattr(handler, "dropped", 0) for handler in logging.getLogger().handlers)
+
+def random_metrics() -> dict:
+    return {"positivity": round(random.random(), 3), "intensity": round(random.random(), 3), "stress_level": round(random.random(), 3)}
+
+async def measure_allocations(process, chunks: list[list]) -> dict:
+    """
+    Processes the chunks one by one under tracemalloc.
+
+    Returns the mean peak of memory allocated while processing a chunk, and the memory still
+    held after all chunks were processed, both per message.
+    """
+    messages = sum(len(chunk) for chunk in chunks)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start_current, _ = tracemalloc.get_traced_memory()
+        peak_sum = 0
+        for chunk in chunks:
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            await process(chunk)
+            _, peak = tracemalloc.get_traced_memory()
+            peak_sum += peak - before
+        gc.collect()
+        end_current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "peak_bytes_per_msg": round(peak_sum / messages, 1),
+        "retained_bytes_per_msg": round((end_current - start_current) / messages, 1),
+    }
+
+def chunked(items: list, size: int) -> list[list]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
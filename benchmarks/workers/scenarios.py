@@ -0,0 +1,268 @@
+"""
+One scenario per worker processing path. A scenario imports the code of its service, swaps the
+event decoder of its processing module for a timed stand-in, and drives the handler the way the
+worker's main does, against a fake pool or a local PostgreSQL. Messages are encoded with the
+content type given to the scenario, as a producer configured with EVENT_CONTENT_TYPE would.
+"""
+import os
+import abc
+import sys
+import time
+import uuid
+import random
+import asyncpg
+
+from datetime import datetime, timezone
+from harness import StageClock, FakeMsg, FakePool, StagedPool, FakeNats, random_metrics
+
+SERVICES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "services"))
+USERS = 100
+
+class Scenario(abc.ABC):
+    """
+    Base class of the scenarios. `unit` is the number of messages the worker handles as one unit
+    of work, which is also the chunk size of the allocation pass.
+    """
+    service = None
+    unit = 1
+
+    def __init__(self, clock: StageClock, database_url: str | None, fake_latency: float, concurrency: int | None, content_type: str):
+        self.clock = clock
+        self.content_type = content_type
+        self.database_url = database_url
+        self.fake_latency = fake_latency
+        self.concurrency = concurrency
+        self.raw_pool = None
+        self.user_ids = []
+        sys.path.insert(0, os.path.join(SERVICES_DIR, self.service))
+
+    @abc.abstractmethod
+    def load(self):
+        """Imports the modules of the service and swaps in the timed event decoder."""
+
+    def message(self, event) -> FakeMsg:
+        """Encodes an event of the service's events module as a message."""
+        from events.events import encode_event, event_headers
+        return FakeMsg(encode_event(event, self.content_type), self.clock, event_headers(self.content_type))
+
+    @abc.abstractmethod
+    def pool_size(self) -> int:
+        """Returns the size of the connection pool, as the worker configures it."""
+
+    def wrap_pool(self, pool):
+        return pool
+
+    def fetch_handler(self, *args):
+        return []
+
+    async def setup(self):
+        self.load()
+        if self.database_url is None:
+            self.raw_pool = FakePool(self.pool_size(), self.fake_latency, self.fetch_handler)
+            self.user_ids = [uuid.uuid4() for _ in range(USERS)]
+        else:
+            self.raw_pool = await asyncpg.create_pool(self.database_url, min_size=1, max_size=self.pool_size())
+            async with self.raw_pool.acquire() as conn:
+                self.user_ids = [r["id"] for r in await conn.fetch("""
+                    INSERT INTO users (email, password_hash)
+                    SELECT $1 || '-' || i || '@example.com', 'benchmark' FROM generate_series(1, $2) AS i
+                    RETURNING id;
+                """, f"bench-workers-{time.time_ns()}", USERS)]
+        self.pool = StagedPool(self.wrap_pool(self.raw_pool), self.clock)
+
+    async def teardown(self):
+        if self.database_url is not None:
+            async with self.raw_pool.acquire() as conn:
+                await conn.execute("DELETE FROM users WHERE id = ANY($1::uuid[]);", self.user_ids)
+        await self.raw_pool.close()
+
+    @abc.abstractmethod
+    async def build_messages(self, count: int) -> list[FakeMsg]:
+        """Builds `count` messages of the events the worker consumes."""
+
+    @abc.abstractmethod
+    async def run(self, msgs: list[FakeMsg]):
+        """Processes the messages the way the worker does in production."""
+
+    async def process(self, msgs: list[FakeMsg]):
+        """Processes one unit of messages directly, for the allocation pass."""
+        await self.run(msgs)
+
+    def params(self) -> dict:
+        return {"concurrency": self.concurrency, "pool_size": self.pool_size(), "unit": self.unit, "content_type": self.content_type}
+
+class TransactionPerMessage(Scenario):
+    """
+    transaction-processing-worker with PROCESSING_MODE=per_message: `process_message` behind the WorkerRuntime.
+    """
+    service = "transaction-processing-worker"
+
+    def load(self):
+        import processing.processing as processing
+        from runtime.runtime import WorkerRuntime
+        from metrics.metrics import MeteredPool
+        from concurrency.concurrency import AdaptiveLimit
+        from configuration.config import DB_POOL_MAX_SIZE, WORKER_CONCURRENCY, WORKER_QUEUE_SIZE, BATCH_SIZE
+        processing.TRANSACTION_DECODER = self.clock.timed_decoder(processing.TRANSACTION_DECODER)
+        self.processing = processing
+        self.WorkerRuntime, self.MeteredPool, self.AdaptiveLimit = WorkerRuntime, MeteredPool, AdaptiveLimit
+        self.db_pool_max_size, self.queue_size, self.batch_size = DB_POOL_MAX_SIZE, WORKER_QUEUE_SIZE, BATCH_SIZE
+        self.concurrency = self.concurrency or WORKER_CONCURRENCY
+
+    def pool_size(self) -> int:
+        return self.db_pool_max_size
+
+    def wrap_pool(self, pool):
+        return self.MeteredPool(pool)
+
+    async def build_messages(self, count: int) -> list[FakeMsg]:
+        from events.events import TransactionEvent
+        now = datetime.now(timezone.utc)
+        return [
+            self.message(TransactionEvent(user_id=str(random.choice(self.user_ids)), amount=round(random.uniform(1, 500), 2), created_at=now))
+            for _ in range(count)
+        ]
+
+    async def run(self, msgs):
+        runtime = self.WorkerRuntime(lambda msg: self.processing.process_message(msg, self.pool), self.AdaptiveLimit.fixed(self.concurrency), self.queue_size, None)
+        runtime.start()
+        for msg in msgs:
+            await runtime.submit(msg)
+        await runtime.stop()
+
+    async def process(self, msgs):
+        for msg in msgs:
+            await self.processing.process_message(msg, self.pool)
+
+class TransactionBatch(TransactionPerMessage):
+    """
+    transaction-processing-worker with PROCESSING_MODE=batch: `process_batch` over pulled batches.
+    """
+
+    def load(self):
+        super().load()
+        self.unit = self.batch_size
+        self.concurrency = 1
+
+    async def run(self, msgs):
+        for start in range(0, len(msgs), self.batch_size):
+            await self.processing.process_batch(msgs[start:start + self.batch_size], self.pool)
+
+    async def process(self, msgs):
+        await self.processing.process_batch(msgs, self.pool)
+
+class EmotionPerMessage(Scenario):
+    """
+    emotion-processing-worker: `process_message` behind the WorkerRuntime folding events into the
+    aggregator, which is flushed every FLUSH_MAX_EVENTS messages as its flush loop would.
+    """
+    service = "emotion-processing-worker"
+
+    def load(self):
+        import processing.processing as processing
+        from runtime.runtime import WorkerRuntime
+        from metrics.metrics import MeteredPool
+        from concurrency.concurrency import AdaptiveLimit
+        from aggregation.aggregation import EmotionSummaryAggregator
+        from configuration.config import DB_POOL_MAX_SIZE, WORKER_CONCURRENCY, WORKER_QUEUE_SIZE, FLUSH_INTERVAL_MS, FLUSH_MAX_EVENTS
+        processing.EMOTION_DECODER = self.clock.timed_decoder(processing.EMOTION_DECODER)
+        self.processing = processing
+        self.WorkerRuntime, self.MeteredPool, self.AdaptiveLimit = WorkerRuntime, MeteredPool, AdaptiveLimit
+        self.EmotionSummaryAggregator = EmotionSummaryAggregator
+        self.db_pool_max_size, self.queue_size = DB_POOL_MAX_SIZE, WORKER_QUEUE_SIZE
+        self.flush_interval_ms, self.unit = FLUSH_INTERVAL_MS, FLUSH_MAX_EVENTS
+        self.concurrency = self.concurrency or WORKER_CONCURRENCY
+
+    def pool_size(self) -> int:
+        return self.db_pool_max_size
+
+    def wrap_pool(self, pool):
+        return self.MeteredPool(pool)
+
+    async def setup(self):
+        await super().setup()
+        self.aggregator = self.EmotionSummaryAggregator(self.pool, self.flush_interval_ms, self.unit)
+        self.aggregator.add = self.clock.wrap("aggregate", self.aggregator.add)
+
+    async def build_messages(self, count: int) -> list[FakeMsg]:
+        from events.events import EmotionEvent, EmotionEventPayload, EmotionMetrics
+        now = datetime.now(timezone.utc).isoformat()
+        return [
+            self.message(EmotionEvent(
+                user_id=str(random.choice(self.user_ids)), timestamp=now,
+                emotion_event=EmotionEventPayload(type="SENTIMENT_ANALYSIS", metrics=EmotionMetrics(**random_metrics()))
+            ))
+            for _ in range(count)
+        ]
+
+    async def run(self, msgs):
+        for start in range(0, len(msgs), self.unit):
+            runtime = self.WorkerRuntime(lambda msg: self.processing.process_message(msg, self.aggregator), self.AdaptiveLimit.fixed(self.concurrency), self.queue_size, None)
+            runtime.start()
+            for msg in msgs[start:start + self.unit]:
+                await runtime.submit(msg)
+            await runtime.stop()
+            await self.aggregator.flush()
+
+    async def process(self, msgs):
+        for msg in msgs:
+            await self.processing.process_message(msg, self.aggregator)
+        await self.aggregator.flush()
+
+class CreditApplicationLanes(Scenario):
+    """
+    credit-application-worker: messages submitted to the PartitionedExecutor, whose lanes call
+    `process_events` for every group of waiting messages, as the worker's main does.
+    """
+    service = "credit-application-worker"
+
+    def load(self):
+        import processing.processing as processing
+        from executor.executor import PartitionedExecutor
+        from metrics.metrics import MeteredPool
+        from configuration.config import LANE_CONCURRENCY, LANE_CAPACITY, LANE_BATCH_SIZE
+        processing.ACCEPTANCE_DECODER = self.clock.timed_decoder(processing.ACCEPTANCE_DECODER)
+        processing.send_activation_notification = self.clock.wrap("publish", processing.send_activation_notification)
+        self.PartitionedExecutor, self.MeteredPool = PartitionedExecutor, MeteredPool
+        self.concurrency = self.concurrency or LANE_CONCURRENCY
+        self.lane_capacity, self.unit = LANE_CAPACITY, LANE_BATCH_SIZE
+        self.js = FakeNats()
+
+    def pool_size(self) -> int:
+        return self.concurrency
+
+    def wrap_pool(self, pool):
+        return self.MeteredPool(pool)
+
+    def fetch_handler(self, offer_ids, user_ids):
+        return [{"id": offer_id, "user_id": user_id, "activated": True} for offer_id, user_id in zip(offer_ids, user_ids)]
+
+    async def build_messages(self, count: int) -> list[FakeMsg]:
+        from events.events import CreditOfferAcceptedEvent
+        offers = [(uuid.uuid4(), random.choice(self.user_ids)) for _ in range(count)]
+        if self.database_url is not None:
+            async with self.raw_pool.acquire() as conn:
+                await conn.copy_records_to_table(
+                    "credit_limits",
+                    records=[(offer_id, user_id, "offered", 5000, 10.0, "SHORT_TERM_PERSONAL_LOAN", datetime.now(timezone.utc).replace(year=2100)) for offer_id, user_id in offers],
+                    columns=["id", "user_id", "status", "credit_limit", "interest_rate", "credit_type", "expires_at"]
+                )
+        accepted_at = datetime.now(timezone.utc).isoformat()
+        return [
+            self.message(CreditOfferAcceptedEvent(offer_id=offer_id, user_id=user_id, accepted_at=accepted_at))
+            for offer_id, user_id in offers
+        ]
+
+    async def run(self, msgs):
+        executor = self.PartitionedExecutor(self.pool, self.js, self.concurrency, self.lane_capacity, self.unit)
+        executor.start()
+        for msg in msgs:
+            await executor.submit(msg)
+        await executor.stop()
+
+SCENARIOS = {
+    "transaction_per_message": TransactionPerMessage,
+    "transaction_batch": TransactionBatch,
+    "emotion_per_message": EmotionPerMessage,
+    "credit_application_lanes": CreditApplicationLanes,
+}
@@ -0,0 +1,119 @@
+import http from 'k6/http';
+import { check } from 'k6';
+import { Trend } from 'k6/metrics';
+import { SharedArray } from 'k6/data';
+
+const sessions = new SharedArray('sessions', function () {
+  return JSON.parse(open('../sessions.json'));
+});
+
+const users = new SharedArray('users', function () {
+  try {
+    return JSON.parse(open('../users.json'));
+  } catch (e) {
+    return [];
+  }
+});
+
+const STORM_START_SECONDS = 40;
+const STORM_END_SECONDS = 100;
+
+const creditAnalysisBaseline = new Trend('credit_analysis_duration_baseline', true);
+const creditAnalysisDuringStorm = new Trend('credit_analysis_duration_storm', true);
+
+export const options = {
+  scenarios: {
+    credit_analysis: {
+      executor: 'constant-arrival-rate',
+      exec: 'creditAnalysis',
+      rate: 20,
+      timeUnit: '1s',
+      duration: '2m',
+      preAllocatedVUs: 20,
+      maxVUs: 100,
+    },
+    login_storm: {
+      executor: 'ramping-arrival-rate',
+      exec: 'login',
+      startTime: `${STORM_START_SECONDS}s`,
+      startRate: 10,
+      timeUnit: '1s',
+      stages: [
+        { duration: '10s', target: 100 },
+        { duration: '40s', target: 100 },
+        { duration: '10s', target: 0 },
+      ],
+      preAllocatedVUs: 50,
+      maxVUs: 300,
+    },
+  },
+  summaryTrendStats: ['avg', 'p(90)', 'p(95)', 'p(99)', 'max'],
+  thresholds: {
+    'credit_analysis_duration_storm': ['p(99)<500'],
+    'http_req_failed{scenario:credit_analysis}': ['rate<0.01'],
+  },
+};
+
+export function setup() {
+  return { startedAt: Date.now() };
+}
+
+export function creditAnalysis(data) {
+  const session = sessions[Math.floor(Math.random() * sessions.length)];
+  if (!session) {
+    return;
+  }
+  const params = {
+    headers: {
+      'Content-Type': 'application/json',
+      'Authorization': `Bearer ${session.token}`,
+    },
+  };
+  const res = http.post(`http://localhost:9999/v1/users/${session.userId}/credit-analysis`, null, params);
+  check(res, {
+    'credit analysis status is 200 (OK)': (r) => r.status === 200,
+  });
+
+  const elapsedSeconds = (Date.now() - data.startedAt) / 1000;
+  if (elapsedSeconds >= STORM_START_SECONDS && elapsedSeconds < STORM_END_SECONDS) {
+    creditAnalysisDuringStorm.add(res.timings.duration);
+  } else if (elapsedSeconds < STORM_START_SECONDS) {
+    creditAnalysisBaseline.add(res.timings.duration);
+  }
+}
+
+export function login() {
+  if (users.length === 0) {
+    return;
+  }
+  const user = users[Math.floor(Math.random() * users.length)];
+  const payload = JSON.stringify({
+    email: user.email,
+    password: user.password_sent,
+  });
+  const res = http.post('http://localhost:9999/v1/auth/login', payload, {
+    headers: { 'Content-Type': 'application/json' },
+  });
+  check(res, {
+    'login status is 200 (OK) or 503 (shed)': (r) => r.status === 200 || r.status === 503,
+  });
+}
+
+export function handleSummary(data) {
+  const baseline = data.metrics.credit_analysis_duration_baseline;
+  const storm = data.metrics.credit_analysis_duration_storm;
+  const lines = ['Credit analysis latency before and during the login storm'];
+  if (baseline && storm) {
+    const baselineP99 = baseline.values['p(99)'];
+    const stormP99 = storm.values['p(99)'];
+    lines.push(`  p99 baseline: ${baselineP99.toFixed(2)} ms`);
+    lines.push(`  p99 storm:    ${stormP99.toFixed(2)} ms`);
+    lines.push(`  ratio:        ${(stormP99 / baselineP99).toFixed(2)}x`);
+  } else {
+    lines.push('  not enough samples, check that sessions.json and users.json exist.');
+  }
+  return {
+    stdout: lines.join('\n') + '\n',
+    'summary-login-storm.json': JSON.stringify(data, null, 2),
+  };
+}
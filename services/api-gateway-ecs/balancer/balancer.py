@@ -0,0 +1,242 @@
+import math
+import time
+import random
+import asyncio
+import httpx
+
+from collections import deque
+from configuration.config import logger
+
+LEAST_OUTSTANDING = "least_outstanding"
+EWMA = "ewma"
+BALANCING_STRATEGIES = (LEAST_OUTSTANDING, EWMA)
+
+HEDGE_MIN_SAMPLES = 100
+HEDGE_DELAY_REFRESH = 50
+HEDGE_TOKEN_CAP = 10.0
+
+class Endpoint:
+    """
+    One replica of an upstream service, with its in-flight requests, latency and health.
+    """
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.ewma = 0.0
+        self.observed_at = None
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def cost(self, now: float, decay: float) -> float:
+        """
+        Peak EWMA of the latency, decayed since the last observation so an endpoint that was once slow
+        is tried again, weighted by the requests in flight. An endpoint never observed costs nothing.
+        """
+        if self.observed_at is None:
+            return 0.0
+        return self.ewma * math.exp(-(now - self.observed_at) / decay) * (self.outstanding + 1)
+
+class UpstreamBalancer:
+    """
+    Spreads the requests to one upstream service over its endpoints, by least outstanding requests
+    or by the power of two choices over the peak EWMA of their latencies.
+
+    Endpoints are ejected passively: after `ejection_failures` consecutive connection errors or 5xx
+    responses an endpoint gets no requests for `ejection_time`, doubled at every new ejection up to
+    `max_ejection_time`, and then takes requests again until it fails anew. The last available
+    endpoint is never ejected.
+
+    Idempotent requests can be hedged: when the first endpoint has not answered after the
+    `hedge_quantile` of the recent latencies, the same request is sent to a second endpoint and the
+    first response wins. Every request earns `hedge_budget` of a hedge, so hedges stay a bounded
+    fraction of the load even when the whole service slows down. They are also retried once on
+    another endpoint when the first one refuses the connection, so an endpoint that went down costs
+    no errors while it is being ejected.
+    """
+
+    def __init__(
+        self, urls: list[str], strategy: str = EWMA, decay: float = 10.0, ejection_failures: int = 5,
+        ejection_time: float = 10.0, max_ejection_time: float = 300.0, hedge_quantile: float = 0.95,
+        hedge_min_delay: float = 0.005, hedge_budget: float = 0.1, window: int = 1000,
+    ):
+        if strategy not in BALANCING_STRATEGIES:
+            raise ValueError(f"Unsupported balancing strategy {strategy!r}, expected one of {', '.join(BALANCING_STRATEGIES)}.")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self._strategy = strategy
+        self._decay = decay
+        self._ejection_failures = ejection_failures
+        self._ejection_time = ejection_time
+        self._max_ejection_time = max_ejection_time
+        self._hedge_quantile = hedge_quantile
+        self._hedge_min_delay = hedge_min_delay
+        self._hedge_budget = hedge_budget
+        self._latencies = deque(maxlen=window)
+        self._hedge_delay = None
+        self._samples_since_refresh = 0
+        self._hedge_tokens = HEDGE_TOKEN_CAP
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def available(self, now: float) -> list[Endpoint]:
+        """Returns the endpoints that are not ejected, or all of them if every one is."""
+        return [endpoint for endpoint in self.endpoints if endpoint.ejected_until <= now] or self.endpoints
+
+    def pick(self, exclude: Endpoint | None = None) -> Endpoint | None:
+        """Chooses the endpoint of the next request and counts the request as outstanding on it."""
+        now = time.monotonic()
+        candidates = [endpoint for endpoint in self.available(now) if endpoint is not exclude]
+        if not candidates:
+            return None
+        if len(candidates) == 1:
+            endpoint = candidates[0]
+        elif self._strategy == LEAST_OUTSTANDING:
+            fewest = min(endpoint.outstanding for endpoint in candidates)
+            endpoint = random.choice([endpoint for endpoint in candidates if endpoint.outstanding == fewest])
+        else:
+            first, second = random.sample(candidates, 2)
+            endpoint = first if first.cost(now, self._decay) <= second.cost(now, self._decay) else second
+        endpoint.outstanding += 1
+        endpoint.requests += 1
+        return endpoint
+
+    def release(self, endpoint: Endpoint):
+        endpoint.outstanding -= 1
+
+    def observe(self, endpoint: Endpoint, latency: float, failed: bool = False, complete: bool = True):
+        """
+        Records the time an endpoint took to answer, or to fail, and ejects it after repeated failures.
+        Failures leave the EWMA alone, so an endpoint that fails fast does not attract the traffic, and
+        an incomplete latency, of a request given up on, only updates the EWMA.
+        """
+        now = time.monotonic()
+        if not failed:
+            if endpoint.observed_at is None or latency > endpoint.ewma:
+                endpoint.ewma = latency
+            else:
+                weight = math.exp(-(now - endpoint.observed_at) / self._decay)
+                endpoint.ewma = endpoint.ewma * weight + latency * (1 - weight)
+            endpoint.observed_at = now
+
+        if not complete:
+            return
+        if not failed:
+            endpoint.consecutive_failures = 0
+            endpoint.ejections = 0
+            self._latencies.append(latency)
+            self._samples_since_refresh += 1
+            return
+        endpoint.failures += 1
+        endpoint.consecutive_failures += 1
+        if endpoint.consecutive_failures >= self._ejection_failures and len(self.available(now)) > 1 and endpoint.ejected_until <= now:
+            ejection_time = min(self._ejection_time * 2 ** endpoint.ejections, self._max_ejection_time)
+            endpoint.ejected_until = now + ejection_time
+            endpoint.ejections += 1
+            endpoint.consecutive_failures = 0
+            logger.warning("Ejected upstream endpoint %s for %.0fs after %d consecutive failures.", endpoint.url, ejection_time, self._ejection_failures)
+
+    def hedge_delay(self) -> float | None:
+        """Returns how long to wait before hedging a request, or None while there are too few latencies to tell."""
+        if len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        if self._hedge_delay is None or self._samples_since_refresh >= HEDGE_DELAY_REFRESH:
+            latencies = sorted(self._latencies)
+            quantile = latencies[min(len(latencies) - 1, int(len(latencies) * self._hedge_quantile))]
+            self._hedge_delay = max(self._hedge_min_delay, quantile)
+            self._samples_since_refresh = 0
+        return self._hedge_delay
+
+    async def _attempt(self, http_client: httpx.AsyncClient, build_request, endpoint: Endpoint) -> httpx.Response:
+        """Sends the request to one endpoint, recording its latency up to the response headers."""
+        started_at = time.perf_counter()
+        try:
+            response = await http_client.send(build_request(endpoint), stream=True)
+        except BaseException as e:
+            # A cancelled attempt lost to a hedge, or its client went away: it took at least this long.
+            cancelled = isinstance(e, asyncio.CancelledError)
+            self.observe(endpoint, time.perf_counter() - started_at, failed=isinstance(e, httpx.RequestError), complete=not cancelled)
+            self.release(endpoint)
+            raise
+        self.observe(endpoint, time.perf_counter() - started_at, failed=response.status_code >= 500)
+        return response
+
+    def _closer(self, response: httpx.Response, endpoint: Endpoint):
+        async def close():
+            try:
+                await response.aclose()
+            finally:
+                self.release(endpoint)
+        return close
+
+    async def send(self, http_client: httpx.AsyncClient, build_request, idempotent: bool = False):
+        """
+        Sends a request built by `build_request(endpoint)` and returns the streamed response with the
+        coroutine function that closes it and frees its endpoint.
+
+        An idempotent request, which must have no body since it may be sent twice, is hedged, and
+        sent to another endpoint when the first one could not be connected to.
+
+        Raises:
+            httpx.RequestError: If the upstream service could not be reached.
+        """
+        self._hedge_tokens = min(HEDGE_TOKEN_CAP, self._hedge_tokens + self._hedge_budget)
+        endpoint = self.pick()
+        try:
+            return await self._send_to(http_client, build_request, endpoint, idempotent)
+        except httpx.ConnectError:
+            retry_endpoint = self.pick(exclude=endpoint) if idempotent else None
+            if retry_endpoint is None:
+                raise
+            return await self._send_to(http_client, build_request, retry_endpoint, idempotent)
+
+    async def _send_to(self, http_client: httpx.AsyncClient, build_request, endpoint: Endpoint, hedge: bool):
+        delay = self.hedge_delay() if hedge and self._hedge_budget > 0 and len(self.endpoints) > 1 else None
+        if delay is None:
+            response = await self._attempt(http_client, build_request, endpoint)
+            return response, self._closer(response, endpoint)
+
+        attempts = {asyncio.create_task(self._attempt(http_client, build_request, endpoint)): endpoint}
+        winner = None
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if not done and self._hedge_tokens >= 1:
+                hedge_endpoint = self.pick(exclude=endpoint)
+                if hedge_endpoint is not None:
+                    self._hedge_tokens -= 1
+                    self.hedges += 1
+                    attempts[asyncio.create_task(self._attempt(http_client, build_request, hedge_endpoint))] = hedge_endpoint
+            pending = set(attempts)
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winners = [task for task in done if task.exception() is None]
+                if winners or not pending:
+                    break
+            winner = winners[0] if winners else next(iter(done))
+            response = winner.result()
+            if attempts[winner] is not endpoint:
+                self.hedge_wins += 1
+            return response, self._closer(response, attempts[winner])
+        finally:
+            for task, task_endpoint in attempts.items():
+                if task is winner:
+                    continue
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled() and task.exception() is None:
+                    await self._closer(task.result(), task_endpoint)()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "outstanding": {endpoint.url: endpoint.outstanding for endpoint in self.endpoints},
+            "latency_ewma_ms": {endpoint.url: endpoint.cost(now, self._decay) / (endpoint.outstanding + 1) * 1000 for endpoint in self.endpoints},
+            "ejected": {endpoint.url: int(endpoint.ejected_until > now) for endpoint in self.endpoints},
+            "requests": {endpoint.url: endpoint.requests for endpoint in self.endpoints},
+            "failures": {endpoint.url: endpoint.failures for endpoint in self.endpoints},
+            "hedge_delay_ms": (self._hedge_delay or 0.0) * 1000,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
@@ -0,0 +1,152 @@
+import time
+import hashlib
+
+from dataclasses import dataclass
+from collections import OrderedDict
+
+ENTRY_OVERHEAD_BYTES = 256
+MAX_TRACKED_INVALIDATIONS = 65536
+
+@dataclass
+class CachedResponse:
+    """
+    A successful upstream response held by the gateway, with its strong ETag.
+    """
+    owner: str
+    body: bytes
+    headers: list[tuple[bytes, bytes]]
+    etag: str
+    size: int
+    expires_at: float
+
+def strong_etag(body: bytes) -> str:
+    """Returns a strong ETag for a response body: the same bytes always get the same tag."""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Tells whether an If-None-Match header names `etag`, with the weak comparison RFC 9110 requires for it."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+class ResponseCache:
+    """
+    Bounded LRU cache of GET responses, keyed by route, authenticated subject and query string.
+
+    Entries are indexed by the user who owns the resource, so all the cached responses about a user
+    are dropped at once when its data changes. Invalidations are numbered, and a response fetched
+    while its user was invalidated is served but not stored, so a slow upstream call never puts back
+    the data it was meant to replace. The memory is bounded by `max_bytes` over the bodies and
+    headers, and `ttl` bounds the staleness of an entry whose invalidation was missed.
+
+    The cache is only used while `listening` is set, i.e. while its invalidations are received.
+    """
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._ttl = ttl
+        self.listening = False
+        self._entries: OrderedDict[tuple[str, str, str], CachedResponse] = OrderedDict()
+        self._owners: dict[str, set[tuple[str, str, str]]] = {}
+        self._generation = 0
+        self._invalidated_at: OrderedDict[str, int] = OrderedDict()
+        self._cleared_at = 0
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.uncacheable = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.listening and self.max_bytes > 0
+
+    def get(self, key: tuple[str, str, str]) -> CachedResponse | None:
+        """Returns the cached response for a key, or None on a miss or an expired entry."""
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            self._remove(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def generation(self) -> int:
+        """Returns the number of the last invalidation, to be passed to `put` with the response fetched after it."""
+        return self._generation
+
+    def invalidated_since(self, owner: str, generation: int) -> bool:
+        """
+        Tells whether a user was invalidated after `generation`. Only the latest invalidations are
+        remembered; for a user past them, the oldest one remembered stands in for its own.
+        """
+        invalidated_at = self._invalidated_at.get(owner)
+        if invalidated_at is None:
+            invalidated_at = next(iter(self._invalidated_at.values()), 0) if len(self._invalidated_at) >= MAX_TRACKED_INVALIDATIONS else 0
+        return max(invalidated_at, self._cleared_at) > generation
+
+    def put(self, key: tuple[str, str, str], owner: str, generation: int, body: bytes, headers: list[tuple[bytes, bytes]]) -> CachedResponse:
+        """
+        Builds the cached form of a response and stores it, unless it is larger than
+        `max_entry_bytes` or the user was invalidated since `generation`.
+        """
+        size = len(body) + sum(len(name) + len(value) for name, value in headers) + ENTRY_OVERHEAD_BYTES
+        entry = CachedResponse(owner, body, headers, strong_etag(body), size, time.monotonic() + self._ttl)
+        if size > self.max_entry_bytes or self.invalidated_since(owner, generation):
+            self.uncacheable += 1
+            return entry
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._owners.setdefault(owner, set()).add(key)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+        return entry
+
+    def invalidate(self, owner: str):
+        """Drops every cached response about a user and fences off the ones being fetched."""
+        self._generation += 1
+        self._invalidated_at.pop(owner, None)
+        self._invalidated_at[owner] = self._generation
+        if len(self._invalidated_at) > MAX_TRACKED_INVALIDATIONS:
+            self._invalidated_at.popitem(last=False)
+        for key in self._owners.pop(owner, ()):
+            self._remove(key)
+        self.invalidations += 1
+
+    def clear(self):
+        """Drops every entry and fences off every fetch, e.g. after missing invalidations while disconnected from NATS."""
+        self._generation += 1
+        self._cleared_at = self._generation
+        self._entries.clear()
+        self._owners.clear()
+        self._bytes = 0
+        self.invalidations += 1
+
+    def _remove(self, key: tuple[str, str, str]):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        keys = self._owners.get(entry.owner)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._owners[entry.owner]
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes,
+            "hits": self.hits, "misses": self.misses, "not_modified": self.not_modified,
+            "evictions": self.evictions, "invalidations": self.invalidations, "uncacheable": self.uncacheable,
+        }
@@ -1,14 +1,62 @@
+import re
 import os
-import logging
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
-logger = logging.getLogger("api_gateway")
+from logs.logs import setup_logging
+
+logger = setup_logging("api_gateway")
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-super-secret-and-long-api-token")
 INTERNAL_SERVICE_API_KEY = os.getenv("INTERNAL_SERVICE_API_KEY", "a-different-secret-for-internal-services")
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+NATS_URL = os.getenv("NATS_URL", "nats://localhost:4222")
+NATS_OFFER_CREATED_SUBJECT = "credit.offers.created"
+NATS_ACCEPT_SUBJECT = "credit.offers.approved"
+NATS_NOTIFY_SUBJECT = "user.notifications"
+
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+RESPONSE_CACHE_MAX_ENTRY_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", str(256 * 1024)))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "60"))
+
+# GET routes whose responses are cached, with the user who owns each one in the `owner` group.
+CACHEABLE_ROUTES = [
+    re.compile(r"^/v1/users/(?P<owner>[^/]+)/offers$"),
+]
+
+def endpoint_urls(value: str) -> list[str]:
+    """Splits a comma-separated list of the URLs of the replicas of a service."""
+    return [url.strip() for url in value.split(",") if url.strip()]
 
+# Each service can list several replicas, e.g. EMOTION_SERVICE_URL=http://emotion-1:8000,http://emotion-2:8000.
 SERVICE_URLS = {
-    "emotion_service": os.getenv("EMOTION_SERVICE_URL", "http://emotion-ingestion-service:8000"),
-    "transaction_service": os.getenv("TRANSACTION_SERVICE_URL", "http://transaction-service:8000"),
-    "user_credit_service": os.getenv("USER_CREDIT_SERVICE_URL", "http://user-and-credit-service:8000"),
+    "emotion_service": endpoint_urls(os.getenv("EMOTION_SERVICE_URL", "http://emotion-ingestion-service:8000")),
+    "transaction_service": endpoint_urls(os.getenv("TRANSACTION_SERVICE_URL", "http://transaction-service:8000")),
+    "user_credit_service": endpoint_urls(os.getenv("USER_CREDIT_SERVICE_URL", "http://user-and-credit-service:8000")),
+}
+
+UPSTREAM_BALANCING = os.getenv("UPSTREAM_BALANCING", "ewma")
+UPSTREAM_EWMA_DECAY = float(os.getenv("UPSTREAM_EWMA_DECAY", "10"))
+UPSTREAM_EJECTION_FAILURES = int(os.getenv("UPSTREAM_EJECTION_FAILURES", "5"))
+UPSTREAM_EJECTION_TIME = float(os.getenv("UPSTREAM_EJECTION_TIME", "10"))
+UPSTREAM_MAX_EJECTION_TIME = float(os.getenv("UPSTREAM_MAX_EJECTION_TIME", "300"))
+UPSTREAM_HEDGE_QUANTILE = float(os.getenv("UPSTREAM_HEDGE_QUANTILE", "0.95"))
+UPSTREAM_HEDGE_MIN_DELAY = float(os.getenv("UPSTREAM_HEDGE_MIN_DELAY", "0.005"))
+UPSTREAM_HEDGE_BUDGET = float(os.getenv("UPSTREAM_HEDGE_BUDGET", "0.1"))
+
+def upstream_client_settings(env_prefix: str, max_connections: int, max_keepalive_connections: int, timeout: float) -> dict:
+    """
+    Reads the connection pool settings of one upstream service, overridable with <env_prefix>_* variables.
+    """
+    return {
+        "max_connections": int(os.getenv(f"{env_prefix}_MAX_CONNECTIONS", str(max_connections))),
+        "max_keepalive_connections": int(os.getenv(f"{env_prefix}_MAX_KEEPALIVE_CONNECTIONS", str(max_keepalive_connections))),
+        "keepalive_expiry": float(os.getenv(f"{env_prefix}_KEEPALIVE_EXPIRY", "30")),
+        "connect_timeout": float(os.getenv(f"{env_prefix}_CONNECT_TIMEOUT", "2")),
+        "timeout": float(os.getenv(f"{env_prefix}_TIMEOUT", str(timeout))),
+    }
+
+UPSTREAM_CLIENT_SETTINGS = {
+    "emotion_service": upstream_client_settings("EMOTION_SERVICE", 200, 100, 5.0),
+    "transaction_service": upstream_client_settings("TRANSACTION_SERVICE", 200, 100, 5.0),
+    "user_credit_service": upstream_client_settings("USER_CREDIT_SERVICE", 100, 50, 10.0),
 }
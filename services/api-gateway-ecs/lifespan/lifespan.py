@@ -1,6 +1,42 @@
+import nats
+import asyncio
+
 from fastapi import FastAPI
-from router.router import http_client
+from cache.cache import ResponseCache
+from metrics.metrics import register_stats
+from security.security import token_cache
+from router.router import create_upstream_clients, create_upstream_balancers
 from contextlib import asynccontextmanager
+from messaging.messaging import subscribe_to_invalidations
+from configuration.config import logger, NATS_URL, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_MAX_ENTRY_BYTES, RESPONSE_CACHE_TTL
+
+async def connect_response_cache(app: FastAPI, response_cache: ResponseCache):
+    """
+    Connects to NATS without holding up the startup and turns the response cache on once its
+    invalidations are received. The cache is emptied and off while the connection is down, since
+    the invalidations published meanwhile are lost.
+    """
+    async def on_disconnected():
+        response_cache.listening = False
+        response_cache.clear()
+
+    async def on_reconnected():
+        response_cache.clear()
+        response_cache.listening = True
+
+    async def on_error(e):
+        logger.warning("NATS connection error, the response cache is off until it is back: %s", e)
+
+    try:
+        app.state.nats_conn = await nats.connect(
+            NATS_URL, name="api_gateway", max_reconnect_attempts=-1, error_cb=on_error,
+            disconnected_cb=on_disconnected, reconnected_cb=on_reconnected,
+        )
+        await subscribe_to_invalidations(app.state.nats_conn, response_cache)
+    except Exception as e:
+        logger.error("Could not subscribe to cache invalidations, the response cache is off: %s", e)
+        return
+    response_cache.listening = True
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -9,5 +45,20 @@ async def lifespan(app: FastAPI):
     The code before 'yield' runs on startup.
     The code after 'yield' runs on shutdown.
     """
+    app.state.http_clients = create_upstream_clients()
+    app.state.balancers = create_upstream_balancers()
+    for service_name, balancer in app.state.balancers.items():
+        register_stats(f"ecs_upstream_{service_name}", balancer.stats, label="endpoint")
+    register_stats("ecs_token_cache", token_cache.stats)
+
+    app.state.response_cache = ResponseCache(RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_MAX_ENTRY_BYTES, RESPONSE_CACHE_TTL)
+    register_stats("ecs_response_cache", app.state.response_cache.stats)
+    connect_task = asyncio.create_task(connect_response_cache(app, app.state.response_cache)) if RESPONSE_CACHE_MAX_BYTES > 0 else None
     yield
-    await http_client.aclose()
+    if connect_task is not None:
+        connect_task.cancel()
+        await asyncio.gather(connect_task, return_exceptions=True)
+    if hasattr(app.state, 'nats_conn') and app.state.nats_conn.is_connected:
+        await app.state.nats_conn.close()
+    for client in app.state.http_clients.values():
+        await client.aclose()
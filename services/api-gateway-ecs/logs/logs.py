@@ -0,0 +1,164 @@
+"""
+Logging setup shared by the services.
+
+Records are rendered as JSON lines (or the former text format with LOG_FORMAT=text) and written to
+STDOUT by a background thread: the code that logs only creates the record and puts it on a bounded
+queue, so a slow STDOUT never blocks the event loop. Records below WARNING can be sampled per
+logger with LOG_SAMPLE_RATES, before they are built; warnings and errors are always kept.
+
+This module must stay identical in every service that copies it.
+"""
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object with its time, level, logger and message, the fields
+    passed with `extra` and the exception, if any.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+def parse_sample_rates(spec: str) -> dict[str, float]:
+    """
+    Parses comma-separated `logger=rate` pairs, e.g. `transaction_processing_worker.processing=0.01`.
+    Pairs without a logger name or without a rate between 0 and 1 are skipped with a warning.
+    """
+    rates = {}
+    for pair in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = pair.partition("=")
+        try:
+            value = float(rate)
+        except ValueError:
+            value = None
+        if not name.strip() or value is None or not 0.0 <= value <= 1.0:
+            logging.getLogger(__name__).warning("Skipping invalid LOG_SAMPLE_RATES entry %r: expected logger=rate with a rate between 0 and 1.", pair)
+            continue
+        rates[name.strip()] = value
+    return rates
+
+class SuccessSampler:
+    """
+    Keeps a fraction of the records below WARNING of the loggers that have a sampling rate, or
+    whose closest configured ancestor has one. Warnings and errors are always kept.
+    """
+
+    def __init__(self, rates: dict[str, float]):
+        self._rates = rates
+        self._resolved: dict[str, float] = {}
+
+    def rate_of(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate, candidate = 1.0, name
+            while candidate:
+                if candidate in self._rates:
+                    rate = self._rates[candidate]
+                    break
+                candidate = candidate.rpartition(".")[0]
+            self._resolved[name] = rate
+        return rate
+
+    def keep(self, name: str, level: int) -> bool:
+        if level >= logging.WARNING or not self._rates:
+            return True
+        rate = self.rate_of(name)
+        return rate >= 1.0 or random.random() < rate
+
+class SampledLogger(logging.Logger):
+    """
+    Logger that is disabled for the records its sampler drops, so they are never built.
+    """
+    sampler: SuccessSampler | None = None
+
+    def isEnabledFor(self, level: int) -> bool:
+        return super().isEnabledFor(level) and (self.sampler is None or self.sampler.keep(self.name, level))
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on a bounded queue without ever waiting; the records that find it full are
+    dropped and counted.
+
+    The message is rendered from its arguments here, at the time of the call, while the JSON
+    serialization and the write happen on the listener thread.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def setup_logging(service_name: str) -> logging.Logger:
+    """
+    Routes every record of the process, including the ones of uvicorn, through the queue and
+    returns the logger of the service. Only the first call configures logging; the loggers
+    created after it are sampled with LOG_SAMPLE_RATES.
+    """
+    root = logging.getLogger()
+    if not any(isinstance(handler, NonBlockingQueueHandler) for handler in root.handlers):
+        # None of the formats uses the caller, thread or process of a record: skip looking them up.
+        logging._srcfile = None
+        logging.logThreads = logging.logProcesses = logging.logMultiprocessing = False
+        if hasattr(logging, "logAsyncioTasks"):
+            logging.logAsyncioTasks = False
+        logging.setLoggerClass(SampledLogger)
+
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+        queue_handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        queue_handler.listener = logging.handlers.QueueListener(queue_handler.queue, stream_handler)
+        queue_handler.listener.start()
+        atexit.register(queue_handler.listener.stop)
+
+        root.handlers = [queue_handler]
+        root.setLevel(LOG_LEVEL)
+        for name in UVICORN_LOGGERS:
+            logging.getLogger(name).handlers = []
+            logging.getLogger(name).propagate = True
+        # Parsed once the handlers are set, so the warnings about invalid entries are written like any other record.
+        SampledLogger.sampler = SuccessSampler(parse_sample_rates(LOG_SAMPLE_RATES))
+    return logging.getLogger(service_name)
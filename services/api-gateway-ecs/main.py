@@ -1,5 +1,6 @@
 from fastapi import FastAPI
 from lifespan.lifespan import lifespan
+from metrics.metrics import instrument_app
 from router.router import router as api_router
 
 app = FastAPI(
@@ -7,5 +8,6 @@ app = FastAPI(
     title="Empathic Credit System API Gateway",
     version="1.0.0"
 )
+instrument_app(app)
 
 app.include_router(api_router)
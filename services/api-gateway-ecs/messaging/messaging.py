@@ -0,0 +1,30 @@
+from cache.cache import ResponseCache
+from configuration.config import logger as service_logger, NATS_OFFER_CREATED_SUBJECT, NATS_ACCEPT_SUBJECT, NATS_NOTIFY_SUBJECT
+from events.events import OfferCreatedEvent, CreditOfferAcceptedEvent, CreditActivationNotification, EventDecoder, EventDecodeError
+
+logger = service_logger.getChild("messaging")
+
+# Events after which the cached responses about their user are outdated.
+INVALIDATING_EVENTS = {
+    NATS_OFFER_CREATED_SUBJECT: EventDecoder(OfferCreatedEvent),
+    NATS_ACCEPT_SUBJECT: EventDecoder(CreditOfferAcceptedEvent),
+    NATS_NOTIFY_SUBJECT: EventDecoder(CreditActivationNotification),
+}
+
+async def subscribe_to_invalidations(nats_conn, response_cache: ResponseCache):
+    """
+    Subscribes, outside of any queue group so that every gateway replica gets every event, to the
+    events that change the offers of a user, and drops the cached responses about that user.
+    """
+    async def invalidate(msg):
+        try:
+            event = INVALIDATING_EVENTS[msg.subject].decode(msg.data, msg.headers)
+        except EventDecodeError as e:
+            logger.warning("Discarding malformed event on '%s': %s", msg.subject, e)
+            return
+        response_cache.invalidate(str(event.user_id))
+        logger.debug("Cached responses of user %s invalidated by '%s'", event.user_id, msg.subject)
+
+    for subject in INVALIDATING_EVENTS:
+        await nats_conn.subscribe(subject, cb=invalidate)
+    logger.info("Listening for cache invalidations on %s", ", ".join(INVALIDATING_EVENTS))
@@ -1,40 +1,162 @@
+import uuid
 import httpx
 
-from configuration.config import SERVICE_URLS, logger
-from fastapi import APIRouter, Request, Response, Depends, HTTPException
-from security.security import validate_api_key, validate_internal_api_key
+from starlette.background import BackgroundTask
+from cache.cache import etag_matches
+from fastapi.responses import Response, StreamingResponse
+from balancer.balancer import UpstreamBalancer
+from configuration.config import (
+    SERVICE_URLS, UPSTREAM_CLIENT_SETTINGS, CACHEABLE_ROUTES, UPSTREAM_BALANCING, UPSTREAM_EWMA_DECAY, UPSTREAM_EJECTION_FAILURES,
+    UPSTREAM_EJECTION_TIME, UPSTREAM_MAX_EJECTION_TIME, UPSTREAM_HEDGE_QUANTILE, UPSTREAM_HEDGE_MIN_DELAY, UPSTREAM_HEDGE_BUDGET, logger
+)
+from fastapi import APIRouter, Request, Depends, HTTPException
+from security.security import validate_api_key, validate_internal_api_key, token_cache
 
 router = APIRouter()
-http_client = httpx.AsyncClient()
 
-async def forward(service_name: str, path: str, request: Request):
-    """Generic function to forward a request to an internal service."""
+HOP_BY_HOP_HEADERS = frozenset({
+    b"connection", b"keep-alive", b"proxy-authenticate", b"proxy-authorization",
+    b"te", b"trailer", b"trailers", b"transfer-encoding", b"upgrade", b"host",
+})
+
+def create_upstream_clients() -> dict[str, httpx.AsyncClient]:
+    """Creates one HTTP client, with its own connection pool shared by the replicas, per internal service."""
+    clients = {}
+    for service_name in SERVICE_URLS:
+        settings = UPSTREAM_CLIENT_SETTINGS[service_name]
+        clients[service_name] = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings["max_connections"],
+                max_keepalive_connections=settings["max_keepalive_connections"],
+                keepalive_expiry=settings["keepalive_expiry"],
+            ),
+            timeout=httpx.Timeout(settings["timeout"], connect=settings["connect_timeout"]),
+        )
+    return clients
+
+def create_upstream_balancers() -> dict[str, UpstreamBalancer]:
+    """Creates one balancer over the replicas of each internal service."""
+    return {
+        service_name: UpstreamBalancer(
+            urls, UPSTREAM_BALANCING, UPSTREAM_EWMA_DECAY, UPSTREAM_EJECTION_FAILURES, UPSTREAM_EJECTION_TIME,
+            UPSTREAM_MAX_EJECTION_TIME, UPSTREAM_HEDGE_QUANTILE, UPSTREAM_HEDGE_MIN_DELAY, UPSTREAM_HEDGE_BUDGET,
+        )
+        for service_name, urls in SERVICE_URLS.items()
+    }
+
+def end_to_end_headers(raw_headers: list[tuple[bytes, bytes]]) -> list[tuple[bytes, bytes]]:
+    """Drops hop-by-hop headers, including the ones named by the Connection header."""
+    excluded = HOP_BY_HOP_HEADERS
+    for name, value in raw_headers:
+        if name.lower() == b"connection":
+            excluded = excluded | {token.strip().lower() for token in value.split(b",")}
+    return [(name, value) for name, value in raw_headers if name.lower() not in excluded]
+
+# Cached responses must be revalidated on every use, and only by the client they were sent to.
+CACHED_RESPONSE_CACHE_CONTROL = b"private, no-cache"
+# Upstream headers that are not stored, since the gateway sets them when it answers from the cache.
+CACHE_MANAGED_HEADERS = frozenset({b"content-length", b"etag", b"cache-control", b"date"})
+
+def cacheable_owner(full_path: str) -> str | None:
+    """Returns the user who owns the resource of a cacheable GET route, or None if the route is not cached."""
+    for route in CACHEABLE_ROUTES:
+        match = route.match(full_path)
+        if match:
+            owner = match.group("owner")
+            try:
+                return str(uuid.UUID(owner))
+            except ValueError:
+                return owner
+    return None
+
+async def send_upstream(service_name: str, path: str, request: Request):
+    """
+    Sends a request to a replica of an internal service chosen by its balancer, streaming the body of
+    the client request, and returns the streamed response with the coroutine function that closes it.
+    GETs without a body may be hedged to a second replica, or retried on one if the first could not
+    be connected to.
+    """
     if not service_name or service_name not in SERVICE_URLS:
         raise HTTPException(status_code=404, detail="Endpoint not found.")
 
-    downstream_url = f"{SERVICE_URLS[service_name]}/{path}"
-    headers = dict(request.headers)
-    headers["host"] = httpx.URL(downstream_url).host
-    body = await request.body()
+    http_client = request.app.state.http_clients[service_name]
+    has_body = "content-length" in request.headers or "transfer-encoding" in request.headers
+    headers = end_to_end_headers(request.headers.raw)
 
-    try:
-        response = await http_client.request(
+    def build_request(endpoint):
+        return http_client.build_request(
             method=request.method,
-            url=downstream_url,
+            url=f"{endpoint.url}/{path}",
             headers=headers,
             params=request.query_params,
-            content=body,
-            timeout=10.0
-        )
-        return Response(
-            content=response.content,
-            status_code=response.status_code,
-            headers=dict(response.headers)
+            content=request.stream() if has_body else None,
         )
+
+    try:
+        return await request.app.state.balancers[service_name].send(http_client, build_request, idempotent=request.method == "GET" and not has_body)
     except httpx.RequestError as e:
-        logger.error(f"Could not connect to service {service_name}: {e}")
+        logger.error("Could not connect to service %s: %s", service_name, e)
         raise HTTPException(status_code=503, detail=f"Service '{service_name}' unavailable.")
 
+async def forward(service_name: str, path: str, request: Request):
+    """
+    Generic function to forward a request to an internal service.
+
+    Request and response bodies are streamed chunk by chunk, so memory use does not grow with the payload size.
+    """
+    response, close = await send_upstream(service_name, path, request)
+    return stream_upstream_response(response, close)
+
+def stream_upstream_response(response: httpx.Response, close) -> StreamingResponse:
+    streaming_response = StreamingResponse(
+        response.aiter_raw(),
+        status_code=response.status_code,
+        background=BackgroundTask(close),
+    )
+    streaming_response.raw_headers = end_to_end_headers(response.headers.raw)
+    return streaming_response
+
+def cached_response(entry, request: Request) -> Response:
+    """Answers with a cached response, or with a bodiless 304 if the client already has its ETag."""
+    validators = [(b"etag", entry.etag.encode()), (b"cache-control", CACHED_RESPONSE_CACHE_CONTROL)]
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        request.app.state.response_cache.not_modified += 1
+        response = Response(status_code=304)
+        response.raw_headers = validators
+        return response
+    response = Response(content=entry.body)
+    response.raw_headers = [(b"content-length", str(len(entry.body)).encode()), *entry.headers, *validators]
+    return response
+
+async def forward_cached(service_name: str, path: str, request: Request, subject: str, owner: str):
+    """
+    Answers a GET from the response cache, keyed by route, authenticated subject and query string,
+    and forwards it to the internal service on a miss.
+
+    A successful upstream response is read whole to be stored with its strong ETag; any other
+    response is passed through as is.
+    """
+    response_cache = request.app.state.response_cache
+    key = (request.url.path, subject, request.url.query)
+    entry = response_cache.get(key)
+    if entry is not None:
+        return cached_response(entry, request)
+
+    generation = response_cache.generation()
+    response, close = await send_upstream(service_name, path, request)
+    if response.status_code != 200:
+        return stream_upstream_response(response, close)
+    try:
+        body = b"".join([chunk async for chunk in response.aiter_raw()])
+    except httpx.RequestError as e:
+        logger.error("Could not read the response of service %s: %s", service_name, e)
+        raise HTTPException(status_code=503, detail=f"Service '{service_name}' unavailable.")
+    finally:
+        await close()
+
+    headers = [(name, value) for name, value in end_to_end_headers(response.headers.raw) if name.lower() not in CACHE_MANAGED_HEADERS]
+    return cached_response(response_cache.put(key, owner, generation, body, headers), request)
+
 @router.get("/healthz")
 async def health_check():
     """
@@ -42,6 +164,20 @@ async def health_check():
     """
     return {"status": "ok"}
 
+@router.get("/internal/stats/response-cache")
+async def response_cache_stats(request: Request, _=Depends(validate_internal_api_key)):
+    """
+    Reports the size and hit/miss/304 counters of the response cache.
+    """
+    return request.app.state.response_cache.stats()
+
+@router.get("/internal/stats/token-cache")
+async def token_cache_stats(_=Depends(validate_internal_api_key)):
+    """
+    Reports the size and hit/miss counters of the verified-token cache.
+    """
+    return token_cache.stats()
+
 @router.post("/v1/emotions/stream")
 async def forward_emotion_request(request: Request, _=Depends(validate_internal_api_key)):
     """
@@ -49,6 +185,21 @@ async def forward_emotion_request(request: Request, _=Depends(validate_internal_
     """
     return await forward("emotion_service", "v1/emotions/stream", request)
 
+@router.post("/v1/emotions/stream:batch")
+async def forward_emotion_batch_request(request: Request, _=Depends(validate_internal_api_key)):
+    """
+    Forwards NDJSON or JSON array batches of emotion events to the emotions service, requiring an internal API key.
+    """
+    return await forward("emotion_service", "v1/emotions/stream:batch", request)
+
+@router.post("/v1/credit-analysis:batch")
+async def forward_bulk_credit_analysis(request: Request, _=Depends(validate_internal_api_key)):
+    """
+    Forwards bulk credit analyses of user cohorts to the user_credit_service, requiring an internal API key.
+    The NDJSON results are streamed back as they are produced.
+    """
+    return await forward("user_credit_service", "v1/credit-analysis:batch", request)
+
 @router.post("/v1/auth/register")
 async def forward_register(request: Request):
     """
@@ -64,9 +215,11 @@ async def forward_login(request: Request):
     return await forward("user_credit_service", "v1/login", request)
 
 @router.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
-async def forward_user_request(request: Request, path: str, _=Depends(validate_api_key)):
+async def forward_user_request(request: Request, path: str, claims: dict = Depends(validate_api_key)):
     """
     Forwards all other requests, requiring a user API key.
+    GETs of the cacheable routes are answered from the response cache, and any other method drops
+    the cached responses about the user who sent it.
     """
     PATH_TO_SERVICE_MAP = {
         "/v1/transactions": "transaction_service",
@@ -81,5 +234,14 @@ async def forward_user_request(request: Request, path: str, _=Depends(validate_a
         if full_path.startswith(prefix):
             service_name = name
             break
-    
-    return await forward(service_name, path, request)
+
+    response_cache = request.app.state.response_cache
+    subject = str(claims.get("sub", ""))
+    if response_cache.enabled and request.method == "GET":
+        owner = cacheable_owner(full_path)
+        if owner is not None:
+            return await forward_cached(service_name, path, request, subject, owner)
+    response = await forward(service_name, path, request)
+    if response_cache.enabled and request.method != "GET" and subject:
+        response_cache.invalidate(subject)
+    return response
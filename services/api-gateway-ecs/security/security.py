@@ -1,12 +1,63 @@
+import time
+import hashlib
+
+from collections import OrderedDict
 from jose import JWTError, jwt
 from fastapi import Security, HTTPException, status
-from configuration.config import SECRET_KEY, INTERNAL_SERVICE_API_KEY
+from configuration.config import SECRET_KEY, INTERNAL_SERVICE_API_KEY, TOKEN_CACHE_SIZE
 from fastapi.security import APIKeyHeader, HTTPAuthorizationCredentials, HTTPBearer
 
 internal_api_key_header = APIKeyHeader(name="X-Internal-Key", auto_error=False)
 
 bearer_scheme = HTTPBearer(auto_error=False)
 
+class VerifiedTokenCache:
+    """
+    Bounded LRU cache from the digest of an already verified JWT to its decoded claims.
+
+    Entries expire at the token's own `exp` claim, so a cached token is never accepted past its lifetime.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[bytes, tuple[dict, float]] = OrderedDict()
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, key: bytes) -> dict | None:
+        """Returns the cached claims for a token digest, or None on a miss or an expired entry."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        claims, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return claims
+
+    def put(self, key: bytes, claims: dict):
+        """Caches the claims of a verified token; tokens without a numeric `exp` are never cached."""
+        expires_at = claims.get("exp")
+        if self.max_size <= 0 or not isinstance(expires_at, (int, float)):
+            return
+        self._entries[key] = (claims, float(expires_at))
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+token_cache = VerifiedTokenCache(TOKEN_CACHE_SIZE)
+
 async def validate_api_key(credentials: HTTPAuthorizationCredentials = Security(bearer_scheme)):
     """Validates the JWT Bearer token for external clients."""
     if not credentials or credentials.scheme.lower() != "bearer":
@@ -15,6 +66,10 @@ async def validate_api_key(credentials: HTTPAuthorizationCredentials = Security(
             detail="Invalid or missing authorization header."
         )
     token = credentials.credentials
+    cache_key = token_cache.key(token)
+    payload = token_cache.get(cache_key)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
     except JWTError:
@@ -22,6 +77,7 @@ async def validate_api_key(credentials: HTTPAuthorizationCredentials = Security(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token."
         )
+    token_cache.put(cache_key, payload)
     return payload
 
 async def validate_internal_api_key(internal_api_key: str = Security(internal_api_key_header)):
@@ -0,0 +1,11 @@
+import os
+
+from logs.logs import setup_logging
+
+logger = setup_logging("credit_analysis_service")
+
+MODEL_PATH = os.getenv("MODEL_PATH", os.path.join(os.path.dirname(__file__), "..", "models", "coefficients.json"))
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "")
+MODEL_REGISTRY_POLL_INTERVAL = float(os.getenv("MODEL_REGISTRY_POLL_INTERVAL", "5"))
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "20000"))
+SCORE_IN_THREAD_MIN_ROWS = int(os.getenv("SCORE_IN_THREAD_MIN_ROWS", "1024"))
@@ -0,0 +1,38 @@
+import asyncio
+
+from fastapi import FastAPI
+from metrics.metrics import register_stats
+from registry.registry import ModelRegistry
+from scoring.scoring import ScoringEngine
+from contextlib import asynccontextmanager
+from configuration.config import logger, MODEL_PATH, MODEL_REGISTRY_DIR, MODEL_REGISTRY_POLL_INTERVAL
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Loads the scoring model once at startup, from the active version of the model registry when
+    MODEL_REGISTRY_DIR is set, and swaps in every version activated afterwards.
+    """
+    registry = ModelRegistry(MODEL_REGISTRY_DIR, ScoringEngine.from_artifact) if MODEL_REGISTRY_DIR else None
+    app.state.scoring_engine = registry.load_active() if registry is not None else None
+    if app.state.scoring_engine is None:
+        if registry is not None:
+            logger.warning("Model registry %s has no active version yet.", MODEL_REGISTRY_DIR)
+        logger.info("Loading scoring model from %s...", MODEL_PATH)
+        app.state.scoring_engine = ScoringEngine.from_file(MODEL_PATH)
+    logger.info("Scoring model '%s' loaded.", app.state.scoring_engine.version)
+    if registry is None:
+        yield
+        return
+
+    def swap(engine: ScoringEngine):
+        app.state.scoring_engine = engine
+        logger.info("Scoring model '%s' activated.", engine.version)
+
+    register_stats("ecs_model_registry", registry.stats, label="version")
+    watch_task = asyncio.create_task(registry.watch(MODEL_REGISTRY_POLL_INTERVAL, swap))
+    try:
+        yield
+    finally:
+        watch_task.cancel()
+        await asyncio.gather(watch_task, return_exceptions=True)
@@ -1,15 +1,21 @@
-import logging
-import random
+import asyncio
 
-from fastapi import FastAPI, status
-from models.machine_learning import FeatureVector, PredictionResponse
-
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+from fastapi import FastAPI, Request, status
+from lifespan.lifespan import lifespan
+from scoring.scoring import features_matrix
+from configuration.config import SCORE_IN_THREAD_MIN_ROWS
+from metrics.metrics import instrument_app, ML_CALL_LATENCY
+from models.machine_learning import FeatureVector, PredictionResponse, BatchPredictionRequest, BatchPredictionResponse
 
 app = FastAPI(
+    lifespan=lifespan,
     title="Credit Analysis Service",
     version="1.0.0"
 )
+instrument_app(app)
+
+SCORE_LATENCY = ML_CALL_LATENCY.labels("score")
+SCORE_BATCH_LATENCY = ML_CALL_LATENCY.labels("score_batch")
 
 @app.get("/healthz", status_code=status.HTTP_200_OK, tags=["Monitoring"])
 async def health_check():
@@ -22,28 +28,44 @@ async def health_check():
     return {"status": "ok"}
 
 @app.post("/v1/predict", response_model=PredictionResponse, tags=["Prediction"])
-async def predict_risk(features: FeatureVector):
+async def predict_risk(features: FeatureVector, request: Request):
     """
     Predicts the credit risk score for a user based on provided feature vector.
 
-    This endpoint receives a set of user features, applies a risk prediction algorithm, and returns a risk score
-    between 0.0 (low risk) and 1.0 (high risk). The current implementation uses a random score for demonstration purposes.
+    This endpoint receives a set of user features, evaluates the active scoring model, and returns a risk score
+    between 0.0 (low risk) and 1.0 (high risk).
 
     Args:
         features (FeatureVector): The input features for risk prediction.
 
     Returns:
-        PredictionResponse: The predicted risk score response.
+        PredictionResponse: The predicted risk score and the version of the model that computed it.
+    """
+    engine = request.app.state.scoring_engine
+    with SCORE_LATENCY.time():
+        scores = engine.score(features_matrix([features]))
+    return PredictionResponse(risk_score=float(scores[0]), model_version=engine.version)
+
+@app.post("/v1/predict/batch", response_model=BatchPredictionResponse, tags=["Prediction"])
+async def predict_risk_batch(batch: BatchPredictionRequest, request: Request):
+    """
+    Predicts the credit risk scores of many users in a single call.
+
+    All feature vectors are stacked into one matrix and scored with a single vectorized evaluation of the model, so
+    the whole batch is scored by the same model version even if another one is activated meanwhile. Batches of at
+    least SCORE_IN_THREAD_MIN_ROWS rows are scored in a worker thread, so they do not hold up the event loop.
+
+    Args:
+        batch (BatchPredictionRequest): The feature vectors to score.
+
+    Returns:
+        BatchPredictionResponse: The risk scores, in the same order as the request.
     """
-    # logging.info(f"Received prediction request with features: {features.model_dump_json()}")
-    
-    # base_score = random.uniform(0.05, 0.75)
-    # stress_penalty = features.stress_events_30d * 0.05
-    # final_score = min(base_score + stress_penalty, 1.0)
-
-    # logging.info(f"Prediction complete. Calculated risk_score: {final_score}")
-    # return PredictionResponse(risk_score=final_score)
-    logging.info(f"Received prediction request with features: {features.model_dump_json()}")
-    final_score = random.uniform(0.0, 1.0)
-    logging.info(f"Prediction complete. Calculated risk_score: {final_score}")
-    return PredictionResponse(risk_score=final_score)
+    engine = request.app.state.scoring_engine
+    with SCORE_BATCH_LATENCY.time():
+        matrix = features_matrix(batch.features)
+        if len(matrix) >= SCORE_IN_THREAD_MIN_ROWS:
+            scores = await asyncio.to_thread(engine.score, matrix)
+        else:
+            scores = engine.score(matrix)
+    return BatchPredictionResponse(risk_scores=scores.tolist(), model_version=engine.version)
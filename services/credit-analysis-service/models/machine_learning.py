@@ -1,5 +1,6 @@
-
+from typing import List
 from pydantic import BaseModel, Field
+from configuration.config import MAX_BATCH_SIZE
 
 class FeatureVector(BaseModel):
     """
@@ -22,5 +23,27 @@ class PredictionResponse(BaseModel):
 
     Attributes:
         risk_score (float): The calculated credit risk score, ranging from 0.0 (low risk) to 1.0 (high risk).
+        model_version (str): The version of the model that calculated the score.
     """
     risk_score: float = Field(..., description="The calculated credit risk score, from 0.0 (low risk) to 1.0 (high risk).")
+    model_version: str = Field(..., description="Version of the model that calculated the score.")
+
+class BatchPredictionRequest(BaseModel):
+    """
+    Represents a batch of feature vectors to be scored in a single call.
+
+    Attributes:
+        features (List[FeatureVector]): The feature vectors to score, in order.
+    """
+    features: List[FeatureVector] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE, description="Feature vectors to score.")
+
+class BatchPredictionResponse(BaseModel):
+    """
+    Represents the response of a batch credit risk prediction.
+
+    Attributes:
+        risk_scores (List[float]): The risk score of each feature vector, in the order they were sent.
+        model_version (str): The version of the model that calculated every score of the batch.
+    """
+    risk_scores: List[float] = Field(..., description="Risk scores in request order, from 0.0 (low risk) to 1.0 (high risk).")
+    model_version: str = Field(..., description="Version of the model that calculated the scores.")
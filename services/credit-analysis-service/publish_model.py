@@ -0,0 +1,37 @@
+import argparse
+
+from configuration.config import logger, MODEL_PATH, MODEL_REGISTRY_DIR
+from scoring.scoring import ScoringEngine, FEATURE_NAMES
+from registry.registry import publish_model, activate_version, active_version, list_versions
+
+def manage(args: argparse.Namespace):
+    """
+    Publishes a model to the registry, activates one of its versions, or lists them.
+    """
+    if args.command == "publish":
+        engine = ScoringEngine.from_file(args.path)
+        version = args.version or engine.version
+        publish_model(args.registry, version, engine.kind, FEATURE_NAMES, engine.arrays())
+        logger.info("Published model version '%s' to %s.", version, args.registry)
+        if args.activate:
+            activate_version(args.registry, version)
+            logger.info("Activated model version '%s'.", version)
+    elif args.command == "activate":
+        activate_version(args.registry, args.version)
+        logger.info("Activated model version '%s'.", args.version)
+    else:
+        active = active_version(args.registry)
+        for version in list_versions(args.registry):
+            print(f"{'*' if version == active else ' '} {version}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manages the versions of the scoring model in the model registry.")
+    parser.add_argument("command", choices=["publish", "activate", "list"], help="'publish' adds a JSON model file, of coefficients or trees, as a new version; 'activate' makes a published version the one the replicas serve; 'list' shows the versions, the active one starred.")
+    parser.add_argument("--registry", default=MODEL_REGISTRY_DIR, required=not MODEL_REGISTRY_DIR, help="Directory of the model registry. Defaults to MODEL_REGISTRY_DIR.")
+    parser.add_argument("--path", default=MODEL_PATH, help="JSON model file to publish.")
+    parser.add_argument("--version", help="Version to publish, defaults to the one of the model file, or to activate.")
+    parser.add_argument("--activate", action="store_true", help="Activate the version once published.")
+    args = parser.parse_args()
+    if args.command == "activate" and not args.version:
+        parser.error("activate needs --version.")
+    manage(args)
@@ -0,0 +1,199 @@
+import os
+import json
+import shutil
+import asyncio
+import tempfile
+import contextlib
+import numpy as np
+
+from dataclasses import dataclass
+from configuration.config import logger
+
+MANIFEST_FILE = "manifest.json"
+ACTIVE_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+
+@dataclass
+class ModelArtifact:
+    """
+    One version of a model read from the registry, with its arrays memory-mapped read-only.
+    """
+    version: str
+    kind: str
+    features: tuple[str, ...]
+    arrays: dict[str, np.ndarray]
+
+def _version_dir(root: str, version: str) -> str:
+    if not version or version.startswith(".") or "/" in version or version != version.strip():
+        raise ValueError(f"Invalid model version {version!r}.")
+    return os.path.join(root, VERSIONS_DIR, version)
+
+def _fsync_dir(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def publish_model(root: str, version: str, kind: str, features, arrays: dict[str, np.ndarray]) -> str:
+    """
+    Writes a new version of a model to the registry, one `.npy` file per array, without activating it.
+
+    The version is written under a temporary name and renamed into place, so a reader never sees it
+    half written. Published versions are never modified, which is what lets the replicas map them.
+
+    Raises:
+        ValueError: If the version is already published or an array name is not an identifier.
+    """
+    target = _version_dir(root, version)
+    versions_dir = os.path.dirname(target)
+    os.makedirs(versions_dir, exist_ok=True)
+    if os.path.exists(target):
+        raise ValueError(f"Model version '{version}' is already published in {root}.")
+    staging = tempfile.mkdtemp(prefix=f".{version}-", dir=versions_dir)
+    try:
+        for name, array in arrays.items():
+            if not name.isidentifier():
+                raise ValueError(f"Invalid array name {name!r} for model version '{version}'.")
+            with open(os.path.join(staging, f"{name}.npy"), "wb") as f:
+                np.save(f, np.asarray(array, order="C"), allow_pickle=False)
+                f.flush()
+                os.fsync(f.fileno())
+        manifest = {"version": version, "kind": kind, "features": list(features), "arrays": sorted(arrays)}
+        with open(os.path.join(staging, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        _fsync_dir(staging)
+        os.chmod(staging, 0o755)
+        os.rename(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    _fsync_dir(versions_dir)
+    return target
+
+def activate_version(root: str, version: str):
+    """
+    Makes a published version the active one, by atomically replacing the file that names it.
+
+    Raises:
+        FileNotFoundError: If the version is not published.
+    """
+    if not os.path.isfile(os.path.join(_version_dir(root, version), MANIFEST_FILE)):
+        raise FileNotFoundError(f"Model version '{version}' is not published in {root}.")
+    fd, staging = tempfile.mkstemp(prefix=f".{ACTIVE_FILE}-", dir=root)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(version + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(staging, 0o644)
+        os.replace(staging, os.path.join(root, ACTIVE_FILE))
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(staging)
+        raise
+    _fsync_dir(root)
+
+def active_version(root: str) -> str | None:
+    """Returns the name of the active version, or None if none was activated yet."""
+    try:
+        with open(os.path.join(root, ACTIVE_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def list_versions(root: str) -> list[str]:
+    """Returns the published versions, oldest first."""
+    versions_dir = os.path.join(root, VERSIONS_DIR)
+    if not os.path.isdir(versions_dir):
+        return []
+    versions = [entry for entry in os.scandir(versions_dir) if entry.is_dir() and not entry.name.startswith(".")]
+    return [entry.name for entry in sorted(versions, key=lambda entry: entry.stat().st_mtime)]
+
+def load_model(root: str, version: str) -> ModelArtifact:
+    """
+    Maps the arrays of a published version read-only. Their pages are only read when the model first
+    uses them, from the page cache that every process mapping the same files shares, so loading takes
+    the same time whatever the size of the model.
+
+    Raises:
+        FileNotFoundError: If the version or one of its arrays is missing.
+        ValueError: If its manifest names another version.
+    """
+    path = _version_dir(root, version)
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest["version"] != version:
+        raise ValueError(f"Manifest of model version '{version}' names version '{manifest['version']}'.")
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r", allow_pickle=False)
+        for name in manifest["arrays"]
+    }
+    return ModelArtifact(version, manifest["kind"], tuple(manifest["features"]), arrays)
+
+class ModelRegistry:
+    """
+    Follows the active version of a model registry on local disk.
+
+    The registry holds every published version under `versions/` and the name of the active one in
+    `CURRENT`. When the active version changes, it is mapped and built into a model with
+    `build(artifact)` off the event loop, and handed over whole, so a request is scored entirely by
+    the old model or entirely by the new one. A version that fails to load is logged and skipped
+    until another one is activated, and the model in use is kept.
+    """
+
+    def __init__(self, root: str, build):
+        self.root = root
+        self._build = build
+        self.version = None
+        self._rejected = None
+        self.reloads = 0
+        self.failures = 0
+
+    def load_active(self):
+        """
+        Builds the model of the active version, or returns None when no version was activated yet.
+
+        Raises:
+            FileNotFoundError, ValueError: If the active version cannot be loaded.
+        """
+        version = active_version(self.root)
+        if version is None:
+            return None
+        model = self._build(load_model(self.root, version))
+        self.version = version
+        return model
+
+    def refresh(self):
+        """Returns the model of a newly activated version, or None if the active version did not change or failed to load."""
+        version = active_version(self.root)
+        if version is None or version in (self.version, self._rejected):
+            return None
+        try:
+            model = self._build(load_model(self.root, version))
+        except Exception as e:
+            self._rejected = version
+            self.failures += 1
+            logger.error("Failed to load model version '%s' from %s, keeping '%s': %s", version, self.root, self.version, e)
+            return None
+        self.version = version
+        self._rejected = None
+        self.reloads += 1
+        return model
+
+    async def watch(self, interval: float, on_swap):
+        """Checks the active version every `interval` seconds and calls `on_swap(model)` with every new model."""
+        while True:
+            await asyncio.sleep(interval)
+            model = await asyncio.to_thread(self.refresh)
+            if model is not None:
+                on_swap(model)
+
+    def stats(self) -> dict:
+        return {
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "active": {self.version: 1} if self.version is not None else {},
+        }
@@ -0,0 +1,190 @@
+import abc
+import json
+import numpy as np
+
+from typing import List
+from models.machine_learning import FeatureVector
+from registry.registry import ModelArtifact
+
+FEATURE_NAMES = (
+    "transaction_count_30d",
+    "avg_transaction_value_30d",
+    "avg_positivity_7d",
+    "stress_events_30d",
+)
+TREE_SCORING_ROWS = 1024
+
+def features_matrix(features: List[FeatureVector]) -> np.ndarray:
+    """
+    Stacks feature vectors into a (n_rows, n_features) matrix in FEATURE_NAMES order.
+    """
+    return np.array(
+        [
+            (f.transaction_count_30d, f.avg_transaction_value_30d, f.avg_positivity_7d, f.stress_events_30d)
+            for f in features
+        ],
+        dtype=np.float64,
+    ).reshape(len(features), len(FEATURE_NAMES))
+
+class ScoringEngine(abc.ABC):
+    """
+    Risk model evaluated over a whole features matrix at once. Every kind of model is a subclass
+    built from named arrays, the ones it stores as a registry version, or the lists of the same
+    names in a JSON model file.
+
+    Attributes:
+        version (str): Identifier of the loaded model.
+        kind (str): Kind of the model, recorded in the manifest of its registry versions.
+    """
+    kind: str = ""
+    array_names: tuple[str, ...] = ()
+
+    def __init__(self, version: str):
+        self.version = version
+
+    @staticmethod
+    def engine_class(kind: str, version: str) -> type["ScoringEngine"]:
+        """
+        Raises:
+            ValueError: If no engine scores models of this kind.
+        """
+        if kind not in ENGINES:
+            raise ValueError(f"Model '{version}' is a {kind!r} model, expected one of {', '.join(ENGINES)}.")
+        return ENGINES[kind]
+
+    @classmethod
+    def from_file(cls, path: str) -> "ScoringEngine":
+        """
+        Loads a model from a JSON file, a logistic model unless it names another `kind`.
+
+        Raises:
+            ValueError: If the file describes features other than FEATURE_NAMES, or a kind of model no engine scores.
+        """
+        with open(path) as f:
+            model = json.load(f)
+        if tuple(model["features"]) != FEATURE_NAMES:
+            raise ValueError(f"Model features {model['features']} do not match {list(FEATURE_NAMES)}.")
+        engine_class = cls.engine_class(model.get("kind", LogisticEngine.kind), model["version"])
+        return engine_class(model["version"], *(model[name] for name in engine_class.array_names))
+
+    @classmethod
+    def from_artifact(cls, artifact: ModelArtifact) -> "ScoringEngine":
+        """
+        Builds the model over the memory-mapped arrays of a registry version, without copying them.
+
+        Raises:
+            ValueError: If the version is not a model of FEATURE_NAMES, or a kind of model no engine scores.
+        """
+        if artifact.features != FEATURE_NAMES:
+            raise ValueError(f"Model '{artifact.version}' is a model of {list(artifact.features)}, expected a model of {list(FEATURE_NAMES)}.")
+        engine_class = cls.engine_class(artifact.kind, artifact.version)
+        return engine_class(artifact.version, *(artifact.arrays[name] for name in engine_class.array_names))
+
+    @abc.abstractmethod
+    def arrays(self) -> dict[str, np.ndarray]:
+        """Returns the model as the arrays of a registry version."""
+
+    @abc.abstractmethod
+    def score(self, matrix: np.ndarray) -> np.ndarray:
+        """
+        Computes the risk score of every row of the features matrix.
+
+        Returns:
+            A 1-D array of scores between 0.0 (low risk) and 1.0 (high risk).
+        """
+
+class LogisticEngine(ScoringEngine):
+    """
+    Logistic regression over the standardized features.
+    """
+    kind = "logistic"
+    array_names = ("means", "scales", "weights", "intercept")
+
+    def __init__(self, version: str, means, scales, weights, intercept):
+        super().__init__(version)
+        self._means = np.asarray(means, dtype=np.float64)
+        self._scales = np.asarray(scales, dtype=np.float64)
+        self._weights = np.asarray(weights, dtype=np.float64)
+        self._intercept = float(intercept)
+        if not (self._means.shape == self._scales.shape == self._weights.shape == (len(FEATURE_NAMES),)):
+            raise ValueError(f"Model '{version}' must define exactly {len(FEATURE_NAMES)} coefficients per parameter.")
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        return {"means": self._means, "scales": self._scales, "weights": self._weights, "intercept": np.float64(self._intercept)}
+
+    def score(self, matrix: np.ndarray) -> np.ndarray:
+        logits = ((matrix - self._means) / self._scales) @ self._weights + self._intercept
+        return 1.0 / (1.0 + np.exp(-logits))
+
+class TreeEnsembleEngine(ScoringEngine):
+    """
+    Ensemble of binary decision trees, such as gradient-boosted trees, whose leaf values are summed
+    with `base_score` into the logit of the risk score.
+
+    The trees are stored as flat node arrays: node i sends a row to `left[i]` when its feature
+    `feature[i]` is at most `threshold[i]`, and to `right[i]` otherwise; a node whose feature is -1
+    is a leaf worth `value[i]`. `roots` holds the first node of every tree. All the trees are walked
+    together, one level per step, over blocks of TREE_SCORING_ROWS rows.
+    """
+    kind = "tree_ensemble"
+    array_names = ("feature", "threshold", "left", "right", "value", "roots", "base_score")
+
+    def __init__(self, version: str, feature, threshold, left, right, value, roots, base_score):
+        super().__init__(version)
+        self._feature = np.asarray(feature, dtype=np.int32)
+        self._threshold = np.asarray(threshold, dtype=np.float64)
+        self._left = np.asarray(left, dtype=np.int32)
+        self._right = np.asarray(right, dtype=np.int32)
+        self._value = np.asarray(value, dtype=np.float64)
+        self._roots = np.asarray(roots, dtype=np.int32)
+        self._base_score = float(base_score)
+        self._depth = self._check_trees()
+
+    def _check_trees(self) -> int:
+        """
+        Returns the depth of the deepest tree.
+
+        Raises:
+            ValueError: If the node arrays do not describe trees over FEATURE_NAMES.
+        """
+        nodes = len(self._feature)
+        if not (self._threshold.shape == self._left.shape == self._right.shape == self._value.shape == (nodes,)):
+            raise ValueError(f"Model '{self.version}' must define every node array for each of its {nodes} nodes.")
+        if self._roots.ndim != 1 or len(self._roots) == 0 or not np.all((self._roots >= 0) & (self._roots < nodes)):
+            raise ValueError(f"Model '{self.version}' must have at least one tree, and its roots must be nodes.")
+        internal = self._feature >= 0
+        if np.any(self._feature >= len(FEATURE_NAMES)) or np.any(self._feature < -1):
+            raise ValueError(f"Model '{self.version}' has nodes testing a feature other than the {len(FEATURE_NAMES)} of FEATURE_NAMES.")
+        children = np.concatenate([self._left[internal], self._right[internal]])
+        if not np.all((children >= 0) & (children < nodes)):
+            raise ValueError(f"Model '{self.version}' has nodes whose children are not nodes.")
+        depth = 0
+        level = self._roots
+        while np.any(internal[level]):
+            if depth == nodes:
+                raise ValueError(f"Model '{self.version}' has a cycle between its nodes.")
+            branches = level[internal[level]]
+            level = np.concatenate([self._left[branches], self._right[branches]])
+            depth += 1
+        return depth
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        return {
+            "feature": self._feature, "threshold": self._threshold, "left": self._left, "right": self._right,
+            "value": self._value, "roots": self._roots, "base_score": np.float64(self._base_score),
+        }
+
+    def score(self, matrix: np.ndarray) -> np.ndarray:
+        logits = np.empty(len(matrix), dtype=np.float64)
+        for start in range(0, len(matrix), TREE_SCORING_ROWS):
+            block = matrix[start:start + TREE_SCORING_ROWS]
+            rows = np.arange(len(block))[:, None]
+            nodes = np.broadcast_to(self._roots, (len(block), len(self._roots)))
+            for _ in range(self._depth):
+                feature = self._feature[nodes]
+                go_left = block[rows, np.maximum(feature, 0)] <= self._threshold[nodes]
+                nodes = np.where(feature >= 0, np.where(go_left, self._left[nodes], self._right[nodes]), nodes)
+            logits[start:start + TREE_SCORING_ROWS] = self._value[nodes].sum(axis=1) + self._base_score
+        return 1.0 / (1.0 + np.exp(-logits))
+
+ENGINES = {engine_class.kind: engine_class for engine_class in (LogisticEngine, TreeEnsembleEngine)}
@@ -0,0 +1,133 @@
+"""
+Adaptive concurrency limit of the workers and the JetStream pending limit that follows it.
+
+Every service is built with its own directory as the Docker context, so the workers cannot import
+code from outside it; the module is copied into each of them instead, like `events/` and `logs/`,
+and must stay identical in every worker that copies it.
+"""
+import time
+import asyncio
+
+from configuration.config import logger
+from contextlib import asynccontextmanager
+
+class AdaptiveLimit:
+    """
+    Limits how many messages are processed at once and adjusts the limit with AIMD on the latency of
+    the processing, which includes the wait for a database connection and the queries.
+
+    Every adjustment compares the mean latency of the slots released since the previous one with a
+    baseline, the lowest mean latency seen. Above `tolerance` times the baseline, the limit is
+    multiplied by `backoff`; otherwise it grows by one if it was reached during the window. Once the
+    limit is down to `minimum`, the baseline is reset to the current latency, so it follows a
+    database that became lastingly slower. A limit whose minimum and maximum are equal never changes.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, tolerance: float = 1.5, backoff: float = 0.9):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = max(minimum, min(initial, maximum))
+        self._tolerance = tolerance
+        self._backoff = backoff
+        self.in_use = 0
+        self.latency = 0.0
+        self.baseline = None
+        self._released = asyncio.Event()
+        self._window_count = 0
+        self._window_sum = 0.0
+        self._window_peak = 0
+
+    @classmethod
+    def fixed(cls, limit: int) -> "AdaptiveLimit":
+        return cls(limit, limit, limit)
+
+    async def acquire(self):
+        """Waits for a free slot and takes it."""
+        while self.in_use >= self.limit:
+            self._released.clear()
+            await self._released.wait()
+        self.in_use += 1
+        self._window_peak = max(self._window_peak, self.in_use)
+
+    def release(self, latency: float):
+        """Frees a slot held for `latency` seconds."""
+        self.in_use -= 1
+        self._window_count += 1
+        self._window_sum += latency
+        self._released.set()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started_at)
+
+    def adjust(self) -> bool:
+        """Applies the AIMD rule to the slots released since the previous call and returns whether the limit changed."""
+        count, total, peak = self._window_count, self._window_sum, self._window_peak
+        self._window_count, self._window_sum, self._window_peak = 0, 0.0, self.in_use
+        if not count or self.minimum == self.maximum:
+            return False
+        self.latency = total / count
+        if self.baseline is None or self.latency < self.baseline or self.limit <= self.minimum:
+            self.baseline = self.latency
+
+        previous = self.limit
+        if self.latency > self.baseline * self._tolerance:
+            self.limit = max(self.minimum, min(self.limit - 1, int(self.limit * self._backoff)))
+        elif peak >= self.limit:
+            self.limit = min(self.maximum, self.limit + 1)
+        return self.limit != previous
+
+    async def run(self, interval: float, on_change=None):
+        """Adjusts the limit every `interval` seconds, awaiting `on_change(limit)` after every change."""
+        while True:
+            await asyncio.sleep(interval)
+            if self.adjust() and on_change is not None:
+                try:
+                    await on_change(self.limit)
+                except Exception as e:
+                    logger.warning("Failed to follow the concurrency limit of %s: %s", self.limit, e)
+
+    def gauges(self) -> dict:
+        """Returns the current limit, the slots in use and the latencies of the last adjustment."""
+        return {
+            "limit": self.limit,
+            "in_use": self.in_use,
+            "latency_ms": self.latency * 1000,
+            "baseline_latency_ms": (self.baseline or 0.0) * 1000,
+        }
+
+class AckPendingLimit:
+    """
+    Keeps the max_ack_pending of the JetStream consumer of a subscription at `per_slot` messages per
+    slot of the concurrency limit.
+
+    The consumer is only updated when its target moved by more than `hysteresis` of the current
+    value, so a limit that grows by one does not call the server at every adjustment.
+
+    The replicas of a worker share one durable consumer and each would set it to its own limit, the
+    last one overwriting the others, so this is only used by a worker that runs a single replica
+    (ACK_PENDING_MODE=follow).
+    """
+
+    def __init__(self, js, sub, per_slot: int, hysteresis: float = 0.2):
+        self._js = js
+        self._sub = sub
+        self._per_slot = per_slot
+        self._hysteresis = hysteresis
+        self.current = None
+
+    async def update(self, limit: int):
+        target = max(1, limit * self._per_slot)
+        if self.current is not None and abs(target - self.current) <= self.current * self._hysteresis:
+            return
+        info = await self._sub.consumer_info()
+        if info.config.max_ack_pending != target:
+            info.config.max_ack_pending = target
+            await self._js.add_consumer(info.stream_name, info.config)
+            logger.info("Consumer %s now allows %s pending acknowledgements.", info.name, target)
+        self.current = target
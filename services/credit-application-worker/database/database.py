@@ -1,29 +1,51 @@
 import uuid
 
 from configuration.config import logger
+from metrics.metrics import timed_query
 
-async def activate_credit_offer(db_conn, offer_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+@timed_query
+async def activate_credit_offers(db_conn, offers: list[tuple[uuid.UUID, uuid.UUID]]) -> list:
     """
-    Updates the status of a credit offer to 'active' in the database.
+    Updates the status of a group of credit offers to 'active' in the database with a single statement.
 
     Args:
         db_conn: An active asyncpg pool connection.
-        offer_id: The ID of the offer to be activated.
-        user_id: The ID of the user associated with the offer.
+        offers: Pairs of (offer_id, user_id) to be activated.
 
     Returns:
-        True if the offer was successfully activated, False otherwise.
+        The (id, user_id, activated) records of the given offers that are active after the statement,
+        where `activated` tells whether this statement activated the offer or it was already active,
+        as when an acceptance is redelivered. Offers in any other state, or that do not belong to the
+        given user, are left untouched and not returned.
     """
     update_query = """
-    UPDATE credit_limits
-    SET status = 'active', activated_at = NOW(), updated_at = NOW()
-    WHERE id = $1 AND user_id = $2 AND status = 'offered';
+    WITH requested AS (
+        SELECT * FROM unnest($1::uuid[], $2::uuid[]) AS requested(id, user_id)
+    ), activated AS (
+        UPDATE credit_limits
+        SET status = 'active', activated_at = NOW(), updated_at = NOW()
+        WHERE id = ANY($1::uuid[])
+          AND (id, user_id) IN (SELECT * FROM requested)
+          AND status = 'offered'
+        RETURNING id, user_id
+    )
+    SELECT id, user_id, TRUE AS activated FROM activated
+    UNION ALL
+    SELECT id, user_id, FALSE AS activated FROM credit_limits
+    WHERE id = ANY($1::uuid[])
+      AND (id, user_id) IN (SELECT * FROM requested)
+      AND status = 'active';
     """
-    result = await db_conn.execute(update_query, offer_id, user_id)
-    
-    if result.strip() == "UPDATE 1":
-        logger.info(f"Offer {offer_id} successfully activated for user {user_id} in the database.")
-        return True
-    
-    logger.warning(f"Offer {offer_id} for user {user_id} was not in a valid state to be activated.")
-    return False
+    offer_ids = [offer_id for offer_id, _ in offers]
+    user_ids = [user_id for _, user_id in offers]
+    active = await db_conn.fetch(update_query, offer_ids, user_ids)
+
+    active_offers = {(record["id"], record["user_id"]): record["activated"] for record in active}
+    for offer_id, user_id in offers:
+        if active_offers.get((offer_id, user_id)):
+            logger.info("Offer %s successfully activated for user %s in the database.", offer_id, user_id)
+        elif (offer_id, user_id) in active_offers:
+            logger.info("Offer %s of user %s was already active.", offer_id, user_id)
+        else:
+            logger.warning("Offer %s for user %s was not in a valid state to be activated.", offer_id, user_id)
+    return active
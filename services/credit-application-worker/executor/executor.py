@@ -0,0 +1,171 @@
+import time
+import asyncio
+
+from dataclasses import dataclass
+from configuration.config import logger
+from concurrency.concurrency import AdaptiveLimit
+from events.events import EventDecodeError
+from metrics.metrics import LANE_LATENCY
+from processing.processing import decode_message, acknowledge, process_events
+
+@dataclass
+class LaneStats:
+    """
+    Latency counters of one lane since the last report, measured from submission to acknowledgement.
+    The same latencies are observed, cumulatively, in the `ecs_lane_latency_seconds` histogram.
+    """
+    processed: int = 0
+    latency_sum: float = 0.0
+    latency_max: float = 0.0
+
+    def record(self, latency: float):
+        self.processed += 1
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+
+class PartitionedExecutor:
+    """
+    Runs credit offer activations in N ordered lanes that are processed concurrently.
+
+    Messages are routed to a lane by their user id, so the activations of a user keep their order,
+    while different users progress in parallel. A lane picks up every message that is already
+    waiting in it (up to `batch_size`) and activates them with a single statement. How many lanes
+    work at once is bounded by `limit`, which defaults to all of them.
+
+    The messages of a group that fails are retried in place, with a backoff from `retry_backoff` up
+    to `retry_max_backoff` seconds, and the lane takes no later message until they succeed, so the
+    order holds on the error path too. Meanwhile they are marked in progress, so JetStream does not
+    redeliver them. Once `stop` is called, new messages are no longer queued but negatively
+    acknowledged, and so are the messages a lane is still retrying, along with the ones waiting
+    behind them; all of them are redelivered later.
+    """
+
+    def __init__(
+        self,
+        db_pool,
+        js,
+        lane_count: int,
+        lane_capacity: int,
+        batch_size: int,
+        limit: AdaptiveLimit | None = None,
+        retry_backoff: float = 1.0,
+        retry_max_backoff: float = 10.0,
+    ):
+        self._db_pool = db_pool
+        self._js = js
+        self._batch_size = batch_size
+        self._limit = limit or AdaptiveLimit.fixed(lane_count)
+        self._retry_backoff = retry_backoff
+        self._retry_max_backoff = retry_max_backoff
+        self._queues = [asyncio.Queue(maxsize=lane_capacity) for _ in range(lane_count)]
+        self._stats = [LaneStats() for _ in range(lane_count)]
+        self._latency = [LANE_LATENCY.labels(str(lane)) for lane in range(lane_count)]
+        self._tasks = []
+        self._stopping = False
+        self._stop_requested = asyncio.Event()
+
+    def start(self):
+        """Starts one task per lane."""
+        self._tasks = [asyncio.create_task(self._run_lane(lane)) for lane in range(len(self._queues))]
+
+    async def stop(self):
+        """Stops accepting messages, waits for the lanes to drain and stops them."""
+        self._stopping = True
+        self._stop_requested.set()
+        await asyncio.gather(*(queue.join() for queue in self._queues))
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def submit(self, msg):
+        """
+        Routes a message to its lane, waiting while the lane is full.
+        """
+        if self._stopping:
+            await msg.nak()
+            return
+        try:
+            event = decode_message(msg)
+        except EventDecodeError as e:
+            logger.error("Validation or decoding error: %s. Message: %s", e, msg.data.decode(errors='replace'))
+            await acknowledge(msg)
+            return
+        lane = event.user_id.int % len(self._queues)
+        await self._queues[lane].put((msg, event, time.perf_counter()))
+
+    async def _run_lane(self, lane: int):
+        queue = self._queues[lane]
+        while True:
+            entries = [await queue.get()]
+            while len(entries) < self._batch_size and not queue.empty():
+                entries.append(queue.get_nowait())
+            try:
+                if await self._process_in_order(lane, [(msg, event) for msg, event, _ in entries]):
+                    finished_at = time.perf_counter()
+                    for _, _, submitted_at in entries:
+                        self._stats[lane].record(finished_at - submitted_at)
+                        self._latency[lane].observe(finished_at - submitted_at)
+            except Exception as e:
+                logger.error("Unexpected error in lane %d: %s", lane, e)
+            finally:
+                for _ in entries:
+                    queue.task_done()
+
+    async def _process_in_order(self, lane: int, items: list[tuple]) -> bool:
+        """
+        Processes a group until every message of it is acknowledged, and returns True, or until the
+        executor stops, when the rest of the lane is negatively acknowledged and it returns False.
+        """
+        delay = self._retry_backoff
+        while True:
+            async with self._limit.slot():
+                items = await process_events(items, self._db_pool, self._js)
+            if not items:
+                return True
+            if self._stopping:
+                await self._redeliver_lane(lane, items)
+                return False
+            logger.warning("Lane %d retries %d acceptances in %.1fs before taking later ones.", lane, len(items), delay)
+            await asyncio.gather(*(msg.in_progress() for msg, _ in items), return_exceptions=True)
+            try:
+                await asyncio.wait_for(self._stop_requested.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, self._retry_max_backoff)
+
+    async def _redeliver_lane(self, lane: int, items: list[tuple]):
+        queue = self._queues[lane]
+        msgs = [msg for msg, _ in items]
+        while not queue.empty():
+            msgs.append(queue.get_nowait()[0])
+            queue.task_done()
+        logger.warning("Lane %d stopped with %d acceptances not processed, they will be redelivered.", lane, len(msgs))
+        await asyncio.gather(*(msg.nak() for msg in msgs), return_exceptions=True)
+
+    def lane_depths(self) -> list[int]:
+        """Returns how many messages are waiting in each lane."""
+        return [queue.qsize() for queue in self._queues]
+
+    def collect_stats(self) -> list[dict]:
+        """Returns the depth and latency of every lane since the previous call, and resets the latency counters."""
+        report = []
+        for lane, (queue, stats) in enumerate(zip(self._queues, self._stats)):
+            report.append({
+                "lane": lane,
+                "depth": queue.qsize(),
+                "processed": stats.processed,
+                "avg_latency_ms": stats.latency_sum / stats.processed * 1000 if stats.processed else 0.0,
+                "max_latency_ms": stats.latency_max * 1000,
+            })
+            self._stats[lane] = LaneStats()
+        return report
+
+    async def report_stats(self, interval: float):
+        """Logs the per-lane depth and latency every `interval` seconds."""
+        while True:
+            await asyncio.sleep(interval)
+            for lane in self.collect_stats():
+                logger.info(
+                    "Lane %d: depth=%d, processed=%d, avg_latency_ms=%.1f, max_latency_ms=%.1f",
+                    lane["lane"], lane["depth"], lane["processed"], lane["avg_latency_ms"], lane["max_latency_ms"]
+                )
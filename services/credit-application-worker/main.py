@@ -2,8 +2,11 @@ import asyncio
 import asyncpg
 import nats
 
-from processing.processing import process_message
-from configuration.config import logger, DATABASE_URL, NATS_URL, NATS_CONSUME_SUBJECT, DURABLE_NAME
+from nats.js.api import ConsumerConfig
+from executor.executor import PartitionedExecutor
+from concurrency.concurrency import AdaptiveLimit, AckPendingLimit
+from metrics.metrics import MeteredPool, start_metrics_server, register_stats
+from configuration.config import logger, DATABASE_URL, NATS_URL, NATS_CONSUME_SUBJECT, DURABLE_NAME, LANE_COUNT, LANE_CAPACITY, LANE_BATCH_SIZE, LANE_STATS_INTERVAL, LANE_RETRY_BACKOFF, LANE_RETRY_MAX_BACKOFF, METRICS_PORT, CONCURRENCY_MODE, LANE_CONCURRENCY, LANE_CONCURRENCY_MIN, LANE_CONCURRENCY_MAX, CONCURRENCY_ADJUST_INTERVAL, CONCURRENCY_LATENCY_TOLERANCE, ACK_PENDING_PER_SLOT, ACK_PENDING_MODE
 
 async def main():
     """
@@ -12,25 +15,66 @@ async def main():
     logger.info("Starting Credit Application Worker...")
     nats_conn = None
     db_pool = None
+    executor = None
+    sub = None
+    stats_task = None
+    limit_task = None
     try:
-        logger.info("Connecting to PostgreSQL...")
-        db_pool = await asyncpg.create_pool(DATABASE_URL, min_size=1, max_size=5)
-        logger.info("PostgreSQL connection established.")
+        start_metrics_server(METRICS_PORT)
+        logger.info("Serving metrics on port %s.", METRICS_PORT)
 
-        logger.info(f"Connecting to NATS at {NATS_URL}...")
+        logger.info("Connecting to NATS at %s...", NATS_URL)
         nats_conn = await nats.connect(NATS_URL, name="credit_application_worker")
         js = nats_conn.jetstream()
         logger.info("NATS connection established.")
 
-        sub = await js.subscribe(subject=NATS_CONSUME_SUBJECT, durable=DURABLE_NAME)
-        logger.info(f"Waiting for messages on topic '{NATS_CONSUME_SUBJECT}'...")
+        if CONCURRENCY_MODE == "adaptive":
+            limit = AdaptiveLimit(LANE_CONCURRENCY, LANE_CONCURRENCY_MIN, LANE_CONCURRENCY_MAX, CONCURRENCY_LATENCY_TOLERANCE)
+        else:
+            limit = AdaptiveLimit.fixed(LANE_CONCURRENCY)
+
+        # A lane holds one connection per slot, so the limit is the only bound and the pool never makes it wait.
+        logger.info("Connecting to PostgreSQL...")
+        db_pool = MeteredPool(await asyncpg.create_pool(DATABASE_URL, min_size=1, max_size=limit.maximum))
+        logger.info("PostgreSQL connection established.")
+
+        executor = PartitionedExecutor(db_pool, js, LANE_COUNT, LANE_CAPACITY, LANE_BATCH_SIZE, limit, LANE_RETRY_BACKOFF, LANE_RETRY_MAX_BACKOFF)
+        executor.start()
+        register_stats("ecs_lane", lambda: {"depth": dict(enumerate(executor.lane_depths()))}, label="lane")
+        register_stats("ecs_worker_concurrency", limit.gauges)
+        stats_task = asyncio.create_task(executor.report_stats(LANE_STATS_INTERVAL))
+
+        sub = await js.subscribe(
+            subject=NATS_CONSUME_SUBJECT,
+            durable=DURABLE_NAME,
+            config=ConsumerConfig(max_ack_pending=limit.limit * ACK_PENDING_PER_SLOT)
+        )
+        # An existing durable keeps the config it was created with, so it is brought to the initial limit too.
+        ack_pending = AckPendingLimit(js, sub, ACK_PENDING_PER_SLOT)
+        await ack_pending.update(limit.limit)
+        follow = ack_pending.update if ACK_PENDING_MODE == "follow" else None
+        limit_task = asyncio.create_task(limit.run(CONCURRENCY_ADJUST_INTERVAL, follow))
+        logger.info("Waiting for messages on topic '%s' with %d lanes, %d at once...", NATS_CONSUME_SUBJECT, LANE_COUNT, limit.limit)
         
         async for msg in sub.messages:
-            await process_message(msg, db_pool, nats_conn)
+            await executor.submit(msg)
 
     except Exception as e:
-        logger.critical(f"A critical error occurred, shutting down the worker: {e}")
+        logger.critical("A critical error occurred, shutting down the worker: %s", e)
     finally:
+        if stats_task:
+            stats_task.cancel()
+        if limit_task:
+            limit_task.cancel()
+        if sub:
+            logger.info("Stopping the subscription...")
+            try:
+                await sub.unsubscribe()
+            except Exception as e:
+                logger.warning("Failed to stop the subscription: %s", e)
+        if executor:
+            logger.info("Draining processing lanes...")
+            await executor.stop()
         if nats_conn and nats_conn.is_connected:
             logger.info("Closing NATS connection...")
             await nats_conn.close()
@@ -43,4 +87,3 @@ if __name__ == "__main__":
         asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("Service manually terminated.")
-
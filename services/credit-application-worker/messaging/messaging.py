@@ -1,21 +1,28 @@
-import json
 import uuid
 
-from configuration.config import logger, NATS_NOTIFY_SUBJECT
+from metrics.metrics import NATS_PUBLISH_LATENCY
+from configuration.config import logger as service_logger, NATS_NOTIFY_SUBJECT, EVENT_CONTENT_TYPE
+from events.events import CreditActivationNotification, encode_event, event_headers, check_content_type
 
-async def send_activation_notification(nats_conn, user_id: uuid.UUID):
+logger = service_logger.getChild("messaging")
+
+EVENT_HEADERS = event_headers(check_content_type(EVENT_CONTENT_TYPE))
+
+async def send_activation_notification(js, offer_id: uuid.UUID, user_id: uuid.UUID):
     """
-    Publishes a credit activation notification for the user to NATS.
+    Publishes a credit activation notification for the user to JetStream.
+
+    The publish returns once the notifications stream has stored the event, and its `Nats-Msg-Id`
+    is derived from the offer, so the stream drops the copies published again for the same offer
+    within its duplicate window.
 
     Args:
-        nats_conn: The active NATS connection.
+        js: The JetStream context of the active NATS connection.
+        offer_id: The ID of the activated offer.
         user_id: The ID of the user to be notified.
     """
-    notification_payload = {
-        "userId": str(user_id),
-        "type": "CREDIT_LIMIT_APPLIED",
-        "title": "Credit Limit Active!",
-        "message": "Your new credit limit is now available for use."
-    }
-    await nats_conn.publish(NATS_NOTIFY_SUBJECT, json.dumps(notification_payload).encode())
-    logger.info(f"Notification event for user {user_id} published to '{NATS_NOTIFY_SUBJECT}'.")
+    notification = CreditActivationNotification(user_id=user_id)
+    headers = {**(EVENT_HEADERS or {}), "Nats-Msg-Id": f"credit-activation-{offer_id}"}
+    with NATS_PUBLISH_LATENCY.labels(NATS_NOTIFY_SUBJECT).time():
+        await js.publish(NATS_NOTIFY_SUBJECT, encode_event(notification, EVENT_CONTENT_TYPE), headers=headers)
+    logger.info("Notification event for user %s published to '%s'.", user_id, NATS_NOTIFY_SUBJECT)
@@ -1,26 +1,86 @@
-import json
+import asyncio
 
-from configuration.config import logger
-from models.models import CreditOfferAcceptedEvent
-from database.database import activate_credit_offer
+from configuration.config import logger as service_logger, NOTIFY_MAX_RETRIES, NOTIFY_RETRY_BACKOFF
+from nats.errors import MsgAlreadyAckdError
+from database.database import activate_credit_offers
 from messaging.messaging import send_activation_notification
+from events.events import CreditOfferAcceptedEvent, EventDecoder
 
-async def process_message(msg, db_pool, nats_conn):
+logger = service_logger.getChild("processing")
+
+ACCEPTANCE_DECODER = EventDecoder(CreditOfferAcceptedEvent)
+
+def decode_message(msg) -> CreditOfferAcceptedEvent:
+    """
+    Decodes and validates a credit offer acceptance message.
+
+    Raises:
+        EventDecodeError: If the message is malformed or invalid.
+    """
+    return ACCEPTANCE_DECODER.decode(msg.data, msg.headers)
+
+async def acknowledge(msg):
     """
-    Processes a single credit offer acceptance message.
+    Acknowledges a message, ignoring messages already acknowledged by another replica.
     """
-    event = None
     try:
-        data = json.loads(msg.data.decode())
-        event = CreditOfferAcceptedEvent.model_validate(data)
-        logger.info(f"Processing acceptance for offerId: {event.offer_id}, userId: {event.user_id}")
+        await msg.ack()
+    except MsgAlreadyAckdError:
+        logger.warning("Message has already been acknowledged, probably by another replica.")
+
+async def notify_users(js, offers: list) -> set:
+    """
+    Sends the activation notification of every offer, retrying the failed ones up to NOTIFY_MAX_RETRIES
+    times with exponential backoff.
+
+    Args:
+        js: The JetStream context the notifications are published with.
+        offers: The (id, user_id) records of the active offers.
 
+    Returns:
+        The ids of the offers whose notification still failed.
+    """
+    pending = list(offers)
+    for attempt in range(NOTIFY_MAX_RETRIES + 1):
+        if attempt:
+            await asyncio.sleep(NOTIFY_RETRY_BACKOFF * 2 ** (attempt - 1))
+        results = await asyncio.gather(*(send_activation_notification(js, offer["id"], offer["user_id"]) for offer in pending), return_exceptions=True)
+        failed = [(offer, result) for offer, result in zip(pending, results) if isinstance(result, Exception)]
+        if not failed:
+            return set()
+        pending = [offer for offer, _ in failed]
+    for offer, error in failed:
+        logger.error("Failed to notify user %s of the activation of offer %s after %d attempts: %s", offer["user_id"], offer["id"], NOTIFY_MAX_RETRIES + 1, error)
+    return {offer["id"] for offer in pending}
+
+async def process_events(items: list[tuple], db_pool, js) -> list[tuple]:
+    """
+    Activates a group of accepted offers with one statement, notifies their users and acknowledges the messages.
+
+    A message is only acknowledged once the notification of its offer is stored by JetStream. The
+    ones that are not, because the activation or the notification failed, are returned to be tried
+    again: their offers are then found already active and notified again, with the same
+    `Nats-Msg-Id`, so the notification is sent at least once even if the worker stops between the
+    activation and the publish.
+
+    Args:
+        items: Pairs of (msg, CreditOfferAcceptedEvent).
+        js: The JetStream context the notifications are published with.
+
+    Returns:
+        The pairs whose message was not acknowledged, in their original order.
+    """
+    try:
+        logger.info("Processing acceptance of %d offers", len(items))
         async with db_pool.acquire() as conn:
-            was_activated = await activate_credit_offer(conn, event.offer_id, event.user_id)
-            if was_activated:
-                await send_activation_notification(nats_conn, event.user_id)
-        await msg.ack()
+            active = await activate_credit_offers(conn, [(event.offer_id, event.user_id) for _, event in items])
     except Exception as e:
-        offer_id = event.offer_id if event else 'N/A'
-        logger.error(f"Failed to process message for offerId {offer_id}: {e}")
-        await msg.nak(delay=10)
+        logger.error("Failed to process acceptance of offers %s: %s", [str(event.offer_id) for _, event in items], e)
+        return list(items)
+    unnotified = await notify_users(js, active)
+    acknowledged = [(msg, event) for msg, event in items if event.offer_id not in unnotified]
+    acks = await asyncio.gather(*(acknowledge(msg) for msg, _ in acknowledged), return_exceptions=True)
+    for (_, event), result in zip(acknowledged, acks):
+        if isinstance(result, Exception):
+            logger.warning("Failed to acknowledge the acceptance of offer %s: %s", event.offer_id, result)
+    return [(msg, event) for msg, event in items if event.offer_id in unnotified]
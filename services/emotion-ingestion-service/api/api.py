@@ -1,14 +1,35 @@
-import json
 import uuid
+import orjson
 
 from typing import Optional
-from models.models import EmotionEvent
-from messaging.messaging import publish_to_nats
-from configuration.config import logger, NATS_SUBJECT
+from pydantic import ValidationError
+from messaging.messaging import publish_to_nats, PipelinedPublisher
+from models.models import EmotionEvent, BatchIngestionResponse, RejectedEvent
 from fastapi import APIRouter, Request, status, Header, BackgroundTasks, HTTPException
+from configuration.config import logger as service_logger, NATS_SUBJECT, MAX_BATCH_EVENTS, MAX_BATCH_BYTES, MAX_EVENT_BYTES, PUBLISH_WINDOW, EVENT_CONTENT_TYPE
+from events.events import EmotionEvent as EmotionEventMessage, EmotionEventPayload, EmotionMetrics, encode_event, event_headers, check_content_type
+
+logger = service_logger.getChild("api")
 
 router = APIRouter()
 
+EVENT_HEADERS = event_headers(check_content_type(EVENT_CONTENT_TYPE))
+
+def encode_emotion_event(event: EmotionEvent, trace_id: str) -> bytes:
+    """
+    Encodes a validated emotion event as the message published to NATS.
+    """
+    metrics = event.emotion_event.metrics
+    return encode_event(EmotionEventMessage(
+        user_id=event.user_id,
+        timestamp=event.timestamp,
+        emotion_event=EmotionEventPayload(
+            type=event.emotion_event.type,
+            metrics=EmotionMetrics(positivity=metrics.positivity, intensity=metrics.intensity, stress_level=metrics.stress_level),
+        ),
+        trace_id=trace_id,
+    ), EVENT_CONTENT_TYPE)
+
 @router.get("/healthz", status_code=status.HTTP_200_OK, tags=["Monitoring"])
 async def health_check():
     """
@@ -27,14 +48,12 @@ async def publish_emotion_event(
     Publishes a user emotion event to NATS JetStream asynchronously.
     """
     trace_id = x_request_id or str(uuid.uuid4())
-    logger.info(f"Received emotion event for user_id={event.user_id}, trace_id={trace_id}")
+    logger.info("Received emotion event for user_id=%s, trace_id=%s", event.user_id, trace_id)
     try:
         nc = request.app.state.nats_connection
-        payload_dict = event.model_dump(by_alias=True)
-        payload_dict['traceId'] = trace_id
-        payload_bytes = json.dumps(payload_dict).encode()
+        payload_bytes = encode_emotion_event(event, trace_id)
 
-        background_tasks.add_task(publish_to_nats, nc, NATS_SUBJECT, payload_bytes)
+        background_tasks.add_task(publish_to_nats, nc, NATS_SUBJECT, payload_bytes, EVENT_HEADERS)
         
         return {"status": "event received", "traceId": trace_id}
     except AttributeError:
@@ -44,8 +63,142 @@ async def publish_emotion_event(
             detail="Service unavailable. Could not connect to the messaging system."
         )
     except Exception as e:
-        logger.exception(f"Failed to process event: {str(e)}")
+        logger.exception("Failed to process event: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to process event: {str(e)}"
         )
+
+class EventTooLargeError(Exception):
+    """
+    Raised when a line of an NDJSON batch is longer than MAX_EVENT_BYTES.
+    """
+
+def describe_validation_error(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, e['loc'])) or 'event'}: {e['msg']}" for e in error.errors())
+
+async def iter_ndjson_lines(request: Request):
+    """
+    Yields the non-empty lines of an NDJSON request body as they arrive.
+
+    Raises:
+        EventTooLargeError: If a line is longer than MAX_EVENT_BYTES, so a body without newlines
+            is never buffered whole.
+    """
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if len(line) > MAX_EVENT_BYTES:
+                raise EventTooLargeError()
+            if line.strip():
+                yield line
+        if len(buffer) > MAX_EVENT_BYTES:
+            raise EventTooLargeError()
+    if buffer.strip():
+        yield buffer
+
+async def read_bounded_body(request: Request) -> bytes:
+    """
+    Reads a request body of at most MAX_BATCH_BYTES, answering 413 as soon as it is known to be larger.
+    """
+    too_large = HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Request body is larger than {MAX_BATCH_BYTES} bytes.")
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > MAX_BATCH_BYTES:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > MAX_BATCH_BYTES:
+            raise too_large
+    return bytes(body)
+
+async def iter_batch_events(request: Request):
+    """
+    Yields (raw, parsed) pairs for each event of the batch, where exactly one of them is set:
+    raw bytes for NDJSON lines and parsed objects for JSON array items.
+
+    A JSON array is parsed whole, so its body is bounded by MAX_BATCH_BYTES; NDJSON is read line by
+    line, each bounded by MAX_EVENT_BYTES.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("application/json"):
+        try:
+            items = orjson.loads(await read_bounded_body(request))
+        except orjson.JSONDecodeError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Request body is not valid JSON.")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Request body must be a JSON array of events.")
+        for item in items:
+            yield None, item
+    else:
+        async for line in iter_ndjson_lines(request):
+            yield line, None
+
+@router.post("/v1/emotions/stream:batch", status_code=status.HTTP_202_ACCEPTED, response_model=BatchIngestionResponse, tags=["Emotions"])
+async def publish_emotion_events_batch(
+    request: Request,
+    x_request_id: Optional[str] = Header(None, alias="X-Request-ID")
+):
+    """
+    Validates a batch of user emotion events, sent as NDJSON or as a JSON array, and publishes them to NATS JetStream.
+
+    Events are validated in a single streaming pass and published as soon as they are valid, with many
+    acks outstanding at once. The response reports which events were rejected, by index.
+
+    Every event is published under the `Nats-Msg-Id` `{trace_id}-{index}`, so a client that retries a
+    batch with the same X-Request-ID, after a 413 or a lost response, does not publish its events twice.
+    """
+    trace_id = x_request_id or str(uuid.uuid4())
+    nc = getattr(request.app.state, "nats_connection", None)
+    if nc is None or not nc.is_connected:
+        logger.error("Service unavailable. Could not connect to the messaging system.")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Service unavailable. Could not connect to the messaging system."
+        )
+
+    publisher = PipelinedPublisher(nc, NATS_SUBJECT, PUBLISH_WINDOW, EVENT_HEADERS)
+    errors = {}
+    index = 0
+    truncated = False
+    too_large = False
+    try:
+        async for raw, parsed in iter_batch_events(request):
+            if index >= MAX_BATCH_EVENTS:
+                truncated = True
+                break
+            try:
+                event = EmotionEvent.model_validate_json(raw) if raw is not None else EmotionEvent.model_validate(parsed)
+            except ValidationError as e:
+                errors[index] = describe_validation_error(e)
+            else:
+                event_id = f"{trace_id}-{index}"
+                await publisher.submit(index, encode_emotion_event(event, event_id), event_id)
+            index += 1
+    except EventTooLargeError:
+        too_large = True
+    finally:
+        failed = await publisher.wait()
+
+    if too_large:
+        logger.warning("Batch trace_id=%s: event %d is larger than %d bytes, stopped after %d events.", trace_id, index, MAX_EVENT_BYTES, index)
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Event {index} is larger than {MAX_EVENT_BYTES} bytes. The {index - len(errors) - len(failed)} valid events before it were accepted.",
+        )
+
+    for failed_index, error in failed.items():
+        logger.error("Failed to publish event %s of batch trace_id=%s: %s", failed_index, trace_id, error)
+        errors[failed_index] = "Failed to publish event."
+
+    logger.info("Batch trace_id=%s: %d events accepted, %d rejected.", trace_id, index - len(errors), len(errors))
+    return BatchIngestionResponse(
+        status="batch processed",
+        traceId=trace_id,
+        accepted=index - len(errors),
+        rejected=len(errors),
+        truncated=truncated,
+        errors=[RejectedEvent(index=i, error=errors[i]) for i in sorted(errors)],
+    )
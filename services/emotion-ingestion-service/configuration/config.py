@@ -1,8 +1,14 @@
 import os
-import logging
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
-logger = logging.getLogger("emotion_ingestion_service")
+from logs.logs import setup_logging
+
+logger = setup_logging("emotion_ingestion_service")
 
 NATS_SUBJECT = "user.emotions.topic"
 NATS_URL = os.getenv("NATS_URL", "nats://localhost:4222")
+EVENT_CONTENT_TYPE = os.getenv("EVENT_CONTENT_TYPE", "application/json")
+
+MAX_BATCH_EVENTS = int(os.getenv("MAX_BATCH_EVENTS", "5000"))
+MAX_BATCH_BYTES = int(os.getenv("MAX_BATCH_BYTES", str(8 * 1024 * 1024)))
+MAX_EVENT_BYTES = int(os.getenv("MAX_EVENT_BYTES", str(16 * 1024)))
+PUBLISH_WINDOW = int(os.getenv("PUBLISH_WINDOW", "512"))
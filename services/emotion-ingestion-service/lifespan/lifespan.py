@@ -9,7 +9,7 @@ async def lifespan(app: FastAPI):
     """
     Application lifecycle manager for NATS connection.
     """
-    logger.info(f"Connecting to NATS at {NATS_URL}...")
+    logger.info("Connecting to NATS at %s...", NATS_URL)
     try:
         nc = await nats.connect(NATS_URL, name="emotion_ingestion_service")
         app.state.nats_connection = nc
@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
 from lifespan.lifespan import lifespan
+from metrics.metrics import instrument_app
 from api.api import router as api_router
 
 app = FastAPI(
@@ -9,5 +10,6 @@ app = FastAPI(
     version="1.1.0",
     default_response_class=ORJSONResponse 
 )
+instrument_app(app)
 
 app.include_router(api_router)
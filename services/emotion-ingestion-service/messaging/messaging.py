@@ -1,14 +1,54 @@
+import asyncio
 import nats
 
-from configuration.config import logger
+from configuration.config import logger as service_logger
+from metrics.metrics import NATS_PUBLISH_LATENCY
 
-async def publish_to_nats(nc: nats.aio.client.Client, subject: str, payload: bytes):
+logger = service_logger.getChild("messaging")
+
+async def publish_to_nats(nc: nats.aio.client.Client, subject: str, payload: bytes, headers: dict | None = None):
     """
     Publishes a message to a NATS JetStream topic asynchronously.
     """
     try:
         js = nc.jetstream()
-        await js.publish(subject, payload)
-        logger.info(f"Background task: Event published to NATS topic '{subject}'")
+        with NATS_PUBLISH_LATENCY.labels(subject).time():
+            await js.publish(subject, payload, headers=headers)
+        logger.info("Background task: Event published to NATS topic '%s'", subject)
     except Exception as e:
-        logger.error(f"Background task error: Failed to publish to NATS. Error: {e}")
+        logger.error("Background task error: Failed to publish to NATS. Error: %s", e)
+
+class PipelinedPublisher:
+    """
+    Publishes many messages, all carrying `headers`, to NATS JetStream with up to `window` acks outstanding at once.
+
+    A message submitted with a `msg_id` is published under that `Nats-Msg-Id`, so the stream drops it
+    when it is submitted again within its duplicate window.
+    """
+
+    def __init__(self, nc: nats.aio.client.Client, subject: str, window: int, headers: dict | None = None):
+        self._js = nc.jetstream()
+        self._subject = subject
+        self._headers = headers
+        self._window = asyncio.Semaphore(window)
+        self._pending: dict[int, asyncio.Task] = {}
+        self._publish_latency = NATS_PUBLISH_LATENCY.labels(subject)
+
+    async def submit(self, key: int, payload: bytes, msg_id: str | None = None):
+        """Starts publishing a message, waiting while the window of outstanding acks is full."""
+        await self._window.acquire()
+        headers = {**(self._headers or {}), "Nats-Msg-Id": msg_id} if msg_id is not None else self._headers
+        self._pending[key] = asyncio.create_task(self._publish(payload, headers))
+
+    async def _publish(self, payload: bytes, headers: dict | None):
+        try:
+            with self._publish_latency.time():
+                await self._js.publish(self._subject, payload, headers=headers)
+        finally:
+            self._window.release()
+
+    async def wait(self) -> dict[int, Exception]:
+        """Waits for every outstanding ack and returns the publish errors by key."""
+        keys = list(self._pending)
+        results = await asyncio.gather(*self._pending.values(), return_exceptions=True)
+        return {key: result for key, result in zip(keys, results) if isinstance(result, Exception)}
@@ -0,0 +1,216 @@
+"""
+Prometheus instrumentation shared by every service.
+
+FastAPI apps call `instrument_app` to record per-route request latency and serve `/metrics`;
+workers call `start_metrics_server` to serve the same registry on a side port. The hot-path
+helpers only touch pre-resolved histogram children, so they are cheap enough to leave on.
+"""
+import time
+import functools
+
+from contextlib import asynccontextmanager
+from prometheus_client import Counter, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, start_http_server
+from prometheus_client.core import GaugeMetricFamily
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    "ecs_http_request_duration_seconds", "HTTP request latency by route template.",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+POOL_ACQUIRE_WAIT = Histogram(
+    "ecs_db_pool_acquire_wait_seconds", "Time spent waiting for an asyncpg pool connection.",
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_LATENCY = Histogram(
+    "ecs_db_query_duration_seconds", "Duration of database functions by name.",
+    ["query"], buckets=LATENCY_BUCKETS,
+)
+NATS_PUBLISH_LATENCY = Histogram(
+    "ecs_nats_publish_duration_seconds", "Time from a NATS publish until it is acknowledged (JetStream) or flushed to the client buffer (core NATS).",
+    ["subject"], buckets=LATENCY_BUCKETS,
+)
+ML_CALL_LATENCY = Histogram(
+    "ecs_ml_call_duration_seconds", "Latency of credit scoring calls, both client side and model evaluation.",
+    ["operation"], buckets=LATENCY_BUCKETS,
+)
+REDIS_LATENCY = Histogram(
+    "ecs_redis_command_duration_seconds", "Redis command latency.",
+    ["command"], buckets=LATENCY_BUCKETS,
+)
+LANE_LATENCY = Histogram(
+    "ecs_lane_latency_seconds", "Time from the submission of a message to an ordered lane until it is acknowledged.",
+    ["lane"], buckets=LATENCY_BUCKETS,
+)
+REDIS_CACHE_REQUESTS = Counter(
+    "ecs_redis_cache_requests_total", "Redis cache reads by result.",
+    ["result"],
+)
+
+_REDIS_HITS = REDIS_CACHE_REQUESTS.labels("hit")
+_REDIS_MISSES = REDIS_CACHE_REQUESTS.labels("miss")
+_REDIS_GET = REDIS_LATENCY.labels("get")
+_REDIS_SETEX = REDIS_LATENCY.labels("setex")
+_REDIS_DELETE = REDIS_LATENCY.labels("delete")
+
+def timed(histogram, *labels):
+    """
+    Decorator recording the duration of an async function in `histogram`.
+    """
+    child = histogram.labels(*labels) if labels else histogram
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started_at = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - started_at)
+        return wrapper
+    return decorator
+
+def timed_query(func):
+    """
+    Decorator recording the duration of a database function under its name.
+    """
+    return timed(DB_QUERY_LATENCY, func.__name__)(func)
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the latency of every HTTP request, labelled by route template.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                scope["method"], route.path if route is not None else "unmatched", str(status_code)
+            ).observe(time.perf_counter() - started_at)
+
+def instrument_app(app):
+    """
+    Adds the request latency middleware and the `/metrics` route to a FastAPI app.
+    """
+    # Imported here so that workers, which do not ship starlette, can use the rest of the module.
+    from starlette.responses import Response
+
+    async def metrics_endpoint(request):
+        return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+    app.add_middleware(MetricsMiddleware)
+    app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+
+def start_metrics_server(port: int):
+    """
+    Serves `/metrics` on a side port from a background thread, for services without an HTTP app.
+    """
+    start_http_server(port)
+
+class MeteredPool:
+    """
+    Wraps an asyncpg pool to record how long callers wait for a connection, both in the
+    histogram and in counters that `collect_wait` reads and resets.
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+        self.wait_count = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+
+    @asynccontextmanager
+    async def acquire(self):
+        started_at = time.perf_counter()
+        async with self._pool.acquire() as conn:
+            waited = time.perf_counter() - started_at
+            POOL_ACQUIRE_WAIT.observe(waited)
+            self.wait_count += 1
+            self.wait_sum += waited
+            self.wait_max = max(self.wait_max, waited)
+            yield conn
+
+    def collect_wait(self) -> tuple[int, float, float]:
+        """Returns (count, avg_ms, max_ms) of the waits since the previous call and resets them."""
+        count, total, maximum = self.wait_count, self.wait_sum, self.wait_max
+        self.wait_count, self.wait_sum, self.wait_max = 0, 0.0, 0.0
+        return count, (total / count * 1000 if count else 0.0), maximum * 1000
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+class MeteredRedis:
+    """
+    Wraps a redis.asyncio client to record command latency and cache hits and misses of reads.
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    async def get(self, key):
+        with _REDIS_GET.time():
+            value = await self._client.get(key)
+        (_REDIS_HITS if value is not None else _REDIS_MISSES).inc()
+        return value
+
+    async def setex(self, key, seconds, value):
+        with _REDIS_SETEX.time():
+            return await self._client.setex(key, seconds, value)
+
+    async def delete(self, *keys):
+        with _REDIS_DELETE.time():
+            return await self._client.delete(*keys)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+class StatsCollector:
+    """
+    Exposes the numeric values returned by a `stats()` callable as gauges named `<prefix>_<key>`.
+    Nested dicts become one gauge with a `label` label per entry.
+    """
+
+    def __init__(self, prefix: str, stats, label: str = "key"):
+        self._prefix = prefix
+        self._stats = stats
+        self._label = label
+
+    def collect(self):
+        for name, value in self._stats().items():
+            if isinstance(value, dict):
+                gauge = GaugeMetricFamily(f"{self._prefix}_{name}", f"{self._prefix} {name}", labels=[self._label])
+                for label_value, sample in value.items():
+                    gauge.add_metric([str(label_value)], sample)
+                yield gauge
+            elif isinstance(value, (int, float)):
+                yield GaugeMetricFamily(f"{self._prefix}_{name}", f"{self._prefix} {name}", value=value)
+
+_stats_collectors: dict[str, StatsCollector] = {}
+
+def register_stats(prefix: str, stats, label: str = "key"):
+    """
+    Registers a `stats()` callable whose values are read at scrape time, replacing any previous one with the same prefix.
+    """
+    if prefix in _stats_collectors:
+        REGISTRY.unregister(_stats_collectors.pop(prefix))
+    collector = StatsCollector(prefix, stats, label)
+    REGISTRY.register(collector)
+    _stats_collectors[prefix] = collector
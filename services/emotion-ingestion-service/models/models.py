@@ -22,3 +22,21 @@ class EmotionEvent(BaseModel):
     user_id: str = Field(..., alias="userId", description="The unique identifier for the user.")
     timestamp: str = Field(..., description="The ISO 8601 timestamp of the event.")
     emotion_event: EmotionEventPayload = Field(..., alias="emotionEvent")
+
+class RejectedEvent(BaseModel):
+    """
+    Represents an event of a batch that was not accepted.
+    """
+    index: int = Field(..., description="Position of the event in the batch, starting at 0.")
+    error: str = Field(..., description="Why the event was rejected.")
+
+class BatchIngestionResponse(BaseModel):
+    """
+    Represents the outcome of a batch of emotion events.
+    """
+    status: str
+    trace_id: str = Field(..., alias="traceId", description="Trace id of the batch; event i is published with traceId '<traceId>-<i>'.")
+    accepted: int = Field(..., description="Number of events validated and published.")
+    rejected: int = Field(..., description="Number of events that failed validation or publishing.")
+    truncated: bool = Field(False, description="Whether the batch exceeded the size limit and its remaining events were ignored.")
+    errors: list[RejectedEvent] = Field(default_factory=list, description="The rejected events, by index.")
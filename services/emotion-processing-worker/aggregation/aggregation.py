@@ -0,0 +1,146 @@
+import uuid
+import asyncio
+import asyncpg
+
+from datetime import date, datetime
+from dataclasses import dataclass, field
+from events.events import EmotionEvent
+from configuration.config import logger
+from nats.errors import MsgAlreadyAckdError
+from database.database import upsert_emotional_summaries
+
+@dataclass
+class SummaryAccumulator:
+    """
+    Running sums and count of the emotion events of one user on one day, plus the messages they came from.
+    """
+    positivity_sum: float = 0.0
+    intensity_sum: float = 0.0
+    stress_sum: float = 0.0
+    event_count: int = 0
+    msgs: list = field(default_factory=list)
+
+    def add(self, event: EmotionEvent, msg):
+        metrics = event.emotion_event.metrics
+        self.positivity_sum += metrics.positivity
+        self.intensity_sum += metrics.intensity
+        self.stress_sum += metrics.stress_level
+        self.event_count += 1
+        self.msgs.append(msg)
+
+def summary_key(event: EmotionEvent) -> tuple[uuid.UUID, date]:
+    """
+    Returns the (user_id, summary_date) key an event is folded into.
+
+    Raises:
+        ValueError: If the user id or the timestamp of the event are malformed.
+    """
+    date_string = event.timestamp.split("T")[0]
+    return uuid.UUID(event.user_id), datetime.strptime(date_string, "%Y-%m-%d").date()
+
+async def acknowledge(msg):
+    """
+    Acknowledges a message, ignoring messages already acknowledged by another replica.
+    """
+    try:
+        await msg.ack()
+    except MsgAlreadyAckdError:
+        logger.warning("Message has already been acknowledged, probably by another replica.")
+
+class EmotionSummaryAggregator:
+    """
+    Folds emotion events into per-(user_id, summary_date) accumulators and periodically flushes
+    every dirty key with one set-based upsert.
+
+    Messages are only acknowledged after the flush that covers them has been committed.
+    """
+
+    def __init__(self, db_pool, flush_interval_ms: int, flush_max_events: int):
+        self._db_pool = db_pool
+        self._flush_interval = flush_interval_ms / 1000
+        self._flush_max_events = flush_max_events
+        self._accumulators: dict[tuple, SummaryAccumulator] = {}
+        self._pending_events = 0
+        self._flush_lock = asyncio.Lock()
+        self._flush_requested = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        """Starts the periodic flush loop."""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops the flush loop and flushes whatever is still pending."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    def add(self, event: EmotionEvent, msg):
+        """
+        Folds an event into its accumulator.
+
+        Raises:
+            ValueError: If the event cannot be mapped to a summary row.
+        """
+        key = summary_key(event)
+        accumulator = self._accumulators.get(key)
+        if accumulator is None:
+            accumulator = self._accumulators[key] = SummaryAccumulator()
+        accumulator.add(event, msg)
+        self._pending_events += 1
+        if self._pending_events >= self._flush_max_events:
+            self._flush_requested.set()
+
+    async def flush(self):
+        """Writes all dirty accumulators to the database and acknowledges their messages."""
+        async with self._flush_lock:
+            if not self._accumulators:
+                return
+            accumulators, self._accumulators = self._accumulators, {}
+            events, self._pending_events = self._pending_events, 0
+            await self._write(sorted(accumulators.items()))
+            logger.info("Flushed %d emotion events into %d daily summaries.", events, len(accumulators))
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Unexpected error flushing emotional summaries: %s", e)
+
+    async def _write(self, items: list):
+        """
+        Upserts the accumulators, splitting them in half when the database rejects their content
+        so a single bad key does not block the others.
+        """
+        rows = [
+            (user_id, summary_date, acc.positivity_sum, acc.intensity_sum, acc.stress_sum, acc.event_count)
+            for (user_id, summary_date), acc in items
+        ]
+        try:
+            async with self._db_pool.acquire() as conn:
+                await upsert_emotional_summaries(conn, rows)
+        except (asyncpg.exceptions.DataError, asyncpg.exceptions.IntegrityConstraintViolationError) as e:
+            if len(items) == 1:
+                (user_id, summary_date), acc = items[0]
+                logger.error("Summary for userId %s on %s rejected by the database: %s", user_id, summary_date, e)
+                await asyncio.gather(*(acknowledge(msg) for msg in acc.msgs))
+                return
+            middle = len(items) // 2
+            await self._write(items[:middle])
+            await self._write(items[middle:])
+            return
+        except Exception as e:
+            logger.error("Error flushing %d emotional summaries: %s", len(items), e)
+            await asyncio.gather(*(msg.nak(delay=10) for _, acc in items for msg in acc.msgs), return_exceptions=True)
+            return
+        await asyncio.gather(*(acknowledge(msg) for _, acc in items for msg in acc.msgs))
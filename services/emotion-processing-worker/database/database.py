@@ -1,31 +1,28 @@
-from datetime import datetime
-from models.models import EmotionEvent
+from metrics.metrics import timed_query
 
-async def update_emotional_summary(db_conn, event: EmotionEvent):
-    """
-    Inserts or updates the emotional events summary for a user on a given day.
+UPSERT_SUMMARIES_QUERY = """
+INSERT INTO emotional_events_summary (user_id, summary_date, avg_positivity_score, avg_intensity_score, avg_stress_level, event_count, updated_at)
+SELECT user_id, summary_date, positivity_sum / event_count, intensity_sum / event_count, stress_sum / event_count, event_count, NOW()
+FROM unnest($1::uuid[], $2::date[], $3::float8[], $4::float8[], $5::float8[], $6::int[])
+    AS batch(user_id, summary_date, positivity_sum, intensity_sum, stress_sum, event_count)
+ON CONFLICT (user_id, summary_date)
+DO UPDATE SET
+    avg_positivity_score = (emotional_events_summary.avg_positivity_score * emotional_events_summary.event_count + EXCLUDED.avg_positivity_score * EXCLUDED.event_count) / (emotional_events_summary.event_count + EXCLUDED.event_count),
+    avg_intensity_score = (emotional_events_summary.avg_intensity_score * emotional_events_summary.event_count + EXCLUDED.avg_intensity_score * EXCLUDED.event_count) / (emotional_events_summary.event_count + EXCLUDED.event_count),
+    avg_stress_level = (emotional_events_summary.avg_stress_level * emotional_events_summary.event_count + EXCLUDED.avg_stress_level * EXCLUDED.event_count) / (emotional_events_summary.event_count + EXCLUDED.event_count),
+    event_count = emotional_events_summary.event_count + EXCLUDED.event_count,
+    updated_at = NOW();
+"""
+
+@timed_query
+async def upsert_emotional_summaries(db_conn, rows: list[tuple]):
     """
-    date_string = event.timestamp.split("T")[0]
-    summary_date = datetime.strptime(date_string, "%Y-%m-%d").date()
-    metrics = event.emotion_event.metrics
-    
-    query = """
-    INSERT INTO emotional_events_summary (user_id, summary_date, avg_positivity_score, avg_intensity_score, avg_stress_level, event_count, updated_at)
-    VALUES ($1, $2, $3, $4, $5, 1, NOW())
-    ON CONFLICT (user_id, summary_date)
-    DO UPDATE SET
-        avg_positivity_score = (emotional_events_summary.avg_positivity_score * emotional_events_summary.event_count + EXCLUDED.avg_positivity_score) / (emotional_events_summary.event_count + 1),
-        avg_intensity_score = (emotional_events_summary.avg_intensity_score * emotional_events_summary.event_count + EXCLUDED.avg_intensity_score) / (emotional_events_summary.event_count + 1),
-        avg_stress_level = (emotional_events_summary.avg_stress_level * emotional_events_summary.event_count + EXCLUDED.avg_stress_level) / (emotional_events_summary.event_count + 1),
-        event_count = emotional_events_summary.event_count + 1,
-        updated_at = NOW();
+    Merges pre-aggregated emotion events into the daily summaries with a single set-based upsert.
+
+    Args:
+        db_conn: An active asyncpg pool connection.
+        rows: Tuples of (user_id, summary_date, positivity_sum, intensity_sum, stress_sum, event_count),
+            with at most one row per (user_id, summary_date).
     """
-    
-    await db_conn.execute(
-        query, 
-        event.user_id, 
-        summary_date,
-        metrics.positivity, 
-        metrics.intensity, 
-        metrics.stress_level
-    )
+    columns = list(zip(*rows))
+    await db_conn.execute(UPSERT_SUMMARIES_QUERY, *columns)
@@ -1,42 +1,82 @@
+import signal
 import asyncio
 import asyncpg
 import nats
 
+from functools import partial
 from nats.js.api import ConsumerConfig
+from runtime.runtime import WorkerRuntime
+from concurrency.concurrency import AdaptiveLimit
+from metrics.metrics import MeteredPool, start_metrics_server, register_stats
 from processing.processing import process_message
-from configuration.config import logger, DATABASE_URL, NATS_URL, NATS_SUBJECT, DURABLE_NAME
+from aggregation.aggregation import EmotionSummaryAggregator
+from configuration.config import logger, DATABASE_URL, NATS_URL, NATS_SUBJECT, DURABLE_NAME, FLUSH_INTERVAL_MS, FLUSH_MAX_EVENTS, DB_POOL_MAX_SIZE, WORKER_CONCURRENCY, WORKER_QUEUE_SIZE, RUNTIME_STATS_INTERVAL, METRICS_PORT
 
 async def main():
     """
     Main entry point for the Emotion Processing Worker.
     """
     logger.info("Starting Emotion Processing Worker...")
+    loop = asyncio.get_running_loop()
+    stopping = loop.create_future()
+    # The worker runs as PID 1 of its container: without a handler, SIGTERM is ignored until the SIGKILL that follows it.
+    loop.add_signal_handler(signal.SIGTERM, lambda: stopping.done() or stopping.set_result(None))
     nats_conn = None
     db_pool = None
+    sub = None
+    aggregator = None
+    runtime = None
+    stats_task = None
     try:
+        start_metrics_server(METRICS_PORT)
+        logger.info("Serving metrics on port %s.", METRICS_PORT)
+
         logger.info("Connecting to PostgreSQL...")
-        db_pool = await asyncpg.create_pool(DATABASE_URL, min_size=1, max_size=10)
+        db_pool = MeteredPool(await asyncpg.create_pool(DATABASE_URL, min_size=1, max_size=DB_POOL_MAX_SIZE))
         logger.info("PostgreSQL connection established.")
 
-        logger.info(f"Connecting to NATS at {NATS_URL}...")
+        aggregator = EmotionSummaryAggregator(db_pool, FLUSH_INTERVAL_MS, FLUSH_MAX_EVENTS)
+        aggregator.start()
+
+        logger.info("Connecting to NATS at %s...", NATS_URL)
         nats_conn = await nats.connect(NATS_URL, name="emotion_processing_worker")
         js = nats_conn.jetstream()
         logger.info("NATS connection established.")
         
-        async def message_handler(msg):
-            asyncio.create_task(process_message(msg, db_pool))
-        consumer_config = ConsumerConfig(max_ack_pending=100)
-        await js.subscribe(
+        # The handler only folds events in memory, the database work happens in the flushes, so there is no latency to adapt to.
+        limit = AdaptiveLimit.fixed(WORKER_CONCURRENCY)
+        runtime = WorkerRuntime(partial(process_message, aggregator=aggregator), limit, WORKER_QUEUE_SIZE, db_pool)
+        runtime.start()
+        register_stats("ecs_worker_runtime", runtime.gauges)
+        register_stats("ecs_worker_concurrency", limit.gauges)
+        stats_task = asyncio.create_task(runtime.report_stats(RUNTIME_STATS_INTERVAL))
+        consumer_config = ConsumerConfig(max_ack_pending=FLUSH_MAX_EVENTS * 2)
+        sub = await js.subscribe(
             subject=NATS_SUBJECT, 
             queue=DURABLE_NAME, 
-            cb=message_handler,
+            cb=runtime.submit,
             config=consumer_config
         )
-        logger.info(f"Waiting for messages on topic '{NATS_SUBJECT}'...")
-        await asyncio.Future()
+        logger.info("Waiting for messages on topic '%s'...", NATS_SUBJECT)
+        await stopping
+        logger.info("Received SIGTERM, shutting down the worker...")
     except Exception as e:
-        logger.critical(f"A critical error occurred, shutting down the worker: {e}")
+        logger.critical("A critical error occurred, shutting down the worker: %s", e)
     finally:
+        if stats_task:
+            stats_task.cancel()
+        if sub:
+            logger.info("Stopping the subscription...")
+            try:
+                await sub.unsubscribe()
+            except Exception as e:
+                logger.warning("Failed to stop the subscription: %s", e)
+        if runtime:
+            logger.info("Draining in-flight messages...")
+            await runtime.stop()
+        if aggregator:
+            logger.info("Flushing pending emotional summaries...")
+            await aggregator.stop()
         if nats_conn and nats_conn.is_connected:
             logger.info("Closing NATS connection...")
             await nats_conn.close()
@@ -1,37 +1,28 @@
-import json
+from configuration.config import logger as service_logger
+from aggregation.aggregation import EmotionSummaryAggregator
+from events.events import EmotionEvent, EventDecoder, EventDecodeError
 
-from pydantic import ValidationError
-from models.models import EmotionEvent
-from configuration.config import logger
-from nats.errors import MsgAlreadyAckdError
-from database.database import update_emotional_summary
+logger = service_logger.getChild("processing")
 
-async def process_message(msg, db_pool):
+EMOTION_DECODER = EventDecoder(EmotionEvent)
+
+async def process_message(msg, aggregator: EmotionSummaryAggregator):
     """
     Processes a single emotion event message from NATS.
+
+    The event is folded into the in-memory aggregator; the message is acknowledged by the flush that persists it.
     """
-    data = None
     try:
-        payload_str = msg.data.decode()
-        data = json.loads(payload_str)
-        event = EmotionEvent.model_validate(data)
+        event = EMOTION_DECODER.decode(msg.data, msg.headers)
         
-        logger.info(f"Received event for userId: {event.user_id}, traceId: {event.trace_id}")
+        logger.info("Received event for userId: %s, traceId: %s", event.user_id, event.trace_id)
 
-        async with db_pool.acquire() as conn:
-            await update_emotional_summary(conn, event)
-        
-        await msg.ack()
-        logger.info(f"Event successfully processed for userId: {event.user_id}, traceId: {event.trace_id}")
+        aggregator.add(event, msg)
 
-    except (json.JSONDecodeError, ValidationError) as e:
-        logger.error(f"Validation or JSON decoding error: {e}. Message: {msg.data.decode()}")
+    except (EventDecodeError, ValueError) as e:
+        logger.error("Validation or decoding error: %s. Message: %s", e, msg.data.decode(errors='replace'))
         await msg.ack()
 
-    except MsgAlreadyAckdError:
-        trace_id = data.get('traceId', 'N/A') if data else 'N/A'
-        logger.warning(f"Message with traceId {trace_id} has already been acknowledged, probably by another replica.")
-
     except Exception as e:
-        logger.error(f"Error processing message: {e}")
+        logger.error("Error processing message: %s", e)
         await msg.nak(delay=10)
@@ -0,0 +1,85 @@
+import time
+import asyncio
+import logging
+
+from configuration.config import logger
+from metrics.metrics import MeteredPool
+from concurrency.concurrency import AdaptiveLimit
+
+class WorkerRuntime:
+    """
+    Runs a message handler behind a bounded queue, with as many messages at once as `limit` allows.
+
+    `submit` is meant to be used as the NATS subscription callback: it waits while the queue is
+    full, which stops the subscription from handing over more messages until the handlers catch up.
+    Every running handler is kept in a set of in-flight tasks that is drained on shutdown.
+    """
+
+    def __init__(self, handler, limit: AdaptiveLimit, queue_size: int, db_pool: MeteredPool | None = None):
+        self._handler = handler
+        self._db_pool = db_pool
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._limit = limit
+        self._in_flight: set[asyncio.Task] = set()
+        self._dispatcher = None
+
+    def start(self):
+        """Starts dispatching queued messages to the handler."""
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def submit(self, msg):
+        """Queues a message, waiting while the queue is full."""
+        await self._queue.put(msg)
+
+    async def stop(self, timeout: float = 30.0):
+        """Waits for the queued and in-flight messages to finish, up to `timeout` seconds."""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Shutting down with %d queued and %d in-flight messages.", self._queue.qsize(), len(self._in_flight))
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    async def _dispatch(self):
+        while True:
+            msg = await self._queue.get()
+            await self._limit.acquire()
+            task = asyncio.create_task(self._run(msg))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _run(self, msg):
+        started_at = time.perf_counter()
+        try:
+            await self._handler(msg)
+        except Exception as e:
+            logger.error("Unhandled error in message handler: %s", e)
+        finally:
+            self._limit.release(time.perf_counter() - started_at)
+            self._queue.task_done()
+
+    def gauges(self) -> dict:
+        """Returns the current queue depth and in-flight count."""
+        return {"queue_depth": self._queue.qsize(), "in_flight": len(self._in_flight)}
+
+    def stats(self) -> dict:
+        """Returns the current queue depth, in-flight count and concurrency limit, and the pool waits since the previous call."""
+        stats = {**self.gauges(), "concurrency_limit": self._limit.limit, "latency_ms": self._limit.latency * 1000}
+        if self._db_pool is not None:
+            count, avg_ms, max_ms = self._db_pool.collect_wait()
+            stats.update({"pool_acquires": count, "pool_wait_avg_ms": avg_ms, "pool_wait_max_ms": max_ms})
+        return stats
+
+    async def report_stats(self, interval: float):
+        """Logs the runtime gauges every `interval` seconds."""
+        while True:
+            await asyncio.sleep(interval)
+            if not logger.isEnabledFor(logging.INFO):
+                continue
+            logger.info("Worker runtime: %s", ", ".join(
+                f"{name}={value:.1f}" if isinstance(value, float) else f"{name}={value}"
+                for name, value in self.stats().items()
+            ))
@@ -0,0 +1,25 @@
+import asyncio
+import asyncpg
+import argparse
+
+from datetime import datetime, timedelta, timezone
+from configuration.config import logger, DATABASE_URL
+from database.database import backfill_transaction_rollup
+
+async def backfill(days: int | None):
+    """
+    Builds the per-user daily transaction rollup from the existing transactions.
+    """
+    since = datetime.now(timezone.utc) - timedelta(days=days) if days else None
+    logger.info("Backfilling transaction rollup %s...", "for the whole history" if since is None else f"since {since.date()}")
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        status = await backfill_transaction_rollup(conn, since)
+        logger.info("Transaction rollup backfilled: %s.", status)
+    finally:
+        await conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds the transaction_daily_rollup table from the transactions table.")
+    parser.add_argument("--days", type=int, default=None, help="Only rebuild the last N days. Rebuilds everything when omitted.")
+    asyncio.run(backfill(parser.parse_args().days))
@@ -1,14 +1,226 @@
-from models.models import TransactionEvent
+import uuid
 
-async def insert_transaction(db_conn, transaction: TransactionEvent):
+from datetime import datetime
+from events.events import TransactionEvent
+from metrics.metrics import timed_query
+
+TRANSACTION_COLUMNS = ["id", "user_id", "amount", "created_at"]
+STAGING_TABLE = "transactions_staging"
+
+ROLLUP_CONFLICT_CLAUSE = """
+ON CONFLICT (user_id, rollup_date)
+DO UPDATE SET
+    tx_count = transaction_daily_rollup.tx_count + EXCLUDED.tx_count,
+    tx_amount_sum = transaction_daily_rollup.tx_amount_sum + EXCLUDED.tx_amount_sum,
+    updated_at = NOW()
+"""
+
+@timed_query
+async def insert_transaction(db_conn, transaction_id: uuid.UUID, transaction: TransactionEvent, created_at: datetime):
     """
-    Inserts a new transaction record into the database.
+    Inserts a new transaction record into the database and adds it to the user's daily rollup
+    in the same statement. A transaction already stored under the same id is skipped, and is not
+    added to the rollup again.
     """
-    query = """
-    INSERT INTO transactions (user_id, amount, created_at) VALUES ($1, $2, NOW());
+    query = f"""
+    WITH inserted AS (
+        INSERT INTO transactions (id, user_id, amount, created_at) VALUES ($1, $2, $3, $4)
+        ON CONFLICT (id, created_at) DO NOTHING
+        RETURNING user_id, amount, created_at
+    )
+    INSERT INTO transaction_daily_rollup (user_id, rollup_date, tx_count, tx_amount_sum)
+    SELECT user_id, (created_at AT TIME ZONE 'UTC')::date, 1, amount FROM inserted
+    {ROLLUP_CONFLICT_CLAUSE};
     """
     await db_conn.execute(
         query, 
+        transaction_id,
         transaction.user_id,
-        transaction.amount
+        transaction.amount,
+        created_at
+    )
+
+@timed_query
+async def copy_transactions(db_conn, records: list[tuple]):
+    """
+    Writes a batch of transaction records with a single COPY and adds them to the daily rollups,
+    all inside one transaction.
+
+    The batch is copied into a temporary staging table, kept by the connection and emptied at
+    every commit, and moved into transactions from there, so transactions already stored under
+    the same id are skipped and only the new ones are added to the rollups.
+
+    Args:
+        db_conn: An active asyncpg pool connection.
+        records: Tuples of (id, user_id, amount, created_at) in the order of TRANSACTION_COLUMNS.
+    """
+    move_query = f"""
+    WITH inserted AS (
+        INSERT INTO transactions (id, user_id, amount, created_at)
+        SELECT id, user_id, amount, created_at FROM {STAGING_TABLE}
+        ON CONFLICT (id, created_at) DO NOTHING
+        RETURNING user_id, amount, created_at
     )
+    INSERT INTO transaction_daily_rollup (user_id, rollup_date, tx_count, tx_amount_sum)
+    SELECT user_id, (created_at AT TIME ZONE 'UTC')::date, COUNT(*), SUM(amount)
+    FROM inserted
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+    {ROLLUP_CONFLICT_CLAUSE};
+    """
+    async with db_conn.transaction():
+        await db_conn.execute(f"""
+        CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+            id UUID NOT NULL,
+            user_id UUID,
+            amount NUMERIC(10, 2),
+            created_at TIMESTAMPTZ NOT NULL
+        ) ON COMMIT DELETE ROWS;
+        """)
+        await db_conn.copy_records_to_table(
+            STAGING_TABLE,
+            records=records,
+            columns=TRANSACTION_COLUMNS
+        )
+        await db_conn.execute(move_query)
+
+@timed_query
+async def backfill_transaction_rollup(db_conn, since: datetime | None = None) -> str:
+    """
+    Rebuilds the daily rollups from the transactions table.
+
+    The rollup table is locked against concurrent upserts for the duration of the rebuild, so
+    transactions written by running workers are neither lost nor counted twice.
+
+    Args:
+        db_conn: An active asyncpg connection.
+        since: Only rebuild days from this instant on. Rebuilds the whole history when None.
+
+    Returns:
+        The status of the upsert statement.
+    """
+    query = f"""
+    INSERT INTO transaction_daily_rollup (user_id, rollup_date, tx_count, tx_amount_sum)
+    SELECT user_id, (created_at AT TIME ZONE 'UTC')::date, COUNT(*), COALESCE(SUM(amount), 0)
+    FROM transactions
+    WHERE user_id IS NOT NULL AND ($1::timestamptz IS NULL OR created_at >= date_trunc('day', $1::timestamptz AT TIME ZONE 'UTC') AT TIME ZONE 'UTC')
+    GROUP BY 1, 2
+    ON CONFLICT (user_id, rollup_date)
+    DO UPDATE SET
+        tx_count = EXCLUDED.tx_count,
+        tx_amount_sum = EXCLUDED.tx_amount_sum,
+        updated_at = NOW();
+    """
+    async with db_conn.transaction():
+        await db_conn.execute("LOCK TABLE transaction_daily_rollup IN SHARE ROW EXCLUSIVE MODE;")
+        return await db_conn.execute(query, since)
+
+@timed_query
+async def fetch_transaction_partitions(db_conn) -> list:
+    """
+    Lists the partitions of the transactions table with their bounds, oldest first.
+
+    Returns:
+        Records with `name`, `lower_bound` and `upper_bound`; a bound is None for MINVALUE
+        and MAXVALUE, and both are None for the default partition, which is flagged by `is_default`.
+    """
+    query = """
+    SELECT name, bound = 'DEFAULT' AS is_default,
+        (regexp_match(bound, $$FROM \\('([^']+)'\\)$$))[1]::timestamptz AS lower_bound,
+        (regexp_match(bound, $$TO \\('([^']+)'\\)$$))[1]::timestamptz AS upper_bound
+    FROM (
+        SELECT c.relname AS name, pg_get_expr(c.relpartbound, c.oid) AS bound
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'transactions'::regclass
+    ) AS partitions
+    ORDER BY upper_bound NULLS FIRST;
+    """
+    return await db_conn.fetch(query)
+
+@timed_query
+async def create_transaction_partition(db_conn, name: str, lower_bound: datetime, upper_bound: datetime, default_partition: str | None):
+    """
+    Creates a partition of the transactions table for [lower_bound, upper_bound) and attaches it.
+
+    Rows of the range that already landed in the default partition are moved into the new one
+    first, with inserts into the default partition blocked meanwhile, since PostgreSQL refuses to
+    attach a partition whose range still has rows in the default partition.
+    """
+    async with db_conn.transaction():
+        await db_conn.execute(f"CREATE TABLE {name} (LIKE transactions INCLUDING DEFAULTS INCLUDING CONSTRAINTS);")
+        if default_partition is not None:
+            await db_conn.execute(f"LOCK TABLE {default_partition} IN SHARE ROW EXCLUSIVE MODE;")
+            await db_conn.execute(f"""
+            WITH moved AS (
+                DELETE FROM {default_partition} WHERE created_at >= $1 AND created_at < $2
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved;
+            """, lower_bound, upper_bound)
+        await db_conn.execute(
+            f"ALTER TABLE transactions ATTACH PARTITION {name} FOR VALUES FROM ('{lower_bound.isoformat()}') TO ('{upper_bound.isoformat()}');"
+        )
+
+@timed_query
+async def detach_transaction_partition(db_conn, name: str, drop: bool):
+    """
+    Detaches a partition from the transactions table, keeping it as a standalone table unless `drop` is set.
+    """
+    async with db_conn.transaction():
+        await db_conn.execute(f"ALTER TABLE transactions DETACH PARTITION {name};")
+        if drop:
+            await db_conn.execute(f"DROP TABLE {name};")
+
+async def is_transactions_partitioned(db_conn) -> bool:
+    """Returns whether the transactions table is already range partitioned."""
+    return await db_conn.fetchval("SELECT relkind = 'p' FROM pg_class WHERE oid = 'transactions'::regclass;")
+
+async def prepare_legacy_transactions(db_conn, bound: datetime):
+    """
+    Builds, without blocking writes, the indexes and the range constraint that let the existing
+    unpartitioned transactions table be attached as the partition of everything before `bound`
+    without any scan or index build under lock.
+
+    Must not run inside a transaction, as the indexes are built concurrently.
+    """
+    await db_conn.execute("CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS transactions_legacy_id_created_at ON transactions(id, created_at);")
+    await db_conn.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS transactions_legacy_user_id_created_at ON transactions(user_id, created_at DESC);")
+    await db_conn.execute("ALTER TABLE transactions DROP CONSTRAINT IF EXISTS transactions_legacy_bound;")
+    await db_conn.execute(f"ALTER TABLE transactions ADD CONSTRAINT transactions_legacy_bound CHECK (created_at < '{bound.isoformat()}') NOT VALID;")
+    await db_conn.execute("ALTER TABLE transactions VALIDATE CONSTRAINT transactions_legacy_bound;")
+
+async def swap_in_partitioned_transactions(db_conn, bound: datetime):
+    """
+    Renames the prepared unpartitioned table to transactions_legacy and replaces it with a
+    partitioned transactions table that has it attached as the partition of everything before
+    `bound`, plus a default partition. The swap only takes brief locks.
+    """
+    async with db_conn.transaction():
+        await db_conn.execute("ALTER TABLE transactions RENAME TO transactions_legacy;")
+        await db_conn.execute("""
+        ALTER TABLE transactions_legacy
+            DROP CONSTRAINT transactions_pkey,
+            ADD CONSTRAINT transactions_legacy_pkey PRIMARY KEY USING INDEX transactions_legacy_id_created_at;
+        """)
+        await db_conn.execute("""
+        CREATE TABLE transactions (
+            id UUID NOT NULL DEFAULT gen_random_uuid(),
+            user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+            amount NUMERIC(10, 2),
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at);
+        """)
+        await db_conn.execute("CREATE INDEX idx_transactions_user_id_created_at ON transactions(user_id, created_at DESC);")
+        await db_conn.execute("CREATE TABLE transactions_default PARTITION OF transactions DEFAULT;")
+        await db_conn.execute(
+            f"ALTER TABLE transactions ATTACH PARTITION transactions_legacy FOR VALUES FROM (MINVALUE) TO ('{bound.isoformat()}');"
+        )
+
+async def drop_legacy_transaction_indexes(db_conn):
+    """
+    Drops the single-column indexes of the unpartitioned table, which the partitioned index replaces.
+    """
+    await db_conn.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_transactions_user_id;")
+    await db_conn.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_transactions_created_at;")
@@ -1,42 +1,164 @@
+import signal
 import asyncio
 import asyncpg
 import nats
 
-from nats.js.api import ConsumerConfig
-from processing.processing import process_message
-from configuration.config import logger, DATABASE_URL, NATS_URL, NATS_SUBJECT, DURABLE_NAME
+from functools import partial
+from nats.errors import TimeoutError
+from nats.js.errors import NotFoundError
+from nats.js.api import ConsumerConfig, DeliverPolicy
+from runtime.runtime import WorkerRuntime
+from concurrency.concurrency import AdaptiveLimit, AckPendingLimit
+from metrics.metrics import MeteredPool, start_metrics_server, register_stats
+from processing.processing import process_message, process_batch
+from partitions.partitions import run_partition_maintenance
+from configuration.config import logger, DATABASE_URL, NATS_URL, NATS_SUBJECT, DURABLE_NAME, PROCESSING_MODE, BATCH_DURABLE_NAME, BATCH_SIZE, BATCH_TIMEOUT, DB_POOL_MAX_SIZE, CONCURRENCY_MODE, WORKER_CONCURRENCY, WORKER_CONCURRENCY_MIN, WORKER_CONCURRENCY_MAX, CONCURRENCY_ADJUST_INTERVAL, CONCURRENCY_LATENCY_TOLERANCE, ACK_PENDING_PER_SLOT, ACK_PENDING_MODE, WORKER_QUEUE_SIZE, RUNTIME_STATS_INTERVAL, METRICS_PORT, PARTITION_MONTHS_AHEAD, PARTITION_RETENTION_MONTHS, PARTITION_RETENTION_MODE, PARTITION_MAINTENANCE_INTERVAL
+
+async def batch_consumer_config(js, stream: str) -> ConsumerConfig:
+    """
+    Builds the configuration the batch durable is created with, on the first start in batch mode.
+
+    The batch durable takes over from the per-message durable: it starts right after the last
+    message that durable acknowledged, or with new messages only when there is none, instead of
+    replaying the history the stream keeps. The inserts are idempotent, so the messages it had
+    acknowledged out of order past that point are only skipped again.
+    """
+    config = ConsumerConfig(max_ack_pending=max(800, BATCH_SIZE * 2))
+    try:
+        previous = await js.consumer_info(stream, DURABLE_NAME)
+    except NotFoundError:
+        config.deliver_policy = DeliverPolicy.NEW
+        logger.info("Creating durable '%s' for new messages only.", BATCH_DURABLE_NAME)
+        return config
+    if previous.push_bound:
+        logger.warning("Durable '%s' still has subscribers: stop the per_message replicas, or every transaction is processed twice.", DURABLE_NAME)
+    config.deliver_policy = DeliverPolicy.BY_START_SEQUENCE
+    config.opt_start_seq = previous.ack_floor.stream_seq + 1
+    logger.info("Creating durable '%s' from stream sequence %d, after the acknowledgements of '%s'.", BATCH_DURABLE_NAME, config.opt_start_seq, DURABLE_NAME)
+    return config
+
+async def consume_in_batches(js, db_pool):
+    """
+    Pulls messages in size- and time-bounded batches and writes each batch at once.
+
+    A batch that fails in an unexpected way is negatively acknowledged as a whole, so it is
+    redelivered later instead of stopping the worker.
+    """
+    stream = await js.find_stream_name_by_subject(NATS_SUBJECT)
+    try:
+        await js.consumer_info(stream, BATCH_DURABLE_NAME)
+        config = None
+    except NotFoundError:
+        config = await batch_consumer_config(js, stream)
+    psub = await js.pull_subscribe(
+        subject=NATS_SUBJECT,
+        durable=BATCH_DURABLE_NAME,
+        stream=stream,
+        config=config
+    )
+    logger.info("Pulling batches of up to %d messages on topic '%s'...", BATCH_SIZE, NATS_SUBJECT)
+    while True:
+        try:
+            msgs = await psub.fetch(batch=BATCH_SIZE, timeout=BATCH_TIMEOUT)
+        except TimeoutError:
+            continue
+        try:
+            await process_batch(msgs, db_pool)
+        except Exception as e:
+            logger.error("Unexpected error processing a batch of %d transactions: %s", len(msgs), e)
+            await asyncio.gather(*(msg.nak(delay=10) for msg in msgs), return_exceptions=True)
 
 async def main():
     """
     Main entry point for the Transaction Processing Worker.
     """
     logger.info("Starting Transaction Processing Worker...")
+    loop = asyncio.get_running_loop()
+    stopping = loop.create_future()
+    # The worker runs as PID 1 of its container: without a handler, SIGTERM is ignored until the SIGKILL that follows it.
+    loop.add_signal_handler(signal.SIGTERM, lambda: stopping.done() or stopping.set_result(None))
     nats_conn = None
     db_pool = None
+    sub = None
+    runtime = None
+    consumer_task = None
+    stats_task = None
+    limit_task = None
+    maintenance_task = None
     try:
+        start_metrics_server(METRICS_PORT)
+        logger.info("Serving metrics on port %s.", METRICS_PORT)
+
         logger.info("Connecting to PostgreSQL...")
-        db_pool = await asyncpg.create_pool(DATABASE_URL, min_size=1, max_size=10)
+        db_pool = MeteredPool(await asyncpg.create_pool(DATABASE_URL, min_size=1, max_size=DB_POOL_MAX_SIZE))
         logger.info("PostgreSQL connection established.")
 
-        logger.info(f"Connecting to NATS at {NATS_URL}...")
+        if PARTITION_MAINTENANCE_INTERVAL > 0:
+            maintenance_task = asyncio.create_task(run_partition_maintenance(
+                db_pool,
+                PARTITION_MAINTENANCE_INTERVAL,
+                PARTITION_MONTHS_AHEAD,
+                PARTITION_RETENTION_MONTHS,
+                PARTITION_RETENTION_MODE == "drop"
+            ))
+
+        logger.info("Connecting to NATS at %s...", NATS_URL)
         nats_conn = await nats.connect(NATS_URL, name="transaction_processing_worker")
         js = nats_conn.jetstream()
         logger.info("NATS connection established.")
 
-        async def message_handler(msg):
-            asyncio.create_task(process_message(msg, db_pool))
-        consumer_config = ConsumerConfig(max_ack_pending=800)
-        await js.subscribe(
+        if PROCESSING_MODE == "batch":
+            consumer_task = asyncio.create_task(consume_in_batches(js, db_pool))
+            await asyncio.wait([consumer_task, stopping], return_when=asyncio.FIRST_COMPLETED)
+            if consumer_task.done():
+                consumer_task.result()
+            return
+
+        if CONCURRENCY_MODE == "adaptive":
+            limit = AdaptiveLimit(WORKER_CONCURRENCY, WORKER_CONCURRENCY_MIN, WORKER_CONCURRENCY_MAX, CONCURRENCY_LATENCY_TOLERANCE)
+        else:
+            limit = AdaptiveLimit.fixed(WORKER_CONCURRENCY)
+        runtime = WorkerRuntime(partial(process_message, db_pool=db_pool), limit, WORKER_QUEUE_SIZE, db_pool)
+        runtime.start()
+        register_stats("ecs_worker_runtime", runtime.gauges)
+        register_stats("ecs_worker_concurrency", limit.gauges)
+        stats_task = asyncio.create_task(runtime.report_stats(RUNTIME_STATS_INTERVAL))
+        consumer_config = ConsumerConfig(max_ack_pending=limit.limit * ACK_PENDING_PER_SLOT)
+        sub = await js.subscribe(
             subject=NATS_SUBJECT, 
             queue=DURABLE_NAME, 
-            cb=message_handler,
+            cb=runtime.submit,
             config=consumer_config
         )
-        logger.info(f"Waiting for messages on topic '{NATS_SUBJECT}'...")
-        await asyncio.Future()
+        # An existing durable keeps the config it was created with, so it is brought to the initial limit too.
+        ack_pending = AckPendingLimit(js, sub, ACK_PENDING_PER_SLOT)
+        await ack_pending.update(limit.limit)
+        follow = ack_pending.update if ACK_PENDING_MODE == "follow" else None
+        limit_task = asyncio.create_task(limit.run(CONCURRENCY_ADJUST_INTERVAL, follow))
+        logger.info("Waiting for messages on topic '%s'...", NATS_SUBJECT)
+        await stopping
+        logger.info("Received SIGTERM, shutting down the worker...")
     except Exception as e:
-        logger.critical(f"A critical error occurred, shutting down the worker: {e}")
+        logger.critical("A critical error occurred, shutting down the worker: %s", e)
     finally:
+        if stats_task:
+            stats_task.cancel()
+        if limit_task:
+            limit_task.cancel()
+        if maintenance_task:
+            maintenance_task.cancel()
+        if consumer_task:
+            consumer_task.cancel()
+            await asyncio.gather(consumer_task, return_exceptions=True)
+        if sub:
+            logger.info("Stopping the subscription...")
+            try:
+                await sub.unsubscribe()
+            except Exception as e:
+                logger.warning("Failed to stop the subscription: %s", e)
+        if runtime:
+            logger.info("Draining in-flight messages...")
+            await runtime.stop()
         if nats_conn and nats_conn.is_connected:
             logger.info("Closing NATS connection...")
             await nats_conn.close()
@@ -0,0 +1,28 @@
+import asyncio
+import asyncpg
+import argparse
+
+from configuration.config import logger, DATABASE_URL, PARTITION_MONTHS_AHEAD, PARTITION_RETENTION_MONTHS, PARTITION_RETENTION_MODE
+from partitions.partitions import maintain_partitions, migrate_to_partitions
+
+async def manage(args: argparse.Namespace):
+    """
+    Runs one partition maintenance pass, or the migration of an unpartitioned transactions table.
+    """
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        if args.command == "migrate":
+            await migrate_to_partitions(conn, args.months_ahead)
+            return
+        result = await maintain_partitions(conn, args.months_ahead, args.retention_months, args.drop)
+        logger.info("Transaction partitions created: %s; %s: %s.", result["created"], "dropped" if args.drop else "detached", result["detached"])
+    finally:
+        await conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manages the monthly partitions of the transactions table.")
+    parser.add_argument("command", choices=["maintain", "migrate"], help="'maintain' creates upcoming partitions and applies retention; 'migrate' partitions an existing unpartitioned table.")
+    parser.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD, help="Number of future months to create partitions for.")
+    parser.add_argument("--retention-months", type=int, default=PARTITION_RETENTION_MONTHS, help="Detach partitions older than N months. 0 keeps everything.")
+    parser.add_argument("--drop", action="store_true", default=PARTITION_RETENTION_MODE == "drop", help="Drop expired partitions instead of detaching them.")
+    asyncio.run(manage(parser.parse_args()))
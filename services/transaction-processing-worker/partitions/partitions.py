@@ -0,0 +1,102 @@
+import asyncio
+
+from datetime import datetime, timezone
+from configuration.config import logger
+from database.database import (
+    fetch_transaction_partitions,
+    create_transaction_partition,
+    detach_transaction_partition,
+    is_transactions_partitioned,
+    prepare_legacy_transactions,
+    swap_in_partitioned_transactions,
+    drop_legacy_transaction_indexes,
+)
+
+MAINTENANCE_LOCK_KEY = "transactions_partition_maintenance"
+
+def month_start(moment: datetime) -> datetime:
+    """Returns midnight UTC of the first day of the month of `moment`."""
+    moment = moment.astimezone(timezone.utc)
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+def add_months(month: datetime, months: int) -> datetime:
+    """Returns the first day of the month `months` months after (or before) `month`."""
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+def partition_name(lower_bound: datetime) -> str:
+    return f"transactions_{lower_bound:%Y_%m}"
+
+async def maintain_partitions(db_conn, months_ahead: int, retention_months: int, drop_expired: bool) -> dict:
+    """
+    Brings the monthly partitions of the transactions table up to date.
+
+    Creates every missing partition from the end of the newest one (or the current month, on an
+    empty table) through `months_ahead` months from now, so that new transactions never land in
+    the default partition. When `retention_months` is positive, partitions entirely older than
+    that many months are detached, and dropped if `drop_expired` is set. Replicas running this
+    concurrently are serialized by an advisory lock.
+
+    Returns:
+        The names of the created and of the detached partitions.
+    """
+    current_month = month_start(datetime.now(timezone.utc))
+    created, detached = [], []
+    async with db_conn.transaction():
+        await db_conn.execute("SELECT pg_advisory_xact_lock(hashtext($1));", MAINTENANCE_LOCK_KEY)
+        partitions = await fetch_transaction_partitions(db_conn)
+        default_partition = next((p["name"] for p in partitions if p["is_default"]), None)
+        ranges = [p for p in partitions if not p["is_default"]]
+
+        lower_bound = max((p["upper_bound"] for p in ranges if p["upper_bound"] is not None), default=current_month)
+        horizon = add_months(current_month, months_ahead + 1)
+        while lower_bound < horizon:
+            upper_bound = add_months(month_start(lower_bound), 1)
+            name = partition_name(lower_bound)
+            await create_transaction_partition(db_conn, name, lower_bound, upper_bound, default_partition)
+            created.append(name)
+            lower_bound = upper_bound
+
+        if retention_months > 0:
+            cutoff = add_months(current_month, -retention_months)
+            for partition in await fetch_transaction_partitions(db_conn):
+                if not partition["is_default"] and partition["upper_bound"] is not None and partition["upper_bound"] <= cutoff:
+                    await detach_transaction_partition(db_conn, partition["name"], drop_expired)
+                    detached.append(partition["name"])
+    return {"created": created, "detached": detached}
+
+async def run_partition_maintenance(db_pool, interval: float, months_ahead: int, retention_months: int, drop_expired: bool):
+    """
+    Runs `maintain_partitions` now and then every `interval` seconds.
+    """
+    while True:
+        try:
+            async with db_pool.acquire() as conn:
+                result = await maintain_partitions(conn, months_ahead, retention_months, drop_expired)
+            if result["created"] or result["detached"]:
+                logger.info("Transaction partitions created: %s; %s: %s.", result["created"], "dropped" if drop_expired else "detached", result["detached"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Transaction partition maintenance failed: %s", e)
+        await asyncio.sleep(interval)
+
+async def migrate_to_partitions(db_conn, months_ahead: int):
+    """
+    Converts an existing unpartitioned transactions table in place, without copying its rows.
+
+    The old table becomes the partition of everything before the start of the month after next,
+    which leaves time for the swap, and monthly partitions are created from there on. Once all of
+    its rows are older than the retention period, it is detached like any other partition.
+    """
+    if await is_transactions_partitioned(db_conn):
+        logger.info("The transactions table is already partitioned.")
+        return
+    bound = add_months(month_start(datetime.now(timezone.utc)), 2)
+    logger.info("Building indexes and the range constraint of the legacy partition (up to %s)...", bound.date())
+    await prepare_legacy_transactions(db_conn, bound)
+    logger.info("Swapping in the partitioned transactions table...")
+    await swap_in_partitioned_transactions(db_conn, bound)
+    await drop_legacy_transaction_indexes(db_conn)
+    result = await maintain_partitions(db_conn, months_ahead, 0, False)
+    logger.info("Transactions table partitioned. Partitions created: %s.", result["created"])
@@ -1,31 +1,121 @@
-import json
+import uuid
+import asyncio
+import asyncpg
 
-from pydantic import ValidationError
-from configuration.config import logger
-from models.models import TransactionEvent
+from configuration.config import logger as service_logger
 from nats.errors import MsgAlreadyAckdError
-from database.database import insert_transaction
+from database.database import insert_transaction, copy_transactions
+from events.events import TransactionEvent, EventDecoder, EventDecodeError
+
+logger = service_logger.getChild("processing")
+
+TRANSACTION_DECODER = EventDecoder(TransactionEvent)
+TRANSACTION_ID_NAMESPACE = uuid.UUID("5b0f3c4e-8d2a-4f6b-9a51-2c7e1d9f0a38")
+
+def event_timestamp(msg, transaction: TransactionEvent):
+    """
+    Returns the time the transaction happened, falling back to the time JetStream stored the message.
+    """
+    if transaction.created_at is not None:
+        return transaction.created_at
+    return msg.metadata.timestamp
+
+def transaction_id(msg) -> uuid.UUID:
+    """
+    Returns the id a transaction message is stored under. It is the same for every delivery of the
+    message to any consumer, so a redelivered or replayed transaction is only written once.
+
+    The id is derived from the Nats-Msg-Id of the producer, or, for producers that send none, from
+    the position and the time of the message in its stream.
+    """
+    msg_id = (msg.headers or {}).get("Nats-Msg-Id")
+    if msg_id is None:
+        metadata = msg.metadata
+        msg_id = f"{metadata.stream}:{metadata.sequence.stream}:{metadata.timestamp.isoformat()}"
+    return uuid.uuid5(TRANSACTION_ID_NAMESPACE, msg_id)
 
 async def process_message(msg, db_pool):
     """
     Processes a single transaction event message from NATS.
     """
-    data = None
+    transaction = None
     try:
-        payload_str = msg.data.decode()
-        data = json.loads(payload_str)
-        transaction = TransactionEvent.model_validate(data)
-        logger.info(f"Received transaction for userId: {transaction.user_id}")
+        transaction = TRANSACTION_DECODER.decode(msg.data, msg.headers)
+        logger.info("Received transaction for userId: %s", transaction.user_id)
         async with db_pool.acquire() as conn:
-            await insert_transaction(conn, transaction)
+            await insert_transaction(conn, transaction_id(msg), transaction, event_timestamp(msg, transaction))
         await msg.ack()
-        logger.info(f"Transaction successfully processed for userId: {transaction.user_id}")
-    except (json.JSONDecodeError, ValidationError) as e:
-        logger.error(f"Validation or JSON decoding error: {e}. Message: {msg.data.decode()}")
+        logger.info("Transaction successfully processed for userId: %s", transaction.user_id)
+    except EventDecodeError as e:
+        logger.error("Validation or decoding error: %s. Message: %s", e, msg.data.decode(errors='replace'))
         await msg.ack()
     except MsgAlreadyAckdError:
-        user_id = data.get('userId', 'N/A') if data else 'N/A'
-        logger.warning(f"Message for userId {user_id} has already been acknowledged, probably by another replica.")
+        user_id = transaction.user_id if transaction else 'N/A'
+        logger.warning("Message for userId %s has already been acknowledged, probably by another replica.", user_id)
     except Exception as e:
-        logger.error(f"Error processing message: {e}")
+        logger.error("Error processing message: %s", e)
         await msg.nak(delay=10)
+
+async def acknowledge(msg):
+    """
+    Acknowledges a message, ignoring messages already acknowledged by another replica.
+    """
+    try:
+        await msg.ack()
+    except MsgAlreadyAckdError:
+        logger.warning("Message has already been acknowledged, probably by another replica.")
+
+def validate_batch(msgs) -> tuple[list, list]:
+    """
+    Decodes and validates a batch of messages in a single pass.
+
+    Returns:
+        A tuple of (valid, invalid) where valid holds (msg, record) pairs ready to be copied
+        and invalid holds the messages that can never be processed.
+    """
+    valid, invalid = [], []
+    for msg in msgs:
+        try:
+            transaction = TRANSACTION_DECODER.decode(msg.data, msg.headers)
+            record = (transaction_id(msg), uuid.UUID(transaction.user_id), transaction.amount, event_timestamp(msg, transaction))
+            valid.append((msg, record))
+        except (EventDecodeError, ValueError) as e:
+            logger.error("Validation or decoding error: %s. Message: %s", e, msg.data.decode(errors='replace'))
+            invalid.append(msg)
+    return valid, invalid
+
+async def write_batch(batch: list, db_pool):
+    """
+    Copies a validated batch into the database and acknowledges it once committed.
+
+    When the database rejects the batch because of its content, the batch is split in half and
+    each half is retried, so a poison message only takes itself down.
+    """
+    try:
+        async with db_pool.acquire() as conn:
+            await copy_transactions(conn, [record for _, record in batch])
+    except (asyncpg.exceptions.DataError, asyncpg.exceptions.IntegrityConstraintViolationError) as e:
+        if len(batch) == 1:
+            msg, record = batch[0]
+            logger.error("Transaction for userId %s rejected by the database: %s", record[1], e)
+            await acknowledge(msg)
+            return
+        middle = len(batch) // 2
+        await write_batch(batch[:middle], db_pool)
+        await write_batch(batch[middle:], db_pool)
+        return
+    except Exception as e:
+        logger.error("Error writing batch of %d transactions: %s", len(batch), e)
+        await asyncio.gather(*(msg.nak(delay=10) for msg, _ in batch), return_exceptions=True)
+        return
+    await asyncio.gather(*(acknowledge(msg) for msg, _ in batch))
+
+async def process_batch(msgs, db_pool):
+    """
+    Processes a batch of transaction event messages fetched from a pull consumer.
+    """
+    valid, invalid = validate_batch(msgs)
+    await asyncio.gather(*(acknowledge(msg) for msg in invalid))
+    if valid:
+        await write_batch(valid, db_pool)
+    logger.info("Batch of %d transactions processed, %d rejected during validation.", len(msgs), len(invalid))
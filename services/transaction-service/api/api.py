@@ -1,9 +1,11 @@
-import json
-
+from datetime import datetime, timezone
 from models.models import TransactionPayload
-from messaging.messaging import publish_to_nats
-from configuration.config import logger, NATS_SUBJECT
-from fastapi import APIRouter, Request, status, BackgroundTasks, HTTPException
+from events.events import TransactionEvent, encode_event
+from configuration.config import logger as service_logger, EVENT_CONTENT_TYPE
+from messaging.messaging import PublisherQueueFullError
+from fastapi import APIRouter, Request, status, HTTPException
+
+logger = service_logger.getChild("api")
 
 router = APIRouter()
 
@@ -15,22 +17,17 @@ async def health_check():
     return {"status": "ok"}
 
 @router.post("/v1/transactions", status_code=status.HTTP_202_ACCEPTED, tags=["Transactions"])
-async def create_transaction(
-    transaction: TransactionPayload,
-    request: Request,
-    background_tasks: BackgroundTasks
-):
+async def create_transaction(transaction: TransactionPayload, request: Request):
     """
-    Publishes a transaction event to NATS JetStream asynchronously.
+    Queues a transaction event for publishing to NATS JetStream by the background publisher.
     """
-    logger.info(f"Received transaction for userId={transaction.userId}")
+    logger.info("Received transaction for userId=%s", transaction.userId)
     try:
-        nc = request.app.state.nats_connection
-        payload_dict = transaction.model_dump(by_alias=True)
-        payload_bytes = json.dumps(payload_dict).encode()
+        publisher = request.app.state.publisher
+        event = TransactionEvent(user_id=transaction.userId, amount=transaction.amount, created_at=datetime.now(timezone.utc))
+
+        publisher.publish(encode_event(event, EVENT_CONTENT_TYPE))
 
-        background_tasks.add_task(publish_to_nats, nc, NATS_SUBJECT, payload_bytes)
-        
         return {"status": "event received", "userId": transaction.userId}
     except AttributeError:
         logger.error("Service unavailable. Could not connect to messaging system.")
@@ -38,8 +35,15 @@ async def create_transaction(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Service unavailable. Could not connect to messaging system."
         )
+    except PublisherQueueFullError as e:
+        logger.warning("Rejecting transaction for userId=%s: %s", transaction.userId, e)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many pending transaction events. Please try again later.",
+            headers={"Retry-After": "1"}
+        )
     except Exception as e:
-        logger.exception(f"Failed to process event: {str(e)}")
+        logger.exception("Failed to process event: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to process event: {str(e)}"
@@ -1,8 +1,14 @@
 import os
-import logging
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
-logger = logging.getLogger("transaction_service")
+from logs.logs import setup_logging
+
+logger = setup_logging("transaction_service")
 
 NATS_SUBJECT = "transactions.topic"
 NATS_URL = os.getenv("NATS_URL", "nats://localhost:4222")
+EVENT_CONTENT_TYPE = os.getenv("EVENT_CONTENT_TYPE", "application/json")
+
+PUBLISH_QUEUE_SIZE = int(os.getenv("PUBLISH_QUEUE_SIZE", "10000"))
+PUBLISH_WINDOW = int(os.getenv("PUBLISH_WINDOW", "256"))
+PUBLISH_MAX_RETRIES = int(os.getenv("PUBLISH_MAX_RETRIES", "5"))
+PUBLISH_RETRY_BACKOFF = float(os.getenv("PUBLISH_RETRY_BACKOFF", "0.05"))
@@ -0,0 +1,121 @@
+"""
+Wire schema of the events exchanged over NATS and their codec.
+
+This module is shared by the producers and the consumers of the events and must stay identical in
+every service that copies it. Events are typed msgspec structs, decoded straight from the bytes of a
+message into their final type. They are encoded as JSON or MessagePack, named by the Content-Type
+header of the message; a message without the header is JSON, so a consumer reads both the current
+and the older producers, and producers switch to MessagePack with EVENT_CONTENT_TYPE once their
+consumers run this module.
+"""
+import uuid
+import msgspec
+
+from datetime import datetime
+
+CONTENT_TYPE_HEADER = "Content-Type"
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+
+EventDecodeError = msgspec.DecodeError
+
+class TransactionEvent(msgspec.Struct, kw_only=True):
+    """
+    A transaction of a user, published to `transactions.topic`.
+    """
+    user_id: str = msgspec.field(name="userId")
+    amount: float
+    created_at: datetime | None = msgspec.field(default=None, name="createdAt")
+
+class EmotionMetrics(msgspec.Struct, kw_only=True):
+    """
+    The main emotional metrics derived from user data, each from 0.0 to 1.0.
+    """
+    positivity: float
+    intensity: float
+    stress_level: float
+
+class EmotionEventPayload(msgspec.Struct, kw_only=True):
+    """
+    The analysis of an emotion event.
+    """
+    type: str
+    metrics: EmotionMetrics
+
+class EmotionEvent(msgspec.Struct, kw_only=True):
+    """
+    An emotion event of a user, published to `user.emotions.topic`.
+    """
+    user_id: str = msgspec.field(name="userId")
+    timestamp: str
+    emotion_event: EmotionEventPayload = msgspec.field(name="emotionEvent")
+    trace_id: str | None = msgspec.field(default=None, name="traceId")
+
+class OfferCreatedEvent(msgspec.Struct, kw_only=True):
+    """
+    A credit offer made to a user by a credit analysis, published to `credit.offers.created`.
+    """
+    offer_id: uuid.UUID = msgspec.field(name="offerId")
+    user_id: uuid.UUID = msgspec.field(name="userId")
+
+class CreditOfferAcceptedEvent(msgspec.Struct, kw_only=True):
+    """
+    A credit offer accepted by its user, published to `credit.offers.approved`.
+    """
+    offer_id: uuid.UUID = msgspec.field(name="offerId")
+    user_id: uuid.UUID = msgspec.field(name="userId")
+    credit_limit: float | None = msgspec.field(default=None, name="creditLimit")
+    interest_rate: float | None = msgspec.field(default=None, name="interestRate")
+    credit_type: str | None = msgspec.field(default=None, name="creditType")
+    accepted_at: str = msgspec.field(name="acceptedAt")
+
+class CreditActivationNotification(msgspec.Struct, kw_only=True):
+    """
+    A notification to a user whose credit limit was activated, published to `user.notifications`.
+    """
+    user_id: uuid.UUID = msgspec.field(name="userId")
+    type: str = "CREDIT_LIMIT_APPLIED"
+    title: str = "Credit Limit Active!"
+    message: str = "Your new credit limit is now available for use."
+
+_ENCODERS = {JSON: msgspec.json.Encoder(), MSGPACK: msgspec.msgpack.Encoder()}
+
+def check_content_type(content_type: str) -> str:
+    """
+    Returns the content type if events can be encoded with it.
+
+    Raises:
+        ValueError: If the content type is not supported.
+    """
+    if content_type not in _ENCODERS:
+        raise ValueError(f"Unsupported event content type {content_type!r}, expected one of {', '.join(_ENCODERS)}.")
+    return content_type
+
+def event_headers(content_type: str) -> dict | None:
+    """Returns the NATS headers of a message encoded with `content_type`; JSON messages go without headers."""
+    return None if content_type == JSON else {CONTENT_TYPE_HEADER: content_type}
+
+def encode_event(event: msgspec.Struct, content_type: str = JSON) -> bytes:
+    """Encodes an event with `content_type`."""
+    return _ENCODERS[content_type].encode(event)
+
+class EventDecoder:
+    """
+    Decodes the messages of one event type by their Content-Type header.
+    """
+
+    def __init__(self, event_type: type):
+        self._decoders = {JSON: msgspec.json.Decoder(event_type), MSGPACK: msgspec.msgpack.Decoder(event_type)}
+
+    def decode(self, data: bytes, headers: dict | None = None):
+        """
+        Decodes and validates the payload of a message.
+
+        Raises:
+            EventDecodeError: If the payload is malformed, does not match the event type or has an unsupported content type.
+        """
+        content_type = headers.get(CONTENT_TYPE_HEADER, JSON) if headers else JSON
+        decoder = self._decoders.get(content_type)
+        if decoder is None:
+            raise EventDecodeError(f"Unsupported content type {content_type!r}")
+        return decoder.decode(data)
@@ -2,20 +2,42 @@ import nats
 
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
-from configuration.config import logger, NATS_URL
+from metrics.metrics import register_stats
+from messaging.messaging import BackgroundPublisher
+from events.events import check_content_type, event_headers
+from configuration.config import (
+    logger, NATS_URL, NATS_SUBJECT, PUBLISH_QUEUE_SIZE, PUBLISH_WINDOW,
+    PUBLISH_MAX_RETRIES, PUBLISH_RETRY_BACKOFF, EVENT_CONTENT_TYPE
+)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
-    Application lifecycle manager for NATS connection.
+    Application lifecycle manager for NATS connection and the background publisher.
     """
-    logger.info(f"Connecting to NATS at {NATS_URL}...")
+    logger.info("Connecting to NATS at %s...", NATS_URL)
     try:
         nc = await nats.connect(NATS_URL, name="transaction_service")
         app.state.nats_connection = nc
         logger.info("Connected to NATS.")
+
+        publisher = BackgroundPublisher(
+            nc, NATS_SUBJECT,
+            queue_size=PUBLISH_QUEUE_SIZE,
+            window=PUBLISH_WINDOW,
+            max_retries=PUBLISH_MAX_RETRIES,
+            retry_backoff=PUBLISH_RETRY_BACKOFF,
+            headers=event_headers(check_content_type(EVENT_CONTENT_TYPE)),
+        )
+        publisher.start()
+        app.state.publisher = publisher
+        register_stats("ecs_publisher", publisher.stats)
         yield
     finally:
+        if hasattr(app.state, 'publisher'):
+            logger.info("Draining background publisher...")
+            await app.state.publisher.stop()
+            logger.info("Background publisher stopped: %s", app.state.publisher.stats())
         if hasattr(app.state, 'nats_connection') and app.state.nats_connection.is_connected:
             logger.info("Closing NATS connection...")
             await app.state.nats_connection.close()
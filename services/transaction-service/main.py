@@ -1,5 +1,6 @@
 from fastapi import FastAPI
 from lifespan.lifespan import lifespan
+from metrics.metrics import instrument_app
 from api.api import router as api_router
 from fastapi.responses import ORJSONResponse
 
@@ -9,5 +10,6 @@ app = FastAPI(
     version="1.0.0",
     default_response_class=ORJSONResponse 
 )
+instrument_app(app)
 
 app.include_router(api_router)
@@ -1,14 +1,123 @@
 import nats
+import uuid
+import asyncio
 
 from configuration.config import logger
+from metrics.metrics import NATS_PUBLISH_LATENCY
 
-async def publish_to_nats(nc: nats.aio.client.Client, subject: str, payload: bytes):
+class PublisherQueueFullError(Exception):
     """
-    Publishes a message to a NATS JetStream topic asynchronously.
+    Raised when the background publisher cannot accept more events.
     """
-    try:
-        js = nc.jetstream()
-        await js.publish(subject, payload)
-        logger.info(f"Background task: Event published to NATS topic '{subject}'")
-    except Exception as e:
-        logger.error(f"Background task error: Failed to publish to NATS. Error: {e}")
+
+class BackgroundPublisher:
+    """
+    Long-lived NATS JetStream publisher.
+
+    Events are queued in a bounded in-memory queue and published by a dispatcher
+    task that keeps up to `window` acks outstanding at once, reusing a single
+    JetStream context. Failed publishes are retried with exponential backoff, and
+    an event that still fails after `max_retries` retries goes back to the end of
+    the queue instead of being dropped, so while JetStream is unreachable the
+    queue fills up and new events are refused rather than lost after their 202.
+    Every message carries `headers`, which name the content type of its payload,
+    and a `Nats-Msg-Id` chosen when it is queued and kept across its retries, so a
+    retry of a publish that was stored but whose ack was lost is dropped by the
+    duplicate window of the stream instead of being stored twice.
+    """
+
+    def __init__(
+        self,
+        nc: nats.aio.client.Client,
+        subject: str,
+        queue_size: int,
+        window: int,
+        max_retries: int,
+        retry_backoff: float,
+        headers: dict | None = None,
+    ):
+        self._js = nc.jetstream()
+        self._subject = subject
+        self._headers = headers
+        self._queue: asyncio.Queue[tuple[bytes, str]] = asyncio.Queue(maxsize=queue_size)
+        self._window = asyncio.Semaphore(window)
+        self._max_retries = max_retries
+        self._retry_backoff = retry_backoff
+        self._publish_latency = NATS_PUBLISH_LATENCY.labels(subject)
+        self._dispatcher: asyncio.Task | None = None
+        self._in_flight: set[asyncio.Task] = set()
+        self.published = 0
+        self.retried = 0
+        self.requeued = 0
+
+    def start(self):
+        """Starts the dispatcher task."""
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    def publish(self, payload: bytes, msg_id: str | None = None):
+        """
+        Queues an event for publishing without waiting for its ack, under `msg_id`
+        or a new random message id.
+        Raises PublisherQueueFullError when the queue is full.
+        """
+        try:
+            self._queue.put_nowait((payload, msg_id or uuid.uuid4().hex))
+        except asyncio.QueueFull:
+            raise PublisherQueueFullError(f"Publish queue is full ({self._queue.maxsize} events pending).")
+
+    async def _dispatch(self):
+        while True:
+            payload, msg_id = await self._queue.get()
+            await self._window.acquire()
+            task = asyncio.create_task(self._publish(payload, msg_id))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _publish(self, payload: bytes, msg_id: str):
+        try:
+            try:
+                published = await self._attempt(payload, msg_id)
+            finally:
+                self._window.release()
+            if not published:
+                # Waits for room with the window slot released, so the dispatcher keeps freeing the queue.
+                await self._queue.put((payload, msg_id))
+        finally:
+            self._queue.task_done()
+
+    async def _attempt(self, payload: bytes, msg_id: str) -> bool:
+        headers = {**(self._headers or {}), "Nats-Msg-Id": msg_id}
+        for attempt in range(self._max_retries + 1):
+            try:
+                with self._publish_latency.time():
+                    await self._js.publish(self._subject, payload, headers=headers)
+                self.published += 1
+                return True
+            except Exception as e:
+                if attempt == self._max_retries:
+                    self.requeued += 1
+                    logger.error("Failed to publish to NATS topic '%s' after %d attempts, requeueing the event. Error: %s", self._subject, attempt + 1, e)
+                    return False
+                self.retried += 1
+                await asyncio.sleep(self._retry_backoff * 2 ** attempt)
+
+    async def stop(self, timeout: float = 10.0):
+        """Waits for queued and in-flight events to be published, then stops the dispatcher."""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Publisher stopped with %d events not yet acknowledged.", self._queue.qsize() + len(self._in_flight))
+        tasks = [self._dispatcher, *self._in_flight] if self._dispatcher else list(self._in_flight)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        """Returns publisher counters and the current queue depth."""
+        return {
+            "queued": self._queue.qsize(),
+            "in_flight": len(self._in_flight),
+            "published": self.published,
+            "retried": self.retried,
+            "requeued": self.requeued,
+        }
@@ -4,53 +4,66 @@ import json
 import httpx
 
 from datetime import datetime, timedelta
-from passlib.context import CryptContext
 from pybreaker import CircuitBreakerError
+from fastapi.responses import StreamingResponse
 from dtos.dtos import UserCreateDTO, UserDTO
-from configuration.config import logger, SECRET_KEY
-from messaging.messaging import publish_offer_acceptance_event
-from services.services import get_credit_analysis_from_ml_service
+from configuration.config import logger as service_logger, SECRET_KEY, BULK_ANALYSIS_CHUNK_SIZE
+from messaging.messaging import publish_offer_acceptance_event, publish_offers_created_events
+from services.services import get_credit_analysis_from_ml_service, get_batch_credit_analysis_from_ml_service, CreditAnalysisResponseError
+from hashing.hashing import PasswordHasherOverloadedError
 from fastapi import APIRouter, Request, status, Query, HTTPException
-from models.models import CreditAnalysisResponse, AcceptOfferPayload, PaginatedOffersResponse, CreditOffer, CreditOfferListItem
-from database.database import fetch_paginated_offers, get_user_features, save_credit_offer, validate_offer_for_acceptance, insert_user, find_user_by_email
+from models.models import CreditAnalysisResponse, AcceptOfferPayload, PaginatedOffersResponse, CreditOffer, CreditOfferListItem, BulkCreditAnalysisRequest, CreditAnalysisError
+from pagination.pagination import encode_cursor, decode_cursor
+from database.database import count_user_offers, fetch_offers_page, fetch_offers_after, get_user_features, get_users_features, save_credit_offer, copy_credit_offers, validate_offer_for_acceptance, insert_user, find_user_by_email, update_user_password_hash
+
+logger = service_logger.getChild("api")
 
 router = APIRouter()
 
+MAX_APPROVED_RISK_SCORE = 0.6
+
+def build_offer_details(user_id: str, risk_score: float) -> dict:
+    """Computes the terms of the offer made to a user approved with `risk_score`."""
+    return {
+        "id": uuid.uuid4(), "user_id": user_id, "credit_limit": round(max(1000, (1 - risk_score) * 10000), 2),
+        "interest_rate": round(5.0 + (risk_score * 15), 2), "credit_type": "SHORT_TERM_PERSONAL_LOAN",
+        "expires_at": datetime.utcnow() + timedelta(days=7)
+    }
+
+def approved_analysis_response(offer_details: dict, risk_score: float) -> CreditAnalysisResponse:
+    return CreditAnalysisResponse(
+        user_id=offer_details['user_id'], approved=True, ml_risk_score=risk_score,
+        offer=CreditOffer(
+            offer_id=str(offer_details['id']), credit_limit=offer_details['credit_limit'], interest_rate=offer_details['interest_rate'],
+            credit_type=offer_details['credit_type'], expires_at=offer_details['expires_at'].isoformat()
+        )
+    )
+
+def denied_analysis_response(user_id: str, risk_score: float) -> CreditAnalysisResponse:
+    return CreditAnalysisResponse(user_id=user_id, approved=False, ml_risk_score=risk_score, reason="High risk score.")
+
 @router.get("/healthz", status_code=status.HTTP_200_OK, tags=["Monitoring"])
 async def health_check():
     return {"status": "ok"}
 
 @router.post("/v1/users/{user_id}/credit-analysis", response_model=CreditAnalysisResponse, tags=["Credit Analysis"])
 async def analyze_credit(user_id: str, request: Request):
-    logger.info(f"Starting credit analysis for user_id={user_id}")
+    logger.info("Starting credit analysis for user_id=%s", user_id)
 
-    redis_client = request.app.state.redis_client
-    cache_key = f"user_features:{user_id}"
-    feature_vector = None
-    try:
-        cached_features = await redis_client.get(cache_key)
-        if cached_features:
-            logger.info(f"Cache HIT for user_id={user_id}")
-            feature_vector = json.loads(cached_features)
-        else:
-            logger.info(f"Cache MISS for user_id={user_id}")
-            async with request.app.state.db_pool.acquire() as conn:
-                feature_vector = await get_user_features(conn, user_id)
-            await redis_client.setex(cache_key, 300, json.dumps(feature_vector))
-    except Exception as e:
-        logger.error(f"Redis error for user_id={user_id}: {e}. Falling back to database.")
+    cache = request.app.state.cache
+    features_key, ml_key = f"user_features:{user_id}", f"ml_result:{user_id}"
+
+    async def load_features():
         async with request.app.state.db_pool.acquire() as conn:
-            feature_vector = await get_user_features(conn, user_id)
+            return await get_user_features(conn, user_id)
+
+    async def load_ml_result():
+        feature_vector = await cache.get_or_load(features_key, load_features)
+        return await get_credit_analysis_from_ml_service(request.app.state.http_client, feature_vector)
+
     try:
-        ml_cache_key = f"ml_result:{user_id}"
-        cached_ml_result = await redis_client.get(ml_cache_key)
-        if cached_ml_result:
-            logger.info(f"Cache HIT for ML result for user_id={user_id}")
-            ml_result = json.loads(cached_ml_result)
-        else:
-            logger.info(f"Cache MISS for ML result for user_id={user_id}")
-            ml_result = await get_credit_analysis_from_ml_service(request.app.state.http_client, feature_vector)
-            await redis_client.setex(ml_cache_key, 300, json.dumps(ml_result))
+        cached = await cache.get_many({features_key: None, ml_key: load_ml_result})
+        ml_result = cached[ml_key]
         risk_score = ml_result.get("risk_score")
     except CircuitBreakerError:
         logger.error("Circuit breaker is open. Failing fast for ML service call.")
@@ -64,98 +77,202 @@ async def analyze_credit(user_id: str, request: Request):
             detail="Credit analysis service is unavailable."
         )
     except Exception as e:
-        logger.error(f"An unexpected error occurred calling the ML service: {e}")
+        logger.error("An unexpected error occurred calling the ML service: %s", e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An internal error occurred during credit analysis.")
     if risk_score is None:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Invalid response from analysis service.")
-    if risk_score > 0.6:
-        logger.info(f"Analysis denied for user_id={user_id} with score={risk_score}")
-        return CreditAnalysisResponse(user_id=user_id, approved=False, ml_risk_score=risk_score, reason="High risk score.")
+    if risk_score > MAX_APPROVED_RISK_SCORE:
+        logger.info("Analysis denied for user_id=%s with score=%s", user_id, risk_score)
+        return denied_analysis_response(user_id, risk_score)
     
-    offer_id = uuid.uuid4()
-    credit_limit = round(max(1000, (1 - risk_score) * 10000), 2)
-    interest_rate = round(5.0 + (risk_score * 15), 2)
-    expires_at = datetime.utcnow() + timedelta(days=7)
-    
-    offer_details = {
-        "id": offer_id, "user_id": user_id, "credit_limit": credit_limit, 
-        "interest_rate": interest_rate, "credit_type": "SHORT_TERM_PERSONAL_LOAN", "expires_at": expires_at
-    }
+    offer_details = build_offer_details(user_id, risk_score)
     
     async with request.app.state.db_pool.acquire() as conn:
         await save_credit_offer(conn, offer_details)
+    await announce_saved_offers(request.app.state, [offer_details])
     
-    logger.info(f"Offer {offer_id} saved in database for user_id={user_id}")
-    return CreditAnalysisResponse(
-        user_id=user_id, approved=True, ml_risk_score=risk_score,
-        offer=CreditOffer(
-            offer_id=str(offer_id), credit_limit=credit_limit, interest_rate=interest_rate,
-            credit_type=offer_details['credit_type'], expires_at=expires_at.isoformat()
-        )
-    )
+    logger.info("Offer %s saved in database for user_id=%s", offer_details['id'], user_id)
+    return approved_analysis_response(offer_details, risk_score)
+
+async def announce_saved_offers(state, offers: list[dict]):
+    """
+    Drops the cached offer counts of the users of newly saved offers and publishes their creation events.
+    The offers are already committed, so failures are only logged: answering with an error would
+    make clients retry the analysis and save the offers again.
+    """
+    try:
+        await state.cache.invalidate_many([f"offers_count:{canonical_user_id(str(offer['user_id']))}" for offer in offers])
+    except Exception as e:
+        logger.error("Failed to invalidate the offer counts of %d saved offers: %s", len(offers), e)
+    try:
+        await publish_offers_created_events(state.nats_conn, offers)
+    except Exception as e:
+        logger.error("Failed to publish the creation events of %d saved offers: %s", len(offers), e)
+
+async def analyze_credit_chunk(state, user_ids: list[str]) -> list[CreditAnalysisResponse | CreditAnalysisError]:
+    """
+    Analyzes a chunk of users with one features query, one batch ML call and one COPY of the offers.
+    Returns one result per user, in order; users that could not be analyzed get a CreditAnalysisError.
+    """
+    results = {}
+    user_uuids = {}
+    offers = []
+    for user_id in user_ids:
+        try:
+            user_uuids[uuid.UUID(user_id)] = user_id
+        except ValueError:
+            results[user_id] = CreditAnalysisError(user_id=user_id, error="Invalid user id.")
+
+    try:
+        async with state.db_pool.acquire() as conn:
+            features = await get_users_features(conn, list(user_uuids))
+        for user_uuid, user_id in user_uuids.items():
+            if user_uuid not in features:
+                results[user_id] = CreditAnalysisError(user_id=user_id, error="User not found.")
+        scored_user_ids = [user_uuids[user_uuid] for user_uuid in features]
+        risk_scores = await get_batch_credit_analysis_from_ml_service(state.http_client, list(features.values())) if features else []
+
+        for user_id, risk_score in zip(scored_user_ids, risk_scores):
+            if risk_score > MAX_APPROVED_RISK_SCORE:
+                results[user_id] = denied_analysis_response(user_id, risk_score)
+                continue
+            offer_details = build_offer_details(user_id, risk_score)
+            offers.append(offer_details)
+            results[user_id] = approved_analysis_response(offer_details, risk_score)
+        if offers:
+            async with state.db_pool.acquire() as conn:
+                await copy_credit_offers(conn, offers)
+    except (CircuitBreakerError, httpx.HTTPError) as e:
+        logger.error("Credit analysis service call failed for a bulk chunk of %d users: %s", len(user_ids), e)
+        return [results.get(user_id) or CreditAnalysisError(user_id=user_id, error="Credit analysis service is unavailable.") for user_id in user_ids]
+    except CreditAnalysisResponseError as e:
+        logger.error("Credit analysis service answered a bulk chunk of %d users with an invalid response: %s", len(user_ids), e)
+        return [results.get(user_id) or CreditAnalysisError(user_id=user_id, error="Credit analysis service returned an invalid response.") for user_id in user_ids]
+    except Exception as e:
+        logger.error("An unexpected error occurred during a bulk chunk of %d users: %s", len(user_ids), e)
+        return [
+            result if isinstance(result := results.get(user_id), CreditAnalysisError)
+            else CreditAnalysisError(user_id=user_id, error="An internal error occurred during credit analysis.")
+            for user_id in user_ids
+        ]
+    if offers:
+        await announce_saved_offers(state, offers)
+    return [results[user_id] for user_id in user_ids]
+
+def canonical_user_id(user_id: str) -> str:
+    """Returns the canonical form of a user id, so every spelling of the same UUID is analyzed once; invalid ids are kept as sent."""
+    try:
+        return str(uuid.UUID(user_id))
+    except ValueError:
+        return user_id
+
+async def stream_bulk_credit_analysis(state, user_ids: list[str]):
+    for start in range(0, len(user_ids), BULK_ANALYSIS_CHUNK_SIZE):
+        results = await analyze_credit_chunk(state, user_ids[start:start + BULK_ANALYSIS_CHUNK_SIZE])
+        yield "".join(result.model_dump_json() + "\n" for result in results)
+
+@router.post("/v1/credit-analysis:batch", tags=["Credit Analysis"])
+async def analyze_credit_batch(payload: BulkCreditAnalysisRequest, request: Request):
+    """
+    Analyzes the credit of a cohort of users, streaming one NDJSON result per user as each chunk completes.
+    Ids are answered in their canonical form, and duplicates, whatever their spelling, are analyzed once.
+    """
+    user_ids = list(dict.fromkeys(canonical_user_id(user_id) for user_id in payload.user_ids))
+    logger.info("Starting bulk credit analysis of %d users", len(user_ids))
+    return StreamingResponse(stream_bulk_credit_analysis(request.app.state, user_ids), media_type="application/x-ndjson")
 
 @router.post("/v1/credit-offers/{offer_id}/accept", status_code=status.HTTP_202_ACCEPTED, tags=["Credit Analysis"])
 async def accept_credit_offer(offer_id: str, payload: AcceptOfferPayload, request: Request):
-    logger.info(f"User {payload.user_id} attempting to accept offer {offer_id}")
+    logger.info("User %s attempting to accept offer %s", payload.user_id, offer_id)
     async with request.app.state.db_pool.acquire() as conn:
         offer_data = await validate_offer_for_acceptance(conn, offer_id, payload.user_id)
     if not offer_data:
-        logger.warning(f"Attempt to accept invalid or expired offer {offer_id} by user {payload.user_id}")
+        logger.warning("Attempt to accept invalid or expired offer %s by user %s", offer_id, payload.user_id)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Offer not found, expired or already processed.")
     await publish_offer_acceptance_event(request.app.state.nats_conn, offer_data)
+    await request.app.state.cache.invalidate(f"ml_result:{payload.user_id}")
     return {"status": "offer acceptance is being processed"}
 
 @router.get("/v1/users/{user_id}/offers", response_model=PaginatedOffersResponse, tags=["Credit Offers"])
 async def get_user_offers(
     user_id: str,
     request: Request,
-    page: int = Query(1, ge=1, description="Page number"),
-    page_size: int = Query(10, ge=1, le=100, description="Items per page")
+    page: int = Query(1, ge=1, description="Page number, ignored when a cursor is given"),
+    page_size: int = Query(10, ge=1, le=100, description="Items per page"),
+    cursor: str | None = Query(None, description="Opaque cursor returned as next_cursor by the previous page"),
+    include_total: bool = Query(True, description="Whether to return the total number of offers")
 ):
-    logger.info(f"Fetching offers for user_id={user_id}, page={page}, page_size={page_size}")
-    offset = (page - 1) * page_size
+    logger.info("Fetching offers for user_id=%s, page=%s, page_size=%s, cursor=%s", user_id, page, page_size, cursor)
+    if cursor is not None:
+        try:
+            after_created_at, after_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor.")
     async with request.app.state.db_pool.acquire() as conn:
-        total_count, records = await fetch_paginated_offers(conn, user_id, page_size, offset)
+        if cursor is not None:
+            records = await fetch_offers_after(conn, user_id, page_size + 1, after_created_at, after_id)
+        else:
+            records = await fetch_offers_page(conn, user_id, page_size + 1, (page - 1) * page_size)
+
+    has_more = len(records) > page_size
+    records = records[:page_size]
+    next_cursor = encode_cursor(records[-1]['created_at'], records[-1]['id']) if has_more else None
     items = [
         CreditOfferListItem(
             offer_id=str(r['id']), status=r['status'], credit_limit=r['credit_limit'],
             interest_rate=r['interest_rate'], created_at=r['created_at'], expires_at=r['expires_at']
         ) for r in records
     ]
-    return PaginatedOffersResponse(total=total_count, page=page, page_size=page_size, items=items)
+
+    total = None
+    if include_total:
+        async def load_count():
+            async with request.app.state.db_pool.acquire() as conn:
+                return await count_user_offers(conn, user_id)
+        total = await request.app.state.cache.get_or_load(f"offers_count:{canonical_user_id(user_id)}", load_count)
+
+    return PaginatedOffersResponse(
+        total=total, page=page if cursor is None else None, page_size=page_size, items=items, next_cursor=next_cursor
+    )
 
 
 auth_router = APIRouter()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+PASSWORD_HASHER_OVERLOADED = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Too many authentication requests. Please try again later."
+)
 
 @auth_router.post("/v1/register", response_model=UserDTO, tags=["Auth"])
 async def register_user(payload: UserCreateDTO, request: Request):
-    logger.info(f"Attempting to register user: {payload.email}")
+    logger.info("Attempting to register user: %s", payload.email)
     redis_client = request.app.state.redis_client
     cache_key = f"user_email:{payload.email}"
     existing_user = None
     try:
         cached_user = await redis_client.get(cache_key)
         if cached_user:
-            logger.info(f"Cache HIT for email={payload.email}")
+            logger.info("Cache HIT for email=%s", payload.email)
             existing_user = json.loads(cached_user)
         else:
-            logger.info(f"Cache MISS for email={payload.email}")
+            logger.info("Cache MISS for email=%s", payload.email)
             async with request.app.state.db_pool.acquire() as conn:
                 existing_user = await find_user_by_email(conn, payload.email)
             if existing_user:
                 user_dict_for_cache = {k: str(v) if isinstance(v, (uuid.UUID, datetime)) else v for k, v in dict(existing_user).items()}
                 await redis_client.setex(cache_key, 300, json.dumps(user_dict_for_cache))
     except Exception as e:
-        logger.error(f"Redis error for email={payload.email}: {e}. Falling back to database.")
+        logger.error("Redis error for email=%s: %s. Falling back to database.", payload.email, e)
         async with request.app.state.db_pool.acquire() as conn:
             existing_user = await find_user_by_email(conn, payload.email)
             
     if existing_user:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already registered.")
         
-    password_hash = pwd_context.hash(payload.password)
+    try:
+        password_hash = await request.app.state.password_hasher.hash(payload.password)
+    except PasswordHasherOverloadedError:
+        raise PASSWORD_HASHER_OVERLOADED
     async with request.app.state.db_pool.acquire() as conn:
         user = await insert_user(conn, payload.email, password_hash)
         
@@ -164,7 +281,7 @@ async def register_user(payload: UserCreateDTO, request: Request):
         user_dict_for_cache = {k: str(v) if isinstance(v, (uuid.UUID, datetime)) else v for k, v in dict(user).items()}
         await redis_client.setex(cache_key, 300, json.dumps(user_dict_for_cache))
     except Exception as e:
-        logger.error(f"Error caching new user: {e}")
+        logger.error("Error caching new user: %s", e)
         
     return UserDTO(
         id=str(user["id"]),
@@ -175,24 +292,24 @@ async def register_user(payload: UserCreateDTO, request: Request):
 
 @auth_router.post("/v1/login", response_model=object, tags=["Auth"])
 async def login_user(payload: UserCreateDTO, request: Request):
-    logger.info(f"Attempting login for user: {payload.email}")
+    logger.info("Attempting login for user: %s", payload.email)
     redis_client = request.app.state.redis_client
     cache_key = f"user_email:{payload.email}"
     user = None
     try:
         cached_user = await redis_client.get(cache_key)
         if cached_user:
-            logger.info(f"Cache HIT for email={payload.email}")
+            logger.info("Cache HIT for email=%s", payload.email)
             user = json.loads(cached_user)
         else:
-            logger.info(f"Cache MISS for email={payload.email}")
+            logger.info("Cache MISS for email=%s", payload.email)
             async with request.app.state.db_pool.acquire() as conn:
                 user = await find_user_by_email(conn, payload.email)
             if user:
                 user_dict_for_cache = {k: str(v) if isinstance(v, (uuid.UUID, datetime)) else v for k, v in dict(user).items()}
                 await redis_client.setex(cache_key, 300, json.dumps(user_dict_for_cache))
     except Exception as e:
-        logger.error(f"Redis error for email={payload.email}: {e}. Falling back to database.")
+        logger.error("Redis error for email=%s: %s. Falling back to database.", payload.email, e)
         async with request.app.state.db_pool.acquire() as conn:
             user = await find_user_by_email(conn, payload.email)
 
@@ -205,8 +322,22 @@ async def login_user(payload: UserCreateDTO, request: Request):
             db_user = await find_user_by_email(conn, payload.email)
             password_hash_to_verify = db_user["password_hash"] if db_user else None
 
-    if not password_hash_to_verify or not pwd_context.verify(payload.password, password_hash_to_verify):
+    if not password_hash_to_verify:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials.")
+    try:
+        is_valid, new_password_hash = await request.app.state.password_hasher.verify_and_update(payload.password, password_hash_to_verify)
+    except PasswordHasherOverloadedError:
+        raise PASSWORD_HASHER_OVERLOADED
+    if not is_valid:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials.")
+    if new_password_hash:
+        try:
+            async with request.app.state.db_pool.acquire() as conn:
+                await update_user_password_hash(conn, user["id"], new_password_hash)
+            await redis_client.delete(cache_key)
+            logger.info("Password hash of user %s re-hashed with the current cost.", user['id'])
+        except Exception as e:
+            logger.error("Error re-hashing password for email=%s: %s", payload.email, e)
     
     ALGORITHM = "HS256"
     expire = datetime.utcnow() + timedelta(days=12)
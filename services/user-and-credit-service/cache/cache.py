@@ -0,0 +1,237 @@
+import json
+import time
+import random
+import asyncio
+
+from functools import partial
+from dataclasses import dataclass
+from collections import OrderedDict
+from configuration.config import logger
+from metrics.metrics import REDIS_LATENCY, REDIS_CACHE_REQUESTS
+
+@dataclass
+class CacheEntry:
+    """
+    A decoded value held in the local tier, with its approximate size in bytes.
+    """
+    value: object
+    size: int
+    fresh_until: float
+    stale_until: float
+
+class TwoTierCache:
+    """
+    In-process TTL + LRU cache in front of Redis.
+
+    A fresh local entry is served without any network round trip. Once it expires it is still
+    served for `stale_ttl` seconds while a background task reloads it; after that the value is
+    read from Redis, and finally from the loader, which writes it back to both tiers. TTLs are
+    jittered so that keys written together do not expire together. The local tier is bounded by
+    the size of the JSON encoding of its values, and invalidations are broadcast to the other
+    replicas over Redis pub/sub. A load running when its key is invalidated still answers the
+    callers that were waiting for it but writes its value to neither tier, since it may have read
+    the data the invalidation replaced; the next miss starts a new load.
+    """
+
+    def __init__(self, redis_client, ttl: int, stale_ttl: int, jitter: float, max_bytes: int, channel: str):
+        self._redis = redis_client
+        self._ttl = ttl
+        self._stale_ttl = stale_ttl
+        self._jitter = jitter
+        self._max_bytes = max_bytes
+        self._channel = channel
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._bytes = 0
+        self._loading: dict[str, asyncio.Task] = {}
+        self._listener: asyncio.Task | None = None
+        self._redis_mget_latency = REDIS_LATENCY.labels("mget")
+        self.local_hits = 0
+        self.stale_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def start(self):
+        """Starts listening for invalidations from the other replicas."""
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        """Stops the invalidation listener and any background reload."""
+        tasks = [*self._loading.values(), *([self._listener] if self._listener else [])]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def get_or_load(self, key: str, loader):
+        """
+        Returns the value of `key`, calling the `loader` coroutine function only when neither tier has it.
+        """
+        return (await self.get_many({key: loader}))[key]
+
+    async def get_many(self, loaders: dict) -> dict:
+        """
+        Returns the values of several keys at once.
+
+        Keys missing from the local tier are read from Redis with a single pipelined MGET, and the
+        loaders of the keys neither tier has are then called in order. A key whose loader is None is
+        only prefetched into the local tier, and left out of the result if neither tier has it.
+        Concurrent misses of the same key share a single loader call.
+        """
+        values = {}
+        remote_keys = []
+        now = time.monotonic()
+        for key, loader in loaders.items():
+            entry = self._entries.get(key)
+            if entry is None or now >= entry.stale_until:
+                remote_keys.append(key)
+                continue
+            self._entries.move_to_end(key)
+            if now < entry.fresh_until:
+                self.local_hits += 1
+            else:
+                self.stale_hits += 1
+                if loader is not None:
+                    self._start_load(key, loader)
+            values[key] = entry.value
+
+        if remote_keys:
+            for key, (raw, ttl_ms) in (await self._read_redis(remote_keys)).items():
+                self.redis_hits += 1
+                values[key] = json.loads(raw)
+                self._store(key, values[key], len(raw), ttl_ms / 1000 if ttl_ms > 0 else self._jittered_ttl())
+
+        for key, loader in loaders.items():
+            if key not in values and loader is not None:
+                self.misses += 1
+                values[key] = await asyncio.shield(self._start_load(key, loader))
+        return values
+
+    async def invalidate(self, key: str):
+        """Drops `key` from both tiers and tells the other replicas to drop it from theirs."""
+        self._drop(key)
+        try:
+            await self._redis.delete(key)
+            await self._redis.publish(self._channel, key)
+        except Exception as e:
+            logger.error("Could not invalidate cache key %s in Redis: %s", key, e)
+
+    async def invalidate_many(self, keys: list[str]):
+        """Like `invalidate`, for several keys at once in a single Redis round trip."""
+        for key in keys:
+            self._drop(key)
+        pipeline = self._redis.pipeline(transaction=False)
+        pipeline.delete(*keys)
+        for key in keys:
+            pipeline.publish(self._channel, key)
+        try:
+            await pipeline.execute()
+        except Exception as e:
+            logger.error("Could not invalidate %d cache keys in Redis: %s", len(keys), e)
+
+    async def _load(self, key: str, loader):
+        task = asyncio.current_task()
+        value = await loader()
+        if self._loading.get(key) is not task:
+            return value
+        raw = json.dumps(value)
+        ttl = self._jittered_ttl()
+        self._store(key, value, len(raw), ttl)
+        try:
+            await self._redis.setex(key, max(1, round(ttl)), raw)
+            if self._loading.get(key) is not task:
+                # Invalidated while the write was in flight, whose DEL may have run first.
+                await self._redis.delete(key)
+        except Exception as e:
+            logger.error("Could not write cache key %s to Redis: %s", key, e)
+        return value
+
+    def _start_load(self, key: str, loader) -> asyncio.Task:
+        """Starts loading `key`, or returns the load of `key` that is already running."""
+        task = self._loading.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+        task = asyncio.create_task(self._load(key, loader))
+        self._loading[key] = task
+        task.add_done_callback(partial(self._load_done, key))
+        return task
+
+    def _load_done(self, key: str, task: asyncio.Task):
+        if self._loading.get(key) is task:
+            del self._loading[key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Loading cache key %s failed: %s", key, task.exception())
+
+    async def _read_redis(self, keys: list[str]) -> dict[str, tuple[str, int]]:
+        """Reads the values of `keys` and their remaining TTLs in a single round trip."""
+        pipeline = self._redis.pipeline(transaction=False)
+        pipeline.mget(keys)
+        for key in keys:
+            pipeline.pttl(key)
+        try:
+            with self._redis_mget_latency.time():
+                raws, *ttls = await pipeline.execute()
+        except Exception as e:
+            logger.error("Redis error reading cache keys %s: %s", keys, e)
+            return {}
+        found = {key: (raw, ttl_ms) for key, raw, ttl_ms in zip(keys, raws, ttls) if raw is not None}
+        REDIS_CACHE_REQUESTS.labels("hit").inc(len(found))
+        REDIS_CACHE_REQUESTS.labels("miss").inc(len(keys) - len(found))
+        return found
+
+    def _jittered_ttl(self) -> float:
+        return self._ttl * random.uniform(1 - self._jitter, 1 + self._jitter)
+
+    def _store(self, key: str, value, size: int, ttl: float):
+        self._discard(key)
+        now = time.monotonic()
+        self._entries[key] = CacheEntry(value, size, now + ttl, now + ttl + self._stale_ttl)
+        self._bytes += size
+        while self._bytes > self._max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self.evictions += 1
+
+    def _discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _drop(self, key: str):
+        """Discards an invalidated key and fences off its running load, if any."""
+        self._discard(key)
+        self._loading.pop(key, None)
+
+    async def _listen(self):
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(self._channel)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._drop(message["data"])
+                        self.invalidations += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Cache invalidation listener error: %s. Resubscribing...", e)
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def stats(self) -> dict:
+        """Returns the size of the local tier and its hit, miss and eviction counters."""
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self._max_bytes,
+            "local_hits": self.local_hits,
+            "stale_hits": self.stale_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
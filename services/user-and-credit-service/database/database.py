@@ -1,31 +1,86 @@
 import uuid
 
-async def get_user_features(db_conn, user_id: str) -> dict:
-    """Fetches aggregated user data to form a feature vector."""
-    emotional_query = """
+from datetime import datetime
+from metrics.metrics import timed_query
+
+USER_FEATURES_QUERY = """
+SELECT e.avg_positivity, e.stress_events, t.tx_count, t.avg_tx_value
+FROM (
     SELECT AVG(avg_positivity_score) as avg_positivity, SUM(event_count) as stress_events
-    FROM emotional_events_summary 
-    WHERE user_id = $1 AND summary_date >= NOW() - INTERVAL '7 days';
+    FROM emotional_events_summary
+    WHERE user_id = $1 AND summary_date >= NOW() - INTERVAL '7 days'
+) e
+CROSS JOIN (
+    SELECT COALESCE(SUM(tx_count), 0) as tx_count, SUM(tx_amount_sum) / NULLIF(SUM(tx_count), 0) as avg_tx_value
+    FROM transaction_daily_rollup
+    WHERE user_id = $1 AND rollup_date > (NOW() AT TIME ZONE 'UTC')::date - 30
+) t;
+"""
+
+USERS_FEATURES_QUERY = """
+SELECT u.id AS user_id, e.avg_positivity, e.stress_events, COALESCE(t.tx_count, 0) AS tx_count, t.avg_tx_value
+FROM users u
+LEFT JOIN (
+    SELECT user_id, AVG(avg_positivity_score) as avg_positivity, SUM(event_count) as stress_events
+    FROM emotional_events_summary
+    WHERE user_id = ANY($1::uuid[]) AND summary_date >= NOW() - INTERVAL '7 days'
+    GROUP BY user_id
+) e ON e.user_id = u.id
+LEFT JOIN (
+    SELECT user_id, SUM(tx_count) as tx_count, SUM(tx_amount_sum) / NULLIF(SUM(tx_count), 0) as avg_tx_value
+    FROM transaction_daily_rollup
+    WHERE user_id = ANY($1::uuid[]) AND rollup_date > (NOW() AT TIME ZONE 'UTC')::date - 30
+    GROUP BY user_id
+) t ON t.user_id = u.id
+WHERE u.id = ANY($1::uuid[]);
+"""
+
+CREDIT_OFFER_COLUMNS = ["id", "user_id", "status", "credit_limit", "interest_rate", "credit_type", "expires_at"]
+
+def feature_vector_from_row(row) -> dict:
+    """Builds the ML feature vector from a row of aggregates, filling in the defaults of users without data."""
+    return {
+        "transaction_count_30d": row['tx_count'],
+        "avg_transaction_value_30d": float(row['avg_tx_value'] or 0.0),
+        "avg_positivity_7d": row['avg_positivity'] if row['avg_positivity'] is not None else 0.5,
+        "stress_events_30d": row['stress_events'] if row['stress_events'] is not None else 0
+    }
+
+@timed_query
+async def get_user_features(db_conn, user_id: str) -> dict:
     """
-    emotional_data = await db_conn.fetchrow(emotional_query, user_id)
+    Fetches aggregated user data to form a feature vector, in a single round trip.
 
-    transactional_query = """
-    SELECT COUNT(*) as tx_count, AVG(amount) as avg_tx_value
-    FROM transactions 
-    WHERE user_id = $1 AND created_at >= NOW() - INTERVAL '30 days';
+    Both aggregates always return exactly one row, so the cross join yields one row as well.
+    The query text is constant, so asyncpg prepares it once per connection and reuses it from its statement cache.
     """
-    transactional_data = await db_conn.fetchrow(transactional_query, user_id)
+    row = await db_conn.fetchrow(USER_FEATURES_QUERY, user_id)
+    return feature_vector_from_row(row)
 
-    feature_vector = {
-        "transaction_count_30d": transactional_data['tx_count'] if transactional_data else 0,
-        "avg_transaction_value_30d": float(transactional_data['avg_tx_value'] or 0.0),
-        "avg_positivity_7d": emotional_data['avg_positivity'] if emotional_data and emotional_data['avg_positivity'] is not None else 0.5,
-        "stress_events_30d": emotional_data['stress_events'] if emotional_data and emotional_data['stress_events'] is not None else 0
-    }
-    import logging
-    logging.info(f"Feature vector for ML: {feature_vector}")
-    return feature_vector
+@timed_query
+async def get_users_features(db_conn, user_ids: list[uuid.UUID]) -> dict[uuid.UUID, dict]:
+    """
+    Fetches the feature vectors of many users with one set-based query.
+
+    Each aggregate is grouped by user over the requested ids only. Ids that do not belong
+    to any user are left out of the result.
+    """
+    rows = await db_conn.fetch(USERS_FEATURES_QUERY, user_ids)
+    return {row['user_id']: feature_vector_from_row(row) for row in rows}
+
+@timed_query
+async def copy_credit_offers(db_conn, offers: list[dict]):
+    """Saves many new credit offers with a single COPY."""
+    await db_conn.copy_records_to_table(
+        "credit_limits",
+        records=[
+            (o['id'], o['user_id'], 'offered', o['credit_limit'], o['interest_rate'], o['credit_type'], o['expires_at'])
+            for o in offers
+        ],
+        columns=CREDIT_OFFER_COLUMNS
+    )
 
+@timed_query
 async def save_credit_offer(db_conn, offer_details: dict):
     """Saves a new credit offer to the database."""
     insert_query = """
@@ -42,6 +97,7 @@ async def save_credit_offer(db_conn, offer_details: dict):
         offer_details['expires_at']
     )
 
+@timed_query
 async def validate_offer_for_acceptance(db_conn, offer_id: str, user_id: str):
     """Validates if an offer is valid for acceptance."""
     validation_query = """
@@ -51,22 +107,41 @@ async def validate_offer_for_acceptance(db_conn, offer_id: str, user_id: str):
     """
     return await db_conn.fetchrow(validation_query, uuid.UUID(offer_id), user_id)
 
-async def fetch_paginated_offers(db_conn, user_id: str, page_size: int, offset: int):
-    """Fetches a paginated list of offers for a user."""
-    count_query = "SELECT COUNT(*) FROM credit_limits WHERE user_id = $1;"
-    total_count = await db_conn.fetchval(count_query, user_id)
-    
-    offers_query = """
-    SELECT id, status, credit_limit, interest_rate, created_at, expires_at
+OFFER_LIST_COLUMNS = "id, status, credit_limit, interest_rate, created_at, expires_at"
+
+@timed_query
+async def count_user_offers(db_conn, user_id: str) -> int:
+    """Counts the offers of a user."""
+    return await db_conn.fetchval("SELECT COUNT(*) FROM credit_limits WHERE user_id = $1;", user_id)
+
+@timed_query
+async def fetch_offers_page(db_conn, user_id: str, limit: int, offset: int):
+    """Fetches a page of a user's offers, newest first, by offset."""
+    offers_query = f"""
+    SELECT {OFFER_LIST_COLUMNS}
     FROM credit_limits
     WHERE user_id = $1
-    ORDER BY created_at DESC
+    ORDER BY created_at DESC, id DESC
     LIMIT $2 OFFSET $3;
     """
-    records = await db_conn.fetch(offers_query, user_id, page_size, offset)
-    
-    return total_count, records
+    return await db_conn.fetch(offers_query, user_id, limit, offset)
 
+@timed_query
+async def fetch_offers_after(db_conn, user_id: str, limit: int, created_at: datetime, offer_id: uuid.UUID):
+    """
+    Fetches a page of a user's offers, newest first, that come after the offer (created_at, offer_id).
+    The row comparison lets idx_credit_limits_user_id_created_at seek straight to the cursor, whatever the page depth.
+    """
+    offers_query = f"""
+    SELECT {OFFER_LIST_COLUMNS}
+    FROM credit_limits
+    WHERE user_id = $1 AND (created_at, id) < ($3, $4)
+    ORDER BY created_at DESC, id DESC
+    LIMIT $2;
+    """
+    return await db_conn.fetch(offers_query, user_id, limit, created_at, offer_id)
+
+@timed_query
 async def insert_user(db_conn, email: str, password_hash: str):
     """
     Inserts a new user into the users table.
@@ -79,6 +154,7 @@ async def insert_user(db_conn, email: str, password_hash: str):
     """
     return await db_conn.fetchrow(query, email, password_hash)
 
+@timed_query
 async def find_user_by_email(db_conn, email: str):
     """
     Finds a user by email.
@@ -90,3 +166,15 @@ async def find_user_by_email(db_conn, email: str):
     WHERE email = $1;
     """
     return await db_conn.fetchrow(query, email)
+
+@timed_query
+async def update_user_password_hash(db_conn, user_id, password_hash: str):
+    """
+    Replaces the password hash of a user.
+    """
+    query = """
+    UPDATE users
+    SET password_hash = $2, updated_at = NOW()
+    WHERE id = $1;
+    """
+    await db_conn.execute(query, user_id, password_hash)
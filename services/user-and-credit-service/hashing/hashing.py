@@ -0,0 +1,76 @@
+import asyncio
+import multiprocessing
+
+from functools import lru_cache
+from passlib.context import CryptContext
+from concurrent.futures import ProcessPoolExecutor
+
+@lru_cache(maxsize=None)
+def build_crypt_context(rounds: int) -> CryptContext:
+    """
+    Builds the bcrypt context for a cost factor. Hashes made with any other cost are flagged for an update.
+    """
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+def hash_password(password: str, rounds: int) -> str:
+    return build_crypt_context(rounds).hash(password)
+
+def verify_and_update_password(password: str, password_hash: str, rounds: int) -> tuple[bool, str | None]:
+    return build_crypt_context(rounds).verify_and_update(password, password_hash)
+
+class PasswordHasherOverloadedError(Exception):
+    """Raised when too many hashing requests are already waiting for a worker."""
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification in a dedicated process pool, off the event loop.
+
+    The workers are spawned rather than forked: the service already runs the event loop and the
+    logging listener thread, and a forked child could inherit one of their locks held.
+
+    At most `max_concurrency` operations run at once and at most `max_queued` wait for a slot;
+    beyond that, callers fail fast with PasswordHasherOverloadedError.
+    """
+
+    def __init__(self, workers: int, rounds: int, max_concurrency: int, max_queued: int):
+        self.rounds = rounds
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._max_queued = max_queued
+        self._queued = 0
+
+    async def _run(self, fn, *args):
+        if self._semaphore.locked() and self._queued >= self._max_queued:
+            raise PasswordHasherOverloadedError()
+        self._queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._queued -= 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        """Hashes a password with the configured cost."""
+        return await self._run(hash_password, password, self.rounds)
+
+    async def verify_and_update(self, password: str, password_hash: str) -> tuple[bool, str | None]:
+        """
+        Verifies a password against its hash.
+
+        Returns:
+            A tuple (valid, new_hash) where new_hash is set when the stored hash should be replaced
+            because it was made with a different cost.
+        """
+        return await self._run(verify_and_update_password, password, password_hash, self.rounds)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -5,7 +5,13 @@ import redis.asyncio as redis
 
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
-from configuration.config import logger, DATABASE_URL, NATS_URL, REDIS_URL
+from cache.cache import TwoTierCache
+from hashing.hashing import PasswordHasher
+from metrics.metrics import MeteredPool, MeteredRedis, register_stats
+from configuration.config import (
+    logger, DATABASE_URL, NATS_URL, REDIS_URL, PASSWORD_HASH_WORKERS, PASSWORD_HASH_ROUNDS, PASSWORD_HASH_MAX_CONCURRENCY, PASSWORD_HASH_MAX_QUEUED,
+    CACHE_TTL, CACHE_STALE_TTL, CACHE_TTL_JITTER, CACHE_MAX_BYTES, CACHE_INVALIDATION_CHANNEL
+)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -14,15 +20,25 @@ async def lifespan(app: FastAPI):
     """
     logger.info("Initializing service connections...")
     try:
-        app.state.db_pool = await asyncpg.create_pool(DATABASE_URL, min_size=1, max_size=10)
+        app.state.db_pool = MeteredPool(await asyncpg.create_pool(DATABASE_URL, min_size=1, max_size=10))
         app.state.http_client = httpx.AsyncClient(timeout=5.0)
         app.state.nats_conn = await nats.connect(NATS_URL, name="user_credit_service")
-        app.state.redis_client = redis.from_url(REDIS_URL, encoding="utf-8", decode_responses=True)
+        app.state.redis_client = MeteredRedis(redis.from_url(REDIS_URL, encoding="utf-8", decode_responses=True))
         await app.state.redis_client.ping()
+        app.state.cache = TwoTierCache(
+            app.state.redis_client, CACHE_TTL, CACHE_STALE_TTL, CACHE_TTL_JITTER, CACHE_MAX_BYTES, CACHE_INVALIDATION_CHANNEL
+        )
+        app.state.cache.start()
+        register_stats("ecs_cache", app.state.cache.stats)
+        app.state.password_hasher = PasswordHasher(
+            PASSWORD_HASH_WORKERS, PASSWORD_HASH_ROUNDS, PASSWORD_HASH_MAX_CONCURRENCY, PASSWORD_HASH_MAX_QUEUED
+        )
         logger.info("All connections were successfully established.")
         yield
     finally:
         logger.info("Closing service connections...")
+        if hasattr(app.state, 'cache'):
+            await app.state.cache.stop()
         if hasattr(app.state, 'db_pool'):
             await app.state.db_pool.close()
         if hasattr(app.state, 'http_client'):
@@ -31,4 +47,6 @@ async def lifespan(app: FastAPI):
             await app.state.nats_conn.close()
         if hasattr(app.state, 'redis_client'):
             await app.state.redis_client.close()
+        if hasattr(app.state, 'password_hasher'):
+            app.state.password_hasher.shutdown()
         logger.info("All connections have been closed.")
@@ -1,12 +1,14 @@
 from fastapi import FastAPI
 from api.api import router as api_router, auth_router
 from lifespan.lifespan import lifespan
+from metrics.metrics import instrument_app
 
 app = FastAPI(
     lifespan=lifespan,
     title="User & Credit Service",
     version="1.0.0"
 )
+instrument_app(app)
 
 app.include_router(api_router)
 app.include_router(auth_router)
@@ -1,20 +1,43 @@
-import json
 import nats
+import uuid
 
 from datetime import datetime
-from configuration.config import logger, NATS_ACCEPT_SUBJECT
+from metrics.metrics import NATS_PUBLISH_LATENCY
+from configuration.config import logger as service_logger, NATS_ACCEPT_SUBJECT, NATS_OFFER_CREATED_SUBJECT, EVENT_CONTENT_TYPE
+from events.events import CreditOfferAcceptedEvent, OfferCreatedEvent, encode_event, event_headers, check_content_type
+
+logger = service_logger.getChild("messaging")
+
+EVENT_HEADERS = event_headers(check_content_type(EVENT_CONTENT_TYPE))
 
 async def publish_offer_acceptance_event(nats_conn: nats.aio.client.Client, offer_data):
     """
     Publishes an offer acceptance event to NATS.
     """
-    event_data = {
-        "offerId": str(offer_data['id']),
-        "userId": str(offer_data['user_id']),
-        "creditLimit": float(offer_data['credit_limit']),
-        "interestRate": offer_data['interest_rate'],
-        "creditType": offer_data['credit_type'],
-        "acceptedAt": datetime.utcnow().isoformat()
-    }
-    await nats_conn.publish(NATS_ACCEPT_SUBJECT, json.dumps(event_data).encode())
-    logger.info(f"Acceptance event for offer {offer_data['id']} published to NATS topic '{NATS_ACCEPT_SUBJECT}'")
+    event = CreditOfferAcceptedEvent(
+        offer_id=offer_data['id'],
+        user_id=offer_data['user_id'],
+        credit_limit=float(offer_data['credit_limit']),
+        interest_rate=offer_data['interest_rate'],
+        credit_type=offer_data['credit_type'],
+        accepted_at=datetime.utcnow().isoformat()
+    )
+    with NATS_PUBLISH_LATENCY.labels(NATS_ACCEPT_SUBJECT).time():
+        await nats_conn.publish(NATS_ACCEPT_SUBJECT, encode_event(event, EVENT_CONTENT_TYPE), headers=EVENT_HEADERS)
+    logger.info("Acceptance event for offer %s published to NATS topic '%s'", offer_data['id'], NATS_ACCEPT_SUBJECT)
+
+async def publish_offers_created_events(nats_conn: nats.aio.client.Client, offers: list[dict]):
+    """
+    Publishes one offer creation event per offer to NATS, so the API gateways drop the cached
+    offers of their users. The offers are already saved, so a failure is only logged: the cached
+    responses then expire with their TTL.
+    """
+    try:
+        with NATS_PUBLISH_LATENCY.labels(NATS_OFFER_CREATED_SUBJECT).time():
+            for offer in offers:
+                event = OfferCreatedEvent(offer_id=offer['id'], user_id=uuid.UUID(str(offer['user_id'])))
+                await nats_conn.publish(NATS_OFFER_CREATED_SUBJECT, encode_event(event, EVENT_CONTENT_TYPE), headers=EVENT_HEADERS)
+    except Exception as e:
+        logger.warning("Failed to publish the creation events of %d offers: %s", len(offers), e)
+        return
+    logger.info("Creation events for %d offers published to NATS topic '%s'", len(offers), NATS_OFFER_CREATED_SUBJECT)
@@ -1,6 +1,7 @@
 from typing import List
 from datetime import datetime
 from pydantic import BaseModel, Field
+from configuration.config import BULK_ANALYSIS_MAX_USERS
 
 class CreditOffer(BaseModel):
     """Represents a credit offer made to a user."""
@@ -18,6 +19,15 @@ class CreditAnalysisResponse(BaseModel):
     offer: CreditOffer | None = None
     reason: str | None = None
 
+class BulkCreditAnalysisRequest(BaseModel):
+    """Represents a request to analyze the credit of a cohort of users."""
+    user_ids: List[str] = Field(..., alias="userIds", min_length=1, max_length=BULK_ANALYSIS_MAX_USERS)
+
+class CreditAnalysisError(BaseModel):
+    """Represents a user of a bulk credit analysis that could not be analyzed."""
+    user_id: str
+    error: str
+
 class User(BaseModel):
     """Represents a user in the system."""
     id: str | None = None
@@ -40,8 +50,14 @@ class CreditOfferListItem(BaseModel):
     expires_at: datetime
 
 class PaginatedOffersResponse(BaseModel):
-    """Represents a paginated response for a user's credit offers."""
-    total: int
-    page: int
+    """
+    Represents a paginated response for a user's credit offers.
+
+    `page` is only set for offset requests and `total` only when it was requested.
+    `next_cursor` is set while there are more offers to list.
+    """
+    total: int | None = None
+    page: int | None = None
     page_size: int
     items: List[CreditOfferListItem]
+    next_cursor: str | None = None
@@ -0,0 +1,24 @@
+import json
+import uuid
+import base64
+import binascii
+
+from datetime import datetime
+
+def encode_cursor(created_at: datetime, offer_id: uuid.UUID) -> str:
+    """
+    Encodes the position of an offer in a user's listing as an opaque, URL-safe cursor.
+    """
+    raw = json.dumps([created_at.isoformat(), str(offer_id)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    """
+    Decodes a cursor produced by `encode_cursor`. Raises ValueError if it is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, offer_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), uuid.UUID(offer_id)
+    except (binascii.Error, json.JSONDecodeError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
@@ -2,21 +2,44 @@ import httpx
 
 from pybreaker import CircuitBreaker
 
-from configuration.config import logger, CREDIT_ANALYSIS_SERVICE_URL
+from metrics.metrics import timed, ML_CALL_LATENCY
+from configuration.config import logger, CREDIT_ANALYSIS_SERVICE_URL, CREDIT_ANALYSIS_BATCH_SERVICE_URL
 
 ml_service_breaker = CircuitBreaker(fail_max=5, reset_timeout=30)
 
+class CreditAnalysisResponseError(Exception):
+    """Raised when the credit analysis service answers a batch with a number of scores other than the number of feature vectors."""
+
 @ml_service_breaker
+@timed(ML_CALL_LATENCY, "credit_analysis")
 async def get_credit_analysis_from_ml_service(http_client: httpx.AsyncClient, feature_vector: dict) -> dict:
     """
     Calls the external credit analysis service to obtain a risk score.
     This function is decorated with a circuit breaker to protect against failures.
     """
-    logger.info(f"Calling ML service. Circuit breaker state: {ml_service_breaker.current_state}")
+    logger.info("Calling ML service. Circuit breaker state: %s", ml_service_breaker.current_state)
     try:
         response = await http_client.post(CREDIT_ANALYSIS_SERVICE_URL, json=feature_vector)
         response.raise_for_status()
         return response.json()
     except httpx.RequestError as e:
-        logger.error(f"HTTP request error calling credit analysis service: {e}")
+        logger.error("HTTP request error calling credit analysis service: %s", e)
+        raise e
+
+@ml_service_breaker
+@timed(ML_CALL_LATENCY, "credit_analysis_batch")
+async def get_batch_credit_analysis_from_ml_service(http_client: httpx.AsyncClient, feature_vectors: list[dict]) -> list[float]:
+    """
+    Calls the batch endpoint of the credit analysis service to score many feature vectors at once.
+    Returns the risk scores in the order of `feature_vectors`. Shares the circuit breaker of the single calls.
+    """
+    try:
+        response = await http_client.post(CREDIT_ANALYSIS_BATCH_SERVICE_URL, json={"features": feature_vectors})
+        response.raise_for_status()
+        risk_scores = response.json()["risk_scores"]
+    except httpx.RequestError as e:
+        logger.error("HTTP request error calling credit analysis batch service: %s", e)
         raise e
+    if len(risk_scores) != len(feature_vectors):
+        raise CreditAnalysisResponseError(f"Expected {len(feature_vectors)} risk scores, got {len(risk_scores)}.")
+    return risk_scores
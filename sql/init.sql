@@ -11,14 +11,25 @@ CREATE TABLE users (
 CREATE INDEX idx_users_email ON users(email);
 
 CREATE TABLE transactions (
-    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    id UUID NOT NULL DEFAULT gen_random_uuid(),
     user_id UUID REFERENCES users(id) ON DELETE CASCADE,
     amount NUMERIC(10, 2),
-    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
-);
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
 
-CREATE INDEX idx_transactions_user_id ON transactions(user_id);
-CREATE INDEX idx_transactions_created_at ON transactions(created_at DESC);
+CREATE INDEX idx_transactions_user_id_created_at ON transactions(user_id, created_at DESC);
+
+CREATE TABLE transactions_default PARTITION OF transactions DEFAULT;
+
+CREATE TABLE transaction_daily_rollup (
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    rollup_date DATE NOT NULL,
+    tx_count INTEGER NOT NULL DEFAULT 0,
+    tx_amount_sum NUMERIC(18, 2) NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (user_id, rollup_date)
+);
 
 CREATE TABLE emotional_events_summary (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -49,3 +60,6 @@ CREATE TABLE credit_limits (
 );
 
 CREATE INDEX idx_credit_limits_user_id_status ON credit_limits(user_id, status);
+
+CREATE INDEX idx_credit_limits_user_id_created_at ON credit_limits(user_id, created_at DESC, id DESC)
+    INCLUDE (status, credit_limit, interest_rate, expires_at);
@@ -2,11 +2,13 @@ import pytest
 import httpx
 import json
 import asyncio
-from datetime import datetime, timezone
+import uuid
+from datetime import datetime, timedelta, timezone
 import os
 
 API_GATEWAY_URL = "http://localhost:9999"
 INTERNAL_API_KEY = "your-different-secret-for-internal-services" 
+CREDIT_ANALYSIS_URL = "http://localhost:18000"
 
 def load_user_sessions():
     """Reads the sessions.json file and prepares it for parameterization."""
@@ -60,6 +62,56 @@ async def test_data_ingestion_flow(db_connection, user_session):
     assert transaction_record is not None
 
 
+@pytest.mark.asyncio
+async def test_emotion_batch_ingestion_reports_rejected_events():
+    """
+    Tests that a NDJSON batch of emotion events is accepted and invalid events are reported by index.
+    """
+    # AAA: Arrange
+    headers = {"Content-Type": "application/x-ndjson", "X-Internal-Key": INTERNAL_API_KEY}
+    valid_event = {
+        "userId": STATIC_TEST_USER_ID,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "emotionEvent": { "type": "SENTIMENT_ANALYSIS", "metrics": { "positivity": 0.7, "intensity": 0.4, "stress_level": 0.1 } },
+    }
+    invalid_event = {**valid_event, "emotionEvent": { "type": "SENTIMENT_ANALYSIS", "metrics": { "positivity": 7 } }}
+    body = "\n".join(json.dumps(event) for event in (valid_event, invalid_event, valid_event))
+
+    # AAA: Act
+    async with httpx.AsyncClient() as client:
+        response = await client.post(f"{API_GATEWAY_URL}/v1/emotions/stream:batch", headers=headers, content=body)
+        response_json = response.json()
+
+    # AAA: Assert
+    assert response.status_code == 202
+    assert response_json["accepted"] == 2
+    assert response_json["rejected"] == 1
+    assert [error["index"] for error in response_json["errors"]] == [1]
+
+@pytest.mark.asyncio
+async def test_emotion_batch_ingestion_with_oversized_event_should_fail():
+    """
+    Tests that a NDJSON batch stops with 413 at an event longer than MAX_EVENT_BYTES, reporting the events accepted before it.
+    """
+    # AAA: Arrange
+    headers = {"Content-Type": "application/x-ndjson", "X-Internal-Key": INTERNAL_API_KEY}
+    valid_event = {
+        "userId": STATIC_TEST_USER_ID,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "emotionEvent": { "type": "SENTIMENT_ANALYSIS", "metrics": { "positivity": 0.7, "intensity": 0.4, "stress_level": 0.1 } },
+    }
+    oversized_event = {**valid_event, "emotionEvent": { "type": "X" * 20000, "metrics": valid_event["emotionEvent"]["metrics"] }}
+    body = "\n".join(json.dumps(event) for event in (valid_event, oversized_event, valid_event))
+
+    # AAA: Act
+    async with httpx.AsyncClient() as client:
+        response = await client.post(f"{API_GATEWAY_URL}/v1/emotions/stream:batch", headers=headers, content=body)
+
+    # AAA: Assert
+    assert response.status_code == 413
+    assert "Event 1 " in response.json()["detail"]
+    assert "The 1 valid events before it were accepted." in response.json()["detail"]
+
 @pytest.mark.asyncio
 @pytest.mark.parametrize("user_session", USER_SESSIONS)
 async def test_credit_analysis_flow(db_connection, user_session):
@@ -136,6 +188,254 @@ async def test_credit_acceptance_flow(db_connection, nats_connection, user_sessi
         pytest.fail(f"Unexpected API response for user {user_id}: {response_json}")
 
 
+# --- Credit Analysis Model Tests ---
+
+FEATURE_VECTORS = [
+    {"transaction_count_30d": 12, "avg_transaction_value_30d": 250.0, "avg_positivity_7d": 0.8, "stress_events_30d": 1},
+    {"transaction_count_30d": 0, "avg_transaction_value_30d": 0.0, "avg_positivity_7d": 0.5, "stress_events_30d": 0},
+    {"transaction_count_30d": 95, "avg_transaction_value_30d": 4800.0, "avg_positivity_7d": 0.1, "stress_events_30d": 14},
+]
+
+@pytest.mark.asyncio
+async def test_batch_prediction_matches_single_predictions():
+    """
+    Validates that a batch prediction scores every feature vector, in order, as the single prediction endpoint does.
+    """
+    # AAA: Arrange
+    async with httpx.AsyncClient() as client:
+        single_responses = [await client.post(f"{CREDIT_ANALYSIS_URL}/v1/predict", json=features) for features in FEATURE_VECTORS]
+
+        # AAA: Act
+        response = await client.post(f"{CREDIT_ANALYSIS_URL}/v1/predict/batch", json={"features": FEATURE_VECTORS})
+        response_json = response.json()
+
+    # AAA: Assert
+    assert response.status_code == 200
+    assert response_json["model_version"]
+    assert len(response_json["risk_scores"]) == len(FEATURE_VECTORS)
+    assert all(0.0 <= score <= 1.0 for score in response_json["risk_scores"])
+    for single_response, score in zip(single_responses, response_json["risk_scores"]):
+        assert single_response.status_code == 200
+        assert single_response.json()["model_version"] == response_json["model_version"]
+        assert single_response.json()["risk_score"] == pytest.approx(score)
+
+
+@pytest.mark.asyncio
+async def test_empty_batch_prediction_should_fail():
+    """Validates that a batch prediction without feature vectors is rejected."""
+    # AAA: Arrange
+    payload = {"features": []}
+
+    # AAA: Act
+    async with httpx.AsyncClient() as client:
+        response = await client.post(f"{CREDIT_ANALYSIS_URL}/v1/predict/batch", json=payload)
+
+    # AAA: Assert
+    assert response.status_code == 422
+
+
+# --- Offers Listing Tests ---
+
+async def insert_offers(db_connection, nats_connection, user_id: str, count: int) -> list[str]:
+    """
+    Saves `count` offers for a user straight to the database, one second apart, newest first, and
+    publishes their creation events as the user-and-credit-service does, so the gateways drop the
+    cached listings of the user.
+    """
+    now = datetime.now(timezone.utc)
+    offer_ids = [str(uuid.uuid4()) for _ in range(count)]
+    await db_connection.executemany(
+        "INSERT INTO credit_limits (id, user_id, credit_limit, interest_rate, credit_type, expires_at, created_at) VALUES ($1, $2, 1000, 2.5, 'TEST', $3, $4)",
+        [(offer_id, user_id, now + timedelta(days=30), now - timedelta(seconds=i)) for i, offer_id in enumerate(offer_ids)],
+    )
+    for offer_id in offer_ids:
+        await nats_connection.publish("credit.offers.created", json.dumps({"offerId": offer_id, "userId": user_id}).encode())
+    await nats_connection.flush()
+    await asyncio.sleep(0.5)
+    return offer_ids
+
+
+@pytest.mark.asyncio
+async def test_offers_cursor_pagination_walks_every_offer_once(db_connection, nats_connection):
+    """
+    Validates that following next_cursor lists every offer of a user once, newest first, and that the last page has no cursor.
+    """
+    user_session = USER_SESSIONS[0]
+    user_id = user_session['userId']
+
+    # AAA: Arrange
+    inserted_ids = await insert_offers(db_connection, nats_connection, user_id, 3)
+    expected_ids = [str(record['id']) for record in await db_connection.fetch(
+        "SELECT id FROM credit_limits WHERE user_id = $1 ORDER BY created_at DESC, id DESC", user_id
+    )]
+    headers = {"Authorization": f"Bearer {user_session['token']}"}
+    params = {"page_size": 2, "include_total": "false"}
+
+    # AAA: Act
+    pages = []
+    async with httpx.AsyncClient() as client:
+        while True:
+            response = await client.get(f"{API_GATEWAY_URL}/v1/users/{user_id}/offers", headers=headers, params=params)
+            assert response.status_code == 200
+            pages.append(response.json())
+            if pages[-1]["next_cursor"] is None:
+                break
+            params["cursor"] = pages[-1]["next_cursor"]
+
+    # AAA: Assert
+    listed_ids = [item["offer_id"] for page in pages for item in page["items"]]
+    assert listed_ids == expected_ids
+    assert set(inserted_ids) <= set(listed_ids)
+    assert all(len(page["items"]) == 2 for page in pages[:-1])
+    assert 1 <= len(pages[-1]["items"]) <= 2
+    assert all(page["total"] is None for page in pages)
+
+
+@pytest.mark.asyncio
+async def test_offers_with_invalid_cursor_should_fail():
+    """Validates that a cursor not returned by a previous page is rejected."""
+    # AAA: Arrange
+    user_session = USER_SESSIONS[0]
+    headers = {"Authorization": f"Bearer {user_session['token']}"}
+
+    # AAA: Act
+    async with httpx.AsyncClient() as client:
+        response = await client.get(
+            f"{API_GATEWAY_URL}/v1/users/{user_session['userId']}/offers", headers=headers, params={"cursor": "not-a-cursor"}
+        )
+
+    # AAA: Assert
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_offers_revalidation_with_etag_returns_not_modified():
+    """Validates that the offers listing carries an ETag and that revalidating with it answers 304 without a body."""
+    # AAA: Arrange
+    user_session = USER_SESSIONS[0]
+    url = f"{API_GATEWAY_URL}/v1/users/{user_session['userId']}/offers"
+    headers = {"Authorization": f"Bearer {user_session['token']}"}
+
+    # AAA: Act
+    async with httpx.AsyncClient() as client:
+        response = await client.get(url, headers=headers)
+        revalidation = await client.get(url, headers={**headers, "If-None-Match": response.headers.get("etag", "")})
+
+    # AAA: Assert
+    assert response.status_code == 200
+    assert response.headers["etag"].startswith('"')
+    assert "no-cache" in response.headers["cache-control"]
+    assert revalidation.status_code == 304
+    assert revalidation.headers["etag"] == response.headers["etag"]
+    assert revalidation.content == b""
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("user_session", USER_SESSIONS)
+async def test_offers_listing_is_invalidated_by_a_credit_analysis(user_session):
+    """
+    Validates that a cached offers listing is not served once a credit analysis made the user a new offer.
+    """
+    user_id = user_session['userId']
+
+    # AAA: Arrange
+    url = f"{API_GATEWAY_URL}/v1/users/{user_id}/offers"
+    headers = {"Authorization": f"Bearer {user_session['token']}"}
+    async with httpx.AsyncClient() as client:
+        listing = await client.get(url, headers=headers)
+        etag = listing.headers["etag"]
+
+        # AAA: Act
+        analysis = await client.post(f"{API_GATEWAY_URL}/v1/users/{user_id}/credit-analysis", headers=headers)
+        analysis_json = analysis.json()
+        await asyncio.sleep(0.5)
+        revalidation = await client.get(url, headers={**headers, "If-None-Match": etag})
+
+    # AAA: Assert
+    assert listing.status_code == 200
+    assert analysis.status_code == 200
+    if analysis_json.get("approved"):
+        assert revalidation.status_code == 200
+        assert revalidation.headers["etag"] != etag
+        assert analysis_json["offer"]["offer_id"] in [item["offer_id"] for item in revalidation.json()["items"]]
+    else:
+        assert revalidation.status_code == 304
+
+
+# --- Bulk Credit Analysis Tests ---
+
+@pytest.mark.asyncio
+async def test_bulk_credit_analysis_streams_a_result_per_user(db_connection):
+    """
+    Validates that a bulk credit analysis streams one NDJSON result per user, in order, and saves the offers it makes.
+    """
+    # AAA: Arrange
+    user_ids = [user_session['userId'] for user_session in USER_SESSIONS]
+    headers = {"Content-Type": "application/json", "X-Internal-Key": INTERNAL_API_KEY}
+
+    # AAA: Act
+    async with httpx.AsyncClient(timeout=30) as client:
+        response = await client.post(f"{API_GATEWAY_URL}/v1/credit-analysis:batch", headers=headers, json={"userIds": user_ids})
+        results = [json.loads(line) for line in response.text.splitlines()]
+
+    # AAA: Assert
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [result["user_id"] for result in results] == list(dict.fromkeys(user_ids))
+    for result in results:
+        assert "error" not in result
+        if result["approved"]:
+            offer = await db_connection.fetchrow("SELECT * FROM credit_limits WHERE id = $1", result["offer"]["offer_id"])
+            assert offer is not None and offer["status"] == "offered"
+        else:
+            assert "reason" in result
+
+
+@pytest.mark.asyncio
+async def test_bulk_credit_analysis_reports_errors_per_user():
+    """
+    Validates that users of a chunk that cannot be analyzed get an error line while the others are analyzed.
+    """
+    # AAA: Arrange
+    unknown_user_id = str(uuid.uuid4())
+    user_ids = [STATIC_TEST_USER_ID, "not-a-user-id", unknown_user_id]
+    headers = {"Content-Type": "application/json", "X-Internal-Key": INTERNAL_API_KEY}
+
+    # AAA: Act
+    async with httpx.AsyncClient(timeout=30) as client:
+        response = await client.post(f"{API_GATEWAY_URL}/v1/credit-analysis:batch", headers=headers, json={"userIds": user_ids})
+        results = [json.loads(line) for line in response.text.splitlines()]
+
+    # AAA: Assert
+    assert response.status_code == 200
+    assert [result["user_id"] for result in results] == user_ids
+    assert "error" not in results[0] and isinstance(results[0]["approved"], bool)
+    assert results[1]["error"] == "Invalid user id."
+    assert results[2]["error"] == "User not found."
+
+
+@pytest.mark.asyncio
+async def test_bulk_credit_analysis_analyzes_each_spelling_of_an_id_once():
+    """
+    Validates that differently spelled duplicates of a user id get a single result, under the canonical id.
+    """
+    # AAA: Arrange
+    user_id = str(uuid.UUID(STATIC_TEST_USER_ID))
+    user_ids = [user_id.upper(), user_id, f"{{{user_id}}}", f"urn:uuid:{user_id}", "not-a-user-id", "not-a-user-id"]
+    headers = {"Content-Type": "application/json", "X-Internal-Key": INTERNAL_API_KEY}
+
+    # AAA: Act
+    async with httpx.AsyncClient(timeout=30) as client:
+        response = await client.post(f"{API_GATEWAY_URL}/v1/credit-analysis:batch", headers=headers, json={"userIds": user_ids})
+        results = [json.loads(line) for line in response.text.splitlines()]
+
+    # AAA: Assert
+    assert response.status_code == 200
+    assert [result["user_id"] for result in results] == [user_id, "not-a-user-id"]
+    assert "error" not in results[0] and isinstance(results[0]["approved"], bool)
+    assert results[1]["error"] == "Invalid user id."
+
+
 # --- Security Tests ---
 
 @pytest.mark.asyncio
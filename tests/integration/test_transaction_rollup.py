@@ -0,0 +1,122 @@
+import uuid
+import pytest
+import pytest_asyncio
+
+from decimal import Decimal
+from datetime import datetime, timedelta, timezone
+from unit.loader import use_service
+
+use_service("transaction-processing-worker")
+
+from events.events import TransactionEvent
+from database.database import insert_transaction, copy_transactions, backfill_transaction_rollup
+
+ROLLUP_QUERY = """
+SELECT rollup_date, tx_count, tx_amount_sum
+FROM transaction_daily_rollup
+WHERE user_id = $1
+ORDER BY rollup_date;
+"""
+
+RAW_TOTALS_QUERY = """
+SELECT (created_at AT TIME ZONE 'UTC')::date AS rollup_date, COUNT(*) AS tx_count, SUM(amount) AS tx_amount_sum
+FROM transactions
+WHERE user_id = $1
+GROUP BY 1
+ORDER BY 1;
+"""
+
+@pytest_asyncio.fixture
+async def user_id(db_connection):
+    """A user of its own for each test, deleted with its transactions and rollups afterwards."""
+    user_id = await db_connection.fetchval(
+        "INSERT INTO users (email, password_hash) VALUES ($1, 'not-a-hash') RETURNING id;",
+        f"rollup-{uuid.uuid4()}@example.com",
+    )
+    yield user_id
+    await db_connection.execute("DELETE FROM users WHERE id = $1;", user_id)
+
+def around_midnight() -> tuple[datetime, datetime]:
+    """Two instants of yesterday's last and today's first UTC hour, which belong to different rollup days."""
+    midnight = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight - timedelta(minutes=30), midnight + timedelta(minutes=1)
+
+async def rollup(db_connection, user_id) -> list[tuple]:
+    return [tuple(row) for row in await db_connection.fetch(ROLLUP_QUERY, user_id)]
+
+async def raw_totals(db_connection, user_id) -> list[tuple]:
+    return [tuple(row) for row in await db_connection.fetch(RAW_TOTALS_QUERY, user_id)]
+
+
+# --- Rollup Upsert Tests ---
+
+@pytest.mark.asyncio
+async def test_inserted_transactions_are_added_to_the_rollup_of_their_utc_day(db_connection, user_id):
+    # AAA: Arrange
+    late, early = around_midnight()
+    transactions = [(uuid.uuid4(), 10.50, late), (uuid.uuid4(), 4.25, late), (uuid.uuid4(), 7.00, early)]
+
+    # AAA: Act
+    for transaction_id, amount, created_at in transactions:
+        await insert_transaction(db_connection, transaction_id, TransactionEvent(user_id=str(user_id), amount=amount), created_at)
+
+    # AAA: Assert
+    assert await rollup(db_connection, user_id) == [
+        (late.date(), 2, Decimal("14.75")),
+        (early.date(), 1, Decimal("7.00")),
+    ]
+
+@pytest.mark.asyncio
+async def test_redelivered_transaction_is_not_added_to_the_rollup_again(db_connection, user_id):
+    # AAA: Arrange
+    transaction_id = uuid.uuid4()
+    event = TransactionEvent(user_id=str(user_id), amount=25.00)
+    created_at = datetime.now(timezone.utc)
+    await insert_transaction(db_connection, transaction_id, event, created_at)
+
+    # AAA: Act
+    await insert_transaction(db_connection, transaction_id, event, created_at)
+    await copy_transactions(db_connection, [(transaction_id, user_id, Decimal("25.00"), created_at)])
+
+    # AAA: Assert
+    assert await rollup(db_connection, user_id) == [(created_at.date(), 1, Decimal("25.00"))]
+
+@pytest.mark.asyncio
+async def test_copied_batch_is_added_to_the_rollups_once_per_new_transaction(db_connection, user_id):
+    # AAA: Arrange
+    late, early = around_midnight()
+    stored = (uuid.uuid4(), user_id, Decimal("3.00"), late)
+    await copy_transactions(db_connection, [stored])
+    batch = [stored, (uuid.uuid4(), user_id, Decimal("1.10"), late), (uuid.uuid4(), user_id, Decimal("2.20"), early), (uuid.uuid4(), user_id, Decimal("3.30"), early)]
+
+    # AAA: Act
+    await copy_transactions(db_connection, batch)
+
+    # AAA: Assert
+    assert await rollup(db_connection, user_id) == [
+        (late.date(), 2, Decimal("4.10")),
+        (early.date(), 2, Decimal("5.50")),
+    ]
+    assert await rollup(db_connection, user_id) == await raw_totals(db_connection, user_id)
+
+
+# --- Rollup Backfill Tests ---
+
+@pytest.mark.asyncio
+async def test_backfilled_rollups_match_the_raw_transactions(db_connection, user_id):
+    # AAA: Arrange
+    now = datetime.now(timezone.utc)
+    await db_connection.executemany(
+        "INSERT INTO transactions (id, user_id, amount, created_at) VALUES ($1, $2, $3, $4);",
+        [(uuid.uuid4(), user_id, Decimal(index) + Decimal("0.99"), now - timedelta(days=index % 3, hours=index)) for index in range(12)],
+    )
+    await db_connection.execute(
+        "INSERT INTO transaction_daily_rollup (user_id, rollup_date, tx_count, tx_amount_sum) VALUES ($1, $2, 99, 99);",
+        user_id, now.date(),
+    )
+
+    # AAA: Act
+    await backfill_transaction_rollup(db_connection, now - timedelta(days=3))
+
+    # AAA: Assert
+    assert await rollup(db_connection, user_id) == await raw_totals(db_connection, user_id)
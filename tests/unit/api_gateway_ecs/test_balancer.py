@@ -0,0 +1,320 @@
+import time
+import asyncio
+import httpx
+import pytest
+import pytest_asyncio
+
+from types import SimpleNamespace
+from balancer import balancer
+from balancer.balancer import UpstreamBalancer, LEAST_OUTSTANDING, HEDGE_MIN_SAMPLES
+
+FAST, SLOW = "http://fast:8000", "http://slow:8000"
+
+class Clock:
+    """Monotonic clock of the balancer module, advanced by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+class Upstream:
+    """Replicas answering through an httpx mock transport, after `delays[url]` seconds or with `refused` connections."""
+
+    def __init__(self):
+        self.delays = {}
+        self.refused = set()
+        self.received = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        url = f"{request.url.scheme}://{request.url.host}:{request.url.port}"
+        if url in self.refused:
+            raise httpx.ConnectError("connection refused", request=request)
+        self.received.append(url)
+        await asyncio.sleep(self.delays.get(url, 0))
+        return httpx.Response(200, text=url)
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(balancer, "time", SimpleNamespace(monotonic=clock.monotonic, perf_counter=time.perf_counter))
+    return clock
+
+@pytest.fixture
+def upstream():
+    return Upstream()
+
+@pytest_asyncio.fixture
+async def http_client(upstream):
+    async with httpx.AsyncClient(transport=httpx.MockTransport(upstream)) as client:
+        yield client
+
+def build_request(endpoint):
+    return httpx.Request("GET", f"{endpoint.url}/v1/users/1/offers")
+
+async def send(upstream_balancer: UpstreamBalancer, http_client, idempotent: bool = True) -> str:
+    response, close = await upstream_balancer.send(http_client, build_request, idempotent=idempotent)
+    await response.aread()
+    await close()
+    return response.text
+
+
+# --- Endpoint Selection Tests ---
+
+def test_unsupported_strategy_is_rejected():
+    # AAA: Act / Assert
+    with pytest.raises(ValueError, match="round_robin"):
+        UpstreamBalancer([FAST], strategy="round_robin")
+
+def test_lower_latency_endpoint_is_picked(clock):
+    # AAA: Arrange
+    upstream_balancer = UpstreamBalancer([FAST, SLOW])
+    fast, slow = upstream_balancer.endpoints
+    upstream_balancer.observe(fast, 0.010)
+    upstream_balancer.observe(slow, 0.100)
+
+    # AAA: Act
+    picked = [upstream_balancer.pick() for _ in range(5)]
+
+    # AAA: Assert
+    assert picked == [fast] * 5
+
+def test_requests_in_flight_weigh_on_the_latency(clock):
+    # AAA: Arrange
+    upstream_balancer = UpstreamBalancer([FAST, SLOW])
+    fast, slow = upstream_balancer.endpoints
+    upstream_balancer.observe(fast, 0.010)
+    upstream_balancer.observe(slow, 0.035)
+
+    # AAA: Act
+    picked = [upstream_balancer.pick() for _ in range(4)]
+
+    # AAA: Assert
+    assert picked == [fast, fast, fast, slow]
+
+def test_endpoint_never_observed_is_tried_first(clock):
+    # AAA: Arrange
+    upstream_balancer = UpstreamBalancer([FAST, SLOW])
+    fast, slow = upstream_balancer.endpoints
+    upstream_balancer.observe(fast, 0.001)
+
+    # AAA: Act / Assert
+    assert upstream_balancer.pick() is slow
+
+def test_least_outstanding_picks_the_endpoint_with_fewest_requests_in_flight(clock):
+    # AAA: Arrange
+    upstream_balancer = UpstreamBalancer([FAST, SLOW], strategy=LEAST_OUTSTANDING)
+    first = upstream_balancer.pick()
+
+    # AAA: Act
+    second = upstream_balancer.pick()
+    upstream_balancer.release(first)
+    third = upstream_balancer.pick()
+
+    # AAA: Assert
+    assert second is not first
+    assert third is first
+
+
+# --- Latency EWMA Tests ---
+
+def test_ewma_jumps_to_a_higher_latency_at_once(clock):
+    # AAA: Arrange
+    upstream_balancer = UpstreamBalancer([FAST], decay=10.0)
+    (endpoint,) = upstream_balancer.endpoints
+    upstream_balancer.observe(endpoint, 0.010)
+
+    # AAA: Act
+    upstream_balancer.observe(endpoint, 0.200)
+
+    # AAA: Assert
+    assert endpoint.ewma == pytest.approx(0.200)
+
+def test_ewma_moves_towards_a_lower_latency_with_the_time_elapsed(clock):
+    # AAA: Arrange
+    upstream_balancer = UpstreamBalancer([FAST], decay=10.0)
+    (endpoint,) = upstream_balancer.endpoints
+    upstream_balancer.observe(endpoint, 0.200)
+
+    # AAA: Act
+    clock.now += 1.0
+    upstream_balancer.observe(endpoint, 0.010)
+    after_one_second = endpoint.ewma
+    clock.now += 100.0
+    upstream_balancer.observe(endpoint, 0.010)
+
+    # AAA: Assert
+    assert 0.010 < after_one_second < 0.200
+    assert endpoint.ewma == pytest.approx(0.010, abs=1e-5)
+
+def test_cost_of_a_slow_endpoint_decays_while_it_is_not_used(clock):
+    # AAA: Arrange
+    upstream_balancer = UpstreamBalancer([FAST], decay=10.0)
+    (endpoint,) = upstream_balancer.endpoints
+    upstream_balancer.observe(endpoint, 0.200)
+
+    # AAA: Act
+    cost_now = endpoint.cost(clock.now, 10.0)
+    cost_later = endpoint.cost(clock.now + 30.0, 10.0)
+
+    # AAA: Assert
+    assert cost_now == pytest.approx(0.200)
+    assert cost_later < cost_now / 10
+
+
+# --- Ejection Tests ---
+
+def test_endpoint_is_ejected_after_consecutive_failures(clock):
+    # AAA: Arrange
+    upstream_balancer = UpstreamBalancer([FAST, SLOW], ejection_failures=3, ejection_time=10.0)
+    fast, slow = upstream_balancer.endpoints
+
+    # AAA: Act
+    for _ in range(3):
+        upstream_balancer.observe(slow, 0.001, failed=True)
+
+    # AAA: Assert
+    assert upstream_balancer.available(clock.now) == [fast]
+    assert upstream_balancer.available(clock.now + 10.0) == [fast, slow]
+
+def test_success_resets_the_failure_count(clock):
+    # AAA: Arrange
+    upstream_balancer = UpstreamBalancer([FAST, SLOW], ejection_failures=3)
+    _, slow = upstream_balancer.endpoints
+
+    # AAA: Act
+    for failed in (True, True, False, True, True):
+        upstream_balancer.observe(slow, 0.001, failed=failed)
+
+    # AAA: Assert
+    assert slow in upstream_balancer.available(clock.now)
+
+def test_ejection_time_doubles_at_every_new_ejection_up_to_its_maximum(clock):
+    # AAA: Arrange
+    upstream_balancer = UpstreamBalancer([FAST, SLOW], ejection_failures=1, ejection_time=10.0, max_ejection_time=30.0)
+    _, slow = upstream_balancer.endpoints
+    ejection_times = []
+
+    # AAA: Act
+    for _ in range(3):
+        upstream_balancer.observe(slow, 0.001, failed=True)
+        ejection_times.append(slow.ejected_until - clock.now)
+        clock.now = slow.ejected_until
+
+    # AAA: Assert
+    assert ejection_times == [10.0, 20.0, 30.0]
+
+def test_last_available_endpoint_is_never_ejected(clock):
+    # AAA: Arrange
+    upstream_balancer = UpstreamBalancer([FAST, SLOW], ejection_failures=1)
+    fast, slow = upstream_balancer.endpoints
+    upstream_balancer.observe(slow, 0.001, failed=True)
+
+    # AAA: Act
+    upstream_balancer.observe(fast, 0.001, failed=True)
+
+    # AAA: Assert
+    assert upstream_balancer.available(clock.now) == [fast]
+
+
+# --- Hedging Tests ---
+
+def test_hedge_delay_waits_for_enough_latencies(clock):
+    # AAA: Arrange
+    upstream_balancer = UpstreamBalancer([FAST, SLOW], hedge_quantile=0.9, hedge_min_delay=0.005)
+    fast, _ = upstream_balancer.endpoints
+    for _ in range(HEDGE_MIN_SAMPLES - 1):
+        upstream_balancer.observe(fast, 0.001)
+    too_few = upstream_balancer.hedge_delay()
+
+    # AAA: Act
+    for latency in range(1, 101):
+        upstream_balancer.observe(fast, latency / 1000)
+
+    # AAA: Assert
+    assert too_few is None
+    assert upstream_balancer.hedge_delay() == pytest.approx(0.081)
+
+@pytest.mark.asyncio
+async def test_slow_get_is_hedged_to_another_endpoint(upstream, http_client):
+    # AAA: Arrange
+    upstream_balancer = UpstreamBalancer([FAST, SLOW], hedge_min_delay=0.005)
+    fast, slow = upstream_balancer.endpoints
+    for _ in range(HEDGE_MIN_SAMPLES):
+        upstream_balancer.observe(slow, 0.001)
+    upstream_balancer.observe(fast, 0.002)
+    upstream.delays[SLOW] = 1.0
+
+    # AAA: Act
+    answered_by = await asyncio.wait_for(send(upstream_balancer, http_client), timeout=0.5)
+
+    # AAA: Assert
+    assert answered_by == FAST
+    assert upstream.received == [SLOW, FAST]
+    assert upstream_balancer.stats()["hedges"] == 1
+    assert upstream_balancer.stats()["hedge_wins"] == 1
+    assert fast.outstanding == slow.outstanding == 0
+
+@pytest.mark.asyncio
+async def test_request_with_a_body_is_never_hedged(upstream, http_client):
+    # AAA: Arrange
+    upstream_balancer = UpstreamBalancer([FAST, SLOW], hedge_min_delay=0.005)
+    fast, slow = upstream_balancer.endpoints
+    for _ in range(HEDGE_MIN_SAMPLES):
+        upstream_balancer.observe(slow, 0.001)
+    upstream_balancer.observe(fast, 0.002)
+    upstream.delays[SLOW] = 0.05
+
+    # AAA: Act
+    answered_by = await send(upstream_balancer, http_client, idempotent=False)
+
+    # AAA: Assert
+    assert answered_by == SLOW
+    assert upstream.received == [SLOW]
+    assert upstream_balancer.stats()["hedges"] == 0
+
+@pytest.mark.asyncio
+async def test_hedges_stay_within_their_budget(upstream, http_client):
+    # AAA: Arrange
+    upstream_balancer = UpstreamBalancer([FAST, SLOW], hedge_min_delay=0.001, hedge_budget=0.1)
+    fast, slow = upstream_balancer.endpoints
+    for _ in range(HEDGE_MIN_SAMPLES):
+        upstream_balancer.observe(fast, 0.0001)
+    upstream.delays = {FAST: 0.01, SLOW: 0.01}
+
+    # AAA: Act
+    for _ in range(30):
+        await send(upstream_balancer, http_client)
+
+    # AAA: Assert
+    assert balancer.HEDGE_TOKEN_CAP <= upstream_balancer.stats()["hedges"] <= balancer.HEDGE_TOKEN_CAP + 30 * 0.1
+
+@pytest.mark.asyncio
+async def test_refused_get_is_retried_on_another_endpoint(upstream, http_client):
+    # AAA: Arrange
+    upstream_balancer = UpstreamBalancer([FAST, SLOW])
+    upstream.refused = {SLOW}
+    fast, slow = upstream_balancer.endpoints
+    upstream_balancer.observe(fast, 0.010)
+
+    # AAA: Act
+    answered_by = await send(upstream_balancer, http_client)
+
+    # AAA: Assert
+    assert answered_by == FAST
+    assert slow.failures == 1
+    assert fast.outstanding == slow.outstanding == 0
+
+@pytest.mark.asyncio
+async def test_refused_request_with_a_body_is_not_retried(upstream, http_client):
+    # AAA: Arrange
+    upstream_balancer = UpstreamBalancer([FAST, SLOW])
+    upstream.refused = {SLOW}
+    fast, _ = upstream_balancer.endpoints
+    upstream_balancer.observe(fast, 0.010)
+
+    # AAA: Act / Assert
+    with pytest.raises(httpx.ConnectError):
+        await send(upstream_balancer, http_client, idempotent=False)
+    assert upstream.received == []
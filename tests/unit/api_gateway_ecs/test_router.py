@@ -0,0 +1,99 @@
+import httpx
+import pytest
+
+from router.router import end_to_end_headers, stream_upstream_response
+
+class UpstreamBody:
+    """Body of an upstream response, recording the chunks it yields and whether it was closed."""
+
+    def __init__(self, chunks: list[bytes]):
+        self.chunks = chunks
+        self.events = []
+
+    async def stream(self):
+        for chunk in self.chunks:
+            self.events.append(chunk)
+            yield chunk
+
+    async def close(self):
+        self.events.append("closed")
+
+async def serve(response) -> list[dict]:
+    """Runs an ASGI response for a client that never disconnects, returning the messages it sent."""
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+    return sent
+
+
+# --- Hop-by-Hop Header Tests ---
+
+def test_hop_by_hop_headers_are_dropped():
+    # AAA: Arrange
+    raw_headers = [
+        (b"Host", b"api-gateway:8000"),
+        (b"Keep-Alive", b"timeout=5"),
+        (b"Transfer-Encoding", b"chunked"),
+        (b"TE", b"trailers"),
+        (b"Upgrade", b"h2c"),
+        (b"Proxy-Authorization", b"Basic Zm9v"),
+        (b"Content-Type", b"application/json"),
+        (b"Authorization", b"Bearer token"),
+    ]
+
+    # AAA: Act
+    headers = end_to_end_headers(raw_headers)
+
+    # AAA: Assert
+    assert headers == [(b"Content-Type", b"application/json"), (b"Authorization", b"Bearer token")]
+
+def test_headers_named_by_the_connection_header_are_dropped():
+    # AAA: Arrange
+    raw_headers = [
+        (b"Connection", b"keep-alive, X-Upstream-Trace"),
+        (b"connection", b" X-Hop-Only "),
+        (b"x-upstream-trace", b"abc"),
+        (b"X-Hop-Only", b"1"),
+        (b"X-Request-ID", b"req-1"),
+    ]
+
+    # AAA: Act
+    headers = end_to_end_headers(raw_headers)
+
+    # AAA: Assert
+    assert headers == [(b"X-Request-ID", b"req-1")]
+
+def test_end_to_end_headers_are_kept_in_order():
+    # AAA: Arrange
+    raw_headers = [(b"set-cookie", b"a=1"), (b"content-length", b"2"), (b"set-cookie", b"b=2")]
+
+    # AAA: Act / Assert
+    assert end_to_end_headers(raw_headers) == raw_headers
+
+
+# --- Response Streaming Tests ---
+
+@pytest.mark.asyncio
+async def test_upstream_response_is_closed_once_its_body_is_streamed():
+    # AAA: Arrange
+    body = UpstreamBody([b"first,", b"second"])
+    upstream = httpx.Response(
+        201,
+        headers=[(b"content-type", b"text/plain"), (b"connection", b"x-internal"), (b"x-internal", b"1")],
+        content=body.stream(),
+    )
+
+    # AAA: Act
+    sent = await serve(stream_upstream_response(upstream, body.close))
+
+    # AAA: Assert
+    assert body.events == [b"first,", b"second", "closed"]
+    assert sent[0]["status"] == 201
+    assert sent[0]["headers"] == [(b"content-type", b"text/plain")]
+    assert b"".join(message.get("body", b"") for message in sent[1:]) == b"first,second"
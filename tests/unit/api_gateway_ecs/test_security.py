@@ -0,0 +1,134 @@
+import time
+import pytest
+
+from jose import JWTError, jwt
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from security import security
+from security.security import VerifiedTokenCache
+from configuration.config import SECRET_KEY
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Freezes the time seen by the token cache; advance it by assigning `clock.now`."""
+    class Clock:
+        now = time.time()
+    monkeypatch.setattr(security.time, "time", lambda: Clock.now)
+    return Clock
+
+@pytest.fixture
+def token_cache(monkeypatch):
+    cache = VerifiedTokenCache(max_size=10)
+    monkeypatch.setattr(security, "token_cache", cache)
+    return cache
+
+def bearer(claims: dict) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=jwt.encode(claims, SECRET_KEY, algorithm="HS256"))
+
+
+# --- Token Cache Tests ---
+
+def test_cached_claims_are_returned_until_their_expiry(clock):
+    # AAA: Arrange
+    cache = VerifiedTokenCache(max_size=10)
+    key = cache.key("token")
+    cache.put(key, {"sub": "user", "exp": clock.now + 60})
+
+    # AAA: Act
+    before_expiry = cache.get(key)
+    clock.now += 60
+    at_expiry = cache.get(key)
+
+    # AAA: Assert
+    assert before_expiry["sub"] == "user"
+    assert at_expiry is None
+    assert cache.stats() == {"size": 0, "max_size": 10, "hits": 1, "misses": 1}
+
+def test_claims_without_numeric_expiry_are_not_cached(clock):
+    # AAA: Arrange
+    cache = VerifiedTokenCache(max_size=10)
+
+    # AAA: Act
+    cache.put(cache.key("no-exp"), {"sub": "user"})
+    cache.put(cache.key("text-exp"), {"sub": "user", "exp": "tomorrow"})
+
+    # AAA: Assert
+    assert cache.stats()["size"] == 0
+
+def test_cache_of_size_zero_stores_nothing(clock):
+    # AAA: Arrange
+    cache = VerifiedTokenCache(max_size=0)
+
+    # AAA: Act
+    cache.put(cache.key("token"), {"sub": "user", "exp": clock.now + 60})
+
+    # AAA: Assert
+    assert cache.get(cache.key("token")) is None
+
+def test_least_recently_used_token_is_evicted_first(clock):
+    # AAA: Arrange
+    cache = VerifiedTokenCache(max_size=2)
+    first, second, third = (cache.key(token) for token in ("first", "second", "third"))
+    cache.put(first, {"sub": "first", "exp": clock.now + 60})
+    cache.put(second, {"sub": "second", "exp": clock.now + 60})
+
+    # AAA: Act
+    cache.get(first)
+    cache.put(third, {"sub": "third", "exp": clock.now + 60})
+
+    # AAA: Assert
+    assert cache.get(first)["sub"] == "first"
+    assert cache.get(second) is None
+    assert cache.get(third)["sub"] == "third"
+
+
+# --- Bearer Validation Tests ---
+
+@pytest.mark.asyncio
+async def test_verified_token_is_served_from_the_cache(clock, token_cache, monkeypatch):
+    # AAA: Arrange
+    credentials = bearer({"sub": "user", "exp": int(clock.now) + 60})
+    await security.validate_api_key(credentials)
+
+    def decode(*args, **kwargs):
+        raise AssertionError("a cached token must not be decoded again")
+    monkeypatch.setattr(security.jwt, "decode", decode)
+
+    # AAA: Act
+    payload = await security.validate_api_key(credentials)
+
+    # AAA: Assert
+    assert payload["sub"] == "user"
+    assert token_cache.hits == 1
+
+@pytest.mark.asyncio
+async def test_cached_token_is_rejected_once_expired(clock, token_cache, monkeypatch):
+    # AAA: Arrange
+    credentials = bearer({"sub": "user", "exp": int(clock.now) + 60})
+    await security.validate_api_key(credentials)
+
+    def decode(*args, **kwargs):
+        raise JWTError("Signature has expired.")
+    monkeypatch.setattr(security.jwt, "decode", decode)
+    clock.now += 61
+
+    # AAA: Act
+    with pytest.raises(HTTPException) as error:
+        await security.validate_api_key(credentials)
+
+    # AAA: Assert
+    assert error.value.status_code == 401
+    assert token_cache.stats()["size"] == 0
+
+@pytest.mark.asyncio
+async def test_invalid_token_is_not_cached(clock, token_cache):
+    # AAA: Arrange
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=jwt.encode({"sub": "user", "exp": int(clock.now) + 60}, "another-secret", algorithm="HS256"))
+
+    # AAA: Act
+    with pytest.raises(HTTPException) as error:
+        await security.validate_api_key(credentials)
+
+    # AAA: Assert
+    assert error.value.status_code == 401
+    assert token_cache.stats()["size"] == 0
@@ -0,0 +1,68 @@
+import threading
+import pytest
+
+import main
+
+from types import SimpleNamespace
+from unit.loader import SERVICES_DIR
+from scoring.scoring import ScoringEngine, LogisticEngine
+from models.machine_learning import FeatureVector, BatchPredictionRequest
+
+MODEL_PATH = SERVICES_DIR / "credit-analysis-service" / "models" / "coefficients.json"
+
+class RecordedEngine:
+    """Scores with the model of MODEL_PATH and records the thread every batch was scored in."""
+
+    def __init__(self):
+        self._engine = ScoringEngine.from_file(str(MODEL_PATH))
+        self.version = self._engine.version
+        self.threads = []
+
+    def score(self, matrix):
+        self.threads.append(threading.get_ident())
+        return self._engine.score(matrix)
+
+def request_for(engine) -> SimpleNamespace:
+    return SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(scoring_engine=engine)))
+
+def batch(rows: int) -> BatchPredictionRequest:
+    return BatchPredictionRequest(features=[
+        FeatureVector(transaction_count_30d=index % 40, avg_transaction_value_30d=120.0, avg_positivity_7d=0.6, stress_events_30d=index % 5)
+        for index in range(rows)
+    ])
+
+
+# --- Scoring Engine Tests ---
+
+def test_engine_without_a_score_cannot_be_built():
+    # AAA: Arrange
+    class Incomplete(ScoringEngine):
+        kind = "incomplete"
+
+        def arrays(self):
+            return {}
+
+    # AAA: Act / Assert
+    with pytest.raises(TypeError):
+        Incomplete("v1")
+    assert isinstance(ScoringEngine.from_file(str(MODEL_PATH)), LogisticEngine)
+
+
+# --- Batch Endpoint Tests ---
+
+@pytest.mark.asyncio
+async def test_large_batch_is_scored_off_the_event_loop(monkeypatch):
+    # AAA: Arrange
+    monkeypatch.setattr(main, "SCORE_IN_THREAD_MIN_ROWS", 8)
+    engine = RecordedEngine()
+    loop_thread = threading.get_ident()
+
+    # AAA: Act
+    small = await main.predict_risk_batch(batch(7), request_for(engine))
+    large = await main.predict_risk_batch(batch(8), request_for(engine))
+
+    # AAA: Assert
+    assert engine.threads[0] == loop_thread
+    assert engine.threads[1] != loop_thread
+    assert large.risk_scores[:7] == small.risk_scores
+    assert large.model_version == engine.version
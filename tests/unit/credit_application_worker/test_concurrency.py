@@ -0,0 +1,193 @@
+import asyncio
+import pytest
+
+from types import SimpleNamespace
+from unit.loader import SERVICES_DIR
+from concurrency.concurrency import AdaptiveLimit, AckPendingLimit
+
+async def window(limit: AdaptiveLimit, latency: float, concurrent: int | None = None):
+    """Runs one adjustment window of `concurrent` slots (the whole limit by default) held for `latency` seconds."""
+    slots = concurrent if concurrent is not None else limit.limit
+    for _ in range(slots):
+        await limit.acquire()
+    for _ in range(slots):
+        limit.release(latency)
+    return limit.adjust()
+
+class FakeConsumer:
+    """Stand-in for a subscription and its JetStream context, recording the consumer updates."""
+
+    def __init__(self, max_ack_pending: int):
+        self.config = SimpleNamespace(max_ack_pending=max_ack_pending)
+        self.updates = []
+
+    async def consumer_info(self):
+        return SimpleNamespace(name="processor", stream_name="credits", config=self.config)
+
+    async def add_consumer(self, stream_name, config):
+        self.updates.append((stream_name, config.max_ack_pending))
+
+
+# --- Adaptive Limit Tests ---
+
+@pytest.mark.asyncio
+async def test_limit_grows_by_one_when_reached_at_a_steady_latency():
+    # AAA: Arrange
+    limit = AdaptiveLimit(initial=4, minimum=1, maximum=10)
+    await window(limit, 0.010)
+
+    # AAA: Act
+    changed = await window(limit, 0.010)
+
+    # AAA: Assert
+    assert changed is True
+    assert limit.limit == 6
+
+@pytest.mark.asyncio
+async def test_limit_does_not_grow_when_it_was_not_reached():
+    # AAA: Arrange
+    limit = AdaptiveLimit(initial=4, minimum=1, maximum=10)
+
+    # AAA: Act
+    changed = await window(limit, 0.010, concurrent=2)
+
+    # AAA: Assert
+    assert changed is False
+    assert limit.limit == 4
+
+@pytest.mark.asyncio
+async def test_limit_never_grows_past_its_maximum():
+    # AAA: Arrange
+    limit = AdaptiveLimit(initial=9, minimum=1, maximum=10)
+
+    # AAA: Act
+    for _ in range(3):
+        await window(limit, 0.010)
+
+    # AAA: Assert
+    assert limit.limit == 10
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("initial, expected", [(20, 18), (10, 9), (3, 2)])
+async def test_limit_backs_off_multiplicatively_when_latency_rises(initial, expected):
+    # AAA: Arrange
+    limit = AdaptiveLimit(initial=initial, minimum=1, maximum=50, tolerance=1.5, backoff=0.9)
+    await window(limit, 0.010, concurrent=1)
+
+    # AAA: Act
+    changed = await window(limit, 0.020, concurrent=1)
+
+    # AAA: Assert
+    assert changed is True
+    assert limit.limit == expected
+    assert limit.baseline == pytest.approx(0.010)
+
+@pytest.mark.asyncio
+async def test_latency_within_the_tolerance_does_not_back_off():
+    # AAA: Arrange
+    limit = AdaptiveLimit(initial=5, minimum=1, maximum=10, tolerance=1.5)
+    await window(limit, 0.010, concurrent=1)
+
+    # AAA: Act
+    changed = await window(limit, 0.014, concurrent=1)
+
+    # AAA: Assert
+    assert changed is False
+    assert limit.limit == 5
+
+@pytest.mark.asyncio
+async def test_baseline_follows_a_lastingly_slower_database_at_the_minimum():
+    # AAA: Arrange
+    limit = AdaptiveLimit(initial=2, minimum=1, maximum=10)
+    await window(limit, 0.010, concurrent=1)
+    await window(limit, 0.050, concurrent=1)
+    backed_off_to = limit.limit
+
+    # AAA: Act
+    grown = await window(limit, 0.050, concurrent=1)
+
+    # AAA: Assert
+    assert backed_off_to == 1
+    assert limit.baseline == pytest.approx(0.050)
+    assert grown is True
+    assert limit.limit == 2
+
+@pytest.mark.asyncio
+async def test_fixed_limit_never_changes():
+    # AAA: Arrange
+    limit = AdaptiveLimit.fixed(3)
+
+    # AAA: Act
+    changes = [await window(limit, latency) for latency in (0.010, 0.100, 0.010)]
+
+    # AAA: Assert
+    assert changes == [False, False, False]
+    assert limit.limit == 3
+
+@pytest.mark.asyncio
+async def test_window_without_released_slots_changes_nothing():
+    # AAA: Arrange
+    limit = AdaptiveLimit(initial=2, minimum=1, maximum=10)
+
+    # AAA: Act / Assert
+    assert limit.adjust() is False
+    assert limit.limit == 2
+
+@pytest.mark.asyncio
+async def test_acquire_waits_for_a_released_slot():
+    # AAA: Arrange
+    limit = AdaptiveLimit.fixed(1)
+    await limit.acquire()
+    waiting = asyncio.create_task(limit.acquire())
+    await asyncio.sleep(0)
+
+    # AAA: Act
+    blocked = not waiting.done()
+    limit.release(0.001)
+    await asyncio.wait_for(waiting, timeout=1)
+
+    # AAA: Assert
+    assert blocked
+    assert limit.in_use == 1
+
+
+# --- Pending Acknowledgement Limit Tests ---
+
+@pytest.mark.asyncio
+async def test_consumer_follows_the_limit_beyond_the_hysteresis():
+    # AAA: Arrange
+    consumer = FakeConsumer(max_ack_pending=1000)
+    ack_pending = AckPendingLimit(consumer, consumer, per_slot=100, hysteresis=0.2)
+
+    # AAA: Act
+    await ack_pending.update(5)
+    await ack_pending.update(6)
+    await ack_pending.update(7)
+
+    # AAA: Assert
+    assert consumer.updates == [("credits", 500), ("credits", 700)]
+    assert ack_pending.current == 700
+
+@pytest.mark.asyncio
+async def test_consumer_already_at_the_target_is_not_updated():
+    # AAA: Arrange
+    consumer = FakeConsumer(max_ack_pending=500)
+    ack_pending = AckPendingLimit(consumer, consumer, per_slot=100)
+
+    # AAA: Act
+    await ack_pending.update(5)
+
+    # AAA: Assert
+    assert consumer.updates == []
+    assert ack_pending.current == 500
+
+def test_every_worker_copies_the_same_concurrency_module():
+    # AAA: Arrange
+    copies = sorted(SERVICES_DIR.glob("*/concurrency/concurrency.py"))
+
+    # AAA: Act
+    sources = {path.read_bytes() for path in copies}
+
+    # AAA: Assert
+    assert len(copies) > 1
+    assert len(sources) == 1
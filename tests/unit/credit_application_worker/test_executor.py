@@ -0,0 +1,199 @@
+import uuid
+import asyncio
+import pytest
+
+from prometheus_client import REGISTRY
+from events.events import CreditOfferAcceptedEvent, encode_event
+from executor import executor
+from executor.executor import PartitionedExecutor
+
+class FakeMsg:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.headers = None
+        self.state = None
+
+    async def ack(self):
+        self.state = "ack"
+
+    async def nak(self, delay=None):
+        self.state = "nak"
+
+    async def in_progress(self):
+        self.state = "in_progress"
+
+class RecordedLanes:
+    """
+    Stand-in for `process_events` that records the groups of events each call receives, and leaves
+    the first `failures` groups unacknowledged.
+    """
+
+    def __init__(self):
+        self.groups = []
+        self.failures = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self, items, db_pool, js):
+        await self.release.wait()
+        self.groups.append([event for _, event in items])
+        if self.failures:
+            self.failures -= 1
+            return list(items)
+        for msg, _ in items:
+            await msg.ack()
+        return []
+
+@pytest.fixture
+def lanes(monkeypatch):
+    lanes = RecordedLanes()
+    monkeypatch.setattr(executor, "process_events", lanes)
+    return lanes
+
+def acceptance(user_id: uuid.UUID) -> FakeMsg:
+    event = CreditOfferAcceptedEvent(offer_id=uuid.uuid4(), user_id=user_id, accepted_at="2025-01-01T00:00:00Z")
+    return FakeMsg(encode_event(event))
+
+async def acknowledged(msg: FakeMsg):
+    while msg.state != "ack":
+        await asyncio.sleep(0.001)
+
+
+# --- Lane Tests ---
+
+@pytest.mark.asyncio
+async def test_acceptances_of_a_user_keep_their_order_in_one_lane(lanes):
+    # AAA: Arrange
+    users = [uuid.UUID(int=lane) for lane in range(4)]
+    msgs = [acceptance(users[index % 4]) for index in range(40)]
+    pool = PartitionedExecutor(None, None, lane_count=4, lane_capacity=100, batch_size=5)
+    pool.start()
+
+    # AAA: Act
+    for msg in msgs:
+        await pool.submit(msg)
+    await pool.stop()
+
+    # AAA: Assert
+    for user_id in users:
+        groups = [group for group in lanes.groups if any(event.user_id == user_id for event in group)]
+        assert all(event.user_id == user_id for group in groups for event in group)
+        submitted = [event.offer_id for event in map(executor.decode_message, msgs) if event.user_id == user_id]
+        assert [event.offer_id for group in groups for event in group] == submitted
+    assert all(msg.state == "ack" for msg in msgs)
+
+@pytest.mark.asyncio
+async def test_waiting_acceptances_are_processed_together(lanes):
+    # AAA: Arrange
+    user_id = uuid.UUID(int=1)
+    lanes.release.clear()
+    pool = PartitionedExecutor(None, None, lane_count=1, lane_capacity=100, batch_size=3)
+    pool.start()
+    await pool.submit(acceptance(user_id))
+    await asyncio.sleep(0)
+
+    # AAA: Act
+    for _ in range(4):
+        await pool.submit(acceptance(user_id))
+    lanes.release.set()
+    await pool.stop()
+
+    # AAA: Assert
+    assert [len(group) for group in lanes.groups] == [1, 3, 1]
+
+@pytest.mark.asyncio
+async def test_latency_of_every_acknowledged_acceptance_is_exported_by_lane(lanes):
+    # AAA: Arrange
+    def observed(lane: int) -> float:
+        return REGISTRY.get_sample_value("ecs_lane_latency_seconds_count", {"lane": str(lane)}) or 0.0
+    before = [observed(lane) for lane in range(2)]
+    pool = PartitionedExecutor(None, None, lane_count=2, lane_capacity=10, batch_size=5)
+    pool.start()
+
+    # AAA: Act
+    for user in [1, 1, 1, 2]:
+        await pool.submit(acceptance(uuid.UUID(int=user)))
+    await pool.stop()
+    pool.collect_stats()
+
+    # AAA: Assert
+    assert [observed(lane) - before[lane] for lane in range(2)] == [1, 3]
+
+@pytest.mark.asyncio
+async def test_malformed_acceptance_is_acknowledged_without_processing(lanes):
+    # AAA: Arrange
+    msg = FakeMsg(b"not json")
+    pool = PartitionedExecutor(None, None, lane_count=2, lane_capacity=10, batch_size=5)
+    pool.start()
+
+    # AAA: Act
+    await pool.submit(msg)
+    await pool.stop()
+
+    # AAA: Assert
+    assert msg.state == "ack"
+    assert lanes.groups == []
+
+@pytest.mark.asyncio
+async def test_acceptances_submitted_after_stop_are_redelivered(lanes):
+    # AAA: Arrange
+    pool = PartitionedExecutor(None, None, lane_count=2, lane_capacity=10, batch_size=5)
+    pool.start()
+    await pool.stop()
+    msg = acceptance(uuid.UUID(int=1))
+
+    # AAA: Act
+    await pool.submit(msg)
+
+    # AAA: Assert
+    assert msg.state == "nak"
+    assert pool.lane_depths() == [0, 0]
+    assert lanes.groups == []
+
+
+# --- Retry Tests ---
+
+@pytest.mark.asyncio
+async def test_failed_group_is_retried_before_later_acceptances_of_its_lane(lanes):
+    # AAA: Arrange
+    user_id = uuid.UUID(int=1)
+    lanes.failures = 2
+    first, later = acceptance(user_id), acceptance(user_id)
+    pool = PartitionedExecutor(None, None, lane_count=1, lane_capacity=10, batch_size=5, retry_backoff=0.001)
+    pool.start()
+    await pool.submit(first)
+    await asyncio.sleep(0)
+
+    # AAA: Act
+    await pool.submit(later)
+    await asyncio.wait_for(acknowledged(later), timeout=1)
+    await pool.stop()
+
+    # AAA: Assert
+    offer_ids = [[event.offer_id for event in group] for group in lanes.groups]
+    first_id, later_id = (executor.decode_message(msg).offer_id for msg in (first, later))
+    assert offer_ids == [[first_id], [first_id], [first_id], [later_id]]
+    assert (first.state, later.state) == ("ack", "ack")
+
+@pytest.mark.asyncio
+async def test_stop_redelivers_the_retried_group_and_the_acceptances_behind_it(lanes):
+    # AAA: Arrange
+    user_id = uuid.UUID(int=1)
+    lanes.failures = 1000
+    retried, behind = acceptance(user_id), [acceptance(user_id) for _ in range(2)]
+    other_lane = acceptance(uuid.UUID(int=2))
+    pool = PartitionedExecutor(None, None, lane_count=2, lane_capacity=10, batch_size=1, retry_backoff=60)
+    pool.start()
+    await pool.submit(retried)
+    await asyncio.sleep(0)
+    for msg in behind:
+        await pool.submit(msg)
+
+    # AAA: Act
+    await asyncio.wait_for(pool.stop(), timeout=1)
+    await pool.submit(other_lane)
+
+    # AAA: Assert
+    assert len(lanes.groups) == 2
+    assert [msg.state for msg in (retried, *behind, other_lane)] == ["nak"] * 4
+    assert pool.lane_depths() == [0, 0]
@@ -0,0 +1,151 @@
+import uuid
+import pytest
+
+from contextlib import asynccontextmanager
+from processing import processing
+from events.events import CreditOfferAcceptedEvent
+
+USER_ID = uuid.UUID("00000000-0000-0000-0000-00000000000a")
+
+class FakeMsg:
+    """Message that records its acknowledgement in the shared `log`."""
+
+    def __init__(self, name: str, log: list):
+        self.name = name
+        self._log = log
+
+    async def ack(self):
+        self._log.append(("ack", self.name))
+
+    async def nak(self, delay=None):
+        self._log.append(("nak", self.name))
+
+class FakePool:
+    @asynccontextmanager
+    async def acquire(self):
+        yield None
+
+class FakeDatabase:
+    """Stand-in for `activate_credit_offers` over offers that are 'offered', 'active' or missing."""
+
+    def __init__(self, log: list):
+        self.status = {}
+        self.error = None
+        self._log = log
+
+    async def __call__(self, conn, offers):
+        if self.error:
+            raise self.error
+        active = []
+        for offer_id, user_id in offers:
+            status = self.status.get(offer_id)
+            if status in ("offered", "active"):
+                active.append({"id": offer_id, "user_id": user_id, "activated": status == "offered"})
+                self.status[offer_id] = "active"
+        self._log.append(("activate", [str(offer["id"]) for offer in active]))
+        return active
+
+class FakeNotifier:
+    """Stand-in for `send_activation_notification` that fails for the offers in `failing`."""
+
+    def __init__(self, log: list):
+        self.failing = set()
+        self.attempts = 0
+        self._log = log
+
+    async def __call__(self, js, offer_id, user_id):
+        self.attempts += 1
+        if offer_id in self.failing:
+            raise TimeoutError("no response from stream")
+        self._log.append(("notify", str(offer_id)))
+
+@pytest.fixture
+def log():
+    return []
+
+@pytest.fixture
+def database(monkeypatch, log):
+    database = FakeDatabase(log)
+    monkeypatch.setattr(processing, "activate_credit_offers", database)
+    return database
+
+@pytest.fixture
+def notifier(monkeypatch, log):
+    notifier = FakeNotifier(log)
+    monkeypatch.setattr(processing, "send_activation_notification", notifier)
+    monkeypatch.setattr(processing, "NOTIFY_RETRY_BACKOFF", 0)
+    return notifier
+
+def acceptance(offer_id: uuid.UUID, log: list) -> tuple:
+    event = CreditOfferAcceptedEvent(offer_id=offer_id, user_id=USER_ID, accepted_at="2025-01-01T00:00:00Z")
+    return FakeMsg(str(offer_id), log), event
+
+
+# --- Activation Tests ---
+
+@pytest.mark.asyncio
+async def test_message_is_acknowledged_after_the_notification(database, notifier, log):
+    # AAA: Arrange
+    offer_id = uuid.uuid4()
+    database.status[offer_id] = "offered"
+
+    # AAA: Act
+    await processing.process_events([acceptance(offer_id, log)], FakePool(), js=None)
+
+    # AAA: Assert
+    assert log == [("activate", [str(offer_id)]), ("notify", str(offer_id)), ("ack", str(offer_id))]
+
+@pytest.mark.asyncio
+async def test_failed_notification_is_retried_then_returned_unacknowledged(database, notifier, log):
+    # AAA: Arrange
+    notified, failing = uuid.uuid4(), uuid.uuid4()
+    database.status.update({notified: "offered", failing: "offered"})
+    notifier.failing = {failing}
+    items = [acceptance(notified, log), acceptance(failing, log)]
+
+    # AAA: Act
+    unacknowledged = await processing.process_events(items, FakePool(), js=None)
+
+    # AAA: Assert
+    assert notifier.attempts == 1 + processing.NOTIFY_MAX_RETRIES + 1
+    assert unacknowledged == items[1:]
+    assert ("ack", str(notified)) in log
+    assert ("ack", str(failing)) not in log
+    assert ("nak", str(failing)) not in log
+
+@pytest.mark.asyncio
+async def test_redelivered_acceptance_of_an_active_offer_notifies_again(database, notifier, log):
+    # AAA: Arrange
+    offer_id = uuid.uuid4()
+    database.status[offer_id] = "active"
+
+    # AAA: Act
+    await processing.process_events([acceptance(offer_id, log)], FakePool(), js=None)
+
+    # AAA: Assert
+    assert log == [("activate", [str(offer_id)]), ("notify", str(offer_id)), ("ack", str(offer_id))]
+
+@pytest.mark.asyncio
+async def test_acceptance_of_an_unknown_offer_is_acknowledged_without_notification(database, notifier, log):
+    # AAA: Arrange
+    offer_id = uuid.uuid4()
+
+    # AAA: Act
+    await processing.process_events([acceptance(offer_id, log)], FakePool(), js=None)
+
+    # AAA: Assert
+    assert log == [("activate", []), ("ack", str(offer_id))]
+
+@pytest.mark.asyncio
+async def test_failed_activation_returns_every_message_unacknowledged(database, notifier, log):
+    # AAA: Arrange
+    items = [acceptance(uuid.uuid4(), log) for _ in range(2)]
+    database.error = ConnectionError("database unavailable")
+
+    # AAA: Act
+    unacknowledged = await processing.process_events(items, FakePool(), js=None)
+
+    # AAA: Assert
+    assert unacknowledged == items
+    assert log == []
+    assert notifier.attempts == 0
@@ -0,0 +1,3 @@
+from unit.loader import use_service
+
+use_service("emotion-ingestion-service")
@@ -0,0 +1,99 @@
+import asyncio
+import orjson
+import pytest
+
+from types import SimpleNamespace
+from fastapi import HTTPException
+from starlette.requests import ClientDisconnect
+from api import api
+from api.api import publish_emotion_events_batch
+
+class FakeJetStream:
+    """
+    Stand-in for a NATS connection and its JetStream context that stores each `Nats-Msg-Id` once,
+    like a stream within its duplicate window, after yielding to the event loop.
+    """
+
+    def __init__(self):
+        self.is_connected = True
+        self.msg_ids = []
+        self.stored = []
+
+    def jetstream(self):
+        return self
+
+    async def publish(self, subject, payload, headers=None):
+        await asyncio.sleep(0)
+        msg_id = headers["Nats-Msg-Id"]
+        self.msg_ids.append(msg_id)
+        if msg_id not in [stored_id for stored_id, _ in self.stored]:
+            self.stored.append((msg_id, payload))
+
+class FakeRequest:
+    """NDJSON request whose body arrives in `chunks`, raising `error` once they are read."""
+
+    def __init__(self, nc: FakeJetStream, chunks: list[bytes], error: Exception | None = None):
+        self.app = SimpleNamespace(state=SimpleNamespace(nats_connection=nc))
+        self.headers = {"content-type": "application/x-ndjson"}
+        self._chunks = chunks
+        self._error = error
+
+    async def stream(self):
+        for chunk in self._chunks:
+            yield chunk
+        if self._error:
+            raise self._error
+
+def line(user_id: str) -> bytes:
+    return orjson.dumps({
+        "userId": user_id,
+        "timestamp": "2025-08-19T12:00:00Z",
+        "emotionEvent": {"type": "SENTIMENT_ANALYSIS", "metrics": {"positivity": 0.8, "intensity": 0.6, "stress_level": 0.2}},
+    }) + b"\n"
+
+
+# --- Batch Endpoint Tests ---
+
+@pytest.mark.asyncio
+async def test_events_are_published_under_the_request_id_and_their_index():
+    # AAA: Arrange
+    nc = FakeJetStream()
+    request = FakeRequest(nc, [line("user-1") + b"not json\n" + line("user-2")])
+
+    # AAA: Act
+    response = await publish_emotion_events_batch(request, x_request_id="batch-1")
+
+    # AAA: Assert
+    assert (response.accepted, response.rejected) == (2, 1)
+    assert [msg_id for msg_id, _ in nc.stored] == ["batch-1-0", "batch-1-2"]
+
+@pytest.mark.asyncio
+async def test_retry_of_a_batch_stopped_by_a_large_event_is_not_published_twice(monkeypatch):
+    # AAA: Arrange
+    monkeypatch.setattr(api, "MAX_EVENT_BYTES", 512)
+    nc = FakeJetStream()
+    body = [line("user-1"), line("user-2"), b'{"userId": "' + b"x" * 600]
+    with pytest.raises(HTTPException) as too_large:
+        await publish_emotion_events_batch(FakeRequest(nc, body), x_request_id="batch-1")
+
+    # AAA: Act
+    response = await publish_emotion_events_batch(FakeRequest(nc, body[:2]), x_request_id="batch-1")
+
+    # AAA: Assert
+    assert too_large.value.status_code == 413
+    assert response.accepted == 2
+    assert nc.msg_ids == ["batch-1-0", "batch-1-1"] * 2
+    assert len(nc.stored) == 2
+
+@pytest.mark.asyncio
+async def test_publishes_are_awaited_when_the_client_disconnects():
+    # AAA: Arrange
+    nc = FakeJetStream()
+    request = FakeRequest(nc, [line("user-1"), line("user-2")], ClientDisconnect())
+
+    # AAA: Act
+    with pytest.raises(ClientDisconnect):
+        await publish_emotion_events_batch(request, x_request_id="batch-1")
+
+    # AAA: Assert
+    assert [msg_id for msg_id, _ in nc.stored] == ["batch-1-0", "batch-1-1"]
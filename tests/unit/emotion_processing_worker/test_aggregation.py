@@ -0,0 +1,180 @@
+import uuid
+import asyncio
+import asyncpg
+import pytest
+
+from datetime import date
+from contextlib import asynccontextmanager
+from aggregation import aggregation
+from aggregation.aggregation import EmotionSummaryAggregator
+from events.events import EmotionEvent, EmotionEventPayload, EmotionMetrics
+
+USER_A = uuid.UUID("00000000-0000-0000-0000-00000000000a")
+USER_B = uuid.UUID("00000000-0000-0000-0000-00000000000b")
+
+class FakeMsg:
+    """Message that records its acknowledgement in the shared `log`."""
+
+    def __init__(self, name: str, log: list):
+        self.name = name
+        self._log = log
+
+    async def ack(self):
+        self._log.append(("ack", self.name))
+
+    async def nak(self, delay=None):
+        self._log.append(("nak", self.name))
+
+class FakePool:
+    @asynccontextmanager
+    async def acquire(self):
+        yield None
+
+class FakeUpsert:
+    """Stand-in for `upsert_emotional_summaries` that rejects the batches containing a user of `rejected`."""
+
+    def __init__(self, log: list):
+        self.batches = []
+        self.rejected = set()
+        self.error = None
+        self._log = log
+
+    async def __call__(self, conn, rows):
+        if self.error:
+            raise self.error
+        if any(row[0] in self.rejected for row in rows):
+            raise asyncpg.exceptions.DataError("value out of range")
+        self.batches.append(rows)
+        self._log.append(("upsert", [row[0] for row in rows]))
+
+def emotion_event(user_id: uuid.UUID, day: str, positivity: float = 0.5) -> EmotionEvent:
+    metrics = EmotionMetrics(positivity=positivity, intensity=0.25, stress_level=0.75)
+    payload = EmotionEventPayload(type="SENTIMENT_ANALYSIS", metrics=metrics)
+    return EmotionEvent(user_id=str(user_id), timestamp=f"{day}T12:00:00Z", emotion_event=payload)
+
+@pytest.fixture
+def log():
+    return []
+
+@pytest.fixture
+def upsert(monkeypatch, log):
+    upsert = FakeUpsert(log)
+    monkeypatch.setattr(aggregation, "upsert_emotional_summaries", upsert)
+    return upsert
+
+
+# --- Aggregation Tests ---
+
+@pytest.mark.asyncio
+async def test_flush_folds_the_events_of_a_user_and_day_into_one_row(upsert, log):
+    # AAA: Arrange
+    aggregator = EmotionSummaryAggregator(FakePool(), flush_interval_ms=1000, flush_max_events=100)
+    aggregator.add(emotion_event(USER_A, "2025-01-01", positivity=0.2), FakeMsg("a1", log))
+    aggregator.add(emotion_event(USER_A, "2025-01-01", positivity=0.6), FakeMsg("a2", log))
+    aggregator.add(emotion_event(USER_A, "2025-01-02"), FakeMsg("a3", log))
+
+    # AAA: Act
+    await aggregator.flush()
+
+    # AAA: Assert
+    (rows,) = upsert.batches
+    assert [row[:2] for row in rows] == [(USER_A, date(2025, 1, 1)), (USER_A, date(2025, 1, 2))]
+    assert rows[0][2:] == (pytest.approx(0.8), 0.5, 1.5, 2)
+    assert rows[1][5] == 1
+
+@pytest.mark.asyncio
+async def test_messages_are_acknowledged_only_after_the_upsert(upsert, log):
+    # AAA: Arrange
+    aggregator = EmotionSummaryAggregator(FakePool(), flush_interval_ms=1000, flush_max_events=100)
+    aggregator.add(emotion_event(USER_A, "2025-01-01"), FakeMsg("a1", log))
+    aggregator.add(emotion_event(USER_B, "2025-01-01"), FakeMsg("b1", log))
+
+    # AAA: Act
+    await aggregator.flush()
+
+    # AAA: Assert
+    assert log[0] == ("upsert", [USER_A, USER_B])
+    assert sorted(log[1:]) == [("ack", "a1"), ("ack", "b1")]
+
+@pytest.mark.asyncio
+async def test_flush_without_pending_events_writes_nothing(upsert, log):
+    # AAA: Arrange
+    aggregator = EmotionSummaryAggregator(FakePool(), flush_interval_ms=1000, flush_max_events=100)
+
+    # AAA: Act
+    await aggregator.flush()
+
+    # AAA: Assert
+    assert upsert.batches == []
+    assert log == []
+
+@pytest.mark.asyncio
+async def test_rejected_summary_is_isolated_and_acknowledged(upsert, log):
+    # AAA: Arrange
+    upsert.rejected = {USER_B}
+    aggregator = EmotionSummaryAggregator(FakePool(), flush_interval_ms=1000, flush_max_events=100)
+    aggregator.add(emotion_event(USER_A, "2025-01-01"), FakeMsg("a1", log))
+    aggregator.add(emotion_event(USER_B, "2025-01-01"), FakeMsg("b1", log))
+
+    # AAA: Act
+    await aggregator.flush()
+
+    # AAA: Assert
+    assert [[row[0] for row in rows] for rows in upsert.batches] == [[USER_A]]
+    assert ("ack", "a1") in log
+    assert ("ack", "b1") in log
+    assert not any(action == "nak" for action, _ in log)
+
+@pytest.mark.asyncio
+async def test_failed_upsert_naks_every_message(upsert, log):
+    # AAA: Arrange
+    upsert.error = ConnectionError("database unavailable")
+    aggregator = EmotionSummaryAggregator(FakePool(), flush_interval_ms=1000, flush_max_events=100)
+    aggregator.add(emotion_event(USER_A, "2025-01-01"), FakeMsg("a1", log))
+    aggregator.add(emotion_event(USER_B, "2025-01-01"), FakeMsg("b1", log))
+
+    # AAA: Act
+    await aggregator.flush()
+
+    # AAA: Assert
+    assert sorted(log) == [("nak", "a1"), ("nak", "b1")]
+
+@pytest.mark.asyncio
+async def test_reaching_flush_max_events_flushes_before_the_interval(upsert, log):
+    # AAA: Arrange
+    aggregator = EmotionSummaryAggregator(FakePool(), flush_interval_ms=60_000, flush_max_events=2)
+    aggregator.start()
+
+    # AAA: Act
+    aggregator.add(emotion_event(USER_A, "2025-01-01"), FakeMsg("a1", log))
+    aggregator.add(emotion_event(USER_A, "2025-01-01"), FakeMsg("a2", log))
+    await asyncio.sleep(0.05)
+
+    # AAA: Assert
+    try:
+        assert len(upsert.batches) == 1
+        assert sorted(log[1:]) == [("ack", "a1"), ("ack", "a2")]
+    finally:
+        await aggregator.stop()
+
+@pytest.mark.asyncio
+async def test_stop_flushes_the_pending_events(upsert, log):
+    # AAA: Arrange
+    aggregator = EmotionSummaryAggregator(FakePool(), flush_interval_ms=60_000, flush_max_events=100)
+    aggregator.start()
+    aggregator.add(emotion_event(USER_A, "2025-01-01"), FakeMsg("a1", log))
+
+    # AAA: Act
+    await aggregator.stop()
+
+    # AAA: Assert
+    assert log == [("upsert", [USER_A]), ("ack", "a1")]
+
+def test_event_with_malformed_timestamp_is_rejected():
+    # AAA: Arrange
+    aggregator = EmotionSummaryAggregator(FakePool(), flush_interval_ms=1000, flush_max_events=100)
+    event = emotion_event(USER_A, "2025-13-01")
+
+    # AAA: Act / Assert
+    with pytest.raises(ValueError):
+        aggregator.add(event, FakeMsg("a1", []))
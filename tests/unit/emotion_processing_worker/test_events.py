@@ -0,0 +1,102 @@
+import json
+import uuid
+import pytest
+
+from unit.loader import SERVICES_DIR
+from events.events import (
+    JSON,
+    MSGPACK,
+    CONTENT_TYPE_HEADER,
+    EmotionEvent,
+    EmotionEventPayload,
+    EmotionMetrics,
+    CreditOfferAcceptedEvent,
+    EventDecoder,
+    EventDecodeError,
+    check_content_type,
+    encode_event,
+    event_headers,
+)
+
+EVENT = EmotionEvent(
+    user_id=str(uuid.UUID(int=1)),
+    timestamp="2025-01-01T12:00:00Z",
+    emotion_event=EmotionEventPayload(type="SENTIMENT_ANALYSIS", metrics=EmotionMetrics(positivity=0.8, intensity=0.9, stress_level=0.2)),
+    trace_id="trace",
+)
+
+
+# --- Event Codec Tests ---
+
+@pytest.mark.parametrize("content_type", [JSON, MSGPACK])
+def test_event_is_decoded_by_the_content_type_it_was_published_with(content_type):
+    # AAA: Arrange
+    data = encode_event(EVENT, content_type)
+
+    # AAA: Act
+    decoded = EventDecoder(EmotionEvent).decode(data, event_headers(content_type))
+
+    # AAA: Assert
+    assert decoded == EVENT
+
+def test_json_events_are_published_without_headers():
+    # AAA: Act / Assert
+    assert event_headers(JSON) is None
+    assert event_headers(MSGPACK) == {CONTENT_TYPE_HEADER: MSGPACK}
+
+def test_message_without_content_type_is_read_as_the_json_of_older_producers():
+    # AAA: Arrange
+    data = json.dumps({
+        "userId": str(uuid.UUID(int=1)),
+        "timestamp": "2025-01-01T12:00:00Z",
+        "emotionEvent": {"type": "SENTIMENT_ANALYSIS", "metrics": {"positivity": 0.8, "intensity": 0.9, "stress_level": 0.2}},
+        "traceId": "trace",
+    }).encode()
+
+    # AAA: Act
+    decoded = EventDecoder(EmotionEvent).decode(data, {"Nats-Msg-Id": "id"})
+
+    # AAA: Assert
+    assert decoded == EVENT
+
+def test_message_with_unsupported_content_type_is_rejected():
+    # AAA: Arrange
+    data = encode_event(EVENT, JSON)
+
+    # AAA: Act / Assert
+    with pytest.raises(EventDecodeError, match="application/xml"):
+        EventDecoder(EmotionEvent).decode(data, {CONTENT_TYPE_HEADER: "application/xml"})
+
+@pytest.mark.parametrize("content_type", [JSON, MSGPACK])
+def test_payload_of_another_event_type_is_rejected(content_type):
+    # AAA: Arrange
+    data = encode_event(EVENT, content_type)
+
+    # AAA: Act / Assert
+    with pytest.raises(EventDecodeError):
+        EventDecoder(CreditOfferAcceptedEvent).decode(data, event_headers(content_type))
+
+def test_payload_encoded_with_another_content_type_than_announced_is_rejected():
+    # AAA: Arrange
+    data = encode_event(EVENT, MSGPACK)
+
+    # AAA: Act / Assert
+    with pytest.raises(EventDecodeError):
+        EventDecoder(EmotionEvent).decode(data, event_headers(JSON))
+
+def test_producers_refuse_unsupported_content_types():
+    # AAA: Act / Assert
+    assert check_content_type(MSGPACK) == MSGPACK
+    with pytest.raises(ValueError, match="application/x-protobuf"):
+        check_content_type("application/x-protobuf")
+
+def test_every_service_copies_the_same_event_schema():
+    # AAA: Arrange
+    copies = sorted(SERVICES_DIR.glob("*/events/events.py"))
+
+    # AAA: Act
+    sources = {path.read_bytes() for path in copies}
+
+    # AAA: Assert
+    assert len(copies) > 1
+    assert len(sources) == 1
@@ -0,0 +1,34 @@
+import sys
+
+from pathlib import Path
+
+SERVICES_DIR = Path(__file__).resolve().parents[2] / "services"
+
+def use_service(name: str):
+    """
+    Makes the modules of services/<name> importable by their top-level names, as they are inside its image.
+
+    Every service has its own `configuration`, `database`, `processing`... packages, so the modules
+    loaded for the tests of another service are forgotten first. The copies of the shared modules
+    (metrics, logs, events...) that are identical in both services are kept, since some of them
+    register process-wide state such as the Prometheus collectors.
+    """
+    service_dir = SERVICES_DIR / name
+    sys.path[:] = [entry for entry in sys.path if Path(entry).resolve().parent != SERVICES_DIR]
+    for module_name, module in list(sys.modules.items()):
+        top_level = module_name.split(".")[0]
+        if not any((other / top_level).exists() or (other / f"{top_level}.py").exists() for other in SERVICES_DIR.iterdir()):
+            continue
+        if not _same_source(module, service_dir):
+            del sys.modules[module_name]
+    sys.path.insert(0, str(service_dir))
+
+def _same_source(module, service_dir: Path) -> bool:
+    path = getattr(module, "__file__", None)
+    if path is None:
+        return False
+    path = Path(path).resolve()
+    if not path.is_relative_to(SERVICES_DIR):
+        return False
+    own_copy = service_dir.joinpath(*path.relative_to(SERVICES_DIR).parts[1:])
+    return own_copy.exists() and own_copy.read_bytes() == path.read_bytes()
@@ -0,0 +1,119 @@
+import asyncio
+import pytest
+
+import main
+
+from types import SimpleNamespace
+from nats.errors import TimeoutError
+from nats.js.errors import NotFoundError
+from nats.js.api import DeliverPolicy
+
+class FakeJetStream:
+    """Stand-in for the JetStream context, with the durables of the transactions stream."""
+
+    def __init__(self, durables: dict, batches: list):
+        self.durables = durables
+        self.created = None
+        self.subscription = FakePullSubscription(batches)
+
+    async def find_stream_name_by_subject(self, subject):
+        return "transactions"
+
+    async def consumer_info(self, stream, durable):
+        if durable not in self.durables:
+            raise NotFoundError()
+        return self.durables[durable]
+
+    async def pull_subscribe(self, subject, durable, stream, config):
+        self.created = config
+        return self.subscription
+
+class FakePullSubscription:
+    """Returns the given batches, times out once in between, and stops the consumer when there are none left."""
+
+    def __init__(self, batches: list):
+        self._batches = list(batches)
+        self._timed_out = False
+
+    async def fetch(self, batch, timeout):
+        if not self._timed_out:
+            self._timed_out = True
+            raise TimeoutError()
+        if not self._batches:
+            raise asyncio.CancelledError()
+        return self._batches.pop(0)
+
+class FakeMsg:
+    def __init__(self):
+        self.state = None
+
+    async def nak(self, delay=None):
+        self.state = "nak"
+
+def durable(ack_floor: int, push_bound: bool = False):
+    return SimpleNamespace(ack_floor=SimpleNamespace(stream_seq=ack_floor), push_bound=push_bound)
+
+
+# --- Batch Durable Tests ---
+
+@pytest.mark.asyncio
+async def test_batch_durable_starts_after_the_per_message_ack_floor():
+    # AAA: Arrange
+    js = FakeJetStream({main.DURABLE_NAME: durable(1234)}, [])
+
+    # AAA: Act
+    config = await main.batch_consumer_config(js, "transactions")
+
+    # AAA: Assert
+    assert config.deliver_policy == DeliverPolicy.BY_START_SEQUENCE
+    assert config.opt_start_seq == 1235
+
+@pytest.mark.asyncio
+async def test_batch_durable_takes_new_messages_only_without_a_per_message_durable():
+    # AAA: Arrange
+    js = FakeJetStream({}, [])
+
+    # AAA: Act
+    config = await main.batch_consumer_config(js, "transactions")
+
+    # AAA: Assert
+    assert config.deliver_policy == DeliverPolicy.NEW
+    assert config.opt_start_seq is None
+
+@pytest.mark.asyncio
+async def test_existing_batch_durable_is_resumed_as_it_is():
+    # AAA: Arrange
+    js = FakeJetStream({main.DURABLE_NAME: durable(1234), main.BATCH_DURABLE_NAME: durable(5000)}, [])
+
+    # AAA: Act
+    with pytest.raises(asyncio.CancelledError):
+        await main.consume_in_batches(js, None)
+
+    # AAA: Assert
+    assert js.created is None
+
+
+# --- Batch Loop Tests ---
+
+@pytest.mark.asyncio
+async def test_failing_batch_is_redelivered_without_stopping_the_consumer(monkeypatch):
+    # AAA: Arrange
+    batches = [[FakeMsg(), FakeMsg()], [FakeMsg()]]
+    processed = []
+
+    async def process_batch(msgs, db_pool):
+        processed.append(msgs)
+        if len(processed) == 1:
+            raise ConnectionError("connection closed")
+
+    monkeypatch.setattr(main, "process_batch", process_batch)
+    js = FakeJetStream({}, batches)
+
+    # AAA: Act
+    with pytest.raises(asyncio.CancelledError):
+        await main.consume_in_batches(js, None)
+
+    # AAA: Assert
+    assert processed == batches
+    assert [msg.state for msg in batches[0]] == ["nak", "nak"]
+    assert batches[1][0].state is None
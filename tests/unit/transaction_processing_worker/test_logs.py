@@ -0,0 +1,63 @@
+import logging
+import pytest
+
+from logs import logs
+from logs.logs import SuccessSampler, parse_sample_rates
+
+@pytest.fixture
+def dropping_draws(monkeypatch):
+    """Makes every random draw of the sampler 0.5, so rates below it drop and rates above it keep."""
+    monkeypatch.setattr(logs.random, "random", lambda: 0.5)
+
+
+# --- Sample Rate Parsing Tests ---
+
+def test_sample_rates_are_parsed_per_logger():
+    # AAA: Act
+    rates = parse_sample_rates(" transaction_processing_worker.processing=0.01, user_credit_service.api = 1 ,")
+
+    # AAA: Assert
+    assert rates == {"transaction_processing_worker.processing": 0.01, "user_credit_service.api": 1.0}
+
+@pytest.mark.parametrize("entry", ["foo", "foo=", "=0.5", "foo=often", "foo=1.5", "foo=-0.1", "foo=nan"])
+def test_invalid_sample_rate_is_skipped_with_a_warning(caplog, entry):
+    # AAA: Act
+    with caplog.at_level(logging.WARNING):
+        rates = parse_sample_rates(f"{entry},bar=0.2")
+
+    # AAA: Assert
+    assert rates == {"bar": 0.2}
+    assert [record.levelno for record in caplog.records] == [logging.WARNING]
+    assert repr(entry) in caplog.records[0].getMessage()
+
+
+# --- Success Sampler Tests ---
+
+@pytest.mark.parametrize("level", [logging.WARNING, logging.ERROR, logging.CRITICAL])
+def test_warnings_and_errors_are_never_sampled(dropping_draws, level):
+    # AAA: Arrange
+    sampler = SuccessSampler({"worker": 0.0})
+
+    # AAA: Act / Assert
+    assert sampler.keep("worker", level)
+    assert sampler.keep("worker.processing", level)
+
+def test_records_below_warning_are_sampled_at_the_rate_of_their_logger(dropping_draws):
+    # AAA: Arrange
+    sampler = SuccessSampler({"worker.processing": 0.1, "worker.api": 0.9})
+
+    # AAA: Act / Assert
+    assert not sampler.keep("worker.processing", logging.INFO)
+    assert sampler.keep("worker.api", logging.INFO)
+    assert sampler.keep("worker", logging.DEBUG)
+
+def test_rate_is_inherited_from_the_closest_configured_ancestor():
+    # AAA: Arrange
+    sampler = SuccessSampler({"worker": 0.5, "worker.processing": 0.01})
+
+    # AAA: Act / Assert
+    assert sampler.rate_of("worker.processing.batch") == 0.01
+    assert sampler.rate_of("worker.processing") == 0.01
+    assert sampler.rate_of("worker.api") == 0.5
+    assert sampler.rate_of("workers") == 1.0
+    assert sampler.rate_of("other.processing") == 1.0
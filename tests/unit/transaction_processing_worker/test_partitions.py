@@ -0,0 +1,191 @@
+import pytest
+
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from partitions import partitions
+from partitions.partitions import add_months, month_start, partition_name, maintain_partitions, migrate_to_partitions
+
+NOW = datetime(2025, 11, 20, 15, 30, tzinfo=timezone.utc)
+
+def utc(year: int, month: int) -> datetime:
+    return datetime(year, month, 1, tzinfo=timezone.utc)
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return NOW.astimezone(tz)
+
+class FakeTransactions:
+    """
+    In-memory partition catalog of the transactions table, standing in for the partition
+    functions of database.database and for the connection they are given.
+    """
+
+    def __init__(self):
+        self.partitioned = True
+        self.partitions = {"transactions_default": (None, None, True)}
+        self.created = []
+        self.detached = []
+        self.dropped = []
+        self.steps = []
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def execute(self, query, *args):
+        self.steps.append(("execute", query.split("(")[0]))
+
+    async def fetch_transaction_partitions(self, db_conn):
+        rows = [
+            {"name": name, "lower_bound": lower, "upper_bound": upper, "is_default": is_default}
+            for name, (lower, upper, is_default) in self.partitions.items()
+        ]
+        return sorted(rows, key=lambda row: (row["upper_bound"] is not None, row["upper_bound"] or NOW))
+
+    async def create_transaction_partition(self, db_conn, name, lower_bound, upper_bound, default_partition):
+        assert default_partition == "transactions_default"
+        assert name not in self.partitions
+        self.partitions[name] = (lower_bound, upper_bound, False)
+        self.created.append((name, lower_bound, upper_bound))
+
+    async def detach_transaction_partition(self, db_conn, name, drop):
+        del self.partitions[name]
+        (self.dropped if drop else self.detached).append(name)
+
+    async def is_transactions_partitioned(self, db_conn):
+        return self.partitioned
+
+    async def prepare_legacy_transactions(self, db_conn, bound):
+        self.steps.append(("prepare", bound))
+
+    async def swap_in_partitioned_transactions(self, db_conn, bound):
+        self.steps.append(("swap", bound))
+        self.partitioned = True
+        self.partitions = {"transactions_default": (None, None, True), "transactions_legacy": (None, bound, False)}
+
+    async def drop_legacy_transaction_indexes(self, db_conn):
+        self.steps.append(("drop indexes", None))
+
+    def add(self, lower_bound: datetime):
+        self.partitions[partition_name(lower_bound)] = (lower_bound, add_months(lower_bound, 1), False)
+
+@pytest.fixture
+def table(monkeypatch):
+    table = FakeTransactions()
+    monkeypatch.setattr(partitions, "datetime", FrozenDatetime)
+    for name in (
+        "fetch_transaction_partitions", "create_transaction_partition", "detach_transaction_partition",
+        "is_transactions_partitioned", "prepare_legacy_transactions", "swap_in_partitioned_transactions",
+        "drop_legacy_transaction_indexes",
+    ):
+        monkeypatch.setattr(partitions, name, getattr(table, name))
+    return table
+
+
+# --- Month Arithmetic Tests ---
+
+def test_month_start_is_taken_in_utc():
+    # AAA: Arrange
+    moment = datetime(2025, 12, 1, 1, 0, tzinfo=timezone(timedelta(hours=3)))
+
+    # AAA: Act
+    start = month_start(moment)
+
+    # AAA: Assert
+    assert start == utc(2025, 11)
+
+@pytest.mark.parametrize("month, months, expected", [
+    (utc(2025, 11), 1, utc(2025, 12)),
+    (utc(2025, 11), 2, utc(2026, 1)),
+    (utc(2025, 1), -1, utc(2024, 12)),
+    (utc(2025, 3), -27, utc(2022, 12)),
+])
+def test_add_months_crosses_years(month, months, expected):
+    # AAA: Act / Assert
+    assert add_months(month, months) == expected
+
+def test_partition_is_named_after_its_month():
+    # AAA: Act / Assert
+    assert partition_name(utc(2026, 1)) == "transactions_2026_01"
+
+
+# --- Partition Maintenance Tests ---
+
+@pytest.mark.asyncio
+async def test_empty_table_gets_the_current_and_the_next_months(table):
+    # AAA: Act
+    result = await maintain_partitions(table, months_ahead=2, retention_months=0, drop_expired=False)
+
+    # AAA: Assert
+    assert result == {"created": ["transactions_2025_11", "transactions_2025_12", "transactions_2026_01"], "detached": []}
+    assert [(lower, upper) for _, lower, upper in table.created] == [
+        (utc(2025, 11), utc(2025, 12)), (utc(2025, 12), utc(2026, 1)), (utc(2026, 1), utc(2026, 2)),
+    ]
+    assert table.steps[0][0] == "execute"
+
+@pytest.mark.asyncio
+async def test_partitions_continue_from_the_newest_one(table):
+    # AAA: Arrange
+    table.add(utc(2025, 11))
+    table.add(utc(2025, 12))
+
+    # AAA: Act
+    result = await maintain_partitions(table, months_ahead=2, retention_months=0, drop_expired=False)
+
+    # AAA: Assert
+    assert result["created"] == ["transactions_2026_01"]
+
+@pytest.mark.asyncio
+async def test_up_to_date_table_is_left_alone(table):
+    # AAA: Arrange
+    table.add(utc(2025, 11))
+    table.add(utc(2025, 12))
+
+    # AAA: Act
+    result = await maintain_partitions(table, months_ahead=1, retention_months=0, drop_expired=False)
+
+    # AAA: Assert
+    assert result == {"created": [], "detached": []}
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("drop_expired", [False, True])
+async def test_partitions_past_the_retention_are_detached_or_dropped(table, drop_expired):
+    # AAA: Arrange
+    for month in (utc(2025, 7), utc(2025, 8), utc(2025, 9), utc(2025, 10), utc(2025, 11), utc(2025, 12)):
+        table.add(month)
+
+    # AAA: Act
+    result = await maintain_partitions(table, months_ahead=1, retention_months=3, drop_expired=drop_expired)
+
+    # AAA: Assert
+    assert result == {"created": [], "detached": ["transactions_2025_07"]}
+    assert (table.dropped if drop_expired else table.detached) == ["transactions_2025_07"]
+    assert "transactions_2025_08" in table.partitions
+    assert "transactions_default" in table.partitions
+
+
+# --- Migration Tests ---
+
+@pytest.mark.asyncio
+async def test_unpartitioned_table_becomes_the_legacy_partition(table):
+    # AAA: Arrange
+    table.partitioned = False
+    table.partitions = {}
+
+    # AAA: Act
+    await migrate_to_partitions(table, months_ahead=2)
+
+    # AAA: Assert
+    assert [step for step in table.steps if step[0] != "execute"] == [("prepare", utc(2026, 1)), ("swap", utc(2026, 1)), ("drop indexes", None)]
+    assert table.partitions["transactions_legacy"] == (None, utc(2026, 1), False)
+    assert [name for name, _, _ in table.created] == ["transactions_2026_01"]
+
+@pytest.mark.asyncio
+async def test_partitioned_table_is_not_migrated_again(table):
+    # AAA: Act
+    await migrate_to_partitions(table, months_ahead=2)
+
+    # AAA: Assert
+    assert table.steps == []
+    assert table.created == []
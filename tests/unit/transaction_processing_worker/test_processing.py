@@ -0,0 +1,149 @@
+import uuid
+import asyncpg
+import pytest
+
+from types import SimpleNamespace
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from processing import processing
+from processing.processing import transaction_id, write_batch, process_batch, validate_batch
+from events.events import TransactionEvent, encode_event
+
+USER_ID = "00000000-0000-0000-0000-00000000000a"
+STORED_AT = datetime(2025, 11, 20, 15, 30, tzinfo=timezone.utc)
+POISON_AMOUNT = -1.0
+
+class FakeMsg:
+    """JetStream message that records its acknowledgement in `state`."""
+
+    def __init__(self, data: bytes, msg_id: str | None = None, sequence: int = 1):
+        self.data = data
+        self.headers = {"Nats-Msg-Id": msg_id} if msg_id else None
+        self.metadata = SimpleNamespace(stream="transactions", sequence=SimpleNamespace(stream=sequence), timestamp=STORED_AT)
+        self.state = None
+
+    async def ack(self):
+        self.state = "ack"
+
+    async def nak(self, delay=None):
+        self.state = "nak"
+
+class FakePool:
+    @asynccontextmanager
+    async def acquire(self):
+        yield None
+
+class FakeDatabase:
+    """
+    Stand-in for `copy_transactions` that rejects, like PostgreSQL would, any batch holding a record
+    with POISON_AMOUNT, or raises `error` for every batch when it is set.
+    """
+
+    def __init__(self):
+        self.stored = []
+        self.attempts = []
+        self.error = None
+
+    async def __call__(self, conn, records):
+        self.attempts.append(len(records))
+        if self.error:
+            raise self.error
+        if any(record[2] == POISON_AMOUNT for record in records):
+            raise asyncpg.exceptions.CheckViolationError("amount out of range")
+        self.stored.extend(records)
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(processing, "copy_transactions", database)
+    return database
+
+def transaction(amount: float = 10.0, msg_id: str | None = None, sequence: int = 1) -> FakeMsg:
+    return FakeMsg(encode_event(TransactionEvent(user_id=USER_ID, amount=amount)), msg_id, sequence)
+
+
+# --- Transaction Id Tests ---
+
+def test_transaction_id_is_derived_from_the_nats_msg_id():
+    # AAA: Arrange
+    first = transaction(msg_id="trace-1", sequence=1)
+    redelivered = transaction(msg_id="trace-1", sequence=7)
+
+    # AAA: Act
+    ids = transaction_id(first), transaction_id(redelivered)
+
+    # AAA: Assert
+    assert ids[0] == ids[1] == uuid.uuid5(processing.TRANSACTION_ID_NAMESPACE, "trace-1")
+    assert transaction_id(transaction(msg_id="trace-2")) != ids[0]
+
+def test_transaction_id_falls_back_to_the_stream_position():
+    # AAA: Arrange
+    msg = transaction(sequence=42)
+
+    # AAA: Act
+    result = transaction_id(msg)
+
+    # AAA: Assert
+    assert result == uuid.uuid5(processing.TRANSACTION_ID_NAMESPACE, f"transactions:42:{STORED_AT.isoformat()}")
+    assert transaction_id(transaction(sequence=43)) != result
+
+
+# --- Batch Tests ---
+
+@pytest.mark.asyncio
+async def test_batch_is_copied_at_once_and_acknowledged(database):
+    # AAA: Arrange
+    msgs = [transaction(msg_id=f"trace-{index}") for index in range(4)]
+    batch, _ = validate_batch(msgs)
+
+    # AAA: Act
+    await write_batch(batch, FakePool())
+
+    # AAA: Assert
+    assert database.attempts == [4]
+    assert [record[0] for record in database.stored] == [transaction_id(msg) for msg in msgs]
+    assert all(msg.state == "ack" for msg in msgs)
+
+@pytest.mark.asyncio
+async def test_rejected_batch_is_bisected_down_to_the_poison_message(database):
+    # AAA: Arrange
+    msgs = [transaction(msg_id=f"trace-{index}") for index in range(8)]
+    msgs[5] = transaction(POISON_AMOUNT, msg_id="trace-5")
+    batch, _ = validate_batch(msgs)
+
+    # AAA: Act
+    await write_batch(batch, FakePool())
+
+    # AAA: Assert
+    assert database.attempts == [8, 4, 4, 2, 1, 1, 2]
+    assert len(database.stored) == 7
+    assert transaction_id(msgs[5]) not in [record[0] for record in database.stored]
+    assert all(msg.state == "ack" for msg in msgs)
+
+@pytest.mark.asyncio
+async def test_batch_is_redelivered_when_the_database_is_unavailable(database):
+    # AAA: Arrange
+    database.error = ConnectionError("connection refused")
+    msgs = [transaction(msg_id=f"trace-{index}") for index in range(4)]
+    batch, _ = validate_batch(msgs)
+
+    # AAA: Act
+    await write_batch(batch, FakePool())
+
+    # AAA: Assert
+    assert database.attempts == [4]
+    assert all(msg.state == "nak" for msg in msgs)
+
+@pytest.mark.asyncio
+async def test_invalid_messages_are_acknowledged_without_being_copied(database):
+    # AAA: Arrange
+    valid = transaction(msg_id="trace-1")
+    invalid = FakeMsg(b'{"userId": "not-a-uuid", "amount": 10.0}')
+    malformed = FakeMsg(b"not json")
+
+    # AAA: Act
+    await process_batch([valid, invalid, malformed], FakePool())
+
+    # AAA: Assert
+    assert [record[0] for record in database.stored] == [transaction_id(valid)]
+    assert [msg.state for msg in (valid, invalid, malformed)] == ["ack", "ack", "ack"]
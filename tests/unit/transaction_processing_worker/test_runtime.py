@@ -0,0 +1,149 @@
+import asyncio
+import pytest
+
+from runtime import runtime as runtime_module
+from runtime.runtime import WorkerRuntime
+from concurrency.concurrency import AdaptiveLimit
+
+class RecordedHandler:
+    """
+    Stand-in for a message handler that holds every message until `release` is set, recording how
+    many run at once and which ones finished.
+    """
+
+    def __init__(self):
+        self.running = 0
+        self.peak_running = 0
+        self.handled = []
+        self.release = asyncio.Event()
+
+    async def __call__(self, msg):
+        self.running += 1
+        self.peak_running = max(self.peak_running, self.running)
+        try:
+            await self.release.wait()
+            if msg == "poison":
+                raise ValueError("cannot handle message")
+            self.handled.append(msg)
+        finally:
+            self.running -= 1
+
+@pytest.fixture
+def logger_level():
+    """Sets the level of the runtime's logger, restoring it afterwards."""
+    logger = runtime_module.logger
+    previous = logger.level
+    yield logger.setLevel
+    logger.setLevel(previous)
+
+
+# --- Worker Runtime Tests ---
+
+@pytest.mark.asyncio
+async def test_handlers_in_flight_are_bounded_by_the_limit():
+    # AAA: Arrange
+    handler = RecordedHandler()
+    runtime = WorkerRuntime(handler, AdaptiveLimit.fixed(3), queue_size=100)
+    runtime.start()
+
+    # AAA: Act
+    for index in range(10):
+        await runtime.submit(index)
+    await asyncio.sleep(0.01)
+    gauges = runtime.gauges()
+    handler.release.set()
+    await runtime.stop()
+
+    # AAA: Assert
+    assert gauges == {"queue_depth": 6, "in_flight": 3}
+    assert handler.peak_running == 3
+    assert sorted(handler.handled) == list(range(10))
+
+@pytest.mark.asyncio
+async def test_submit_waits_while_the_queue_is_full():
+    # AAA: Arrange
+    handler = RecordedHandler()
+    runtime = WorkerRuntime(handler, AdaptiveLimit.fixed(1), queue_size=2)
+    runtime.start()
+    for index in range(4):
+        await runtime.submit(index)
+    await asyncio.sleep(0.01)
+
+    # AAA: Act
+    blocked = asyncio.create_task(runtime.submit(4))
+    await asyncio.sleep(0.01)
+    waited = not blocked.done()
+    handler.release.set()
+    await asyncio.wait_for(blocked, timeout=1)
+    await runtime.stop()
+
+    # AAA: Assert
+    assert waited
+    assert handler.handled == [0, 1, 2, 3, 4]
+
+@pytest.mark.asyncio
+async def test_stop_drains_the_queued_and_in_flight_messages():
+    # AAA: Arrange
+    handler = RecordedHandler()
+    limit = AdaptiveLimit.fixed(2)
+    runtime = WorkerRuntime(handler, limit, queue_size=10)
+    runtime.start()
+    for msg in [0, "poison", 1, 2, 3]:
+        await runtime.submit(msg)
+    await asyncio.sleep(0.01)
+
+    # AAA: Act
+    stopping = asyncio.create_task(runtime.stop())
+    await asyncio.sleep(0.01)
+    waited = not stopping.done()
+    handler.release.set()
+    await stopping
+
+    # AAA: Assert
+    assert waited
+    assert sorted(handler.handled) == [0, 1, 2, 3]
+    assert runtime.gauges() == {"queue_depth": 0, "in_flight": 0}
+    assert limit.in_use == 0
+
+@pytest.mark.asyncio
+async def test_stop_gives_up_on_the_queued_messages_after_its_timeout():
+    # AAA: Arrange
+    handler = RecordedHandler()
+    runtime = WorkerRuntime(handler, AdaptiveLimit.fixed(1), queue_size=10)
+    runtime.start()
+    for index in range(3):
+        await runtime.submit(index)
+    await asyncio.sleep(0.01)
+
+    # AAA: Act
+    stopping = asyncio.create_task(runtime.stop(timeout=0.01))
+    await asyncio.sleep(0.05)
+    handler.release.set()
+    await stopping
+
+    # AAA: Assert
+    assert handler.handled == [0]
+    assert runtime.gauges() == {"queue_depth": 1, "in_flight": 0}
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("level, reported", [("INFO", True), ("WARNING", False)])
+async def test_stats_are_only_collected_when_info_records_are_logged(logger_level, level, reported):
+    # AAA: Arrange
+    class RecordedPool:
+        collected = 0
+
+        def collect_wait(self):
+            self.collected += 1
+            return 0, 0.0, 0.0
+
+    pool = RecordedPool()
+    logger_level(level)
+    runtime = WorkerRuntime(RecordedHandler(), AdaptiveLimit.fixed(1), queue_size=10, db_pool=pool)
+
+    # AAA: Act
+    reporter = asyncio.create_task(runtime.report_stats(0.001))
+    await asyncio.sleep(0.02)
+    reporter.cancel()
+
+    # AAA: Assert
+    assert (pool.collected > 0) == reported
@@ -0,0 +1,144 @@
+import asyncio
+import pytest
+
+from types import SimpleNamespace
+from fastapi import HTTPException
+from api.api import create_transaction
+from models.models import TransactionPayload
+from messaging.messaging import BackgroundPublisher, PublisherQueueFullError
+
+class FakeJetStream:
+    """
+    Stand-in for a NATS connection and its JetStream context, failing the first `failures`
+    publishes and holding every publish until `release` is set.
+    """
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.attempts = []
+        self.stored = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    def jetstream(self):
+        return self
+
+    async def publish(self, subject, payload, headers=None):
+        self.attempts.append(headers["Nats-Msg-Id"])
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await self.release.wait()
+            if self.failures:
+                self.failures -= 1
+                raise TimeoutError("no response from stream")
+            self.stored.append(payload)
+        finally:
+            self.in_flight -= 1
+
+def publisher(js: FakeJetStream, queue_size: int = 100, window: int = 10, max_retries: int = 2) -> BackgroundPublisher:
+    return BackgroundPublisher(js, "transactions.topic", queue_size=queue_size, window=window, max_retries=max_retries, retry_backoff=0.001)
+
+
+# --- Publisher Tests ---
+
+@pytest.mark.asyncio
+async def test_failed_publish_is_retried_under_the_same_msg_id():
+    # AAA: Arrange
+    js = FakeJetStream(failures=2)
+    pipeline = publisher(js, max_retries=2)
+    pipeline.start()
+
+    # AAA: Act
+    pipeline.publish(b"event", "trace-1")
+    await pipeline.stop()
+
+    # AAA: Assert
+    assert js.attempts == ["trace-1"] * 3
+    assert js.stored == [b"event"]
+    assert pipeline.stats() == {"queued": 0, "in_flight": 0, "published": 1, "retried": 2, "requeued": 0}
+
+@pytest.mark.asyncio
+async def test_event_is_requeued_instead_of_dropped_when_its_retries_run_out():
+    # AAA: Arrange
+    js = FakeJetStream(failures=3)
+    pipeline = publisher(js, max_retries=1)
+    pipeline.start()
+
+    # AAA: Act
+    pipeline.publish(b"event", "trace-1")
+    await pipeline.stop()
+
+    # AAA: Assert
+    assert js.attempts == ["trace-1"] * 4
+    assert js.stored == [b"event"]
+    assert pipeline.requeued == 1
+
+@pytest.mark.asyncio
+async def test_publishes_awaiting_their_ack_are_bounded_by_the_window():
+    # AAA: Arrange
+    js = FakeJetStream()
+    js.release.clear()
+    pipeline = publisher(js, window=3)
+    pipeline.start()
+
+    # AAA: Act
+    for index in range(10):
+        pipeline.publish(f"event-{index}".encode())
+    await asyncio.sleep(0.01)
+    held = js.in_flight
+    js.release.set()
+    await pipeline.stop()
+
+    # AAA: Assert
+    assert held == 3
+    assert js.peak_in_flight == 3
+    assert len(js.stored) == 10
+
+@pytest.mark.asyncio
+async def test_stop_drains_the_queued_events():
+    # AAA: Arrange
+    js = FakeJetStream()
+    pipeline = publisher(js, window=2)
+    for index in range(20):
+        pipeline.publish(f"event-{index}".encode())
+    pipeline.start()
+
+    # AAA: Act
+    await pipeline.stop()
+
+    # AAA: Assert
+    assert js.stored == [f"event-{index}".encode() for index in range(20)]
+    assert pipeline.stats()["queued"] == 0
+
+def test_publish_raises_when_the_queue_is_full():
+    # AAA: Arrange
+    pipeline = publisher(FakeJetStream(), queue_size=2)
+    pipeline.publish(b"first")
+    pipeline.publish(b"second")
+
+    # AAA: Act / Assert
+    with pytest.raises(PublisherQueueFullError):
+        pipeline.publish(b"third")
+
+
+# --- Endpoint Tests ---
+
+@pytest.mark.asyncio
+async def test_transaction_is_refused_with_retry_after_when_the_queue_is_full():
+    # AAA: Arrange
+    pipeline = publisher(FakeJetStream(), queue_size=1)
+    request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(publisher=pipeline)))
+    payload = TransactionPayload(userId="00000000-0000-0000-0000-00000000000a", amount=10.0)
+    accepted = await create_transaction(payload, request)
+
+    # AAA: Act
+    with pytest.raises(HTTPException) as refused:
+        await create_transaction(payload, request)
+
+    # AAA: Assert
+    assert accepted["status"] == "event received"
+    assert refused.value.status_code == 503
+    assert refused.value.headers == {"Retry-After": "1"}
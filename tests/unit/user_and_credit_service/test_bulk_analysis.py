@@ -0,0 +1,74 @@
+import uuid
+import httpx
+import pytest
+
+from types import SimpleNamespace
+from contextlib import asynccontextmanager
+from api import api
+from api.api import analyze_credit_chunk
+from services import services
+from models.models import CreditAnalysisError
+
+USER_IDS = [str(uuid.UUID(int=index + 1)) for index in range(3)]
+FEATURES = {"transaction_count_30d": 10, "avg_transaction_value_30d": 120.0, "avg_positivity_7d": 0.6, "stress_events_30d": 1}
+
+class FakePool:
+    @asynccontextmanager
+    async def acquire(self):
+        yield None
+
+@pytest.fixture
+def stored_users(monkeypatch):
+    """Stand-ins of the feature query and of the offers COPY, for users whose features are all stored."""
+    copied = []
+
+    async def get_users_features(conn, user_uuids):
+        return {user_uuid: dict(FEATURES) for user_uuid in user_uuids}
+
+    async def copy_credit_offers(conn, offers):
+        copied.extend(offers)
+
+    async def announce_saved_offers(state, offers):
+        pass
+
+    monkeypatch.setattr(api, "get_users_features", get_users_features)
+    monkeypatch.setattr(api, "copy_credit_offers", copy_credit_offers)
+    monkeypatch.setattr(api, "announce_saved_offers", announce_saved_offers)
+    yield copied
+    services.ml_service_breaker.close()
+
+def state_answering(risk_scores: list[float]) -> SimpleNamespace:
+    """Application state whose credit analysis service answers every batch with `risk_scores`."""
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json={"risk_scores": risk_scores}))
+    return SimpleNamespace(db_pool=FakePool(), http_client=httpx.AsyncClient(transport=transport))
+
+
+# --- Bulk Credit Analysis Tests ---
+
+@pytest.mark.asyncio
+async def test_every_user_of_a_chunk_is_answered_in_order(stored_users):
+    # AAA: Arrange
+    state = state_answering([0.1, 0.9, 0.2])
+
+    # AAA: Act
+    results = await analyze_credit_chunk(state, ["not-a-uuid", *USER_IDS])
+
+    # AAA: Assert
+    assert [result.user_id for result in results] == ["not-a-uuid", *USER_IDS]
+    assert isinstance(results[0], CreditAnalysisError)
+    assert [offer["user_id"] for offer in stored_users] == [USER_IDS[0], USER_IDS[2]]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("risk_scores", [[0.1, 0.2], [0.1, 0.2, 0.3, 0.4]])
+async def test_chunk_fails_as_a_whole_when_the_scores_do_not_match_the_users(stored_users, risk_scores):
+    # AAA: Arrange
+    state = state_answering(risk_scores)
+
+    # AAA: Act
+    results = await analyze_credit_chunk(state, ["not-a-uuid", *USER_IDS])
+
+    # AAA: Assert
+    assert [result.user_id for result in results] == ["not-a-uuid", *USER_IDS]
+    assert results[0].error == "Invalid user id."
+    assert all(result.error == "Credit analysis service returned an invalid response." for result in results[1:])
+    assert stored_users == []
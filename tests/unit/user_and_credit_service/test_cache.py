@@ -0,0 +1,292 @@
+import json
+import asyncio
+import pytest
+import pytest_asyncio
+
+from types import SimpleNamespace
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+from cache import cache as cache_module
+from cache.cache import TwoTierCache
+
+TTL = 300
+STALE_TTL = 60
+CHANNEL = "cache.invalidations"
+
+class Clock:
+    """Monotonic clock of the cache module, advanced by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+class Loader:
+    """Loader coroutine function that counts its calls and returns `value` once `release` is set."""
+
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        return self.value
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+@pytest.fixture
+def server():
+    return FakeServer()
+
+@pytest_asyncio.fixture
+async def redis_client(server):
+    client = FakeRedis(server=server, decode_responses=True)
+    yield client
+    await client.aclose()
+
+def two_tier_cache(redis_client, max_bytes: int = 1024 * 1024) -> TwoTierCache:
+    return TwoTierCache(redis_client, TTL, STALE_TTL, jitter=0.0, max_bytes=max_bytes, channel=CHANNEL)
+
+async def settle():
+    """Lets the background loads and listeners run."""
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+# --- Two-Tier Cache Tests ---
+
+@pytest.mark.asyncio
+async def test_missing_key_is_loaded_into_both_tiers(clock, redis_client):
+    # AAA: Arrange
+    cache = two_tier_cache(redis_client)
+    loader = Loader({"score": 0.7})
+
+    # AAA: Act
+    first = await cache.get_or_load("user:1", loader)
+    second = await cache.get_or_load("user:1", loader)
+
+    # AAA: Assert
+    assert first == second == {"score": 0.7}
+    assert loader.calls == 1
+    assert json.loads(await redis_client.get("user:1")) == {"score": 0.7}
+    assert 0 < await redis_client.ttl("user:1") <= TTL
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["local_hits"] == 1
+
+@pytest.mark.asyncio
+async def test_key_written_by_another_replica_is_read_from_redis(clock, redis_client):
+    # AAA: Arrange
+    await redis_client.setex("user:1", TTL, json.dumps({"score": 0.4}))
+    cache = two_tier_cache(redis_client)
+    loader = Loader({"score": 0.7})
+
+    # AAA: Act
+    value = await cache.get_or_load("user:1", loader)
+
+    # AAA: Assert
+    assert value == {"score": 0.4}
+    assert loader.calls == 0
+    assert cache.stats()["redis_hits"] == 1
+
+@pytest.mark.asyncio
+async def test_expired_entry_is_served_stale_while_it_reloads(clock, redis_client):
+    # AAA: Arrange
+    cache = two_tier_cache(redis_client)
+    await cache.get_or_load("user:1", Loader("old"))
+    clock.now += TTL + 1
+    reload = Loader("new")
+    reload.release.clear()
+
+    # AAA: Act
+    stale = await cache.get_or_load("user:1", reload)
+    reload.release.set()
+    await settle()
+    fresh = await cache.get_or_load("user:1", reload)
+
+    # AAA: Assert
+    assert stale == "old"
+    assert fresh == "new"
+    assert reload.calls == 1
+    assert cache.stats()["stale_hits"] == 1
+
+@pytest.mark.asyncio
+async def test_entry_past_its_stale_window_is_not_served(clock, redis_client):
+    # AAA: Arrange
+    cache = two_tier_cache(redis_client)
+    await cache.get_or_load("user:1", Loader("old"))
+    await redis_client.delete("user:1")
+    clock.now += TTL + STALE_TTL + 1
+
+    # AAA: Act
+    value = await cache.get_or_load("user:1", Loader("new"))
+
+    # AAA: Assert
+    assert value == "new"
+    assert cache.stats()["stale_hits"] == 0
+
+@pytest.mark.asyncio
+async def test_local_tier_evicts_the_least_recently_used_keys_beyond_its_size(clock, redis_client):
+    # AAA: Arrange
+    value = "x" * 100
+    cache = two_tier_cache(redis_client, max_bytes=2 * len(json.dumps(value)))
+    for key in ("user:1", "user:2"):
+        await cache.get_or_load(key, Loader(value))
+    await cache.get_or_load("user:1", Loader(value))
+
+    # AAA: Act
+    await cache.get_or_load("user:3", Loader(value))
+
+    # AAA: Assert
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+    assert stats["bytes"] <= stats["max_bytes"]
+    await redis_client.delete("user:1", "user:2", "user:3")
+    assert await cache.get_many({"user:1": None, "user:2": None, "user:3": None}) == {"user:1": value, "user:3": value}
+
+@pytest.mark.asyncio
+async def test_invalidation_drops_the_key_from_both_tiers(clock, redis_client):
+    # AAA: Arrange
+    cache = two_tier_cache(redis_client)
+    await cache.get_or_load("user:1", Loader("old"))
+
+    # AAA: Act
+    await cache.invalidate("user:1")
+    value = await cache.get_or_load("user:1", Loader("new"))
+
+    # AAA: Assert
+    assert value == "new"
+    assert json.loads(await redis_client.get("user:1")) == "new"
+
+@pytest.mark.asyncio
+async def test_invalidation_reaches_the_local_tier_of_other_replicas(clock, server, redis_client):
+    # AAA: Arrange
+    other_client = FakeRedis(server=server, decode_responses=True)
+    this_replica, other_replica = two_tier_cache(redis_client), two_tier_cache(other_client)
+    other_replica.start()
+    await settle()
+    await this_replica.get_or_load("user:1", Loader("old"))
+    await other_replica.get_or_load("user:1", Loader("old"))
+
+    # AAA: Act
+    await this_replica.invalidate_many(["user:1"])
+    for _ in range(50):
+        if other_replica.stats()["invalidations"]:
+            break
+        await asyncio.sleep(0.01)
+
+    # AAA: Assert
+    try:
+        assert other_replica.stats()["entries"] == 0
+        assert await other_replica.get_or_load("user:1", Loader("new")) == "new"
+    finally:
+        await other_replica.stop()
+        await other_client.aclose()
+
+
+# --- Single-Flight Loading Tests ---
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load(clock, redis_client):
+    # AAA: Arrange
+    cache = two_tier_cache(redis_client)
+    loader = Loader({"score": 0.7})
+    loader.release.clear()
+
+    # AAA: Act
+    waiting = [asyncio.create_task(cache.get_or_load("user:1", loader)) for _ in range(5)]
+    await settle()
+    loader.release.set()
+    values = await asyncio.gather(*waiting)
+
+    # AAA: Assert
+    assert values == [{"score": 0.7}] * 5
+    assert loader.calls == 1
+    assert cache.stats()["coalesced"] == 4
+
+@pytest.mark.asyncio
+async def test_keys_are_read_from_redis_in_one_round_trip(clock, redis_client, monkeypatch):
+    # AAA: Arrange
+    await redis_client.setex("user:1", TTL, json.dumps(1))
+    await redis_client.setex("user:2", TTL, json.dumps(2))
+    cache = two_tier_cache(redis_client)
+    reads = []
+    read_redis = cache._read_redis
+    async def recorded_read_redis(keys):
+        reads.append(list(keys))
+        return await read_redis(keys)
+    monkeypatch.setattr(cache, "_read_redis", recorded_read_redis)
+    loader = Loader(3)
+
+    # AAA: Act
+    values = await cache.get_many({"user:1": loader, "user:2": loader, "user:3": loader})
+
+    # AAA: Assert
+    assert values == {"user:1": 1, "user:2": 2, "user:3": 3}
+    assert reads == [["user:1", "user:2", "user:3"]]
+    assert loader.calls == 1
+
+@pytest.mark.asyncio
+async def test_load_invalidated_while_running_is_stored_in_neither_tier(clock, redis_client):
+    # AAA: Arrange
+    cache = two_tier_cache(redis_client)
+    loader = Loader("before invalidation")
+    loader.release.clear()
+    waiting = asyncio.create_task(cache.get_or_load("user:1", loader))
+    await settle()
+
+    # AAA: Act
+    await cache.invalidate("user:1")
+    loader.release.set()
+    value = await waiting
+
+    # AAA: Assert
+    assert value == "before invalidation"
+    assert await redis_client.get("user:1") is None
+    assert await cache.get_or_load("user:1", Loader("after invalidation")) == "after invalidation"
+
+@pytest.mark.asyncio
+async def test_miss_after_an_invalidation_does_not_join_the_fenced_load(clock, redis_client):
+    # AAA: Arrange
+    cache = two_tier_cache(redis_client)
+    fenced = Loader("before invalidation")
+    fenced.release.clear()
+    waiting = asyncio.create_task(cache.get_or_load("user:1", fenced))
+    await settle()
+    await cache.invalidate("user:1")
+
+    # AAA: Act
+    value = await asyncio.wait_for(cache.get_or_load("user:1", Loader("after invalidation")), timeout=1)
+    fenced.release.set()
+    await waiting
+    await settle()
+
+    # AAA: Assert
+    assert value == "after invalidation"
+    assert json.loads(await redis_client.get("user:1")) == "after invalidation"
+    assert await cache.get_or_load("user:1", Loader("unused")) == "after invalidation"
+
+@pytest.mark.asyncio
+async def test_invalidation_during_the_redis_write_removes_the_written_value(clock, redis_client, monkeypatch):
+    # AAA: Arrange
+    cache = two_tier_cache(redis_client)
+    setex = redis_client.setex
+    async def setex_racing_an_invalidation(key, ttl, value):
+        await cache.invalidate(key)
+        return await setex(key, ttl, value)
+    monkeypatch.setattr(redis_client, "setex", setex_racing_an_invalidation)
+
+    # AAA: Act
+    value = await cache.get_or_load("user:1", Loader("before invalidation"))
+
+    # AAA: Assert
+    assert value == "before invalidation"
+    assert await redis_client.get("user:1") is None
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+from hashing import hashing
+from hashing.hashing import PasswordHasher, PasswordHasherOverloadedError
+
+ROUNDS = 4
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(workers=1, rounds=ROUNDS, max_concurrency=1, max_queued=1)
+    yield hasher
+    hasher.shutdown()
+
+@pytest.fixture
+def blocked_hasher(monkeypatch):
+    """A hasher whose hashing blocks in a thread until `release` is set, to fill its slot and queue."""
+    release = threading.Event()
+    monkeypatch.setattr(hashing, "ProcessPoolExecutor", lambda max_workers, mp_context: ThreadPoolExecutor(max_workers))
+    monkeypatch.setattr(hashing, "hash_password", lambda password, rounds: release.wait(5) and f"hash:{password}")
+    hasher = PasswordHasher(workers=1, rounds=ROUNDS, max_concurrency=1, max_queued=1)
+    yield hasher, release
+    release.set()
+    hasher.shutdown()
+
+
+# --- Password Hashing Tests ---
+
+@pytest.mark.asyncio
+async def test_password_is_verified_against_its_hash(hasher):
+    # AAA: Arrange
+    password_hash = await hasher.hash("correct horse")
+
+    # AAA: Act
+    valid = await hasher.verify_and_update("correct horse", password_hash)
+    invalid = await hasher.verify_and_update("battery staple", password_hash)
+
+    # AAA: Assert
+    assert password_hash.startswith(f"$2b$0{ROUNDS}$")
+    assert valid == (True, None)
+    assert invalid == (False, None)
+
+@pytest.mark.asyncio
+async def test_hash_with_another_cost_is_rehashed_on_verification(hasher):
+    # AAA: Arrange
+    old_hash = hashing.hash_password("correct horse", ROUNDS + 1)
+
+    # AAA: Act
+    valid, new_hash = await hasher.verify_and_update("correct horse", old_hash)
+
+    # AAA: Assert
+    assert valid is True
+    assert new_hash.startswith(f"$2b$0{ROUNDS}$")
+    assert hashing.verify_and_update_password("correct horse", new_hash, ROUNDS) == (True, None)
+
+@pytest.mark.asyncio
+async def test_hashing_runs_in_spawned_workers(hasher):
+    # AAA: Arrange / Act
+    await hasher.hash("correct horse")
+
+    # AAA: Assert
+    processes = list(hasher._executor._processes.values())
+    assert processes
+    assert all(process.__class__.__name__ == "SpawnProcess" for process in processes)
+
+@pytest.mark.asyncio
+async def test_requests_beyond_the_queue_limit_fail_fast(blocked_hasher):
+    # AAA: Arrange
+    hasher, release = blocked_hasher
+    running = asyncio.create_task(hasher.hash("running"))
+    await asyncio.sleep(0.01)
+    queued = asyncio.create_task(hasher.hash("queued"))
+    await asyncio.sleep(0.01)
+
+    # AAA: Act
+    with pytest.raises(PasswordHasherOverloadedError):
+        await hasher.hash("rejected")
+    release.set()
+
+    # AAA: Assert
+    assert await running == "hash:running"
+    assert await queued == "hash:queued"
+
+@pytest.mark.asyncio
+async def test_queue_admits_requests_again_once_drained(blocked_hasher):
+    # AAA: Arrange
+    hasher, release = blocked_hasher
+    first = asyncio.create_task(hasher.hash("first"))
+    await asyncio.sleep(0.01)
+    second = asyncio.create_task(hasher.hash("second"))
+    await asyncio.sleep(0.01)
+    release.set()
+    await asyncio.gather(first, second)
+
+    # AAA: Act
+    result = await hasher.hash("third")
+
+    # AAA: Assert
+    assert result == "hash:third"
@@ -0,0 +1,68 @@
+import uuid
+import pytest
+
+from types import SimpleNamespace
+from contextlib import asynccontextmanager
+from api import api
+from api.api import get_user_offers, announce_saved_offers
+
+USER_ID = uuid.UUID("0b6e1a4c-2f3d-4e5a-8b7c-9d0e1f2a3b4c")
+
+class FakeCache:
+    """Stand-in for the two-tier cache, keeping loaded values by key until they are invalidated."""
+
+    def __init__(self):
+        self.values = {}
+
+    async def get_or_load(self, key, loader):
+        if key not in self.values:
+            self.values[key] = await loader()
+        return self.values[key]
+
+    async def invalidate_many(self, keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+class FakePool:
+    @asynccontextmanager
+    async def acquire(self):
+        yield None
+
+@pytest.fixture
+def offers(monkeypatch):
+    """The offers stored for USER_ID, read by the stand-ins of the offer queries."""
+    offers = []
+
+    async def fetch_offers_page(conn, user_id, limit, offset):
+        return []
+
+    async def count_user_offers(conn, user_id):
+        return len(offers)
+
+    async def publish_offers_created_events(nats_conn, saved):
+        pass
+
+    monkeypatch.setattr(api, "fetch_offers_page", fetch_offers_page)
+    monkeypatch.setattr(api, "count_user_offers", count_user_offers)
+    monkeypatch.setattr(api, "publish_offers_created_events", publish_offers_created_events)
+    return offers
+
+
+# --- Offer Count Tests ---
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("spelling", [str(USER_ID).upper(), USER_ID.hex, str(USER_ID)])
+async def test_cached_offer_count_is_invalidated_whatever_the_spelling_of_the_user_id(offers, spelling):
+    # AAA: Arrange
+    state = SimpleNamespace(cache=FakeCache(), db_pool=FakePool(), nats_conn=None)
+    request = SimpleNamespace(app=SimpleNamespace(state=state))
+    before = await get_user_offers(spelling, request, page=1, page_size=10, cursor=None, include_total=True)
+    offers.append({"id": uuid.uuid4(), "user_id": USER_ID})
+
+    # AAA: Act
+    await announce_saved_offers(state, offers)
+    after = await get_user_offers(spelling, request, page=1, page_size=10, cursor=None, include_total=True)
+
+    # AAA: Assert
+    assert (before.total, after.total) == (0, 1)
+    assert list(state.cache.values) == [f"offers_count:{USER_ID}"]